@@ -0,0 +1,283 @@
+"""
+Comando Django para medir o teste de jams e alerts nas áreas de observação
+
+Gera áreas (polígonos em estrela) e um feed TVT sintético sobre a mesma
+região, gravado no mesmo formato do snapshot de IntegradorWaze.salvar_feed
+(jams = irregularities DYNAMIC, ver inventario_areas.jams_do_snapshot), e
+compara os métodos de atribuir cada jam e alert às áreas:
+
+    ray_casting  ray casting em Python sobre o anel externo, ponto a
+                 ponto (retângulo da área como pré-filtro, jams pelos
+                 5 primeiros vértices)
+    strtree      multipontos dos 5 primeiros vértices dos jams em STRtree
+    kernel       PoligonosVetorizados (services/kernel_poligonos.py):
+                 todos os vértices e interseção segmento × borda
+
+A referência é o Shapely com as linhas inteiras (intersects): para cada
+método são reportados tempo (melhor, mediana, pior) e os pares
+jam × área que faltam ou sobram em relação à referência.
+
+Nada é gravado no banco: as áreas são instâncias não salvas.
+
+Uso:
+    python manage.py benchmark_areas
+    python manage.py benchmark_areas --areas 500 --irregularidades 20000
+    python manage.py benchmark_areas --metodos strtree,kernel --repeticoes 10
+"""
+
+import time
+
+import numpy as np
+import shapely
+from django.core.management.base import BaseCommand, CommandError
+from aplicativo.models import AreaObservacao
+from aplicativo.services.geometria import ler_poligonos
+from aplicativo.services.inventario_areas import CamadaInventario, jams_do_snapshot, poligono_da_area
+from aplicativo.services.kernel_poligonos import PoligonosVetorizados
+from aplicativo.services.snapshot_waze import SnapshotWaze
+from aplicativo.services.waze_sintetico import gerar_areas, gerar_feed
+
+# Vértices iniciais dos jams testados pelos métodos anteriores ao kernel
+VERTICES_JAM = 5
+
+
+class Command(BaseCommand):
+    help = 'Compara ray casting, STRtree e o kernel vetorizado no teste de jams/alerts por area'
+
+    METODOS = ['ray_casting', 'strtree', 'kernel']
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--areas',
+            type=int,
+            default=100,
+            help='Quantidade de areas (padrao: 100)'
+        )
+        parser.add_argument(
+            '--vertices',
+            type=int,
+            default=24,
+            help='Vertices do poligono de cada area (padrao: 24)'
+        )
+        parser.add_argument(
+            '--irregularidades',
+            type=int,
+            default=5000,
+            help='Quantidade de irregularities no feed, cerca de metade DYNAMIC (padrao: 5000)'
+        )
+        parser.add_argument(
+            '--alertas',
+            type=int,
+            default=2000,
+            help='Quantidade de alerts no feed (padrao: 2000)'
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=5,
+            help='Numero de execucoes medidas (padrao: 5)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=2024,
+            help='Semente do gerador pseudoaleatorio (padrao: 2024)'
+        )
+        parser.add_argument(
+            '--metodos',
+            type=str,
+            default=','.join(self.METODOS),
+            help=f'Metodos medidos, separados por virgula (padrao: {",".join(self.METODOS)})'
+        )
+
+    # ========================================
+    # MÉTODOS
+    # ========================================
+
+    @staticmethod
+    def _ponto_no_anel(anel, lon, lat):
+        """Ray casting sobre um anel [[x, y], ...]"""
+        dentro = False
+        j = len(anel) - 1
+        for i in range(len(anel)):
+            xi, yi = anel[i][0], anel[i][1]
+            xj, yj = anel[j][0], anel[j][1]
+            if ((yi > lat) != (yj > lat)) and (lon < (xj - xi) * (lat - yi) / (yj - yi) + xi):
+                dentro = not dentro
+            j = i
+        return dentro
+
+    @staticmethod
+    def _linhas_jams(snapshot, vertices=None):
+        """(índice, [(x, y), ...]) de cada jam do snapshot, com até `vertices` pontos"""
+        jams = jams_do_snapshot(snapshot)
+        xs, ys, offsets = jams['x'].tolist(), jams['y'].tolist(), jams['offsets'].tolist()
+        linhas = []
+        for indice in range(len(offsets) - 1):
+            inicio, fim = offsets[indice], offsets[indice + 1]
+            if vertices is not None:
+                fim = min(fim, inicio + vertices)
+            linhas.append((indice, list(zip(xs[inicio:fim], ys[inicio:fim]))))
+        return linhas
+
+    def _ray_casting(self, areas, snapshot):
+        jams = self._linhas_jams(snapshot, VERTICES_JAM)
+        alerts = [
+            (indice, alert.get('location.x'), alert.get('location.y'))
+            for indice, alert in enumerate(snapshot.tabela('alerts'))
+        ]
+
+        pares_jams, pares_alerts = set(), set()
+        for k, area in enumerate(areas):
+            anel = area.geojson['geometry']['coordinates'][0]
+            oeste, leste = min(p[0] for p in anel), max(p[0] for p in anel)
+            sul, norte = min(p[1] for p in anel), max(p[1] for p in anel)
+
+            def dentro(lon, lat):
+                return (
+                    lon is not None and lat is not None
+                    and oeste <= lon <= leste and sul <= lat <= norte
+                    and self._ponto_no_anel(anel, lon, lat)
+                )
+
+            for indice, pontos in jams:
+                if any(dentro(lon, lat) for lon, lat in pontos):
+                    pares_jams.add((k, indice))
+            for indice, lon, lat in alerts:
+                if dentro(lon, lat):
+                    pares_alerts.add((k, indice))
+        return pares_jams, pares_alerts
+
+    def _strtree(self, areas, snapshot):
+        poligonos = [poligono_da_area(area.geojson) for area in areas]
+
+        indices, geometrias = [], []
+        for indice, pontos in self._linhas_jams(snapshot, VERTICES_JAM):
+            if pontos:
+                indices.append(indice)
+                geometrias.append(shapely.multipoints(pontos))
+        jams = CamadaInventario(indices, geometrias)
+
+        alerts = CamadaInventario.de_pontos(
+            enumerate(snapshot.tabela('alerts')),
+            lambda a: a[1].get('location.y'),
+            lambda a: a[1].get('location.x'),
+            lambda a: a[0],
+        )
+        return self._pares(jams.itens_por_area(poligonos)), self._pares(alerts.itens_por_area(poligonos))
+
+    def _kernel(self, areas, snapshot):
+        kernel = PoligonosVetorizados([ler_poligonos(area.geojson) for area in areas])
+
+        jams = jams_do_snapshot(snapshot)
+        jams = kernel.linhas_por_poligono(jams['x'], jams['y'], jams['offsets'])
+
+        tabela = snapshot.tabela('alerts')
+        alerts = kernel.pontos_por_poligono(
+            np.array(tabela.coluna('location.x'), dtype=np.float64),
+            np.array(tabela.coluna('location.y'), dtype=np.float64),
+        )
+        return self._pares(jams), self._pares(alerts)
+
+    def _referencia(self, areas, snapshot):
+        """Shapely com as linhas inteiras (intersects)"""
+        poligonos = [poligono_da_area(area.geojson) for area in areas]
+
+        indices, geometrias = [], []
+        for indice, pontos in self._linhas_jams(snapshot):
+            if pontos:
+                indices.append(indice)
+                geometrias.append(shapely.LineString(pontos) if len(pontos) > 1 else shapely.Point(pontos[0]))
+        jams = CamadaInventario(indices, geometrias)
+
+        tabela = snapshot.tabela('alerts')
+        alerts = CamadaInventario(
+            list(range(len(tabela))),
+            shapely.points(tabela.coluna('location.x'), tabela.coluna('location.y')),
+        )
+        return self._pares(jams.itens_por_area(poligonos)), self._pares(alerts.itens_por_area(poligonos))
+
+    @staticmethod
+    def _pares(por_area):
+        return {(k, int(item)) for k, itens in enumerate(por_area) for item in itens}
+
+    # ========================================
+    # EXECUÇÃO
+    # ========================================
+
+    def _medir(self, funcao, repeticoes):
+        tempos = []
+        resultado = None
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resultado = funcao()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+        tempos.sort()
+        return {
+            'melhor_ms': round(tempos[0], 2),
+            'mediana_ms': round(tempos[len(tempos) // 2], 2),
+            'pior_ms': round(tempos[-1], 2),
+        }, resultado
+
+    def handle(self, *args, **options):
+        repeticoes = max(1, options.get('repeticoes'))
+        metodos = [m.strip() for m in options.get('metodos').split(',') if m.strip()]
+        invalidos = [m for m in metodos if m not in self.METODOS]
+        if invalidos:
+            raise CommandError(f'Metodos invalidos: {", ".join(invalidos)} (opcoes: {", ".join(self.METODOS)})')
+
+        self.stdout.write(self.style.NOTICE('\n' + '=' * 60))
+        self.stdout.write(self.style.NOTICE('    BENCHMARK - JAMS E ALERTS POR AREA'))
+        self.stdout.write(self.style.NOTICE('=' * 60 + '\n'))
+
+        seed = options.get('seed')
+        areas = [
+            AreaObservacao(nome=f'Area {i}', geojson=geojson)
+            for i, geojson in enumerate(gerar_areas(options.get('areas'), options.get('vertices'), seed=seed))
+        ]
+        feed = gerar_feed(0, options.get('irregularidades'), options.get('alertas'), seed)
+        snapshot = SnapshotWaze.de_feed(feed)
+        jams = jams_do_snapshot(snapshot)
+
+        self.stdout.write(
+            f"{len(areas):,} areas ({options.get('vertices')} vertices), "
+            f"{len(feed['irregularities']):,} irregularities, "
+            f"{len(jams['niveis']):,} jams DYNAMIC ({len(jams['x']):,} vertices), "
+            f"{len(feed['alerts']):,} alerts"
+        )
+        self.stdout.write(f'Execucoes por metodo: {repeticoes}')
+
+        ref_jams, ref_alerts = self._referencia(areas, snapshot)
+        self.stdout.write(
+            f'\nReferencia (Shapely, linhas inteiras): {len(ref_jams):,} pares jam x area, '
+            f'{len(ref_alerts):,} pares alert x area'
+        )
+
+        medianas = {}
+        for metodo in metodos:
+            funcao = getattr(self, f'_{metodo}')
+            medicao, (jams, alerts) = self._medir(lambda: funcao(areas, snapshot), repeticoes)
+            medianas[metodo] = medicao['mediana_ms']
+
+            self.stdout.write(f'\n{metodo}:')
+            self.stdout.write(self.style.SUCCESS(f"  Melhor:  {medicao['melhor_ms']:.2f} ms"))
+            self.stdout.write(f"  Mediana: {medicao['mediana_ms']:.2f} ms")
+            self.stdout.write(f"  Pior:    {medicao['pior_ms']:.2f} ms")
+
+            faltando = len(ref_jams - jams)
+            linha = f'  Jams:    {len(jams):,} pares ({faltando:,} faltando, {len(jams - ref_jams):,} a mais)'
+            self.stdout.write(self.style.WARNING(linha) if faltando else linha)
+            linha = (
+                f'  Alerts:  {len(alerts):,} pares '
+                f'({len(ref_alerts - alerts):,} faltando, {len(alerts - ref_alerts):,} a mais)'
+            )
+            self.stdout.write(self.style.WARNING(linha) if alerts != ref_alerts else linha)
+
+        if 'kernel' in medianas and len(medianas) > 1:
+            self.stdout.write(self.style.NOTICE('\nKernel vetorizado em relacao aos demais (mediana):'))
+            for metodo, mediana in medianas.items():
+                if metodo != 'kernel' and medianas['kernel']:
+                    self.stdout.write(f"  {metodo}: {mediana / medianas['kernel']:.1f}x")
+
+        self.stdout.write('')
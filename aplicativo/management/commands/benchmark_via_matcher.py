@@ -0,0 +1,198 @@
+"""
+Comando Django para medir o fuzzy matching do ViaMatcher
+
+Monta uma amostra rotulada de nomes no estilo do Waze (abreviações,
+acentos removidos, erros de digitação, palavras omitidas) a partir das
+vias do cache e compara, nome a nome, o fuzzy no cache com e sem o
+índice de trigramas:
+
+    - latência por nome (média, mediana, p95)
+    - concordância entre os dois resultados (mesma via e score)
+    - acerto em relação ao rótulo
+
+Sem logradouros importados (ou com --sinteticas), usa vias sintéticas
+criadas dentro de uma transação desfeita ao final.
+
+Uso:
+    python manage.py benchmark_via_matcher
+    python manage.py benchmark_via_matcher --amostra 200 --seed 7
+    python manage.py benchmark_via_matcher --sinteticas 5000 --top-k 16
+"""
+
+import random
+import time
+import unicodedata
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from aplicativo.models import Logradouro
+from aplicativo.services.via_matcher import ViaMatcher
+from aplicativo.services.waze_sintetico import gerar_logradouros, gerar_nomes_vias
+
+
+class Command(BaseCommand):
+    help = 'Mede o fuzzy matching do ViaMatcher com e sem indice de trigramas'
+
+    ABREVIACOES_WAZE = {
+        'Avenida': 'Av.',
+        'Rua': 'R.',
+        'Estrada': 'Estr.',
+        'Travessa': 'Tv.',
+        'Praça': 'Pç.',
+        'Doutor': 'Dr.',
+        'Professor': 'Prof.',
+        'General': 'Gen.',
+        'Presidente': 'Pres.',
+        'Almirante': 'Alm.',
+        'Marechal': 'Mal.',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--amostra',
+            type=int,
+            default=100,
+            help='Quantidade de nomes rotulados (padrao: 100)'
+        )
+        parser.add_argument(
+            '--sinteticas',
+            type=int,
+            default=0,
+            help='Usa N vias sinteticas em vez dos logradouros importados'
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=ViaMatcher.TOP_K_CANDIDATOS,
+            help=f'Candidatos pontuados por nome (padrao: {ViaMatcher.TOP_K_CANDIDATOS})'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=2024,
+            help='Semente do gerador pseudoaleatorio (padrao: 2024)'
+        )
+
+    def _variante_waze(self, rnd, nome):
+        """Aplica 1 ou 2 alterações típicas dos nomes do Waze"""
+        palavras = nome.split()
+
+        for _ in range(rnd.randint(1, 2)):
+            alteracao = rnd.choice(['abreviar', 'acentos', 'digitacao', 'troca', 'omitir'])
+
+            if alteracao == 'abreviar':
+                palavras = [self.ABREVIACOES_WAZE.get(p, p) for p in palavras]
+            elif alteracao == 'acentos':
+                palavras = [
+                    unicodedata.normalize('NFKD', p).encode('ASCII', 'ignore').decode('ASCII')
+                    for p in palavras
+                ]
+            elif alteracao in ('digitacao', 'troca'):
+                i = rnd.randrange(len(palavras))
+                palavra = palavras[i]
+                if len(palavra) > 3:
+                    j = rnd.randrange(1, len(palavra) - 1)
+                    if alteracao == 'digitacao':
+                        palavra = palavra[:j] + palavra[j + 1:]
+                    else:
+                        palavra = palavra[:j - 1] + palavra[j] + palavra[j - 1] + palavra[j + 1:]
+                    palavras[i] = palavra
+            elif len(palavras) > 3:
+                del palavras[rnd.randrange(1, len(palavras))]
+
+        return ' '.join(palavras)
+
+    def _amostra_rotulada(self, matcher, quantidade, seed):
+        """[(nome normalizado, cod_trecho esperado)] que não casam exatamente"""
+        rnd = random.Random(seed)
+        chaves = list(matcher._cache_vias)
+        amostra = []
+        tentativas = 0
+        while len(amostra) < quantidade and tentativas < quantidade * 20:
+            tentativas += 1
+            via = matcher._cache_vias[rnd.choice(chaves)]
+            nome = matcher._normalizar(self._variante_waze(rnd, via.nome_completo))
+            if nome and nome not in matcher._cache_vias:
+                amostra.append((nome, via.cod_trecho))
+        return amostra
+
+    def _medir(self, matcher, amostra, usar_indice):
+        latencias = []
+        resultados = []
+        for nome, _ in amostra:
+            inicio = time.perf_counter()
+            via, score = matcher._fuzzy_cache(nome, usar_indice=usar_indice)
+            latencias.append((time.perf_counter() - inicio) * 1_000_000)
+            aceito = via if score >= matcher.SCORE_MINIMO_FUZZY else None
+            resultados.append((aceito.cod_trecho if aceito else None, score))
+        return latencias, resultados
+
+    def _exibir_latencias(self, titulo, latencias):
+        ordenadas = sorted(latencias)
+        media = sum(ordenadas) / len(ordenadas)
+        p95 = ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))]
+        self.stdout.write(f'\n{titulo}:')
+        self.stdout.write(f'  Media:   {media:,.1f} us/nome')
+        self.stdout.write(f'  Mediana: {ordenadas[len(ordenadas) // 2]:,.1f} us/nome')
+        self.stdout.write(f'  p95:     {p95:,.1f} us/nome')
+        return media
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('\n' + '=' * 60))
+        self.stdout.write(self.style.NOTICE('    BENCHMARK - VIA MATCHER (FUZZY NO CACHE)'))
+        self.stdout.write(self.style.NOTICE('=' * 60 + '\n'))
+
+        with transaction.atomic():
+            sinteticas = options.get('sinteticas')
+            if sinteticas:
+                nomes = gerar_nomes_vias(sinteticas, options.get('seed'))
+                Logradouro.objects.bulk_create(gerar_logradouros(sinteticas, nomes=nomes), batch_size=500)
+
+            inicio = time.perf_counter()
+            matcher = ViaMatcher()
+            tempo_carga = (time.perf_counter() - inicio) * 1000
+            matcher.TOP_K_CANDIDATOS = options.get('top_k')
+
+            transaction.set_rollback(True)
+
+        if not matcher._cache_vias:
+            self.stdout.write(self.style.WARNING(
+                'Cache vazio: importe logradouros ou use --sinteticas 5000'
+            ))
+            return
+
+        estatisticas = matcher.estatisticas_cache()
+        self.stdout.write(
+            f"Cache: {estatisticas['total_vias_cache']:,} vias, "
+            f"{estatisticas['total_trigramas']:,} trigramas (carga {tempo_carga:,.0f} ms)"
+        )
+        self.stdout.write(f"Candidatos por nome (top-k): {matcher.TOP_K_CANDIDATOS}")
+
+        amostra = self._amostra_rotulada(matcher, options.get('amostra'), options.get('seed'))
+        self.stdout.write(f'Amostra rotulada: {len(amostra)} nomes')
+
+        latencias_sem, resultados_sem = self._medir(matcher, amostra, usar_indice=False)
+        latencias_com, resultados_com = self._medir(matcher, amostra, usar_indice=True)
+
+        media_sem = self._exibir_latencias('Sem indice (todas as vias)', latencias_sem)
+        media_com = self._exibir_latencias('Com indice de trigramas', latencias_com)
+        self.stdout.write(self.style.SUCCESS(f'\nGanho: {media_sem / media_com:,.1f}x'))
+
+        iguais = sum(1 for a, b in zip(resultados_sem, resultados_com) if a == b)
+        acertos_sem = sum(1 for (cod, _), (_, esperado) in zip(resultados_sem, amostra) if cod == esperado)
+        acertos_com = sum(1 for (cod, _), (_, esperado) in zip(resultados_com, amostra) if cod == esperado)
+
+        self.stdout.write('\nResultados:')
+        self.stdout.write(f'  Concordancia: {iguais}/{len(amostra)} ({iguais / len(amostra) * 100:.1f}%)')
+        self.stdout.write(f'  Acerto sem indice: {acertos_sem}/{len(amostra)}')
+        self.stdout.write(f'  Acerto com indice: {acertos_com}/{len(amostra)}')
+
+        divergencias = [
+            (nome, sem, com)
+            for (nome, _), sem, com in zip(amostra, resultados_sem, resultados_com)
+            if sem != com
+        ]
+        for nome, sem, com in divergencias[:5]:
+            self.stdout.write(self.style.WARNING(f'  Divergencia: "{nome}" sem={sem} com={com}'))
+
+        self.stdout.write('')
@@ -0,0 +1,283 @@
+"""
+Comando Django para medir o desempenho do IntegradorWaze
+
+Gera um feed TVT sintético (routes, irregularities com polylines, alerts),
+serve o feed por um servidor HTTP local no lugar do Waze e mede cada
+etapa da ingestão e das consultas:
+
+    processar          _processar_dados (em memória)
+    coleta             coletar_dados (HTTP local + snapshot + payloads)
+    congestionamentos  processar_congestionamentos_detalhados
+    mapa               obter_dados_completos_mapa
+    nivel              calcular_nivel_mobilidade
+
+As etapas que gravam no banco rodam dentro de uma transação desfeita ao
+final (inclusive os logradouros sintéticos usados no matching de vias):
+nada fica gravado. Para cada etapa são reportados tempo (melhor,
+mediana, pior), vazão (itens do feed por segundo) e pico de memória
+(tracemalloc, medido em uma execução extra).
+
+Uso:
+    python manage.py benchmark_waze
+    python manage.py benchmark_waze --irregularidades 20000 --alertas 5000
+    python manage.py benchmark_waze --repeticoes 10 --seed 42
+    python manage.py benchmark_waze --etapas processar,coleta
+    python manage.py benchmark_waze --saida base.json
+    python manage.py benchmark_waze --comparar base.json --tolerancia 20
+"""
+
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from aplicativo.models import Cliente, Logradouro
+from aplicativo.services import via_matcher
+from aplicativo.services.integrador_waze import IntegradorWaze
+from aplicativo.services.waze_sintetico import (
+    ServidorFeedSintetico,
+    gerar_feed,
+    gerar_logradouros,
+    total_itens,
+)
+
+
+class Command(BaseCommand):
+    help = 'Mede o desempenho do IntegradorWaze com feeds Waze sintéticos'
+
+    ETAPAS = ['processar', 'coleta', 'congestionamentos', 'mapa', 'nivel']
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rotas',
+            type=int,
+            default=200,
+            help='Quantidade de routes no feed (padrao: 200)'
+        )
+        parser.add_argument(
+            '--irregularidades',
+            type=int,
+            default=20000,
+            help='Quantidade de irregularities no feed (padrao: 20000)'
+        )
+        parser.add_argument(
+            '--alertas',
+            type=int,
+            default=5000,
+            help='Quantidade de alerts no feed (padrao: 5000)'
+        )
+        parser.add_argument(
+            '--logradouros',
+            type=int,
+            default=500,
+            help='Logradouros sinteticos criados para o matching de vias (padrao: 500)'
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=5,
+            help='Numero de execucoes medidas (padrao: 5)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=2024,
+            help='Semente do gerador pseudoaleatorio (padrao: 2024)'
+        )
+        parser.add_argument(
+            '--etapas',
+            type=str,
+            default=','.join(self.ETAPAS),
+            help=f'Etapas medidas, separadas por virgula (padrao: {",".join(self.ETAPAS)})'
+        )
+        parser.add_argument(
+            '--saida',
+            type=str,
+            help='Grava os resultados em um arquivo JSON'
+        )
+        parser.add_argument(
+            '--comparar',
+            type=str,
+            help='Compara a mediana de cada etapa com um JSON gravado por --saida'
+        )
+        parser.add_argument(
+            '--tolerancia',
+            type=float,
+            default=20.0,
+            help='Piora maxima aceita (%%) em --comparar (padrao: 20)'
+        )
+
+    def _medir(self, funcao, repeticoes):
+        """Executa a função N vezes e mede tempo; mede memória em uma execução extra"""
+        tempos = []
+        resultado = None
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resultado = funcao()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+        tracemalloc.start()
+        try:
+            funcao()
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        tempos.sort()
+        return {
+            'melhor_ms': round(tempos[0], 2),
+            'mediana_ms': round(tempos[len(tempos) // 2], 2),
+            'pior_ms': round(tempos[-1], 2),
+            'pico_memoria_kb': round(pico / 1024, 1),
+        }, resultado
+
+    def _exibir_etapa(self, nome, medicao, itens):
+        mediana_s = medicao['mediana_ms'] / 1000
+        medicao['itens_por_segundo'] = round(itens / mediana_s) if mediana_s else 0
+
+        self.stdout.write(f'\n{nome}:')
+        self.stdout.write(self.style.SUCCESS(f"  Melhor:  {medicao['melhor_ms']:.2f} ms"))
+        self.stdout.write(f"  Mediana: {medicao['mediana_ms']:.2f} ms")
+        self.stdout.write(f"  Pior:    {medicao['pior_ms']:.2f} ms")
+        self.stdout.write(f"  Vazao:   {medicao['itens_por_segundo']:,} itens/s")
+        self.stdout.write(f"  Memoria: {medicao['pico_memoria_kb']:,.1f} KB (pico)")
+
+    def _etapas_banco(self, etapas, feed, repeticoes, itens, logradouros, resultados):
+        """Etapas que gravam no banco, dentro de uma transação desfeita ao final"""
+        with ServidorFeedSintetico(feed) as servidor, transaction.atomic():
+            if logradouros:
+                Logradouro.objects.bulk_create(gerar_logradouros(logradouros), batch_size=500)
+            # Matcher recarrega o cache com os logradouros sinteticos
+            via_matcher._matcher_instance = None
+
+            cliente = Cliente.objects.create(
+                nome='Benchmark Waze',
+                cidade='Rio de Janeiro',
+                estado='RJ',
+                config_apis={'waze_feed_id': 'benchmark'},
+                latitude=-22.9068,
+                longitude=-43.1729,
+                ativo=False,
+            )
+            integrador = IntegradorWaze(cliente)
+            integrador.BASE_URL = servidor.base_url
+
+            # A coleta também prepara os dados das demais etapas
+            medicao, dados = self._medir(integrador.coletar_dados, repeticoes if 'coleta' in etapas else 1)
+            if dados is None:
+                raise CommandError('coletar_dados falhou com o servidor sintetico (ver log)')
+            if 'coleta' in etapas:
+                self._exibir_etapa(f'coletar_dados ({servidor.requisicoes} requisicoes HTTP)', medicao, itens)
+                resultados['coleta'] = medicao
+
+            if 'congestionamentos' in etapas:
+                medicao, stats = self._medir(
+                    lambda: integrador.processar_congestionamentos_detalhados(dados), repeticoes
+                )
+                self._exibir_etapa('processar_congestionamentos_detalhados', medicao, itens)
+                self.stdout.write(
+                    f"  Registros: {stats.get('total_processados', 0):,} | "
+                    f"vias distintas: {stats.get('vias_distintas', 0):,}"
+                )
+                resultados['congestionamentos'] = medicao
+
+            if 'mapa' in etapas:
+                medicao, _ = self._medir(integrador.obter_dados_completos_mapa, repeticoes)
+                self._exibir_etapa('obter_dados_completos_mapa', medicao, itens)
+                resultados['mapa'] = medicao
+
+            if 'nivel' in etapas:
+                medicao, (nivel, _) = self._medir(integrador.calcular_nivel_mobilidade, repeticoes)
+                self._exibir_etapa(f'calcular_nivel_mobilidade (E{nivel})', medicao, itens)
+                resultados['nivel'] = medicao
+
+            transaction.set_rollback(True)
+            via_matcher._matcher_instance = None
+
+    def _comparar(self, resultados, arquivo, tolerancia):
+        """Compara as medianas com um resultado anterior; retorna as regressões"""
+        try:
+            with open(arquivo, encoding='utf-8') as f:
+                base = json.load(f).get('etapas', {})
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Nao foi possivel ler {arquivo}: {e}')
+
+        self.stdout.write(self.style.NOTICE(f'\nComparacao com {arquivo} (tolerancia {tolerancia:.0f}%):'))
+        regressoes = []
+        for etapa, medicao in resultados.items():
+            anterior = base.get(etapa, {}).get('mediana_ms')
+            if not anterior:
+                continue
+            variacao = (medicao['mediana_ms'] - anterior) / anterior * 100
+            linha = f"  {etapa}: {anterior:.2f} -> {medicao['mediana_ms']:.2f} ms ({variacao:+.1f}%)"
+            if variacao > tolerancia:
+                regressoes.append(etapa)
+                self.stdout.write(self.style.ERROR(linha))
+            else:
+                self.stdout.write(linha)
+        return regressoes
+
+    def handle(self, *args, **options):
+        repeticoes = max(1, options.get('repeticoes'))
+        etapas = [e.strip() for e in options.get('etapas').split(',') if e.strip()]
+        invalidas = [e for e in etapas if e not in self.ETAPAS]
+        if invalidas:
+            raise CommandError(f'Etapas invalidas: {", ".join(invalidas)} (opcoes: {", ".join(self.ETAPAS)})')
+
+        self.stdout.write(self.style.NOTICE('\n' + '=' * 60))
+        self.stdout.write(self.style.NOTICE('    BENCHMARK - INTEGRADOR WAZE'))
+        self.stdout.write(self.style.NOTICE('=' * 60 + '\n'))
+
+        feed = gerar_feed(
+            options.get('rotas'),
+            options.get('irregularidades'),
+            options.get('alertas'),
+            options.get('seed'),
+        )
+        itens = total_itens(feed)
+
+        self.stdout.write(
+            f"Feed sintetico: {len(feed['routes']):,} routes, "
+            f"{len(feed['irregularities']):,} irregularities, "
+            f"{len(feed['alerts']):,} alerts"
+        )
+        self.stdout.write(f'Execucoes por etapa: {repeticoes}')
+
+        resultados = {}
+
+        if 'processar' in etapas:
+            # Cliente em memoria: esta etapa nao grava nada no banco
+            cliente = Cliente(nome='Benchmark', cidade='Rio de Janeiro', estado='RJ', config_apis={})
+            medicao, stats = self._medir(lambda: IntegradorWaze(cliente)._processar_dados(feed), repeticoes)
+            self._exibir_etapa('_processar_dados', medicao, itens)
+            resultados['processar'] = medicao
+
+            self.stdout.write('\nEstatisticas calculadas:')
+            for chave, valor in stats.items():
+                self.stdout.write(f'  {chave}: {valor}')
+
+        if any(e in etapas for e in self.ETAPAS[1:]):
+            self._etapas_banco(etapas, feed, repeticoes, itens, options.get('logradouros'), resultados)
+
+        if options.get('saida'):
+            with open(options['saida'], 'w', encoding='utf-8') as f:
+                json.dump({
+                    'feed': {
+                        'rotas': len(feed['routes']),
+                        'irregularidades': len(feed['irregularities']),
+                        'alertas': len(feed['alerts']),
+                        'seed': options.get('seed'),
+                    },
+                    'repeticoes': repeticoes,
+                    'etapas': resultados,
+                }, f, indent=2)
+            self.stdout.write(f"\nResultados gravados em {options['saida']}")
+
+        if options.get('comparar'):
+            regressoes = self._comparar(resultados, options['comparar'], options.get('tolerancia'))
+            if regressoes:
+                raise CommandError(f'Regressao de desempenho em: {", ".join(regressoes)}')
+            self.stdout.write(self.style.SUCCESS('  Sem regressoes'))
+
+        self.stdout.write('')
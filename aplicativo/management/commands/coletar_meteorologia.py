@@ -7,6 +7,7 @@ Uso:
 Opções:
     --cliente-id: UUID do cliente específico (opcional)
     --verbose: Mostrar detalhes da coleta
+    --concurrency N: Baixar os dados de N pontos em paralelo
 
 Cron sugerido (a cada hora):
     0 * * * * cd /home/administrador/integracity && ./venv/bin/python manage.py coletar_meteorologia >> /tmp/meteorologia.log 2>&1
@@ -16,6 +17,8 @@ from django.core.management.base import BaseCommand
 from aplicativo.models import Cliente
 from aplicativo.services.integrador_inmet import IntegradorINMET
 import logging
+import time
+from functools import partial
 
 logger = logging.getLogger(__name__)
 
@@ -39,11 +42,18 @@ class Command(BaseCommand):
             action='store_true',
             help='Calcular e mostrar nível meteorológico após coleta'
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=0,
+            help='Baixar os dados de N pontos de coleta em paralelo (padrão: sequencial)'
+        )
 
     def handle(self, *args, **options):
         cliente_id = options.get('cliente_id')
         verbose = options.get('verbose', False)
         calcular = options.get('calcular_nivel', False)
+        concorrencia = options.get('concurrency') or 0
 
         if cliente_id:
             clientes = Cliente.objects.filter(id=cliente_id, ativo=True)
@@ -66,6 +76,31 @@ class Command(BaseCommand):
 
         self.stdout.write(f'Coletando dados de {total_clientes} cliente(s)...\n')
 
+        if concorrencia > 0:
+            total_sucesso, total_estacoes = self._coletar_em_paralelo(clientes, concorrencia, verbose, calcular)
+        else:
+            total_sucesso, total_estacoes = self._coletar_sequencial(clientes, verbose, calcular)
+
+        # Resumo final
+        self.stdout.write('=' * 50)
+        if total_sucesso > 0:
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Coleta finalizada: {total_sucesso}/{total_estacoes} estações'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'⚠ Coleta com problemas: {total_sucesso}/{total_estacoes} estações'
+            ))
+
+        self.stdout.write(f'Clientes processados: {total_clientes}')
+
+    def _coletar_sequencial(self, clientes, verbose, calcular):
+        """
+        Coleta os clientes um a um (download e gravação)
+
+        Returns:
+            Tupla (sucesso, total de estações)
+        """
         total_sucesso = 0
         total_estacoes = 0
 
@@ -87,49 +122,116 @@ class Command(BaseCommand):
                     f'  ⚠ Nenhum dado coletado ({total} estações)'
                 ))
 
-            # Mostrar detalhes se verbose
-            if verbose and sucesso > 0:
-                resumo = integrador.obter_resumo_meteorologico()
-                for est in resumo['estacoes']:
-                    if est['dados']:
-                        dados = est['dados']
-                        self.stdout.write(
-                            f'    {est["nome"]}: '
-                            f'{dados.get("temperatura", "-")}°C, '
-                            f'{dados.get("umidade", "-")}%, '
-                            f'Chuva: {dados.get("chuva_mm", 0):.1f}mm, '
-                            f'Vento: {dados.get("vento_kmh", 0):.1f}km/h'
-                        )
-
-            # Calcular nível se solicitado
-            if calcular:
-                nivel, detalhes = integrador.calcular_nivel_meteorologia()
-
-                # Cores para níveis
-                cores = {
-                    1: self.style.SUCCESS,
-                    2: self.style.HTTP_INFO,
-                    3: self.style.WARNING,
-                    4: self.style.ERROR,
-                    5: self.style.ERROR,
-                }
-
-                estilo = cores.get(nivel, self.style.NOTICE)
-                self.stdout.write(estilo(
-                    f'  Nível Meteorológico: E{nivel} - {detalhes.get("razao", "Normal")}'
+            self._exibir_detalhes(integrador, sucesso, verbose, calcular)
+
+            self.stdout.write('')  # Linha em branco
+
+        return total_sucesso, total_estacoes
+
+    def _coletar_em_paralelo(self, clientes, concorrencia, verbose, calcular):
+        """
+        Baixa os dados Open-Meteo de todos os pontos em paralelo e grava em seguida
+
+        Cada cliente tem o ponto central e as estações extras (mesmos
+        pontos de coletar_todas_estacoes). A gravação no banco é
+        sequencial, na ordem dos clientes e pontos.
+
+        Returns:
+            Tupla (sucesso, total de estações)
+        """
+        from aplicativo.services.coleta_paralela import buscar_em_paralelo
+
+        total_sucesso = 0
+        total_estacoes = 0
+
+        integradores = {cliente.id: IntegradorINMET(cliente) for cliente in clientes}
+        pontos = {chave: integrador.pontos_coleta() for chave, integrador in integradores.items()}
+
+        tarefas = {}
+        for chave, integrador in integradores.items():
+            for indice, (lat, lon) in enumerate(pontos[chave]):
+                # buscar_openmeteo(lat, lon, session)
+                tarefas[(chave, indice)] = partial(integrador.buscar_openmeteo, lat, lon)
+
+        self.stdout.write(f'Baixando {len(tarefas)} ponto(s) com concorrência {concorrencia}...\n')
+
+        inicio = time.perf_counter()
+        resultados = buscar_em_paralelo(tarefas, concorrencia=concorrencia)
+        tempo_download = (time.perf_counter() - inicio) * 1000
+
+        for chave, integrador in integradores.items():
+            cliente = integrador.cliente
+            self.stdout.write(f'Cliente: {cliente.nome} ({cliente.cidade}/{cliente.estado})')
+
+            sucesso = 0
+            total = len(pontos[chave])
+            latencias = []
+
+            for indice, (lat, lon) in enumerate(pontos[chave]):
+                resultado = resultados[(chave, indice)]
+                latencias.append(resultado.latencia_ms)
+
+                if not resultado.ok:
+                    logger.error(f"Erro HTTP ao coletar dados Open-Meteo: {resultado.erro}")
+                    continue
+
+                try:
+                    if integrador.salvar_openmeteo(resultado.valor, lat, lon):
+                        sucesso += 1
+                except Exception as e:
+                    logger.error(f"Erro ao gravar dados Open-Meteo de {cliente.nome}: {e}")
+
+            total_sucesso += sucesso
+            total_estacoes += total
+
+            if sucesso > 0:
+                self.stdout.write(self.style.SUCCESS(
+                    f'  ✓ {sucesso}/{total} estação(ões) - download {max(latencias):.0f} ms'
+                ))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f'  ⚠ Nenhum dado coletado ({total} estações) - download {max(latencias):.0f} ms'
                 ))
 
+            self._exibir_detalhes(integrador, sucesso, verbose, calcular)
+
             self.stdout.write('')  # Linha em branco
 
-        # Resumo final
-        self.stdout.write('=' * 50)
-        if total_sucesso > 0:
-            self.stdout.write(self.style.SUCCESS(
-                f'✓ Coleta finalizada: {total_sucesso}/{total_estacoes} estações'
+        tempo_total = (time.perf_counter() - inicio) * 1000
+        self.stdout.write(f'Tempo de download: {tempo_download:.0f} ms | Tempo total: {tempo_total:.0f} ms')
+
+        return total_sucesso, total_estacoes
+
+    def _exibir_detalhes(self, integrador, sucesso, verbose, calcular):
+        """Exibe detalhes (verbose) e o nível meteorológico do cliente"""
+        # Mostrar detalhes se verbose
+        if verbose and sucesso > 0:
+            resumo = integrador.obter_resumo_meteorologico()
+            for est in resumo['estacoes']:
+                if est['dados']:
+                    dados = est['dados']
+                    self.stdout.write(
+                        f'    {est["nome"]}: '
+                        f'{dados.get("temperatura", "-")}°C, '
+                        f'{dados.get("umidade", "-")}%, '
+                        f'Chuva: {dados.get("chuva_mm", 0):.1f}mm, '
+                        f'Vento: {dados.get("vento_kmh", 0):.1f}km/h'
+                    )
+
+        # Calcular nível se solicitado
+        if calcular:
+            nivel, detalhes = integrador.calcular_nivel_meteorologia()
+
+            # Cores para níveis
+            cores = {
+                1: self.style.SUCCESS,
+                2: self.style.HTTP_INFO,
+                3: self.style.WARNING,
+                4: self.style.ERROR,
+                5: self.style.ERROR,
+            }
+
+            estilo = cores.get(nivel, self.style.NOTICE)
+            self.stdout.write(estilo(
+                f'  Nível Meteorológico: E{nivel} - {detalhes.get("razao", "Normal")}'
             ))
-        else:
-            self.stdout.write(self.style.WARNING(
-                f'⚠ Coleta com problemas: {total_sucesso}/{total_estacoes} estações'
-            ))
-
-        self.stdout.write(f'Clientes processados: {total_clientes}')
@@ -5,6 +5,7 @@ Uso:
     python manage.py coletar_mobilidade
     python manage.py coletar_mobilidade --cliente-id <UUID>
     python manage.py coletar_mobilidade --verbose
+    python manage.py coletar_mobilidade --concurrency 8
 
 Para agendar via cron (a cada 15 minutos):
     */15 * * * * cd /home/administrador/integracity && python manage.py coletar_mobilidade >> /tmp/mobilidade.log 2>&1
@@ -14,6 +15,7 @@ from django.core.management.base import BaseCommand
 from aplicativo.models import Cliente
 from aplicativo.services.integrador_waze import IntegradorWaze
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -37,11 +39,18 @@ class Command(BaseCommand):
             action='store_true',
             help='Calcular nivel de mobilidade apos coleta'
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=0,
+            help='Baixar os feeds de N clientes em paralelo (padrao: sequencial)'
+        )
 
     def handle(self, *args, **options):
         cliente_id = options.get('cliente_id')
         verbose = options.get('verbose')
         calcular = options.get('calcular_nivel')
+        concorrencia = options.get('concurrency') or 0
 
         self.stdout.write(self.style.NOTICE('\n' + '=' * 60))
         self.stdout.write(self.style.NOTICE('    COLETA DE DADOS DE MOBILIDADE - WAZE'))
@@ -65,6 +74,20 @@ class Command(BaseCommand):
 
         self.stdout.write(f'Coletando dados de {total_clientes} cliente(s)...\n')
 
+        if concorrencia > 0:
+            total_sucesso, total_falhas = self._coletar_em_paralelo(clientes, concorrencia, verbose, calcular)
+        else:
+            total_sucesso, total_falhas = self._coletar_sequencial(clientes, verbose, calcular)
+
+        self._exibir_resumo(total_clientes, total_sucesso, total_falhas)
+
+    def _coletar_sequencial(self, clientes, verbose, calcular):
+        """
+        Coleta os clientes um a um (download e gravação)
+
+        Returns:
+            Tupla (sucesso, falhas)
+        """
         total_sucesso = 0
         total_falhas = 0
 
@@ -99,24 +122,7 @@ class Command(BaseCommand):
 
                 if dados:
                     total_sucesso += 1
-
-                    self.stdout.write(self.style.SUCCESS(
-                        f'  [OK] Coletado: {dados.total_jams} jams ({dados.jams_severos} severos)'
-                    ))
-
-                    if verbose:
-                        self.stdout.write(f'       Alerts: {dados.total_alerts} (acidentes: {dados.acidentes_maiores + dados.acidentes_menores})')
-                        self.stdout.write(f'       Irregularidades: {dados.total_irregularidades} (interditadas: {dados.vias_interditadas})')
-                        if dados.velocidade_media_kmh:
-                            self.stdout.write(f'       Velocidade media: {dados.velocidade_media_kmh} km/h')
-                        if dados.extensao_total_km:
-                            self.stdout.write(f'       Extensao congestionamentos: {dados.extensao_total_km} km')
-
-                    # Calcular nivel se solicitado
-                    if calcular:
-                        nivel, detalhes = integrador.calcular_nivel_mobilidade()
-                        self.stdout.write(f'  Nivel de Mobilidade: E{nivel} ({detalhes.get("nomenclatura", "?")})')
-                        self.stdout.write(f'  Razao: {detalhes.get("razao", "N/A")}')
+                    self._exibir_coleta(integrador, dados, verbose, calcular)
                 else:
                     total_falhas += 1
                     self.stdout.write(self.style.ERROR('  [X] Falha na coleta'))
@@ -128,6 +134,104 @@ class Command(BaseCommand):
                     import traceback
                     traceback.print_exc()
 
+        return total_sucesso, total_falhas
+
+    def _exibir_coleta(self, integrador, dados, verbose, calcular):
+        """Exibe o resultado da coleta de um cliente"""
+        self.stdout.write(self.style.SUCCESS(
+            f'  [OK] Coletado: {dados.total_jams} jams ({dados.jams_severos} severos)'
+        ))
+
+        if verbose:
+            self.stdout.write(f'       Alerts: {dados.total_alerts} (acidentes: {dados.acidentes_maiores + dados.acidentes_menores})')
+            self.stdout.write(f'       Irregularidades: {dados.total_irregularidades} (interditadas: {dados.vias_interditadas})')
+            if dados.velocidade_media_kmh:
+                self.stdout.write(f'       Velocidade media: {dados.velocidade_media_kmh} km/h')
+            if dados.extensao_total_km:
+                self.stdout.write(f'       Extensao congestionamentos: {dados.extensao_total_km} km')
+
+        # Calcular nivel se solicitado
+        if calcular:
+            nivel, detalhes = integrador.calcular_nivel_mobilidade()
+            self.stdout.write(f'  Nivel de Mobilidade: E{nivel} ({detalhes.get("nomenclatura", "?")})')
+            self.stdout.write(f'  Razao: {detalhes.get("razao", "N/A")}')
+
+    def _coletar_em_paralelo(self, clientes, concorrencia, verbose, calcular):
+        """
+        Baixa os feeds de todos os clientes em paralelo e grava em seguida
+
+        O download usa um pool de threads com Session HTTP por thread; a
+        gravação no banco é sequencial, na ordem dos clientes.
+
+        Returns:
+            Tupla (sucesso, falhas)
+        """
+        from aplicativo.services.coleta_paralela import buscar_em_paralelo
+
+        total_sucesso = 0
+        total_falhas = 0
+
+        integradores = {}
+        for cliente in clientes:
+            integrador = IntegradorWaze(cliente)
+            if not integrador.feed_id:
+                self.stdout.write(self.style.WARNING(
+                    f'{cliente.nome}: [!] Sem feed_id configurado. Configure em config_apis.waze_feed_id'
+                ))
+                total_falhas += 1
+                continue
+            integradores[cliente.id] = integrador
+
+        self.stdout.write(f'Baixando {len(integradores)} feed(s) com concorrencia {concorrencia}...')
+
+        inicio = time.perf_counter()
+        resultados = buscar_em_paralelo(
+            {chave: integrador.buscar_feed for chave, integrador in integradores.items()},
+            concorrencia=concorrencia,
+        )
+        tempo_download = (time.perf_counter() - inicio) * 1000
+
+        for chave, integrador in integradores.items():
+            cliente = integrador.cliente
+            resultado = resultados[chave]
+
+            self.stdout.write(f'\n{cliente.nome} ({cliente.cidade}/{cliente.estado})')
+            self.stdout.write('-' * 40)
+
+            if not resultado.ok:
+                total_falhas += 1
+                self.stdout.write(self.style.ERROR(
+                    f'  [X] Falha no download ({resultado.latencia_ms:.0f} ms): {resultado.erro}'
+                ))
+                continue
+
+            data, tamanho = resultado.valor
+            inicio_gravacao = time.perf_counter()
+            try:
+                dados = integrador.salvar_feed(data, tamanho)
+            except Exception as e:
+                total_falhas += 1
+                self.stdout.write(self.style.ERROR(f'  [X] Erro ao gravar: {e}'))
+                if verbose:
+                    import traceback
+                    traceback.print_exc()
+                continue
+            tempo_gravacao = (time.perf_counter() - inicio_gravacao) * 1000
+
+            total_sucesso += 1
+            self.stdout.write(
+                f'  Download: {resultado.latencia_ms:.0f} ms ({tamanho / 1024:.0f} KB) | '
+                f'Gravacao: {tempo_gravacao:.0f} ms'
+            )
+            self._exibir_coleta(integrador, dados, verbose, calcular)
+
+        tempo_total = (time.perf_counter() - inicio) * 1000
+        self.stdout.write(f'\nTempo de download: {tempo_download:.0f} ms | Tempo total: {tempo_total:.0f} ms')
+
+        return total_sucesso, total_falhas
+
+    def _exibir_resumo(self, total_clientes, total_sucesso, total_falhas):
+        """Exibe o resumo final da coleta"""
         # Resumo
         self.stdout.write('\n' + '=' * 60)
         self.stdout.write(self.style.NOTICE('RESUMO'))
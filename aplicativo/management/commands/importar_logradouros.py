@@ -9,16 +9,24 @@ Uso:
     python manage.py importar_logradouros --arquivo /caminho/Logradouros.csv
     python manage.py importar_logradouros --apenas-arteriais
     python manage.py importar_logradouros --limpar
+    python manage.py importar_logradouros --geometrias /caminho/Logradouros.geojson
+
+Leitura em uma unica passada, upsert em lotes por cod_trecho (COPY no
+PostgreSQL, INSERT ... ON CONFLICT no SQLite); linhas com o mesmo hash de
+conteudo da importacao anterior nao sao regravadas.
+
+Geometrias dos trechos: coluna WKT/GeoJSON no CSV (geometry, the_geom,
+wkt, shape) ou o GeoJSON do Data.Rio em --geometrias (por cod_trecho).
 
 Para agendar importacao mensal via cron:
     0 3 1 * * cd /home/administrador/integracity && python manage.py importar_logradouros >> /tmp/logradouros.log 2>&1
 """
 
-import csv
 from django.core.management.base import BaseCommand
 from django.db import models
 from aplicativo.models import Logradouro
-from datetime import datetime
+from aplicativo.services.importador_logradouros import ImportadorLogradouros, carregar_geometrias_geojson
+from aplicativo.services.via_matcher import get_via_matcher, invalidar_resolucoes
 import logging
 import os
 
@@ -57,11 +65,16 @@ class Command(BaseCommand):
             action='store_true',
             help='Mostra detalhes de cada importacao'
         )
+        parser.add_argument(
+            '--geometrias',
+            type=str,
+            help='GeoJSON do Data.Rio com as linhas dos trechos (properties.cod_trecho)'
+        )
         parser.add_argument(
             '--batch-size',
             type=int,
-            default=1000,
-            help='Tamanho do batch para bulk_create (padrao: 1000)'
+            default=5000,
+            help='Linhas alteradas por lote gravado (padrao: 5000)'
         )
 
     def encontrar_arquivo(self, arquivo_especificado):
@@ -106,144 +119,65 @@ class Command(BaseCommand):
             Logradouro.objects.all().delete()
             self.stdout.write(self.style.SUCCESS(f'  Removidos {count:,} registros'))
 
-        self.stdout.write(f'\nImportando logradouros...\n')
-
-        total_linhas = 0
-        total_importados = 0
-        total_atualizados = 0
-        total_erros = 0
-        total_ignorados = 0
-
-        # Contar linhas primeiro para barra de progresso
-        with open(arquivo, 'r', encoding='utf-8-sig') as f:
-            total_linhas_arquivo = sum(1 for _ in f) - 1  # -1 para header
-
-        self.stdout.write(f'Total de linhas no arquivo: {total_linhas_arquivo:,}')
-
-        batch = []
-
-        with open(arquivo, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-
-            for row in reader:
-                total_linhas += 1
-
-                # Filtro: apenas arteriais?
-                if apenas_arteriais:
-                    hierarquia = row.get('hierarquia', '').strip()
-                    if hierarquia not in ['Arterial primária', 'Arterial secundária', 'Coletora']:
-                        total_ignorados += 1
-                        continue
-
-                try:
-                    # Parsing de campos
-                    cod_trecho = int(row['cod_trecho'])
-
-                    # Data de ultima edicao
-                    ultima_edicao = None
-                    if row.get('last_edited_date'):
-                        try:
-                            # Formato: 2025/10/21 22:45:38+00
-                            data_str = row['last_edited_date'].split('+')[0]
-                            ultima_edicao = datetime.strptime(data_str, '%Y/%m/%d %H:%M:%S')
-                        except Exception:
-                            pass
-
-                    # Helper para converter inteiros com seguranca
-                    def safe_int(val):
-                        if not val or val.strip() == '':
-                            return None
-                        try:
-                            return int(float(val))
-                        except (ValueError, TypeError):
-                            return None
-
-                    # Criar objeto Logradouro
-                    logradouro = Logradouro(
-                        cod_trecho=cod_trecho,
-                        cod_logradouro=row.get('cl', '').strip(),
-                        tipo_abreviado=row.get('tipo_logra_abr', '').strip(),
-                        tipo_extenso=row.get('tipo_logra_ext', '').strip(),
-                        nome_parcial=row.get('nome_parcial', '').strip(),
-                        nome_completo=row.get('completo', '').strip(),
-                        nome_mapa=row.get('nome_mapa', '').strip(),
-                        bairro=row.get('bairro', '').strip() or None,
-                        cod_bairro=safe_int(row.get('cod_bairro')),
-                        hierarquia=row.get('hierarquia', '').strip() or None,
-                        sentido_unico=row.get('oneway', '').strip() or None,
-                        velocidade_regulamentada=safe_int(row.get('velocidade_regulamentada')),
-                        tipo_trecho=row.get('tipo_trecho', '').strip() or None,
-                        num_par_inicio=safe_int(row.get('np_ini_par')),
-                        num_par_fim=safe_int(row.get('np_fin_par')),
-                        num_impar_inicio=safe_int(row.get('np_ini_imp')),
-                        num_impar_fim=safe_int(row.get('np_fin_imp')),
-                        objectid=safe_int(row.get('objectid')),
-                        ultima_edicao=ultima_edicao,
-                    )
-
-                    batch.append(logradouro)
-                    total_importados += 1
-
-                    if verbose and total_importados % 1000 == 0:
-                        self.stdout.write(f'  Processados: {total_importados:,}')
-
-                    # Salvar batch
-                    if len(batch) >= batch_size:
-                        self._salvar_batch(batch)
-                        batch = []
-
-                except Exception as e:
-                    total_erros += 1
-                    if total_erros <= 10:  # Mostrar apenas primeiros erros
-                        logger.error(f'Erro na linha {total_linhas}: {e}')
-                        if verbose:
-                            self.stdout.write(self.style.ERROR(f'  Erro linha {total_linhas}: {e}'))
-
-        # Salvar batch restante
-        if batch:
-            self._salvar_batch(batch)
+        geometrias = {}
+        if options.get('geometrias'):
+            if not os.path.exists(options['geometrias']):
+                self.stdout.write(self.style.ERROR(f"Arquivo de geometrias nao encontrado: {options['geometrias']}"))
+                return
+            with open(options['geometrias'], 'r', encoding='utf-8-sig') as f:
+                geometrias = carregar_geometrias_geojson(f)
+            self.stdout.write(f'Geometrias de trechos carregadas: {len(geometrias):,}')
+
+        self.stdout.write(f'\nImportando logradouros (lotes de {batch_size:,})...\n')
+
+        def progresso(parcial):
+            if verbose:
+                self.stdout.write(
+                    f"  Linhas lidas: {parcial['linhas']:,} | "
+                    f"gravadas: {parcial['inseridos'] + parcial['atualizados']:,} | "
+                    f"{parcial['linhas_por_segundo']:,.0f} linhas/s"
+                )
+
+        importador = ImportadorLogradouros(
+            tamanho_lote=batch_size,
+            apenas_arteriais=apenas_arteriais,
+            progresso=progresso,
+            geometrias=geometrias,
+        )
+        with open(arquivo, 'r', encoding='utf-8-sig', newline='') as f:
+            resultado = importador.importar(f)
+
+        total_gravados = resultado['inseridos'] + resultado['atualizados']
+
+        # Resolucoes de nomes do Waze calculadas com os dados anteriores
+        if total_gravados > 0 or limpar:
+            removidas = invalidar_resolucoes()
+            self.stdout.write(f'\nResolucoes de vias descartadas: {removidas:,}')
+
+            # Snapshot compartilhado do ViaMatcher com os novos dados
+            estatisticas = get_via_matcher().estatisticas_cache()
+            if estatisticas['snapshot']:
+                self.stdout.write(f"Snapshot do ViaMatcher: {estatisticas['snapshot']}")
 
         # Resumo
         self.stdout.write('\n' + '=' * 60)
         self.stdout.write(self.style.SUCCESS('IMPORTACAO CONCLUIDA'))
         self.stdout.write('=' * 60)
-        self.stdout.write(f'  Total de linhas no CSV: {total_linhas:,}')
-        self.stdout.write(self.style.SUCCESS(f'  Logradouros importados: {total_importados:,}'))
-        if total_ignorados > 0:
-            self.stdout.write(f'  Ignorados (filtro arteriais): {total_ignorados:,}')
-        if total_erros > 0:
-            self.stdout.write(self.style.WARNING(f'  Erros: {total_erros}'))
+        self.stdout.write(f"  Total de linhas no CSV: {resultado['linhas']:,}")
+        self.stdout.write(self.style.SUCCESS(f"  Inseridos: {resultado['inseridos']:,}"))
+        self.stdout.write(self.style.SUCCESS(f"  Atualizados: {resultado['atualizados']:,}"))
+        self.stdout.write(f"  Inalterados (mesmo hash): {resultado['inalterados']:,}")
+        if resultado['ignorados'] > 0:
+            self.stdout.write(f"  Ignorados (filtro arteriais): {resultado['ignorados']:,}")
+        if resultado['erros'] > 0:
+            self.stdout.write(self.style.WARNING(f"  Erros: {resultado['erros']}"))
+        self.stdout.write(
+            f"  Tempo: {resultado['segundos']:,.1f} s ({resultado['linhas_por_segundo']:,.0f} linhas/s)"
+        )
 
         # Estatisticas do banco
         self._mostrar_estatisticas()
 
-    def _salvar_batch(self, batch):
-        """Salva batch usando update_or_create para suportar atualizacoes"""
-        for logradouro in batch:
-            Logradouro.objects.update_or_create(
-                cod_trecho=logradouro.cod_trecho,
-                defaults={
-                    'cod_logradouro': logradouro.cod_logradouro,
-                    'tipo_abreviado': logradouro.tipo_abreviado,
-                    'tipo_extenso': logradouro.tipo_extenso,
-                    'nome_parcial': logradouro.nome_parcial,
-                    'nome_completo': logradouro.nome_completo,
-                    'nome_mapa': logradouro.nome_mapa,
-                    'bairro': logradouro.bairro,
-                    'cod_bairro': logradouro.cod_bairro,
-                    'hierarquia': logradouro.hierarquia,
-                    'sentido_unico': logradouro.sentido_unico,
-                    'velocidade_regulamentada': logradouro.velocidade_regulamentada,
-                    'tipo_trecho': logradouro.tipo_trecho,
-                    'num_par_inicio': logradouro.num_par_inicio,
-                    'num_par_fim': logradouro.num_par_fim,
-                    'num_impar_inicio': logradouro.num_impar_inicio,
-                    'num_impar_fim': logradouro.num_impar_fim,
-                    'objectid': logradouro.objectid,
-                    'ultima_edicao': logradouro.ultima_edicao,
-                }
-            )
-
     def _mostrar_estatisticas(self):
         """Mostra estatisticas dos logradouros importados"""
         self.stdout.write('\n' + '-' * 40)
@@ -279,6 +213,10 @@ class Command(BaseCommand):
         ).count()
         self.stdout.write(f'\n  Com velocidade regulamentada: {com_velocidade:,}')
 
+        # Com geometria (snapping)
+        com_geometria = Logradouro.objects.exclude(geometria__isnull=True).count()
+        self.stdout.write(f'  Com geometria: {com_geometria:,}')
+
         # Por bairro (top 10)
         self.stdout.write('\n  Top 10 bairros:')
         bairros = Logradouro.objects.exclude(
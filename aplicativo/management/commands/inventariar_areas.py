@@ -0,0 +1,66 @@
+"""
+Comando Django para o inventário agendado das áreas de observação
+
+Inventaria em lote as áreas ativas dentro do agendamento (áreas temporárias
+só entre evento_inicio e evento_fim do grupo), gravando um snapshot
+(InventarioArea) por área a cada intervalo e gerando os alertas de área.
+Áreas com snapshot mais recente que o intervalo são puladas, então o
+comando pode ser agendado com qualquer frequência.
+
+Os eventos novos (ocorrências, sirenes acionadas, alerts e jams severos
+do Waze) já atualizam na ingestão as áreas que os contêm
+(services/monitor_areas.py); o comando cobre as demais mudanças.
+
+Uso:
+    python manage.py inventariar_areas
+    python manage.py inventariar_areas --intervalo 10
+    python manage.py inventariar_areas --forcar --sem-alertas
+
+Para agendar via cron (a cada 5 minutos):
+    */5 * * * * cd /home/administrador/integracity && python manage.py inventariar_areas >> /tmp/inventario_areas.log 2>&1
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from aplicativo.services.inventario_areas import INTERVALO_INVENTARIO, inventariar_agendadas
+
+
+class Command(BaseCommand):
+    help = 'Inventaria em lote as areas de observacao agendadas (um snapshot por area e intervalo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=int(INTERVALO_INVENTARIO.total_seconds() // 60),
+            help='Minutos entre snapshots de cada area (padrao: %(default)s)'
+        )
+        parser.add_argument(
+            '--forcar',
+            action='store_true',
+            help='Inventaria todas as areas agendadas, mesmo com snapshot recente'
+        )
+        parser.add_argument(
+            '--sem-alertas',
+            action='store_true',
+            help='Nao gera alertas de area'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('\n' + '=' * 60))
+        self.stdout.write(self.style.NOTICE('    INVENTARIO DAS AREAS DE OBSERVACAO'))
+        self.stdout.write(self.style.NOTICE('=' * 60 + '\n'))
+
+        resultado = inventariar_agendadas(
+            intervalo=timedelta(minutes=options.get('intervalo')),
+            forcar=options.get('forcar'),
+            gerar_alertas=not options.get('sem_alertas'),
+        )
+
+        self.stdout.write(f"Areas agendadas: {resultado['areas']:,}")
+        self.stdout.write(self.style.SUCCESS(f"  Inventariadas: {resultado['inventariadas']:,}"))
+        self.stdout.write(f"  Com snapshot recente: {resultado['puladas']:,}")
+        if resultado['alertas']:
+            self.stdout.write(self.style.WARNING(f"  Alertas gerados: {resultado['alertas']:,}"))
+        self.stdout.write(f"  Tempo: {resultado['segundos']:,.2f} s\n")
@@ -0,0 +1,100 @@
+"""
+Comando Django para exibir as métricas do ViaMatcher
+
+Soma as métricas publicadas pelos workers (MetricaViaMatcher) e mostra,
+por etapa do matching, quantidade e latência (média, p50, p95, p99,
+máx), as origens das resoluções (cache, LRU, tabela, calculada) e os
+nomes do Waze mais frequentes sem match.
+
+Uso:
+    python manage.py metricas_via_matcher
+    python manage.py metricas_via_matcher --horas 6 --top 50
+    python manage.py metricas_via_matcher --json
+    python manage.py metricas_via_matcher --zerar
+"""
+
+import json
+
+from django.core.management.base import BaseCommand
+from aplicativo.models import MetricaViaMatcher
+from aplicativo.services.metricas_via_matcher import agregar_metricas, resumir_metricas
+
+
+class Command(BaseCommand):
+    help = 'Exibe latencia e taxa de acerto do ViaMatcher por etapa'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horas',
+            type=int,
+            default=24,
+            help='Considera metricas publicadas nas ultimas N horas (padrao: 24)'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Quantidade de nomes sem match listados (padrao: 20)'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Imprime o resumo em JSON'
+        )
+        parser.add_argument(
+            '--zerar',
+            action='store_true',
+            help='Remove as metricas publicadas'
+        )
+
+    def _formatar_us(self, valor):
+        if valor is None:
+            return '-'
+        if valor >= 1000:
+            return f'{valor / 1000:,.1f} ms'
+        return f'{valor:,.0f} us'
+
+    def handle(self, *args, **options):
+        if options.get('zerar'):
+            removidas, _ = MetricaViaMatcher.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Metricas removidas: {removidas}'))
+            return
+
+        resumo = resumir_metricas(agregar_metricas(horas=options.get('horas')), top=options.get('top'))
+
+        if options.get('json'):
+            self.stdout.write(json.dumps(resumo, indent=2, ensure_ascii=False))
+            return
+
+        self.stdout.write(self.style.NOTICE('\n' + '=' * 60))
+        self.stdout.write(self.style.NOTICE('    METRICAS - VIA MATCHER'))
+        self.stdout.write(self.style.NOTICE('=' * 60 + '\n'))
+
+        if not resumo['total_buscas']:
+            self.stdout.write(self.style.WARNING(f"Nenhuma metrica publicada nas ultimas {options.get('horas')} horas"))
+            return
+
+        self.stdout.write(f"Processos: {resumo['processos']} | buscas: {resumo['total_buscas']:,}")
+        self.stdout.write(f"Taxa de match: {resumo['taxa_match']}%")
+        self.stdout.write(f"Resolvidas sem matching (cache/LRU/tabela): {resumo['taxa_sem_matching']}%")
+
+        self.stdout.write('\nPor etapa:')
+        self.stdout.write(f"  {'etapa':<16}{'total':>9}{'%':>7}{'media':>11}{'p50':>11}{'p95':>11}{'p99':>11}{'max':>11}")
+        for metodo, etapa in resumo['etapas'].items():
+            self.stdout.write(
+                f"  {metodo:<16}{etapa['total']:>9,}{etapa['percentual']:>7}"
+                f"{self._formatar_us(etapa['media_us']):>11}{self._formatar_us(etapa['p50_us']):>11}"
+                f"{self._formatar_us(etapa['p95_us']):>11}{self._formatar_us(etapa['p99_us']):>11}"
+                f"{self._formatar_us(etapa['max_us']):>11}"
+            )
+
+        self.stdout.write('\nPor origem:')
+        for origem, total in sorted(resumo['origens'].items(), key=lambda item: -item[1]):
+            self.stdout.write(f'  {origem}: {total:,}')
+
+        if resumo['top_nao_encontrados']:
+            self.stdout.write(f"\nNomes sem match mais frequentes:")
+            for nome, total in resumo['top_nao_encontrados']:
+                self.stdout.write(f'  {total:>6,}  {nome}')
+
+        self.stdout.write('')
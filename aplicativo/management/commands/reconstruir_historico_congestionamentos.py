@@ -0,0 +1,77 @@
+"""
+Comando Django para refazer o histórico de congestionamentos por trecho e hora
+
+O histórico (CongestionamentoViaHora) é mantido a cada processamento de
+congestionamentos; este comando faz a carga inicial a partir dos
+registros brutos (CongestionamentoVia) e refaz o período depois de
+alterações em lote nos registros (ex.: vincular_trechos).
+
+Uso:
+    python manage.py reconstruir_historico_congestionamentos
+    python manage.py reconstruir_historico_congestionamentos --dias 90
+    python manage.py reconstruir_historico_congestionamentos --cliente-id <UUID>
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from aplicativo.models import Cliente
+from aplicativo.services.historico_congestionamentos import reconstruir_historico
+
+
+class Command(BaseCommand):
+    help = 'Refaz o historico de congestionamentos por trecho e hora a partir dos registros brutos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cliente-id',
+            type=str,
+            help='ID do cliente especifico (UUID)'
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=30,
+            help='Periodo reconstruido, em dias ate agora (padrao: 30)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Registros brutos por lote (padrao: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        cliente_id = options.get('cliente_id')
+        desde = timezone.now() - timedelta(days=options.get('dias'))
+
+        self.stdout.write(self.style.NOTICE('\n' + '=' * 60))
+        self.stdout.write(self.style.NOTICE('    HISTORICO DE CONGESTIONAMENTOS POR TRECHO'))
+        self.stdout.write(self.style.NOTICE('=' * 60 + '\n'))
+
+        clientes = Cliente.objects.all()
+        if cliente_id:
+            clientes = clientes.filter(id=cliente_id)
+            if not clientes.exists():
+                self.stdout.write(self.style.ERROR(f'Cliente {cliente_id} nao encontrado'))
+                return
+
+        for cliente in clientes:
+            inicio = time.perf_counter()
+            resultado = reconstruir_historico(cliente, desde, tamanho_lote=options.get('batch_size'))
+            segundos = time.perf_counter() - inicio
+
+            if not resultado['registros'] and not resultado['removidas']:
+                continue
+
+            self.stdout.write(f'\n{cliente.nome}:')
+            self.stdout.write(f"  Registros brutos: {resultado['registros']:,}")
+            self.stdout.write(self.style.SUCCESS(
+                f"  Linhas por trecho e hora: {resultado['linhas']:,} "
+                f"(antes: {resultado['removidas']:,})"
+            ))
+            self.stdout.write(f'  Tempo: {segundos:,.1f} s')
+
+        self.stdout.write('')
@@ -0,0 +1,118 @@
+"""
+Comando Django para vincular registros aos trechos oficiais por geometria
+
+Faz o snapping em lote (services.snapping_vias) de:
+    - ocorrências gerenciadas com coordenadas (OcorrenciaGerenciada.logradouro)
+    - congestionamentos sem logradouro (ponto inicial do segmento)
+
+Requer logradouros importados com geometria (importar_logradouros).
+
+Uso:
+    python manage.py vincular_trechos
+    python manage.py vincular_trechos --horas 72 --tolerancia 50
+    python manage.py vincular_trechos --apenas ocorrencias
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import timedelta
+from aplicativo.models import CongestionamentoVia, OcorrenciaGerenciada
+from aplicativo.services.snapping_vias import (
+    get_snapping_vias,
+    vincular_congestionamentos,
+    vincular_ocorrencias,
+)
+
+
+class Command(BaseCommand):
+    help = 'Vincula ocorrencias e congestionamentos ao trecho de logradouro mais proximo'
+
+    TAMANHO_LOTE = 5000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apenas',
+            choices=['ocorrencias', 'congestionamentos'],
+            help='Processa apenas um tipo de registro'
+        )
+        parser.add_argument(
+            '--horas',
+            type=int,
+            default=24,
+            help='Janela dos congestionamentos sem logradouro (padrao: 24)'
+        )
+        parser.add_argument(
+            '--tolerancia',
+            type=float,
+            default=None,
+            help='Distancia maxima em metros (padrao: SnappingVias.TOLERANCIA_METROS)'
+        )
+
+    def _em_lotes(self, queryset):
+        lote = []
+        for registro in queryset.iterator(chunk_size=self.TAMANHO_LOTE):
+            lote.append(registro)
+            if len(lote) >= self.TAMANHO_LOTE:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+
+    def handle(self, *args, **options):
+        apenas = options.get('apenas')
+        tolerancia = options.get('tolerancia')
+
+        self.stdout.write(self.style.NOTICE('\n' + '=' * 60))
+        self.stdout.write(self.style.NOTICE('    SNAPPING NA MALHA DE LOGRADOUROS'))
+        self.stdout.write(self.style.NOTICE('=' * 60 + '\n'))
+
+        snapping = get_snapping_vias()
+        estatisticas = snapping.estatisticas()
+        if not estatisticas['trechos']:
+            self.stdout.write(self.style.WARNING(
+                'Nenhum logradouro com geometria: importe com importar_logradouros --geometrias'
+            ))
+            return
+
+        self.stdout.write(
+            f"Indice: {estatisticas['trechos']:,} trechos ({estatisticas['linhas']:,} linhas), "
+            f"carga {estatisticas['tempo_carga_ms']:,.0f} ms"
+        )
+
+        if apenas in (None, 'ocorrencias'):
+            ocorrencias = OcorrenciaGerenciada.objects.filter(
+                latitude__isnull=False,
+                longitude__isnull=False,
+            ).only('id', 'latitude', 'longitude', 'logradouro')
+
+            total = alteradas = 0
+            inicio = time.perf_counter()
+            for lote in self._em_lotes(ocorrencias):
+                total += len(lote)
+                alteradas += vincular_ocorrencias(lote, tolerancia)
+            self._resumo('Ocorrencias', total, alteradas, time.perf_counter() - inicio)
+
+        if apenas in (None, 'congestionamentos'):
+            congestionamentos = CongestionamentoVia.objects.filter(
+                logradouro__isnull=True,
+                latitude__isnull=False,
+                longitude__isnull=False,
+                data_hora__gte=timezone.now() - timedelta(hours=options.get('horas')),
+            )
+
+            total = vinculados = 0
+            inicio = time.perf_counter()
+            for lote in self._em_lotes(congestionamentos):
+                total += len(lote)
+                vinculados += vincular_congestionamentos(lote, tolerancia)
+            self._resumo('Congestionamentos sem logradouro', total, vinculados, time.perf_counter() - inicio)
+
+        self.stdout.write('')
+
+    def _resumo(self, titulo, total, vinculados, segundos):
+        por_registro = segundos / total * 1_000_000 if total else 0
+        self.stdout.write(f'\n{titulo}: {total:,}')
+        self.stdout.write(self.style.SUCCESS(f'  Vinculados/alterados: {vinculados:,}'))
+        self.stdout.write(f'  Tempo: {segundos * 1000:,.0f} ms ({por_registro:,.0f} us/registro)')
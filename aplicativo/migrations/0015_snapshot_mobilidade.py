@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-17 02:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0014_update_user_permissions_system'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotMobilidade',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('data_hora', models.DateTimeField(db_index=True)),
+                ('formato', models.PositiveSmallIntegerField(default=1, help_text='Versão do formato do snapshot')),
+                ('conteudo', models.BinaryField()),
+                ('tamanho_original', models.IntegerField(default=0, help_text='Bytes do JSON recebido do Waze')),
+                ('tamanho_compactado', models.IntegerField(default=0, help_text='Bytes do snapshot compacto')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots_mobilidade', to='aplicativo.cliente')),
+                ('dados_mobilidade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='aplicativo.dadosmobilidade')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Mobilidade',
+                'verbose_name_plural': 'Snapshots de Mobilidade',
+                'db_table': 'snapshots_mobilidade',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['cliente', '-id'], name='snapshots_m_cliente_51e16f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-17 02:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0015_snapshot_mobilidade'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snapshotmobilidade',
+            name='anterior',
+            field=models.ForeignKey(blank=True, help_text='Snapshot anterior do cliente (base do delta)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posteriores', to='aplicativo.snapshotmobilidade'),
+        ),
+        migrations.AddField(
+            model_name='snapshotmobilidade',
+            name='delta',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-17 02:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0016_snapshot_mobilidade_delta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayloadMapaWaze',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('banda', models.CharField(default='completo', help_text='Variante do payload (completo ou faixa de zoom)', max_length=20)),
+                ('conteudo', models.BinaryField(help_text='JSON da resposta compactado com gzip')),
+                ('hash_conteudo', models.CharField(help_text='SHA-256 do JSON (ETag)', max_length=64)),
+                ('tamanho_json', models.IntegerField(default=0)),
+                ('tamanho_compactado', models.IntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payloads', to='aplicativo.snapshotmobilidade')),
+            ],
+            options={
+                'verbose_name': 'Payload do Mapa Waze',
+                'verbose_name_plural': 'Payloads do Mapa Waze',
+                'db_table': 'payloads_mapa_waze',
+                'unique_together': {('snapshot', 'banda')},
+            },
+        ),
+    ]
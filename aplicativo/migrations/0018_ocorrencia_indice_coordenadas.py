@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-17 02:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0017_payload_mapa_waze'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ocorrenciagerenciada',
+            index=models.Index(fields=['latitude', 'longitude'], name='ocorrencias_latitud_405cb5_idx'),
+        ),
+    ]
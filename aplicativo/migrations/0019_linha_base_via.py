@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-17 02:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0018_ocorrencia_indice_coordenadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinhaBaseVia',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('chave_via', models.CharField(help_text='Nome do trecho no feed Waze (sem sufixo de cidade)', max_length=300)),
+                ('dia_semana', models.PositiveSmallIntegerField(help_text='0=segunda ... 6=domingo')),
+                ('faixa_horaria', models.PositiveSmallIntegerField(help_text='Faixa de 15 minutos do dia (0-95)')),
+                ('amostras', models.PositiveIntegerField(default=0)),
+                ('media_kmh', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0, help_text='Soma dos quadrados dos desvios (Welford)')),
+                ('ultima_velocidade_kmh', models.FloatField(blank=True, null=True)),
+                ('ultimo_zscore', models.FloatField(blank=True, help_text='Desvios-padrão abaixo da média na última amostra (positivo = mais lento)', null=True)),
+                ('ultima_amostra', models.DateTimeField(blank=True, null=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='linhas_base_vias', to='aplicativo.cliente')),
+            ],
+            options={
+                'verbose_name': 'Linha de Base de Via',
+                'verbose_name_plural': 'Linhas de Base de Vias',
+                'db_table': 'linhas_base_vias',
+                'indexes': [models.Index(fields=['cliente', 'ultima_amostra', 'ultimo_zscore'], name='linhas_base_cliente_672b2e_idx')],
+                'unique_together': {('cliente', 'chave_via', 'dia_semana', 'faixa_horaria')},
+            },
+        ),
+    ]
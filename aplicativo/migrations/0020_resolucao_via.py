@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-17 03:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0019_linha_base_via'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logradouro',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, help_text='Última gravação (versão dos dados do ViaMatcher)', null=True),
+        ),
+        migrations.CreateModel(
+            name='ResolucaoVia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome_normalizado', models.CharField(help_text='Nome do Waze normalizado pelo ViaMatcher', max_length=300, unique=True)),
+                ('score', models.FloatField(default=0)),
+                ('metodo', models.CharField(max_length=30)),
+                ('versao_matcher', models.CharField(max_length=20)),
+                ('versao_dados', models.CharField(max_length=64)),
+                ('criado_em', models.DateTimeField(auto_now=True)),
+                ('logradouro', models.ForeignKey(blank=True, help_text='Via resolvida (vazio = não encontrada)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resolucoes', to='aplicativo.logradouro')),
+            ],
+            options={
+                'verbose_name': 'Resolução de Via',
+                'verbose_name_plural': 'Resoluções de Vias',
+                'db_table': 'resolucoes_vias',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-17 03:09
+
+from django.db import migrations, models
+
+
+def preencher_nome_busca(apps, schema_editor):
+    """Preenche nome_busca dos logradouros ja importados"""
+    from aplicativo.services.via_matcher import normalizar_nome_via
+
+    Logradouro = apps.get_model('aplicativo', 'Logradouro')
+
+    lote = []
+    for via in Logradouro.objects.only('cod_trecho', 'nome_completo').iterator(chunk_size=2000):
+        via.nome_busca = normalizar_nome_via(via.nome_completo)[:300]
+        lote.append(via)
+        if len(lote) >= 2000:
+            Logradouro.objects.bulk_update(lote, ['nome_busca'])
+            lote = []
+    if lote:
+        Logradouro.objects.bulk_update(lote, ['nome_busca'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0020_resolucao_via'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logradouro',
+            name='nome_busca',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='nome_completo normalizado (ViaMatcher), preenchido no save', max_length=300),
+        ),
+        migrations.RunPython(preencher_nome_busca, migrations.RunPython.noop),
+    ]
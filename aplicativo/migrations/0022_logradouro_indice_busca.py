@@ -0,0 +1,87 @@
+# Generated by Django 5.1.4 on 2026-10-17 03:40
+
+from django.db import migrations, transaction
+
+
+def recalcular_nome_busca(apps, schema_editor):
+    """Recalcula nome_busca com a expansao de abreviacoes"""
+    from aplicativo.services.via_matcher import normalizar_nome_via
+
+    Logradouro = apps.get_model('aplicativo', 'Logradouro')
+
+    lote = []
+    for via in Logradouro.objects.only('cod_trecho', 'nome_completo').iterator(chunk_size=2000):
+        via.nome_busca = normalizar_nome_via(via.nome_completo)[:300]
+        lote.append(via)
+        if len(lote) >= 2000:
+            Logradouro.objects.bulk_update(lote, ['nome_busca'])
+            lote = []
+    if lote:
+        Logradouro.objects.bulk_update(lote, ['nome_busca'])
+
+
+def criar_indice_texto(apps, schema_editor):
+    """
+    Indice textual de nome_busca, quando o banco suporta
+
+    SQLite: tabela FTS5 (tokenizer trigram) mantida por triggers.
+    PostgreSQL: extensao pg_trgm + indice GIN. Sem permissao para criar a
+    extensao, segue sem indice (o ViaMatcher usa substring).
+    """
+    conexao = schema_editor.connection
+
+    if conexao.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS logradouros_busca USING fts5("
+            "nome_busca, content='logradouros', content_rowid='cod_trecho', tokenize='trigram')"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS logradouros_busca_ai AFTER INSERT ON logradouros BEGIN "
+            "INSERT INTO logradouros_busca(rowid, nome_busca) VALUES (new.cod_trecho, new.nome_busca); END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS logradouros_busca_ad AFTER DELETE ON logradouros BEGIN "
+            "INSERT INTO logradouros_busca(logradouros_busca, rowid, nome_busca) "
+            "VALUES ('delete', old.cod_trecho, old.nome_busca); END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS logradouros_busca_au AFTER UPDATE OF nome_busca ON logradouros BEGIN "
+            "INSERT INTO logradouros_busca(logradouros_busca, rowid, nome_busca) "
+            "VALUES ('delete', old.cod_trecho, old.nome_busca); "
+            "INSERT INTO logradouros_busca(rowid, nome_busca) VALUES (new.cod_trecho, new.nome_busca); END"
+        )
+        schema_editor.execute("INSERT INTO logradouros_busca(logradouros_busca) VALUES ('rebuild')")
+
+    elif conexao.vendor == 'postgresql':
+        try:
+            with transaction.atomic(using=conexao.alias):
+                schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                schema_editor.execute(
+                    "CREATE INDEX IF NOT EXISTS logradouros_nome_busca_trgm "
+                    "ON logradouros USING gin (nome_busca gin_trgm_ops)"
+                )
+        except Exception as e:
+            print(f"\n  pg_trgm indisponivel, seguindo sem indice textual: {e}")
+
+
+def remover_indice_texto(apps, schema_editor):
+    conexao = schema_editor.connection
+
+    if conexao.vendor == 'sqlite':
+        for trigger in ('logradouros_busca_ai', 'logradouros_busca_ad', 'logradouros_busca_au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        schema_editor.execute("DROP TABLE IF EXISTS logradouros_busca")
+    elif conexao.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS logradouros_nome_busca_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0021_logradouro_nome_busca'),
+    ]
+
+    operations = [
+        migrations.RunPython(recalcular_nome_busca, migrations.RunPython.noop),
+        migrations.RunPython(criar_indice_texto, remover_indice_texto),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0022_logradouro_indice_busca'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logradouro',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=7, help_text='Ponto médio do trecho (matching espacial do ViaMatcher)', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='logradouro',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=7, help_text='Ponto médio do trecho (matching espacial do ViaMatcher)', max_digits=10, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-17 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0023_logradouro_centroide'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaViaMatcher',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('processo', models.CharField(help_text='host:pid', max_length=150, unique=True)),
+                ('dados', models.JSONField(default=dict)),
+                ('inicio', models.DateTimeField(help_text='Início da coleta das métricas no processo')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Métrica do ViaMatcher',
+                'verbose_name_plural': 'Métricas do ViaMatcher',
+                'db_table': 'metricas_via_matcher',
+            },
+        ),
+    ]
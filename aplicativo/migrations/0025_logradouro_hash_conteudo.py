@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-17 03:21
+
+from django.db import migrations, models
+
+
+def recriar_indice_texto(apps, schema_editor):
+    """AddField recria logradouros no SQLite: refaz os triggers do FTS5"""
+    from aplicativo.services.via_matcher import recriar_indice_texto_sqlite
+
+    recriar_indice_texto_sqlite(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0024_metrica_via_matcher'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logradouro',
+            name='hash_conteudo',
+            field=models.CharField(blank=True, default='', help_text='Hash da linha do CSV (importar_logradouros ignora linhas inalteradas)', max_length=32),
+        ),
+        migrations.RunPython(recriar_indice_texto, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-17 03:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def recriar_indice_texto(apps, schema_editor):
+    """AddField recria logradouros no SQLite: refaz os triggers do FTS5"""
+    from aplicativo.services.via_matcher import recriar_indice_texto_sqlite
+
+    recriar_indice_texto_sqlite(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0025_logradouro_hash_conteudo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logradouro',
+            name='geometria',
+            field=models.BinaryField(blank=True, help_text='Linha do trecho empacotada (geometria.empacotar_linhas), usada no snapping', null=True),
+        ),
+        migrations.AddField(
+            model_name='ocorrenciagerenciada',
+            name='logradouro',
+            field=models.ForeignKey(blank=True, help_text='Trecho mais próximo das coordenadas (snapping_vias)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ocorrencias_gerenciadas', to='aplicativo.logradouro'),
+        ),
+        migrations.RunPython(recriar_indice_texto, migrations.RunPython.noop),
+    ]
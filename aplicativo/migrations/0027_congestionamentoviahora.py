@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-17 03:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0026_logradouro_geometria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CongestionamentoViaHora',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('chave_via', models.CharField(help_text='cod_trecho do logradouro ou "waze:<nome>" quando não há match', max_length=310)),
+                ('hora', models.DateTimeField(help_text='Início da hora (fuso local)')),
+                ('via_nome_waze', models.CharField(help_text='Último nome do Waze visto no trecho', max_length=300)),
+                ('quantidade', models.PositiveIntegerField(default=0, help_text='Congestionamentos registrados')),
+                ('jam_level_max', models.PositiveSmallIntegerField(default=0)),
+                ('nivel_criticidade_max', models.PositiveSmallIntegerField(default=0, help_text='Índice em CongestionamentoVia.CRITICIDADE_CHOICES (0=normal ... 4=critica)')),
+                ('extensao_total_metros', models.BigIntegerField(default=0)),
+                ('atraso_total_segundos', models.BigIntegerField(default=0)),
+                ('soma_velocidade_kmh', models.FloatField(default=0)),
+                ('amostras_velocidade', models.PositiveIntegerField(default=0)),
+                ('maior_deficit_percentual', models.FloatField(blank=True, null=True)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=7, max_digits=10, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=7, max_digits=10, null=True)),
+                ('match_score', models.FloatField(blank=True, null=True)),
+                ('match_metodo', models.CharField(blank=True, max_length=50, null=True)),
+                ('ultima_ocorrencia', models.DateTimeField()),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico_congestionamentos', to='aplicativo.cliente')),
+                ('logradouro', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='historico_congestionamentos', to='aplicativo.logradouro')),
+            ],
+            options={
+                'verbose_name': 'Congestionamento por Via e Hora',
+                'verbose_name_plural': 'Congestionamentos por Via e Hora',
+                'db_table': 'congestionamentos_via_hora',
+                'indexes': [models.Index(fields=['cliente', 'hora', 'nivel_criticidade_max'], name='congestiona_cliente_a0d0ad_idx'), models.Index(fields=['cliente', 'via_nome_waze', 'hora'], name='congestiona_cliente_e63d4e_idx')],
+                'unique_together': {('cliente', 'chave_via', 'hora')},
+            },
+        ),
+    ]
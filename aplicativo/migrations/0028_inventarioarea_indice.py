@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-17 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0027_congestionamentoviahora'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventarioarea',
+            index=models.Index(fields=['area', '-data_hora'], name='inventarios_area_id_3ae747_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.4 on 2026-10-17 03:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_geometria(apps, schema_editor):
+    """Retângulo envolvente e polígonos empacotados das áreas existentes"""
+    from aplicativo.services.filtro_espacial import limites_geojson
+    from aplicativo.services.geometria import empacotar_poligonos, ler_poligonos
+
+    AreaObservacao = apps.get_model('aplicativo', 'AreaObservacao')
+    for area_id, geojson in AreaObservacao.objects.values_list('id', 'geojson').iterator():
+        oeste, sul, leste, norte = limites_geojson(geojson) or (None, None, None, None)
+        # update() não altera atualizado_em
+        AreaObservacao.objects.filter(id=area_id).update(
+            bbox_oeste=oeste,
+            bbox_sul=sul,
+            bbox_leste=leste,
+            bbox_norte=norte,
+            vertices=empacotar_poligonos(ler_poligonos(geojson)),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aplicativo', '0028_inventarioarea_indice'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='areaobservacao',
+            name='bbox_leste',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='areaobservacao',
+            name='bbox_norte',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='areaobservacao',
+            name='bbox_oeste',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='areaobservacao',
+            name='bbox_sul',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='areaobservacao',
+            name='vertices',
+            field=models.BinaryField(blank=True, help_text='Polígonos da área empacotados (geometria.empacotar_poligonos)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='areaobservacao',
+            index=models.Index(fields=['bbox_oeste', 'bbox_leste'], name='areas_obser_bbox_oe_f9fac9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='areaobservacao',
+            index=models.Index(fields=['bbox_sul', 'bbox_norte'], name='areas_obser_bbox_su_20139f_idx'),
+        ),
+        migrations.RunPython(preencher_geometria, migrations.RunPython.noop),
+    ]
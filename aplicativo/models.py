@@ -5678,6 +5678,14 @@ class OcorrenciaGerenciada(models.Model):
     referencia = models.CharField(max_length=200, blank=True)
     latitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
     longitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
+    logradouro = models.ForeignKey(
+        'Logradouro',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ocorrencias_gerenciadas',
+        help_text='Trecho mais próximo das coordenadas (snapping_vias)'
+    )
 
     # Solicitante
     solicitante_nome = models.CharField(max_length=200, blank=True)
@@ -5722,8 +5730,12 @@ class OcorrenciaGerenciada(models.Model):
             models.Index(fields=['categoria', 'data_abertura']),
             models.Index(fields=['numero_protocolo']),
             models.Index(fields=['data_abertura']),
+            models.Index(fields=['latitude', 'longitude']),
         ]
 
+    # Campos que mudam o inventário das áreas de observação (services/monitor_areas.py)
+    CAMPOS_AREAS = ('status', 'prioridade', 'latitude', 'longitude')
+
     def __str__(self):
         return f"{self.numero_protocolo} - {self.titulo}"
 
@@ -5745,6 +5757,53 @@ class OcorrenciaGerenciada(models.Model):
 
         super().save(*args, **kwargs)
 
+        update_fields = kwargs.get('update_fields')
+        valores = self.__dict__.setdefault('_valores_areas', {})
+        for campo in self.CAMPOS_AREAS:
+            if campo in self.__dict__ and (update_fields is None or campo in update_fields):
+                valores[campo] = self.__dict__[campo]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores carregados dos campos que mudam o inventário das áreas
+        instance._valores_areas = {
+            campo: instance.__dict__[campo] for campo in cls.CAMPOS_AREAS if campo in instance.__dict__
+        }
+        return instance
+
+    def campos_areas_alterados(self, update_fields=None) -> bool:
+        """Se status, prioridade ou localização mudaram desde a leitura (ou o último save)"""
+        originais = self.__dict__.get('_valores_areas')
+        if originais is None:
+            return True
+        return any(
+            campo in self.__dict__ and (
+                campo not in originais or not self._mesmo_valor(self.__dict__[campo], originais[campo])
+            )
+            for campo in self.CAMPOS_AREAS
+            if update_fields is None or campo in update_fields
+        )
+
+    @staticmethod
+    def _mesmo_valor(atual, original) -> bool:
+        """Compara coordenadas float/Decimal/texto pelas 7 casas do campo"""
+        if atual == original:
+            return True
+        if atual is None or original is None:
+            return False
+        try:
+            return round(float(atual), 7) == round(float(original), 7)
+        except (TypeError, ValueError):
+            return False
+
+    def localizacao_carregada(self):
+        """(longitude, latitude) lidas do banco (ou do último save); None se desconhecidas"""
+        originais = self.__dict__.get('_valores_areas') or {}
+        if 'longitude' not in originais or 'latitude' not in originais:
+            return None
+        return originais['longitude'], originais['latitude']
+
     @property
     def status_color(self):
         """Retorna cor CSS baseada no status"""
@@ -6548,6 +6607,136 @@ class DadosMobilidade(models.Model):
             return round(self.extensao_total_congestionamentos_m / 1000, 1)
         return 0
 
+    def obter_snapshot(self):
+        """
+        Retorna o leitor (SnapshotWaze) do feed desta coleta
+
+        Usa o snapshot compacto mais recente; registros antigos, gravados
+        antes do formato compacto, são lidos a partir de dados_raw.
+        """
+        from .services.snapshot_waze import SnapshotWaze
+
+        snapshot = self.snapshots.order_by('-id').first()
+        if snapshot:
+            return snapshot.leitor()
+        if self.dados_raw:
+            return SnapshotWaze.de_feed(self.dados_raw)
+        return None
+
+
+class SnapshotMobilidade(models.Model):
+    """
+    Snapshot compacto (colunar/binário) do feed Waze de uma coleta
+
+    Substitui o JSON completo em DadosMobilidade.dados_raw: as polylines
+    ficam empacotadas como float64 e os demais campos em colunas
+    compactadas. Ver services/snapshot_waze.py para o formato.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    cliente = models.ForeignKey(
+        Cliente,
+        on_delete=models.CASCADE,
+        related_name='snapshots_mobilidade'
+    )
+    dados_mobilidade = models.ForeignKey(
+        DadosMobilidade,
+        on_delete=models.CASCADE,
+        related_name='snapshots'
+    )
+    anterior = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='posteriores',
+        help_text='Snapshot anterior do cliente (base do delta)'
+    )
+
+    data_hora = models.DateTimeField(db_index=True)
+    formato = models.PositiveSmallIntegerField(default=1, help_text='Versão do formato do snapshot')
+    conteudo = models.BinaryField()
+
+    tamanho_original = models.IntegerField(default=0, help_text='Bytes do JSON recebido do Waze')
+    tamanho_compactado = models.IntegerField(default=0, help_text='Bytes do snapshot compacto')
+
+    # Itens do mapa adicionados/alterados/removidos em relação ao anterior
+    # (ver services/delta_waze.py)
+    delta = models.JSONField(default=dict, blank=True)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'snapshots_mobilidade'
+        verbose_name = 'Snapshot de Mobilidade'
+        verbose_name_plural = 'Snapshots de Mobilidade'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['cliente', '-id']),
+        ]
+
+    def __str__(self):
+        return f"Snapshot {self.id} - {self.cliente.nome} ({self.tamanho_compactado / 1024:.1f} KB)"
+
+    def leitor(self):
+        """Retorna o leitor SnapshotWaze para este snapshot"""
+        from .services.snapshot_waze import SnapshotWaze
+        return SnapshotWaze(self.conteudo)
+
+
+class PayloadMapaWaze(models.Model):
+    """
+    Payload do mapa Waze pré-calculado na coleta
+
+    Guarda a resposta JSON de api_waze_completo já serializada e
+    compactada (gzip), com o hash do conteúdo usado como ETag. Assim o
+    payload categorizado é montado uma vez por coleta, e não a cada
+    requisição das telas de operação.
+    """
+
+    BANDA_COMPLETO = 'completo'
+
+    id = models.BigAutoField(primary_key=True)
+    snapshot = models.ForeignKey(
+        SnapshotMobilidade,
+        on_delete=models.CASCADE,
+        related_name='payloads'
+    )
+    banda = models.CharField(
+        max_length=20,
+        default=BANDA_COMPLETO,
+        help_text='Variante do payload (completo ou faixa de zoom)'
+    )
+
+    conteudo = models.BinaryField(help_text='JSON da resposta compactado com gzip')
+    hash_conteudo = models.CharField(max_length=64, help_text='SHA-256 do JSON (ETag)')
+    tamanho_json = models.IntegerField(default=0)
+    tamanho_compactado = models.IntegerField(default=0)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'payloads_mapa_waze'
+        verbose_name = 'Payload do Mapa Waze'
+        verbose_name_plural = 'Payloads do Mapa Waze'
+        unique_together = [['snapshot', 'banda']]
+
+    def __str__(self):
+        return f"Payload {self.banda} do snapshot {self.snapshot_id} ({self.tamanho_compactado / 1024:.1f} KB)"
+
+    @property
+    def etag(self):
+        return f'"{self.hash_conteudo}"'
+
+    def json_bytes(self) -> bytes:
+        """Retorna o JSON descompactado"""
+        import gzip
+        return gzip.decompress(bytes(self.conteudo))
+
+    def carregar(self) -> dict:
+        """Retorna o payload como dict"""
+        import json
+        return json.loads(self.json_bytes())
+
 
 # =============================================================================
 # LOGRADOUROS - VIAS OFICIAIS DO RIO DE JANEIRO
@@ -6601,6 +6790,13 @@ class Logradouro(models.Model):
         max_length=300,
         help_text='Nome para exibição em mapas'
     )
+    nome_busca = models.CharField(
+        max_length=300,
+        blank=True,
+        default='',
+        db_index=True,
+        help_text='nome_completo normalizado (ViaMatcher), preenchido no save'
+    )
 
     # Localização
     bairro = models.CharField(
@@ -6610,6 +6806,25 @@ class Logradouro(models.Model):
         blank=True
     )
     cod_bairro = models.IntegerField(null=True, blank=True)
+    latitude = models.DecimalField(
+        max_digits=10,
+        decimal_places=7,
+        null=True,
+        blank=True,
+        help_text='Ponto médio do trecho (matching espacial do ViaMatcher)'
+    )
+    longitude = models.DecimalField(
+        max_digits=10,
+        decimal_places=7,
+        null=True,
+        blank=True,
+        help_text='Ponto médio do trecho (matching espacial do ViaMatcher)'
+    )
+    geometria = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text='Linha do trecho empacotada (geometria.empacotar_linhas), usada no snapping'
+    )
 
     # Características viárias
     hierarquia = models.CharField(
@@ -6649,7 +6864,18 @@ class Logradouro(models.Model):
 
     # Controle interno
     importado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(
+        auto_now=True,
+        null=True,
+        help_text='Última gravação (versão dos dados do ViaMatcher)'
+    )
     ativa = models.BooleanField(default=True, help_text='Via ativa no sistema')
+    hash_conteudo = models.CharField(
+        max_length=32,
+        blank=True,
+        default='',
+        help_text='Hash da linha do CSV (importar_logradouros ignora linhas inalteradas)'
+    )
 
     class Meta:
         db_table = 'logradouros'
@@ -6667,6 +6893,24 @@ class Logradouro(models.Model):
     def __str__(self):
         return self.nome_completo or f"Via {self.cod_trecho}"
 
+    def save(self, *args, **kwargs):
+        from .services.via_matcher import normalizar_nome_via
+
+        self.nome_busca = normalizar_nome_via(self.nome_completo)[:300]
+
+        # Editada fora da importacao: a proxima importacao regrava a linha do CSV
+        self.hash_conteudo = ''
+
+        # update_or_create grava apenas os campos de defaults
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            extras = {'hash_conteudo'}
+            if 'nome_completo' in update_fields:
+                extras.add('nome_busca')
+            kwargs['update_fields'] = set(update_fields) | extras
+
+        super().save(*args, **kwargs)
+
     @property
     def nome_normalizado(self):
         """Remove acentos e caracteres especiais para matching"""
@@ -6689,6 +6933,69 @@ class Logradouro(models.Model):
         return self.hierarquia in ['Arterial primária', 'Arterial secundária', 'Coletora']
 
 
+class ResolucaoVia(models.Model):
+    """
+    Resolução persistida de um nome de via do Waze (ViaMatcher)
+
+    Os mesmos nomes se repetem em todas as coletas: a resolução (exata,
+    fuzzy ou não encontrada) é gravada uma vez e reaproveitada pelos
+    workers. Vale apenas para a versão do matcher e dos logradouros com
+    que foi calculada; importar_logradouros descarta a tabela.
+    """
+
+    nome_normalizado = models.CharField(
+        max_length=300,
+        unique=True,
+        help_text='Nome do Waze normalizado pelo ViaMatcher'
+    )
+    logradouro = models.ForeignKey(
+        Logradouro,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='resolucoes',
+        help_text='Via resolvida (vazio = não encontrada)'
+    )
+    score = models.FloatField(default=0)
+    metodo = models.CharField(max_length=30)
+
+    # Versões com que a resolução foi calculada
+    versao_matcher = models.CharField(max_length=20)
+    versao_dados = models.CharField(max_length=64)
+
+    criado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'resolucoes_vias'
+        verbose_name = 'Resolução de Via'
+        verbose_name_plural = 'Resoluções de Vias'
+
+    def __str__(self):
+        return f"{self.nome_normalizado} -> {self.logradouro_id or '-'} ({self.metodo})"
+
+
+class MetricaViaMatcher(models.Model):
+    """
+    Métricas do ViaMatcher publicadas por processo (metricas_via_matcher)
+
+    Cada worker regrava a sua linha periodicamente; o comando e a API de
+    métricas somam as linhas atualizadas recentemente.
+    """
+
+    processo = models.CharField(max_length=150, unique=True, help_text='host:pid')
+    dados = models.JSONField(default=dict)
+    inicio = models.DateTimeField(help_text='Início da coleta das métricas no processo')
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        db_table = 'metricas_via_matcher'
+        verbose_name = 'Métrica do ViaMatcher'
+        verbose_name_plural = 'Métricas do ViaMatcher'
+
+    def __str__(self):
+        return f"{self.processo} ({self.atualizado_em:%d/%m %H:%M})"
+
+
 # =============================================================================
 # CONGESTIONAMENTO POR VIA - DADOS DETALHADOS
 # =============================================================================
@@ -6856,6 +7163,194 @@ class CongestionamentoVia(models.Model):
         super().save(*args, **kwargs)
 
 
+class LinhaBaseVia(models.Model):
+    """
+    Velocidade típica por trecho × dia da semana × faixa de 15 minutos
+
+    Atualizada incrementalmente a cada coleta Waze (média e variância
+    pelo método de Welford), sem reprocessar o histórico. Guarda também a
+    última amostra e seu desvio em relação à linha de base, para que a
+    consulta de anomalias seja uma leitura indexada.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    cliente = models.ForeignKey(
+        Cliente,
+        on_delete=models.CASCADE,
+        related_name='linhas_base_vias'
+    )
+    chave_via = models.CharField(
+        max_length=300,
+        help_text='Nome do trecho no feed Waze (sem sufixo de cidade)'
+    )
+    dia_semana = models.PositiveSmallIntegerField(help_text='0=segunda ... 6=domingo')
+    faixa_horaria = models.PositiveSmallIntegerField(help_text='Faixa de 15 minutos do dia (0-95)')
+
+    # Estatísticas acumuladas (Welford)
+    amostras = models.PositiveIntegerField(default=0)
+    media_kmh = models.FloatField(default=0)
+    m2 = models.FloatField(default=0, help_text='Soma dos quadrados dos desvios (Welford)')
+
+    # Última amostra
+    ultima_velocidade_kmh = models.FloatField(null=True, blank=True)
+    ultimo_zscore = models.FloatField(
+        null=True,
+        blank=True,
+        help_text='Desvios-padrão abaixo da média na última amostra (positivo = mais lento)'
+    )
+    ultima_amostra = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'linhas_base_vias'
+        verbose_name = 'Linha de Base de Via'
+        verbose_name_plural = 'Linhas de Base de Vias'
+        unique_together = [['cliente', 'chave_via', 'dia_semana', 'faixa_horaria']]
+        indexes = [
+            models.Index(fields=['cliente', 'ultima_amostra', 'ultimo_zscore']),
+        ]
+
+    def __str__(self):
+        hora = self.faixa_horaria * 15
+        return f"{self.chave_via} (dia {self.dia_semana}, {hora // 60:02d}:{hora % 60:02d}): {self.media_kmh:.1f} km/h"
+
+    @property
+    def variancia(self) -> float:
+        return self.m2 / (self.amostras - 1) if self.amostras > 1 else 0.0
+
+    @property
+    def desvio_padrao(self) -> float:
+        return self.variancia ** 0.5
+
+    def zscore(self, velocidade_kmh: float):
+        """Desvios-padrão abaixo da média (None sem variância conhecida)"""
+        desvio = self.desvio_padrao
+        if not desvio:
+            return None
+        return (self.media_kmh - velocidade_kmh) / desvio
+
+    def registrar(self, velocidade_kmh: float, data_hora, minimo_amostras: int = 2):
+        """
+        Inclui uma amostra (Welford)
+
+        O z-score da amostra é calculado contra a base anterior, e só
+        quando ela já tem pelo menos `minimo_amostras`.
+        """
+        self.ultimo_zscore = self.zscore(velocidade_kmh) if self.amostras >= minimo_amostras else None
+        self.ultima_velocidade_kmh = velocidade_kmh
+        self.ultima_amostra = data_hora
+
+        self.amostras += 1
+        delta = velocidade_kmh - self.media_kmh
+        self.media_kmh += delta / self.amostras
+        self.m2 += delta * (velocidade_kmh - self.media_kmh)
+
+
+class CongestionamentoViaHora(models.Model):
+    """
+    Histórico de congestionamentos por trecho oficial × hora
+
+    Acumulado incrementalmente ao fim de cada processamento de
+    congestionamentos (uma linha por trecho e hora, somando todas as
+    coletas e nomes do Waze que caíram no trecho), para que rankings e
+    consultas históricas não precisem varrer CongestionamentoVia.
+    Congestionamentos sem logradouro ficam em uma linha por nome do Waze.
+    """
+
+    NIVEIS_CRITICIDADE = [valor for valor, _ in CongestionamentoVia.CRITICIDADE_CHOICES]
+
+    id = models.BigAutoField(primary_key=True)
+    cliente = models.ForeignKey(
+        Cliente,
+        on_delete=models.CASCADE,
+        related_name='historico_congestionamentos'
+    )
+    logradouro = models.ForeignKey(
+        'Logradouro',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='historico_congestionamentos',
+    )
+    chave_via = models.CharField(
+        max_length=310,
+        help_text='cod_trecho do logradouro ou "waze:<nome>" quando não há match'
+    )
+    hora = models.DateTimeField(help_text='Início da hora (fuso local)')
+    via_nome_waze = models.CharField(
+        max_length=300,
+        help_text='Último nome do Waze visto no trecho'
+    )
+
+    # Agregados da hora
+    quantidade = models.PositiveIntegerField(default=0, help_text='Congestionamentos registrados')
+    jam_level_max = models.PositiveSmallIntegerField(default=0)
+    nivel_criticidade_max = models.PositiveSmallIntegerField(
+        default=0,
+        help_text='Índice em CongestionamentoVia.CRITICIDADE_CHOICES (0=normal ... 4=critica)'
+    )
+    extensao_total_metros = models.BigIntegerField(default=0)
+    atraso_total_segundos = models.BigIntegerField(default=0)
+    soma_velocidade_kmh = models.FloatField(default=0)
+    amostras_velocidade = models.PositiveIntegerField(default=0)
+    maior_deficit_percentual = models.FloatField(null=True, blank=True)
+
+    # Último registro da hora
+    latitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
+    match_score = models.FloatField(null=True, blank=True)
+    match_metodo = models.CharField(max_length=50, null=True, blank=True)
+    ultima_ocorrencia = models.DateTimeField()
+
+    class Meta:
+        db_table = 'congestionamentos_via_hora'
+        verbose_name = 'Congestionamento por Via e Hora'
+        verbose_name_plural = 'Congestionamentos por Via e Hora'
+        unique_together = [['cliente', 'chave_via', 'hora']]
+        indexes = [
+            models.Index(fields=['cliente', 'hora', 'nivel_criticidade_max']),
+            models.Index(fields=['cliente', 'via_nome_waze', 'hora']),
+        ]
+
+    def __str__(self):
+        from django.utils import timezone
+        return f"{self.via_nome_waze} ({timezone.localtime(self.hora):%d/%m %H}h): {self.quantidade} registros"
+
+    @property
+    def criticidade(self) -> str:
+        return self.NIVEIS_CRITICIDADE[self.nivel_criticidade_max]
+
+    @property
+    def velocidade_media_kmh(self):
+        if not self.amostras_velocidade:
+            return None
+        return self.soma_velocidade_kmh / self.amostras_velocidade
+
+    def registrar(self, congestionamento):
+        """Inclui um CongestionamentoVia nos agregados da hora"""
+        self.quantidade += 1
+        self.jam_level_max = max(self.jam_level_max, congestionamento.jam_level or 0)
+        self.nivel_criticidade_max = max(
+            self.nivel_criticidade_max,
+            self.NIVEIS_CRITICIDADE.index(congestionamento.criticidade or 'normal')
+        )
+        self.extensao_total_metros += congestionamento.extensao_metros or 0
+        self.atraso_total_segundos += max(congestionamento.atraso_segundos or 0, 0)
+        if congestionamento.velocidade_atual is not None:
+            self.soma_velocidade_kmh += float(congestionamento.velocidade_atual)
+            self.amostras_velocidade += 1
+        deficit = congestionamento.percentual_abaixo_regulamentada
+        if deficit is not None and (self.maior_deficit_percentual is None or deficit > self.maior_deficit_percentual):
+            self.maior_deficit_percentual = deficit
+
+        if self.ultima_ocorrencia is None or congestionamento.data_hora >= self.ultima_ocorrencia:
+            self.via_nome_waze = congestionamento.via_nome_waze[:300]
+            self.latitude = congestionamento.latitude
+            self.longitude = congestionamento.longitude
+            self.match_score = congestionamento.match_score
+            self.match_metodo = congestionamento.match_metodo
+            self.ultima_ocorrencia = congestionamento.data_hora
+
+
 # ============================================
 # SISTEMA DE ÁREAS DE OBSERVAÇÃO
 # ============================================
@@ -6894,6 +7389,18 @@ class AreaObservacao(models.Model):
         ('marker', 'Ponto'),
     ], default='polygon')
 
+    # Derivados do geojson, atualizados no save (atualizar_geometria):
+    # retângulo envolvente para filtros no banco e polígonos empacotados
+    bbox_oeste = models.FloatField(null=True, blank=True)
+    bbox_sul = models.FloatField(null=True, blank=True)
+    bbox_leste = models.FloatField(null=True, blank=True)
+    bbox_norte = models.FloatField(null=True, blank=True)
+    vertices = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text='Polígonos da área empacotados (geometria.empacotar_poligonos)'
+    )
+
     # Status
     ativa = models.BooleanField('Área Ativa', default=True)
     alerta_habilitado = models.BooleanField('Alertas Habilitados', default=True)
@@ -6924,10 +7431,45 @@ class AreaObservacao(models.Model):
         verbose_name = 'Área de Observação'
         verbose_name_plural = 'Áreas de Observação'
         ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['bbox_oeste', 'bbox_leste']),
+            models.Index(fields=['bbox_sul', 'bbox_norte']),
+        ]
+
+    CAMPOS_GEOMETRIA = ('bbox_oeste', 'bbox_sul', 'bbox_leste', 'bbox_norte', 'vertices')
 
     def __str__(self):
         return f"{self.nome} ({self.cliente.nome})"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'geojson' in update_fields:
+            self.atualizar_geometria()
+            if update_fields is not None:
+                # atualizado_em é a versão da geometria em cache (inventario_areas.geometria_da_area)
+                kwargs['update_fields'] = set(update_fields) | set(self.CAMPOS_GEOMETRIA) | {'atualizado_em'}
+
+        super().save(*args, **kwargs)
+
+    def atualizar_geometria(self):
+        """Recalcula o retângulo envolvente e os polígonos empacotados a partir do geojson"""
+        from .services.filtro_espacial import limites_geojson
+        from .services.geometria import empacotar_poligonos, ler_poligonos
+
+        self.vertices = empacotar_poligonos(ler_poligonos(self.geojson))
+        self.bbox_oeste, self.bbox_sul, self.bbox_leste, self.bbox_norte = (
+            limites_geojson(self.geojson) or (None, None, None, None)
+        )
+
+    @property
+    def poligonos(self):
+        """Polígonos da área no formato de geometria.ler_poligonos"""
+        from .services.geometria import desempacotar_poligonos, ler_poligonos
+
+        if self.vertices:
+            return desempacotar_poligonos(self.vertices)
+        return ler_poligonos(self.geojson)
+
     @property
     def esta_ativa_agora(self):
         """Verifica se evento está acontecendo agora"""
@@ -6939,168 +7481,50 @@ class AreaObservacao(models.Model):
 
     def _get_bounds(self):
         """Retorna bounding box da área"""
-        try:
-            coords = self.geojson['geometry']['coordinates'][0]
-            lons = [c[0] for c in coords]
-            lats = [c[1] for c in coords]
-
-            return {
-                'north': max(lats),
-                'south': min(lats),
-                'east': max(lons),
-                'west': min(lons),
-            }
-        except (KeyError, IndexError, TypeError):
-            return None
+        if self.bbox_oeste is None:
+            # Instância ainda não salva
+            self.atualizar_geometria()
+            if self.bbox_oeste is None:
+                return None
+
+        return {
+            'north': self.bbox_norte,
+            'south': self.bbox_sul,
+            'east': self.bbox_leste,
+            'west': self.bbox_oeste,
+        }
 
     def _ponto_dentro_poligono(self, lat, lon):
-        """Verifica se ponto está dentro do polígono (Ray Casting Algorithm)"""
-        try:
-            coords = self.geojson['geometry']['coordinates'][0]
-            x, y = float(lon), float(lat)
-            inside = False
-
-            j = len(coords) - 1
-            for i in range(len(coords)):
-                xi, yi = coords[i]
-                xj, yj = coords[j]
-
-                if ((yi > y) != (yj > y)) and (x < (xj - xi) * (y - yi) / (yj - yi) + xi):
-                    inside = not inside
+        """Verifica se ponto está dentro do polígono (geometria preparada em cache)"""
+        from .services.inventario_areas import ponto_na_area
 
-                j = i
-
-            return inside
-        except (KeyError, IndexError, TypeError):
+        try:
+            return ponto_na_area(self, float(lon), float(lat))
+        except (TypeError, ValueError):
             return False
 
     def inventariar(self):
         """
         Faz inventário completo de tudo dentro da área
         Retorna dict com contadores
-        """
-        bounds = self._get_bounds()
-        if not bounds:
-            return {}
-
-        inventario = {}
-
-        # ---- OCORRÊNCIAS ----
-        try:
-            ocorrencias_qs = OcorrenciaGerenciada.objects.filter(
-                cliente=self.cliente,
-                status__in=['aberta', 'em_andamento', 'pendente'],
-                latitude__gte=bounds['south'],
-                latitude__lte=bounds['north'],
-                longitude__gte=bounds['west'],
-                longitude__lte=bounds['east'],
-            )
-
-            ocorrencias_dentro = []
-            for oc in ocorrencias_qs:
-                if self._ponto_dentro_poligono(oc.latitude, oc.longitude):
-                    ocorrencias_dentro.append(oc)
-
-            inventario['ocorrencias'] = {
-                'total': len(ocorrencias_dentro),
-                'graves': len([o for o in ocorrencias_dentro if o.prioridade in ['alta', 'urgente', 'critica']]),
-                'moderadas': len([o for o in ocorrencias_dentro if o.prioridade == 'media']),
-                'leves': len([o for o in ocorrencias_dentro if o.prioridade in ['baixa', 'normal']]),
-                'lista': [{'id': str(o.id), 'titulo': o.titulo, 'status': o.status} for o in ocorrencias_dentro[:10]]
-            }
-        except Exception as e:
-            inventario['ocorrencias'] = {'total': 0, 'erro': str(e)}
-
-        # ---- DADOS WAZE ----
-        try:
-            ultimo_waze = DadosMobilidade.objects.filter(
-                cliente=self.cliente
-            ).order_by('-data_hora').first()
-
-            if ultimo_waze and ultimo_waze.dados_raw:
-                jams_dentro = []
-                alerts_dentro = []
-
-                # Processar jams
-                for jam in ultimo_waze.dados_raw.get('jams', []):
-                    line = jam.get('line', [])
-                    for ponto in line[:5]:  # Checar primeiros pontos
-                        lat = ponto.get('y')
-                        lon = ponto.get('x')
-                        if lat and lon and self._ponto_dentro_poligono(lat, lon):
-                            jams_dentro.append(jam)
-                            break
-
-                # Processar alerts
-                for alert in ultimo_waze.dados_raw.get('alerts', []):
-                    location = alert.get('location', {})
-                    lat = location.get('y')
-                    lon = location.get('x')
-                    if lat and lon and self._ponto_dentro_poligono(lat, lon):
-                        alerts_dentro.append(alert)
-
-                inventario['waze'] = {
-                    'jams_total': len(jams_dentro),
-                    'jams_severos': len([j for j in jams_dentro if j.get('level', 0) >= 4]),
-                    'acidentes': len([a for a in alerts_dentro if 'ACCIDENT' in a.get('type', '').upper()]),
-                    'interdicoes': len([a for a in alerts_dentro if 'ROAD_CLOSED' in a.get('type', '').upper()]),
-                    'perigos': len([a for a in alerts_dentro if 'HAZARD' in a.get('type', '').upper()]),
-                }
-            else:
-                inventario['waze'] = {'jams_total': 0, 'jams_severos': 0, 'acidentes': 0, 'interdicoes': 0, 'perigos': 0}
-        except Exception as e:
-            inventario['waze'] = {'jams_total': 0, 'erro': str(e)}
-
-        # ---- ESCOLAS ----
-        try:
-            escolas = EscolasMunicipais.objects.filter(
-                latitude__gte=bounds['south'],
-                latitude__lte=bounds['north'],
-                longitude__gte=bounds['west'],
-                longitude__lte=bounds['east'],
-            )
-            count = sum(1 for e in escolas if self._ponto_dentro_poligono(e.latitude, e.longitude))
-            inventario['escolas'] = count
-        except Exception:
-            inventario['escolas'] = 0
 
-        # ---- SIRENES ----
-        try:
-            sirenes = Sirene.objects.filter(
-                latitude__gte=bounds['south'],
-                latitude__lte=bounds['north'],
-                longitude__gte=bounds['west'],
-                longitude__lte=bounds['east'],
-            )
-            sirenes_dentro = [s for s in sirenes if self._ponto_dentro_poligono(s.latitude, s.longitude)]
-            inventario['sirenes'] = {
-                'total': len(sirenes_dentro),
-                'acionadas': len([s for s in sirenes_dentro if getattr(s, 'acionada', False)])
-            }
-        except Exception:
-            inventario['sirenes'] = {'total': 0, 'acionadas': 0}
-
-        # ---- CÂMERAS ----
-        try:
-            cameras = Cameras.objects.filter(
-                latitude__gte=bounds['south'],
-                latitude__lte=bounds['north'],
-                longitude__gte=bounds['west'],
-                longitude__lte=bounds['east'],
-            )
-            count = sum(1 for c in cameras if self._ponto_dentro_poligono(c.latitude, c.longitude))
-            inventario['cameras'] = count
-        except Exception:
-            inventario['cameras'] = 0
+        Usa o mesmo motor do inventário em lote (services.inventario_areas);
+        para várias áreas, prefira inventariar_areas(areas).
+        """
+        from .services.inventario_areas import inventariar_areas
 
-        return inventario
+        return inventariar_areas([self]).get(self.id, {})
 
-    def calcular_nivel_operacional(self):
+    def calcular_nivel_operacional(self, inventario=None):
         """
         Calcula nível E1-E5 específico da área
         Usa mesma lógica do Motor de Decisão mas só para área
+
+        Args:
+            inventario: Inventário já calculado (evita inventariar de novo)
         """
-        inventario = self.inventariar()
+        if inventario is None:
+            inventario = self.inventariar()
 
         nivel = 1  # E1 (Normal)
 
@@ -7152,6 +7576,9 @@ class InventarioArea(models.Model):
         verbose_name = 'Inventário de Área'
         verbose_name_plural = 'Inventários de Áreas'
         ordering = ['-data_hora']
+        indexes = [
+            models.Index(fields=['area', '-data_hora']),
+        ]
 
     def __str__(self):
         return f"{self.area.nome} - {self.data_hora.strftime('%d/%m %H:%M')}"
@@ -7203,6 +7630,32 @@ class AlertaArea(models.Model):
         return f"[{self.get_gravidade_display()}] {self.titulo}"
 
 
+# Signals para verificar os alertas das áreas que contêm o evento (services/monitor_areas.py)
+@receiver(post_save, sender=OcorrenciaGerenciada)
+def verificar_areas_ocorrencia(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Ocorrência nova ou com status, prioridade ou localização alterados"""
+    from .services.monitor_areas import agendar_verificacao, verificar_ocorrencia
+
+    if raw or (not created and not instance.campos_areas_alterados(update_fields)):
+        return
+
+    # Posição anterior: as áreas de onde a ocorrência saiu também mudam
+    anterior = None
+    if not created and instance.campos_areas_alterados(['latitude', 'longitude']):
+        anterior = instance.localizacao_carregada()
+    agendar_verificacao(verificar_ocorrencia, instance, localizacao_anterior=anterior)
+
+
+@receiver(post_save, sender=DadosSirene)
+def verificar_areas_sirene(sender, instance, created, raw=False, **kwargs):
+    """Nova leitura de sirene (só dispara se passou a acionada)"""
+    from .services.monitor_areas import agendar_verificacao, verificar_dados_sirene
+
+    if raw or not created:
+        return
+    agendar_verificacao(verificar_dados_sirene, instance)
+
+
 class AlertaUsuarioConfirmado(models.Model):
     """Registro de alertas de área confirmados/dispensados por cada usuário.
     
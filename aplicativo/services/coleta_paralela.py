@@ -0,0 +1,93 @@
+"""
+Coleta Paralela de Feeds HTTP
+=============================
+
+Executa as requisições de vários clientes (Waze, Open-Meteo) em paralelo,
+com um pool de threads e uma requests.Session (pool de conexões
+keep-alive) por thread. Apenas o download roda em paralelo: a gravação
+no banco continua sequencial, na thread do comando.
+
+Exemplo:
+    tarefas = {
+        cliente.id: IntegradorWaze(cliente).buscar_feed
+        for cliente in clientes
+    }
+    resultados = buscar_em_paralelo(tarefas, concorrencia=8)
+    for chave, resultado in resultados.items():
+        if resultado.ok:
+            data, tamanho = resultado.valor
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ResultadoBusca:
+    """Resultado do download de uma tarefa"""
+
+    def __init__(self, valor: Any = None, erro: Optional[BaseException] = None, latencia_ms: float = 0.0):
+        self.valor = valor
+        self.erro = erro
+        self.latencia_ms = latencia_ms
+
+    @property
+    def ok(self) -> bool:
+        return self.erro is None
+
+
+def criar_sessao(tamanho_pool: int = 10) -> requests.Session:
+    """Cria uma requests.Session com pool de conexões HTTP reaproveitáveis"""
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool)
+    sessao.mount('https://', adaptador)
+    sessao.mount('http://', adaptador)
+    return sessao
+
+
+def buscar_em_paralelo(
+    tarefas: Dict[Hashable, Callable[[requests.Session], Any]],
+    concorrencia: int = 4,
+) -> Dict[Hashable, ResultadoBusca]:
+    """
+    Executa as funções de download em paralelo
+
+    Args:
+        tarefas: {chave: funcao(session)} - cada função recebe a Session
+            da thread e retorna o conteúdo baixado
+        concorrencia: Número máximo de downloads simultâneos
+
+    Returns:
+        {chave: ResultadoBusca}, na mesma ordem de tarefas
+    """
+    local = threading.local()
+    sessoes = []
+    trava = threading.Lock()
+
+    def sessao_da_thread() -> requests.Session:
+        sessao = getattr(local, 'sessao', None)
+        if sessao is None:
+            sessao = local.sessao = criar_sessao()
+            with trava:
+                sessoes.append(sessao)
+        return sessao
+
+    def executar(funcao) -> ResultadoBusca:
+        inicio = time.perf_counter()
+        try:
+            valor = funcao(sessao_da_thread())
+            return ResultadoBusca(valor=valor, latencia_ms=(time.perf_counter() - inicio) * 1000)
+        except Exception as e:
+            return ResultadoBusca(erro=e, latencia_ms=(time.perf_counter() - inicio) * 1000)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concorrencia)) as executor:
+            futuros = {chave: executor.submit(executar, funcao) for chave, funcao in tarefas.items()}
+            return {chave: futuro.result() for chave, futuro in futuros.items()}
+    finally:
+        for sessao in sessoes:
+            sessao.close()
@@ -0,0 +1,153 @@
+"""
+Delta entre Payloads do Mapa Waze
+=================================
+
+Calcula as diferenças (adicionados / alterados / removidos) entre dois
+payloads do mapa Waze (ver IntegradorWaze.montar_dados_mapa), usando o
+'id' de cada item: id da irregularidade, id da route ou uuid do alerta.
+
+O delta é gravado em cada SnapshotMobilidade no momento da coleta, em
+relação ao snapshot anterior. Para atender ?since=<snapshot_id>, os
+deltas da cadeia são compostos em um único delta.
+
+Formato do delta:
+    {
+        'adicionados': {'congestionamentos': ['123', ...], ...},
+        'alterados':   {'alertas': ['uuid', ...], ...},
+        'removidos':   {'interdicoes': ['456', ...], ...},
+    }
+"""
+
+import hashlib
+import json
+from typing import Dict, Iterable
+
+CATEGORIAS_MAPA = (
+    'congestionamentos',
+    'interdicoes',
+    'eventos',
+    'rotas_transito',
+    'alertas',
+)
+
+_ADICIONADO = 'adicionados'
+_ALTERADO = 'alterados'
+_REMOVIDO = 'removidos'
+
+
+def assinar_payload(payload: Dict) -> Dict[str, Dict[str, str]]:
+    """
+    Calcula o hash de conteúdo de cada item do payload
+
+    Returns:
+        Dict {categoria: {id: hash}}
+    """
+    assinaturas = {}
+    for categoria in CATEGORIAS_MAPA:
+        itens = {}
+        for item in payload.get(categoria, []):
+            conteudo = json.dumps(item, sort_keys=True, separators=(',', ':'), default=str)
+            itens[str(item.get('id', ''))] = hashlib.blake2b(
+                conteudo.encode('utf-8'), digest_size=8
+            ).hexdigest()
+        assinaturas[categoria] = itens
+    return assinaturas
+
+
+def calcular_delta(anterior: Dict[str, Dict[str, str]], atual: Dict[str, Dict[str, str]]) -> Dict:
+    """
+    Compara as assinaturas de dois payloads
+
+    Args:
+        anterior: assinar_payload() do payload anterior
+        atual: assinar_payload() do payload atual
+
+    Returns:
+        Delta (apenas categorias com mudanças)
+    """
+    delta = {_ADICIONADO: {}, _ALTERADO: {}, _REMOVIDO: {}}
+
+    for categoria in CATEGORIAS_MAPA:
+        antes = anterior.get(categoria, {})
+        depois = atual.get(categoria, {})
+
+        adicionados = [i for i in depois if i not in antes]
+        alterados = [i for i, h in depois.items() if i in antes and antes[i] != h]
+        removidos = [i for i in antes if i not in depois]
+
+        if adicionados:
+            delta[_ADICIONADO][categoria] = adicionados
+        if alterados:
+            delta[_ALTERADO][categoria] = alterados
+        if removidos:
+            delta[_REMOVIDO][categoria] = removidos
+
+    return delta
+
+
+def compor_deltas(deltas: Iterable[Dict]) -> Dict:
+    """
+    Compõe uma sequência de deltas (do mais antigo para o mais novo)
+
+    Regras por item:
+        adicionado + alterado = adicionado
+        adicionado + removido = (nada)
+        alterado   + removido = removido
+        removido   + adicionado = alterado
+    """
+    estado = {}
+
+    for delta in deltas:
+        for operacao in (_REMOVIDO, _ADICIONADO, _ALTERADO):
+            for categoria, ids in (delta.get(operacao) or {}).items():
+                for item_id in ids:
+                    chave = (categoria, item_id)
+                    anterior = estado.get(chave)
+
+                    if operacao == _REMOVIDO:
+                        if anterior == _ADICIONADO:
+                            del estado[chave]
+                        else:
+                            estado[chave] = _REMOVIDO
+                    elif operacao == _ADICIONADO:
+                        estado[chave] = _ALTERADO if anterior == _REMOVIDO else _ADICIONADO
+                    elif anterior != _ADICIONADO:
+                        estado[chave] = _ALTERADO
+
+    resultado = {_ADICIONADO: {}, _ALTERADO: {}, _REMOVIDO: {}}
+    for (categoria, item_id), operacao in estado.items():
+        resultado[operacao].setdefault(categoria, []).append(item_id)
+    return resultado
+
+
+def aplicar_filtro_delta(payload: Dict, delta: Dict) -> Dict:
+    """
+    Reduz o payload completo aos itens adicionados/alterados do delta
+
+    Returns:
+        Dict com as mesmas categorias do payload (só itens novos ou
+        alterados), 'removidos' por categoria e as estatísticas completas
+    """
+    resultado = {}
+    for categoria in CATEGORIAS_MAPA:
+        ids = set(delta.get(_ADICIONADO, {}).get(categoria, []))
+        ids.update(delta.get(_ALTERADO, {}).get(categoria, []))
+        resultado[categoria] = [
+            item for item in payload.get(categoria, [])
+            if str(item.get('id', '')) in ids
+        ] if ids else []
+
+    resultado['removidos'] = {
+        categoria: list(ids) for categoria, ids in delta.get(_REMOVIDO, {}).items()
+    }
+    resultado['estatisticas'] = payload.get('estatisticas', {})
+    return resultado
+
+
+def resumo_delta(delta: Dict) -> Dict[str, int]:
+    """Contagem de itens por operação (para logs)"""
+    return {
+        operacao: sum(len(ids) for ids in (delta.get(operacao) or {}).values())
+        for operacao in (_ADICIONADO, _ALTERADO, _REMOVIDO)
+    }
+
@@ -0,0 +1,286 @@
+"""
+Filtro Espacial para as Camadas do Mapa
+=======================================
+
+Recorte por janela do mapa (viewport) comum a todas as APIs de camadas
+(Waze, ocorrências, eventos, sirenes, câmeras), para o Leaflet carregar
+apenas a área visível e cachear tiles.
+
+Parâmetros aceitos na requisição:
+    bbox=oeste,sul,leste,norte   (graus, WGS84 - map.getBounds().toBBoxString())
+    tile=z/x/y                   (tile XYZ / Web Mercator, como no Leaflet)
+
+Coordenadas em (x, y) = (longitude, latitude), como nos payloads do
+Waze e no GeoJSON.
+
+Exemplo:
+    limites = limites_da_requisicao(request)
+    if limites:
+        queryset = filtrar_queryset(queryset, limites)
+"""
+
+import math
+from functools import wraps
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# Margem (em graus, ~100 m) para não cortar itens na borda do tile
+MARGEM_TILE = 0.001
+
+# Tempo de cache (segundos) das respostas por tile
+CACHE_TILE_SEGUNDOS = 60
+
+ZOOM_MAXIMO_TILE = 22
+
+# Categorias do payload do mapa Waze
+_CATEGORIAS_LINHA = ('congestionamentos', 'interdicoes', 'eventos', 'rotas_transito')
+
+
+class LimitesMapa:
+    """Retângulo (oeste, sul, leste, norte) em graus"""
+
+    def __init__(self, oeste: float, sul: float, leste: float, norte: float, tile: Optional[tuple] = None):
+        self.oeste = oeste
+        self.sul = sul
+        self.leste = leste
+        self.norte = norte
+        self.tile = tile
+
+    def __repr__(self):
+        return f'LimitesMapa({self.oeste}, {self.sul}, {self.leste}, {self.norte})'
+
+    @property
+    def chave(self) -> str:
+        """Identificador estável (usado em ETags)"""
+        if self.tile:
+            return '{}/{}/{}'.format(*self.tile)
+        return f'{self.oeste:.5f},{self.sul:.5f},{self.leste:.5f},{self.norte:.5f}'
+
+    def como_dict(self) -> Dict:
+        resultado = {
+            'oeste': self.oeste,
+            'sul': self.sul,
+            'leste': self.leste,
+            'norte': self.norte,
+        }
+        if self.tile:
+            resultado['tile'] = self.chave
+        return resultado
+
+    def contem(self, lon, lat) -> bool:
+        if lon is None or lat is None:
+            return False
+        return self.oeste <= lon <= self.leste and self.sul <= lat <= self.norte
+
+    def intersecta(self, oeste: float, sul: float, leste: float, norte: float) -> bool:
+        return not (leste < self.oeste or oeste > self.leste or norte < self.sul or sul > self.norte)
+
+    def intersecta_linha(self, coords: Sequence[Sequence[float]]) -> bool:
+        """Testa se o retângulo envolvente da linha intersecta os limites"""
+        xs = [p[0] for p in coords if p and p[0] is not None]
+        ys = [p[1] for p in coords if p and p[1] is not None]
+        if not xs or not ys:
+            return False
+        return self.intersecta(min(xs), min(ys), max(xs), max(ys))
+
+
+def limites_do_tile(z: int, x: int, y: int, margem: float = MARGEM_TILE) -> LimitesMapa:
+    """
+    Converte um tile XYZ (Web Mercator) nos limites em graus
+
+    Raises:
+        ValueError: Tile fora do intervalo válido para o zoom
+    """
+    if not 0 <= z <= ZOOM_MAXIMO_TILE:
+        raise ValueError(f'Zoom de tile invalido: {z}')
+    n = 2 ** z
+    if not (0 <= x < n and 0 <= y < n):
+        raise ValueError(f'Tile fora do intervalo: {z}/{x}/{y}')
+
+    def _lon(coluna):
+        return coluna / n * 360.0 - 180.0
+
+    def _lat(linha):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * linha / n))))
+
+    return LimitesMapa(
+        oeste=_lon(x) - margem,
+        sul=_lat(y + 1) - margem,
+        leste=_lon(x + 1) + margem,
+        norte=_lat(y) + margem,
+        tile=(z, x, y),
+    )
+
+
+def limites_do_bbox(bbox: str) -> LimitesMapa:
+    """
+    Converte 'oeste,sul,leste,norte' nos limites
+
+    Raises:
+        ValueError: Formato inválido
+    """
+    partes = [p.strip() for p in bbox.split(',')]
+    if len(partes) != 4:
+        raise ValueError('bbox deve ter 4 valores: oeste,sul,leste,norte')
+
+    oeste, sul, leste, norte = (float(p) for p in partes)
+    if oeste > leste or sul > norte:
+        raise ValueError('bbox invalido: oeste > leste ou sul > norte')
+    return LimitesMapa(oeste, sul, leste, norte)
+
+
+def limites_da_requisicao(request) -> Optional[LimitesMapa]:
+    """
+    Lê ?bbox= ou ?tile=z/x/y da requisição
+
+    Returns:
+        LimitesMapa ou None se nenhum recorte foi pedido
+
+    Raises:
+        ValueError: Parâmetro informado com formato inválido
+    """
+    tile = request.GET.get('tile')
+    if tile:
+        try:
+            z, x, y = (int(p) for p in tile.strip('/').split('/'))
+        except ValueError:
+            raise ValueError('tile deve estar no formato z/x/y')
+        return limites_do_tile(z, x, y)
+
+    bbox = request.GET.get('bbox')
+    if bbox:
+        return limites_do_bbox(bbox)
+
+    return None
+
+
+def filtrar_queryset(queryset, limites: LimitesMapa, campo_lat: str = 'latitude', campo_lon: str = 'longitude'):
+    """Aplica o recorte como filtro de intervalo no banco"""
+    return queryset.filter(**{
+        f'{campo_lat}__range': (limites.sul, limites.norte),
+        f'{campo_lon}__range': (limites.oeste, limites.leste),
+    })
+
+
+def filtrar_pontos(itens: Iterable[Dict], limites: LimitesMapa, campo_lat: str = 'lat', campo_lon: str = 'lng') -> List[Dict]:
+    """Mantém apenas os itens (dicts) cujo ponto está dentro dos limites"""
+    resultado = []
+    for item in itens:
+        try:
+            lat = float(item.get(campo_lat))
+            lon = float(item.get(campo_lon))
+        except (TypeError, ValueError):
+            continue
+        if limites.contem(lon, lat):
+            resultado.append(item)
+    return resultado
+
+
+def filtrar_payload_waze(payload: Dict, limites: LimitesMapa) -> Dict:
+    """
+    Recorta o payload do mapa Waze (montar_dados_mapa)
+
+    Linhas são mantidas quando o retângulo envolvente intersecta os
+    limites; alertas, quando o ponto está dentro. As estatísticas
+    continuam sendo as da cidade inteira.
+    """
+    resultado = dict(payload)
+
+    for categoria in _CATEGORIAS_LINHA:
+        if categoria in payload:
+            resultado[categoria] = [
+                item for item in payload[categoria]
+                if limites.intersecta_linha(item.get('coordinates') or [])
+            ]
+
+    if 'alertas' in payload:
+        resultado['alertas'] = filtrar_pontos(payload['alertas'], limites, campo_lat='lat', campo_lon='lon')
+
+    resultado['bbox'] = limites.como_dict()
+    return resultado
+
+
+def _limites_geometria(geometria: Dict) -> Optional[tuple]:
+    """Retângulo envolvente (oeste, sul, leste, norte) de uma geometria GeoJSON"""
+    if not isinstance(geometria, dict):
+        return None
+
+    if geometria.get('type') == 'GeometryCollection':
+        caixas = [c for c in map(_limites_geometria, geometria.get('geometries', [])) if c]
+        if not caixas:
+            return None
+        return (
+            min(c[0] for c in caixas), min(c[1] for c in caixas),
+            max(c[2] for c in caixas), max(c[3] for c in caixas),
+        )
+
+    xs, ys = [], []
+    pilha = [geometria.get('coordinates')]
+    while pilha:
+        atual = pilha.pop()
+        if not isinstance(atual, (list, tuple)) or not atual:
+            continue
+        if isinstance(atual[0], (int, float)):
+            if len(atual) >= 2:
+                xs.append(atual[0])
+                ys.append(atual[1])
+        else:
+            pilha.extend(atual)
+
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def limites_geojson(objeto: Dict) -> Optional[tuple]:
+    """Retângulo envolvente (oeste, sul, leste, norte) de uma Feature, FeatureCollection ou geometria"""
+    if not isinstance(objeto, dict):
+        return None
+
+    tipo = objeto.get('type')
+    if tipo == 'Feature':
+        return _limites_geometria(objeto.get('geometry'))
+    if tipo == 'FeatureCollection':
+        return _limites_geometria({
+            'type': 'GeometryCollection',
+            'geometries': [f.get('geometry') for f in objeto.get('features', []) if isinstance(f, dict)],
+        })
+    return _limites_geometria(objeto)
+
+
+def filtrar_geojson(objeto: Dict, limites: LimitesMapa) -> Dict:
+    """Mantém as features de uma FeatureCollection que intersectam os limites"""
+    if not isinstance(objeto, dict) or objeto.get('type') != 'FeatureCollection':
+        return objeto
+
+    features = []
+    for feature in objeto.get('features', []):
+        caixa = _limites_geometria(feature.get('geometry'))
+        if caixa and limites.intersecta(*caixa):
+            features.append(feature)
+
+    return {**objeto, 'features': features, 'bbox': [limites.oeste, limites.sul, limites.leste, limites.norte]}
+
+
+def cache_de_tile(segundos: int = CACHE_TILE_SEGUNDOS):
+    """
+    Decorator: respostas 200 pedidas com ?tile= ficam cacheáveis no
+    navegador por alguns segundos (sobrepõe o never_cache da view)
+
+    Deve ficar acima do @never_cache:
+
+        @cache_de_tile()
+        @never_cache
+        def api_camada(request): ...
+    """
+    def decorator(view):
+        @wraps(view)
+        def _view(request, *args, **kwargs):
+            resposta = view(request, *args, **kwargs)
+            if request.GET.get('tile') and resposta.status_code == 200:
+                resposta['Cache-Control'] = f'private, max-age={segundos}'
+                if 'Expires' in resposta:
+                    del resposta['Expires']
+                resposta['Vary'] = 'Cookie, Accept-Encoding'
+            return resposta
+        return _view
+    return decorator
@@ -0,0 +1,508 @@
+"""
+Simplificação de Geometrias para o Mapa
+=======================================
+
+Reduz o tamanho das geometrias enviadas ao mapa (Leaflet) de acordo com
+o nível de zoom:
+
+    - Douglas–Peucker com tolerância por faixa de zoom
+    - Quantização das coordenadas (5 ou 6 casas decimais)
+    - Opcionalmente, polyline codificada (Google Encoded Polyline), sempre
+      com precisão 5 (padrão dos decodificadores); as 6 casas da banda
+      'alto' valem só para 'coordinates'
+
+As coordenadas seguem o formato usado nos payloads do Waze e no GeoJSON:
+(x, y) = (longitude, latitude).
+
+Faixas de zoom:
+    baixo  (zoom <= 12): tolerância ~30 m, 5 casas
+    medio  (13 a 15):    tolerância ~5 m,  5 casas
+    alto   (zoom >= 16): tolerância ~1 m,  6 casas
+
+Exemplo:
+    banda = banda_para_zoom(request.GET.get('zoom'))
+    if banda:
+        payload = simplificar_payload(payload, banda)
+
+Também empacota linhas (trechos de Logradouro) em bytes compactos:
+    '<I' quantidade de partes, '<I' vértices de cada parte e os vértices
+    (x, y) em int32 com FATOR_EMPACOTAMENTO (1e-7 grau, ~1 cm).
+Os polígonos das áreas de observação usam o mesmo esquema, com um nível
+a mais de contagens (anéis por polígono).
+"""
+
+import json
+import math
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# banda: (zoom máximo, tolerância em graus, casas decimais)
+BANDAS_ZOOM = {
+    'baixo': (12, 0.0003, 5),
+    'medio': (15, 0.00005, 5),
+    'alto': (99, 0.00001, 6),
+}
+
+# Casas decimais das polylines codificadas (padrão de polyline.js / Leaflet.PolylineUtil)
+PRECISAO_POLYLINE = 5
+
+# Categorias do payload do mapa que possuem 'coordinates' (polylines)
+_CATEGORIAS_LINHA = ('congestionamentos', 'interdicoes', 'eventos', 'rotas_transito')
+
+# Graus por unidade dos vértices empacotados (mesma precisão dos DecimalField de coordenadas)
+FATOR_EMPACOTAMENTO = 10_000_000
+
+
+def banda_para_zoom(zoom) -> Optional[str]:
+    """
+    Converte o parâmetro ?zoom= na faixa de simplificação
+
+    Returns:
+        Nome da banda ou None se o zoom não foi informado/é inválido
+    """
+    if zoom is None or zoom == '':
+        return None
+    try:
+        zoom = int(float(zoom))
+    except (TypeError, ValueError):
+        return None
+
+    for banda, (zoom_maximo, _, _) in BANDAS_ZOOM.items():
+        if zoom <= zoom_maximo:
+            return banda
+    return None
+
+
+def simplificar_linha(coords: Sequence[Sequence[float]], tolerancia: float) -> List[Tuple[float, float]]:
+    """
+    Simplifica uma polyline com Douglas–Peucker (iterativo)
+
+    Args:
+        coords: Lista de pontos (x, y)
+        tolerancia: Distância máxima (em graus) de um ponto removido à reta
+
+    Returns:
+        Lista de tuplas (x, y) mantendo o primeiro e o último ponto
+    """
+    total = len(coords)
+    if total <= 2 or tolerancia <= 0:
+        return [(p[0], p[1]) for p in coords]
+
+    manter = [False] * total
+    manter[0] = manter[-1] = True
+    tolerancia_2 = tolerancia * tolerancia
+
+    pilha = [(0, total - 1)]
+    while pilha:
+        inicio, fim = pilha.pop()
+        x1, y1 = coords[inicio][0], coords[inicio][1]
+        x2, y2 = coords[fim][0], coords[fim][1]
+        dx, dy = x2 - x1, y2 - y1
+        comprimento_2 = dx * dx + dy * dy
+
+        maior, indice_maior = -1.0, -1
+        for i in range(inicio + 1, fim):
+            px, py = coords[i][0], coords[i][1]
+            if comprimento_2 == 0:
+                distancia_2 = (px - x1) ** 2 + (py - y1) ** 2
+            else:
+                t = ((px - x1) * dx + (py - y1) * dy) / comprimento_2
+                t = 0.0 if t < 0 else 1.0 if t > 1 else t
+                distancia_2 = (px - x1 - t * dx) ** 2 + (py - y1 - t * dy) ** 2
+            if distancia_2 > maior:
+                maior, indice_maior = distancia_2, i
+
+        if indice_maior >= 0 and maior > tolerancia_2:
+            manter[indice_maior] = True
+            pilha.append((inicio, indice_maior))
+            pilha.append((indice_maior, fim))
+
+    return [(coords[i][0], coords[i][1]) for i in range(total) if manter[i]]
+
+
+def quantizar_linha(coords: Sequence[Sequence[float]], casas: int) -> List[Tuple[float, float]]:
+    """Arredonda as coordenadas e remove pontos consecutivos repetidos"""
+    resultado = []
+    for ponto in coords:
+        atual = (round(ponto[0], casas), round(ponto[1], casas))
+        if not resultado or resultado[-1] != atual:
+            resultado.append(atual)
+
+    # Linha degenerada após arredondar: manter início e fim
+    if len(resultado) == 1 and len(coords) > 1:
+        resultado.append(resultado[0])
+    return resultado
+
+
+def simplificar_coordenadas(coords: Sequence[Sequence[float]], banda: str) -> List[Tuple[float, float]]:
+    """Douglas–Peucker + quantização conforme a banda de zoom"""
+    _, tolerancia, casas = BANDAS_ZOOM[banda]
+    return quantizar_linha(simplificar_linha(coords, tolerancia), casas)
+
+
+def codificar_polyline(coords: Sequence[Sequence[float]], precisao: int = PRECISAO_POLYLINE) -> str:
+    """
+    Codifica pontos (x, y) no formato Google Encoded Polyline
+
+    A string resultante segue a ordem padrão do formato (lat, lng),
+    compatível com Leaflet.PolylineUtil / polyline.js.
+    """
+    fator = 10 ** precisao
+    partes = []
+    lat_anterior = lng_anterior = 0
+
+    for ponto in coords:
+        lat = int(round(ponto[1] * fator))
+        lng = int(round(ponto[0] * fator))
+        for valor in (lat - lat_anterior, lng - lng_anterior):
+            valor = ~(valor << 1) if valor < 0 else (valor << 1)
+            while valor >= 0x20:
+                partes.append(chr((0x20 | (valor & 0x1f)) + 63))
+                valor >>= 5
+            partes.append(chr(valor + 63))
+        lat_anterior, lng_anterior = lat, lng
+
+    return ''.join(partes)
+
+
+def simplificar_payload(payload: Dict, banda: str, codificar: bool = False) -> Dict:
+    """
+    Aplica a simplificação ao payload do mapa Waze (montar_dados_mapa)
+
+    Args:
+        payload: Payload completo (não é alterado)
+        banda: Banda de zoom (ver BANDAS_ZOOM)
+        codificar: Substitui 'coordinates' por 'polyline' codificada
+            (precisão PRECISAO_POLYLINE, independente da banda)
+
+    Returns:
+        Novo dict com as geometrias simplificadas
+    """
+    _, _, casas = BANDAS_ZOOM[banda]
+    resultado = dict(payload)
+
+    for categoria in _CATEGORIAS_LINHA:
+        if categoria not in payload:
+            continue
+        itens = []
+        for item in payload[categoria]:
+            item = dict(item)
+            coords = simplificar_coordenadas(item.get('coordinates') or [], banda)
+            if codificar:
+                item.pop('coordinates', None)
+                item['polyline'] = codificar_polyline(coords, PRECISAO_POLYLINE)
+            else:
+                item['coordinates'] = coords
+            itens.append(item)
+        resultado[categoria] = itens
+
+    if 'alertas' in payload:
+        alertas = []
+        for alerta in payload['alertas']:
+            alerta = dict(alerta)
+            if alerta.get('lat') is not None:
+                alerta['lat'] = round(alerta['lat'], casas)
+            if alerta.get('lon') is not None:
+                alerta['lon'] = round(alerta['lon'], casas)
+            alertas.append(alerta)
+        resultado['alertas'] = alertas
+
+    return resultado
+
+
+def simplificar_jams(jams: List[Dict], banda: str, codificar: bool = False) -> List[Dict]:
+    """Aplica a simplificação à lista de obter_jams_para_mapa"""
+    return simplificar_payload({'congestionamentos': jams}, banda, codificar)['congestionamentos']
+
+
+def _simplificar_anel(anel: Sequence[Sequence[float]], banda: str) -> List[List[float]]:
+    simplificado = simplificar_coordenadas(anel, banda)
+    # Um anel de polígono precisa de pelo menos 4 pontos (fechado)
+    if len(simplificado) < 4:
+        _, _, casas = BANDAS_ZOOM[banda]
+        simplificado = quantizar_linha(anel, casas)
+    return [list(p) for p in simplificado]
+
+
+def simplificar_geometria(geometria: Dict, banda: str) -> Dict:
+    """
+    Simplifica uma geometria GeoJSON (Point, LineString, Polygon e Multi*)
+
+    Returns:
+        Nova geometria; tipos desconhecidos são devolvidos sem alteração
+    """
+    if not isinstance(geometria, dict):
+        return geometria
+
+    tipo = geometria.get('type')
+    coords = geometria.get('coordinates')
+    _, _, casas = BANDAS_ZOOM[banda]
+
+    try:
+        if tipo == 'Point':
+            novas = [round(coords[0], casas), round(coords[1], casas), *coords[2:]]
+        elif tipo == 'MultiPoint':
+            novas = [[round(p[0], casas), round(p[1], casas)] for p in coords]
+        elif tipo == 'LineString':
+            novas = [list(p) for p in simplificar_coordenadas(coords, banda)]
+        elif tipo == 'MultiLineString':
+            novas = [[list(p) for p in simplificar_coordenadas(linha, banda)] for linha in coords]
+        elif tipo == 'Polygon':
+            novas = [_simplificar_anel(anel, banda) for anel in coords]
+        elif tipo == 'MultiPolygon':
+            novas = [[_simplificar_anel(anel, banda) for anel in poligono] for poligono in coords]
+        elif tipo == 'GeometryCollection':
+            return {
+                **geometria,
+                'geometries': [simplificar_geometria(g, banda) for g in geometria.get('geometries', [])],
+            }
+        else:
+            return geometria
+    except (TypeError, IndexError):
+        return geometria
+
+    return {**geometria, 'coordinates': novas}
+
+
+def simplificar_geojson(objeto: Dict, banda: str) -> Dict:
+    """Simplifica FeatureCollection, Feature ou geometria GeoJSON"""
+    if not isinstance(objeto, dict):
+        return objeto
+
+    tipo = objeto.get('type')
+    if tipo == 'FeatureCollection':
+        return {**objeto, 'features': [simplificar_geojson(f, banda) for f in objeto.get('features', [])]}
+    if tipo == 'Feature':
+        return {**objeto, 'geometry': simplificar_geometria(objeto.get('geometry'), banda)}
+    return simplificar_geometria(objeto, banda)
+
+
+# ========================================
+# LINHAS EMPACOTADAS (trechos de logradouros)
+# ========================================
+
+def empacotar_linhas(partes: Sequence[Sequence[Sequence[float]]]) -> Optional[bytes]:
+    """
+    Empacota uma linha ou multilinha [[(x, y), ...], ...] em bytes
+
+    Partes com menos de 2 pontos são descartadas; sem partes válidas
+    retorna None.
+    """
+    partes = [parte for parte in partes if len(parte) >= 2]
+    if not partes:
+        return None
+
+    inteiros = []
+    for parte in partes:
+        for ponto in parte:
+            inteiros.append(int(round(ponto[0] * FATOR_EMPACOTAMENTO)))
+            inteiros.append(int(round(ponto[1] * FATOR_EMPACOTAMENTO)))
+
+    contagens = [len(parte) for parte in partes]
+    return (
+        struct.pack(f'<{len(contagens) + 1}I', len(contagens), *contagens)
+        + struct.pack(f'<{len(inteiros)}i', *inteiros)
+    )
+
+
+def desempacotar_linhas(dados: bytes) -> List[List[Tuple[float, float]]]:
+    """Inverso de empacotar_linhas: lista de partes com pontos (x, y)"""
+    if not dados:
+        return []
+    dados = bytes(dados)
+
+    (quantidade,) = struct.unpack_from('<I', dados, 0)
+    contagens = struct.unpack_from(f'<{quantidade}I', dados, 4)
+    inteiros = struct.unpack_from(f'<{sum(contagens) * 2}i', dados, 4 * (quantidade + 1))
+
+    partes = []
+    posicao = 0
+    for contagem in contagens:
+        fim = posicao + contagem * 2
+        partes.append([
+            (inteiros[i] / FATOR_EMPACOTAMENTO, inteiros[i + 1] / FATOR_EMPACOTAMENTO)
+            for i in range(posicao, fim, 2)
+        ])
+        posicao = fim
+    return partes
+
+
+def ler_linhas(valor) -> List[List[Tuple[float, float]]]:
+    """
+    Lê LineString/MultiLineString em WKT, GeoJSON (texto ou dict)
+
+    Coordenadas fora de longitude/latitude (ex.: UTM) são rejeitadas.
+
+    Returns:
+        Lista de partes [(x, y), ...]; vazia se o valor não é uma linha válida
+    """
+    if not valor:
+        return []
+
+    if isinstance(valor, str):
+        texto = valor.strip()
+        if texto.startswith('{'):
+            try:
+                valor = json.loads(texto)
+            except ValueError:
+                return []
+        else:
+            from shapely import wkt
+            from shapely.errors import ShapelyError
+
+            try:
+                geometria = wkt.loads(texto)
+            except (ShapelyError, ValueError):
+                return []
+            if geometria.geom_type == 'LineString':
+                valor = {'type': 'LineString', 'coordinates': list(geometria.coords)}
+            elif geometria.geom_type == 'MultiLineString':
+                valor = {'type': 'MultiLineString', 'coordinates': [list(g.coords) for g in geometria.geoms]}
+            else:
+                return []
+
+    if not isinstance(valor, dict):
+        return []
+    if valor.get('type') == 'Feature':
+        valor = valor.get('geometry') or {}
+
+    tipo = valor.get('type')
+    coords = valor.get('coordinates') or []
+    if tipo == 'LineString':
+        coords = [coords]
+    elif tipo != 'MultiLineString':
+        return []
+
+    try:
+        partes = [[(float(p[0]), float(p[1])) for p in parte] for parte in coords]
+    except (TypeError, ValueError, IndexError):
+        return []
+
+    for parte in partes:
+        for x, y in parte:
+            if not (-180 <= x <= 180 and -90 <= y <= 90):
+                return []
+    return [parte for parte in partes if len(parte) >= 2]
+
+
+def ponto_medio_linhas(partes: Sequence[Sequence[Sequence[float]]]) -> Optional[Tuple[float, float]]:
+    """Ponto (x, y) na metade do comprimento da maior parte"""
+    melhor, maior = None, -1.0
+    for parte in partes:
+        comprimento = sum(math.dist(parte[i], parte[i + 1]) for i in range(len(parte) - 1))
+        if comprimento > maior:
+            melhor, maior = parte, comprimento
+    if not melhor:
+        return None
+
+    restante = maior / 2
+    for i in range(len(melhor) - 1):
+        segmento = math.dist(melhor[i], melhor[i + 1])
+        if segmento >= restante and segmento > 0:
+            t = restante / segmento
+            return (
+                melhor[i][0] + (melhor[i + 1][0] - melhor[i][0]) * t,
+                melhor[i][1] + (melhor[i + 1][1] - melhor[i][1]) * t,
+            )
+        restante -= segmento
+    return (melhor[-1][0], melhor[-1][1])
+
+
+# ========================================
+# POLÍGONOS (áreas de observação)
+# ========================================
+
+def ler_poligonos(valor) -> List[List[List[Tuple[float, float]]]]:
+    """
+    Lê Polygon/MultiPolygon de um GeoJSON (Feature, geometria ou
+    GeometryCollection, como gravado nas áreas importadas de KML)
+
+    Altitude e coordenadas inválidas são descartadas; anéis com menos de
+    3 pontos são ignorados.
+
+    Returns:
+        Lista de polígonos [anel externo, buracos...], cada anel [(x, y), ...]
+    """
+    if not isinstance(valor, dict):
+        return []
+    if valor.get('type') == 'Feature':
+        valor = valor.get('geometry') or {}
+
+    tipo = valor.get('type')
+    if tipo == 'GeometryCollection':
+        poligonos = []
+        for geometria in valor.get('geometries') or []:
+            poligonos.extend(ler_poligonos(geometria))
+        return poligonos
+
+    coords = valor.get('coordinates') or []
+    if tipo == 'Polygon':
+        coords = [coords]
+    elif tipo != 'MultiPolygon':
+        return []
+
+    poligonos = []
+    for poligono in coords:
+        try:
+            aneis = [[(float(p[0]), float(p[1])) for p in anel] for anel in poligono]
+        except (TypeError, ValueError, IndexError):
+            continue
+        aneis = [anel for anel in aneis if len(anel) >= 3]
+        if aneis:
+            poligonos.append(aneis)
+    return poligonos
+
+
+def empacotar_poligonos(poligonos: Sequence[Sequence[Sequence[Sequence[float]]]]) -> Optional[bytes]:
+    """
+    Empacota a saída de ler_poligonos em bytes
+
+    '<I' quantidade de polígonos, '<I' anéis de cada polígono, '<I'
+    vértices de cada anel e os vértices (x, y) em int32 com
+    FATOR_EMPACOTAMENTO. Sem polígonos retorna None.
+    """
+    if not poligonos:
+        return None
+
+    aneis = [anel for poligono in poligonos for anel in poligono]
+    inteiros = []
+    for anel in aneis:
+        for ponto in anel:
+            inteiros.append(int(round(ponto[0] * FATOR_EMPACOTAMENTO)))
+            inteiros.append(int(round(ponto[1] * FATOR_EMPACOTAMENTO)))
+
+    contagens = [len(poligonos)] + [len(poligono) for poligono in poligonos] + [len(anel) for anel in aneis]
+    return (
+        struct.pack(f'<{len(contagens)}I', *contagens)
+        + struct.pack(f'<{len(inteiros)}i', *inteiros)
+    )
+
+
+def desempacotar_poligonos(dados: bytes) -> List[List[List[Tuple[float, float]]]]:
+    """Inverso de empacotar_poligonos: mesmo formato de ler_poligonos"""
+    if not dados:
+        return []
+    dados = bytes(dados)
+
+    (quantidade,) = struct.unpack_from('<I', dados, 0)
+    por_poligono = struct.unpack_from(f'<{quantidade}I', dados, 4)
+    posicao = 4 * (quantidade + 1)
+    por_anel = struct.unpack_from(f'<{sum(por_poligono)}I', dados, posicao)
+    posicao += 4 * len(por_anel)
+    inteiros = struct.unpack_from(f'<{sum(por_anel) * 2}i', dados, posicao)
+
+    poligonos = []
+    anel_atual = 0
+    vertice = 0
+    for total_aneis in por_poligono:
+        aneis = []
+        for contagem in por_anel[anel_atual:anel_atual + total_aneis]:
+            fim = vertice + contagem * 2
+            aneis.append([
+                (inteiros[i] / FATOR_EMPACOTAMENTO, inteiros[i + 1] / FATOR_EMPACOTAMENTO)
+                for i in range(vertice, fim, 2)
+            ])
+            vertice = fim
+        anel_atual += total_aneis
+        poligonos.append(aneis)
+    return poligonos
@@ -0,0 +1,305 @@
+"""
+Histórico de Congestionamentos por Trecho e Hora
+================================================
+
+Mantém CongestionamentoViaHora, o acumulado por trecho oficial × hora dos
+registros de CongestionamentoVia (quantidade, pior jam_level e
+criticidade, extensão e atraso totais, velocidade média). Cada
+processamento de congestionamentos lê e grava apenas as linhas das horas
+da coleta, sem varrer o histórico bruto.
+
+Congestionamentos sem logradouro são acumulados por nome do Waze
+(chave "waze:<nome>"), para que também apareçam nos rankings.
+
+Exemplo:
+    atualizar_historico(cliente, congestionamentos)
+    ranking = ranking_vias(cliente, desde=timezone.now() - timedelta(days=7))
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+# Ordenações aceitas pelo ranking: {parâmetro: campos anotados}
+ORDENACOES = {
+    'atraso': ('-atraso_total', '-registros'),
+    'extensao': ('-extensao_total', '-registros'),
+    'horas': ('-horas', '-atraso_total'),
+    'registros': ('-registros', '-atraso_total'),
+    'criticidade': ('-nivel_criticidade_max', '-jam_level_max', '-atraso_total'),
+}
+
+MAXIMO_RANKING = 200
+
+# Nível mínimo (índice em CRITICIDADE_CHOICES) dos congestionamentos críticos
+NIVEL_CRITICO_MINIMO = 2
+
+
+def hora_do_registro(data_hora):
+    """Início da hora de data_hora no fuso local"""
+    return timezone.localtime(data_hora).replace(minute=0, second=0, microsecond=0)
+
+
+def chave_do_congestionamento(congestionamento) -> str:
+    """cod_trecho do logradouro vinculado ou o nome do Waze sem match"""
+    if congestionamento.logradouro_id:
+        return str(congestionamento.logradouro_id)
+    return f'waze:{congestionamento.via_nome_waze}'[:310]
+
+
+def atualizar_historico(cliente, congestionamentos: Iterable) -> Dict[str, int]:
+    """
+    Inclui registros de CongestionamentoVia no histórico por hora
+
+    Args:
+        cliente: Cliente dos registros
+        congestionamentos: CongestionamentoVia já com criticidade calculada
+
+    Returns:
+        Dict com 'atualizadas' e 'criadas'
+    """
+    from ..models import CongestionamentoViaHora
+
+    grupos = {}
+    for congestionamento in congestionamentos:
+        chave = (chave_do_congestionamento(congestionamento), hora_do_registro(congestionamento.data_hora))
+        grupos.setdefault(chave, []).append(congestionamento)
+
+    if not grupos:
+        return {'atualizadas': 0, 'criadas': 0}
+
+    existentes = {
+        (linha.chave_via, linha.hora): linha
+        for linha in CongestionamentoViaHora.objects.filter(
+            cliente=cliente,
+            hora__in={hora for _, hora in grupos},
+            chave_via__in={chave for chave, _ in grupos},
+        )
+    }
+
+    linhas = []
+    criadas = 0
+    for (chave, hora), registros in grupos.items():
+        linha = existentes.get((chave, hora))
+        if linha is None:
+            linha = CongestionamentoViaHora(
+                cliente=cliente,
+                logradouro_id=registros[0].logradouro_id,
+                chave_via=chave,
+                hora=hora,
+            )
+            criadas += 1
+        else:
+            # Regravada pelo upsert (conflito na chave única), não pelo id
+            linha.pk = None
+
+        for congestionamento in registros:
+            linha.registrar(congestionamento)
+        linhas.append(linha)
+
+    with transaction.atomic():
+        CongestionamentoViaHora.objects.bulk_create(
+            linhas,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['cliente', 'chave_via', 'hora'],
+            update_fields=[
+                'via_nome_waze', 'quantidade', 'jam_level_max', 'nivel_criticidade_max',
+                'extensao_total_metros', 'atraso_total_segundos', 'soma_velocidade_kmh',
+                'amostras_velocidade', 'maior_deficit_percentual', 'latitude', 'longitude',
+                'match_score', 'match_metodo', 'ultima_ocorrencia',
+            ],
+        )
+
+    return {'atualizadas': len(linhas) - criadas, 'criadas': criadas}
+
+
+def reconstruir_historico(cliente, desde, ate=None, tamanho_lote: int = 5000) -> Dict[str, int]:
+    """
+    Refaz o histórico a partir de CongestionamentoVia
+
+    Apaga as horas de [desde, ate) e acumula de novo os registros brutos
+    do período, em lotes. Usado para a carga inicial e depois de
+    correções em lote dos registros (ex.: vincular_trechos).
+
+    Returns:
+        Dict com 'registros', 'linhas' e 'removidas'
+    """
+    from ..models import CongestionamentoVia, CongestionamentoViaHora
+
+    inicio = hora_do_registro(desde)
+    brutos = CongestionamentoVia.objects.filter(cliente=cliente, data_hora__gte=inicio)
+    antigas = CongestionamentoViaHora.objects.filter(cliente=cliente, hora__gte=inicio)
+    if ate is not None:
+        brutos = brutos.filter(data_hora__lt=ate)
+        antigas = antigas.filter(hora__lt=ate)
+
+    with transaction.atomic():
+        removidas, _ = antigas.delete()
+
+        registros = 0
+        lote = []
+        for congestionamento in brutos.order_by('data_hora').iterator(chunk_size=tamanho_lote):
+            lote.append(congestionamento)
+            if len(lote) >= tamanho_lote:
+                atualizar_historico(cliente, lote)
+                registros += len(lote)
+                lote = []
+        if lote:
+            atualizar_historico(cliente, lote)
+            registros += len(lote)
+
+        linhas = CongestionamentoViaHora.objects.filter(cliente=cliente, hora__gte=inicio).count()
+
+    return {'registros': registros, 'linhas': linhas, 'removidas': removidas}
+
+
+def _dados_oficiais(logradouro) -> Optional[Dict]:
+    if logradouro is None:
+        return None
+    return {
+        'nome_completo': logradouro.nome_completo,
+        'bairro': logradouro.bairro,
+        'hierarquia': logradouro.hierarquia,
+        'velocidade_regulamentada': logradouro.velocidade_regulamentada,
+        'tipo_trecho': logradouro.tipo_trecho,
+    }
+
+
+def congestionamentos_criticos(cliente, desde, limite: int = 10) -> List[Dict]:
+    """
+    Trechos com congestionamento moderado ou pior desde `desde`
+
+    Uma entrada por trecho (a hora mais grave), no formato de
+    IntegradorWaze.obter_congestionamentos_criticos: velocidade, atraso e
+    extensão são médias por registro da hora.
+    """
+    from ..models import CongestionamentoViaHora
+
+    linhas = CongestionamentoViaHora.objects.filter(
+        cliente=cliente,
+        hora__gte=hora_do_registro(desde),
+        ultima_ocorrencia__gte=desde,
+        nivel_criticidade_max__gte=NIVEL_CRITICO_MINIMO,
+    ).select_related('logradouro').order_by(
+        '-nivel_criticidade_max', '-jam_level_max', '-extensao_total_metros'
+    )
+
+    resultado = []
+    vistas = set()
+    for linha in linhas:
+        if linha.chave_via in vistas:
+            continue
+        vistas.add(linha.chave_via)
+
+        velocidade = linha.velocidade_media_kmh
+        resultado.append({
+            'via_waze': linha.via_nome_waze,
+            'cod_trecho': linha.logradouro_id,
+            'jam_level': linha.jam_level_max,
+            'velocidade_atual': round(velocidade, 2) if velocidade is not None else None,
+            'atraso_segundos': round(linha.atraso_total_segundos / linha.quantidade) if linha.quantidade else None,
+            'extensao_metros': round(linha.extensao_total_metros / linha.quantidade) if linha.quantidade else None,
+            'criticidade': linha.criticidade,
+            'percentual_deficit': linha.maior_deficit_percentual,
+            'latitude': float(linha.latitude) if linha.latitude is not None else None,
+            'longitude': float(linha.longitude) if linha.longitude is not None else None,
+            'match_score': linha.match_score,
+            'match_metodo': linha.match_metodo,
+            'registros_hora': linha.quantidade,
+            'oficial': _dados_oficiais(linha.logradouro),
+        })
+        if len(resultado) >= limite:
+            break
+
+    return resultado
+
+
+def historico_por_nome(cliente, nomes: Iterable[str], desde) -> Dict[str, Dict]:
+    """
+    Resumo do histórico dos nomes do Waze desde `desde`
+
+    Returns:
+        {via_nome_waze: {'horas', 'registros', 'jam_level_max', 'atraso_total_segundos'}}
+    """
+    from ..models import CongestionamentoViaHora
+
+    linhas = CongestionamentoViaHora.objects.filter(
+        cliente=cliente,
+        via_nome_waze__in=list(set(nomes)),
+        hora__gte=hora_do_registro(desde),
+    ).values('via_nome_waze').annotate(
+        horas=Count('hora', distinct=True),
+        registros=Sum('quantidade'),
+        jam_level_max=Max('jam_level_max'),
+        atraso_total_segundos=Sum('atraso_total_segundos'),
+    )
+
+    return {linha.pop('via_nome_waze'): linha for linha in linhas}
+
+
+def ranking_vias(cliente, desde, ate=None, limite: int = 20, ordenar: str = 'atraso') -> List[Dict]:
+    """
+    Trechos mais congestionados no período
+
+    Args:
+        cliente: Cliente
+        desde: Início do período
+        ate: Fim do período (padrão: agora)
+        limite: Quantidade de trechos (até MAXIMO_RANKING)
+        ordenar: Uma das chaves de ORDENACOES
+
+    Returns:
+        Lista de dicts, pior trecho primeiro
+    """
+    from ..models import CongestionamentoViaHora, Logradouro
+
+    if ordenar not in ORDENACOES:
+        raise ValueError(f"ordenar deve ser um de: {', '.join(ORDENACOES)}")
+
+    linhas = CongestionamentoViaHora.objects.filter(cliente=cliente, hora__gte=hora_do_registro(desde))
+    if ate is not None:
+        linhas = linhas.filter(hora__lt=ate)
+
+    agregados = list(
+        linhas.values('chave_via').annotate(
+            cod_trecho=Max('logradouro'),
+            via_nome_waze=Max('via_nome_waze'),
+            horas=Count('id'),
+            registros=Sum('quantidade'),
+            jam_level_max=Max('jam_level_max'),
+            nivel_criticidade_max=Max('nivel_criticidade_max'),
+            extensao_total=Sum('extensao_total_metros'),
+            atraso_total=Sum('atraso_total_segundos'),
+            soma_velocidade=Sum('soma_velocidade_kmh'),
+            amostras_velocidade=Sum('amostras_velocidade'),
+            ultima_ocorrencia=Max('ultima_ocorrencia'),
+        ).order_by(*ORDENACOES[ordenar])[:min(max(limite, 1), MAXIMO_RANKING)]
+    )
+
+    logradouros = Logradouro.objects.in_bulk(
+        {item['cod_trecho'] for item in agregados if item['cod_trecho']}
+    )
+    niveis = CongestionamentoViaHora.NIVEIS_CRITICIDADE
+
+    resultado = []
+    for posicao, item in enumerate(agregados, start=1):
+        amostras = item['amostras_velocidade']
+        resultado.append({
+            'posicao': posicao,
+            'via_waze': item['via_nome_waze'],
+            'cod_trecho': item['cod_trecho'],
+            'horas_congestionada': item['horas'],
+            'registros': item['registros'],
+            'jam_level_max': item['jam_level_max'],
+            'criticidade_max': niveis[item['nivel_criticidade_max']],
+            'extensao_total_km': round(item['extensao_total'] / 1000, 1),
+            'atraso_total_min': round(item['atraso_total'] / 60, 1),
+            'velocidade_media_kmh': round(item['soma_velocidade'] / amostras, 1) if amostras else None,
+            'ultima_ocorrencia': item['ultima_ocorrencia'].isoformat(),
+            'oficial': _dados_oficiais(logradouros.get(item['cod_trecho'])),
+        })
+
+    return resultado
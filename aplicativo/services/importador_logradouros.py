@@ -0,0 +1,409 @@
+"""
+Importador de Logradouros (Data.Rio)
+====================================
+
+Lê o CSV de logradouros em uma única passada e grava em lotes com upsert
+por cod_trecho:
+
+    - SQLite: INSERT ... ON CONFLICT (cod_trecho) DO UPDATE (executemany)
+    - PostgreSQL: COPY para uma tabela temporária e um único
+      INSERT ... SELECT ... ON CONFLICT por lote
+
+A geometria do trecho (coluna WKT/GeoJSON do CSV ou GeoJSON separado do
+Data.Rio, ver carregar_geometrias_geojson) é gravada empacotada em
+Logradouro.geometria; sem latitude/longitude no CSV, o ponto médio da
+linha vira o centroide do trecho.
+
+Cada linha gravada leva o hash do seu conteúdo (Logradouro.hash_conteudo).
+As linhas iguais às do banco são descartadas antes de chegar a ele, então
+a atualização mensal grava apenas o que mudou. Cada lote é uma transação
+curta, e a tabela não fica travada durante a importação inteira.
+
+Exemplo:
+    importador = ImportadorLogradouros(tamanho_lote=5000)
+    with open(caminho, 'r', encoding='utf-8-sig') as arquivo:
+        resultado = importador.importar(arquivo)
+    print(resultado['linhas_por_segundo'])
+"""
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.utils import timezone
+
+from .geometria import desempacotar_linhas, empacotar_linhas, ler_linhas, ponto_medio_linhas
+
+logger = logging.getLogger(__name__)
+
+HIERARQUIAS_ARTERIAIS = ['Arterial primária', 'Arterial secundária', 'Coletora']
+
+# Colunas lidas do CSV, na ordem das tuplas de _ler_linha (cod_trecho
+# primeiro, hash_conteudo por ultimo)
+COLUNAS_CSV = [
+    'cod_trecho', 'cod_logradouro', 'tipo_abreviado', 'tipo_extenso', 'nome_parcial',
+    'nome_completo', 'nome_mapa', 'bairro', 'cod_bairro', 'latitude', 'longitude',
+    'geometria', 'hierarquia', 'sentido_unico', 'velocidade_regulamentada', 'tipo_trecho',
+    'num_par_inicio', 'num_par_fim', 'num_impar_inicio', 'num_impar_fim', 'objectid',
+    'ultima_edicao', 'hash_conteudo',
+]
+
+# Colunas gravadas: as do CSV e nome_busca (calculado so para as linhas alteradas)
+COLUNAS_GRAVADAS = COLUNAS_CSV + ['nome_busca']
+
+INDICE_NOME_COMPLETO = COLUNAS_CSV.index('nome_completo')
+INDICE_LATITUDE = COLUNAS_CSV.index('latitude')
+INDICE_LONGITUDE = COLUNAS_CSV.index('longitude')
+INDICE_GEOMETRIA = COLUNAS_CSV.index('geometria')
+
+# Centroide e geometria so quando o CSV traz (nao apagar os existentes)
+COLUNAS_PRESERVADAS = ('latitude', 'longitude', 'geometria')
+
+# Colunas do CSV com a linha do trecho (WKT ou GeoJSON)
+COLUNAS_GEOMETRIA = ('geometria', 'geometry', 'the_geom', 'wkt', 'shape')
+
+# Erros de linha detalhados no log
+MAXIMO_ERROS_LOG = 10
+
+TABELA_TEMPORARIA = 'logradouros_importacao'
+
+
+def _texto(row: Dict, coluna: str) -> str:
+    return (row.get(coluna) or '').strip()
+
+
+def _inteiro(valor: Optional[str]) -> Optional[int]:
+    if not valor or valor.strip() == '':
+        return None
+    try:
+        return int(float(valor))
+    except (ValueError, TypeError):
+        return None
+
+
+def _decimal(valor: Optional[str]) -> Optional[Decimal]:
+    if not valor or valor.strip() == '':
+        return None
+    try:
+        return Decimal(valor.strip().replace(',', '.')).quantize(Decimal('0.0000001'))
+    except InvalidOperation:
+        return None
+
+
+def _data_edicao(valor: Optional[str]) -> Optional[datetime]:
+    """last_edited_date no formato 2025/10/21 22:45:38+00 (UTC)"""
+    if not valor:
+        return None
+    texto = valor.split('+')[0].strip()
+    try:
+        # Fatiamento direto: strptime domina o tempo de leitura do CSV
+        data = datetime(
+            int(texto[0:4]), int(texto[5:7]), int(texto[8:10]),
+            int(texto[11:13]), int(texto[14:16]), int(texto[17:19]),
+        )
+    except ValueError:
+        try:
+            data = datetime.strptime(texto, '%Y/%m/%d %H:%M:%S')
+        except ValueError:
+            return None
+    return data.replace(tzinfo=dt_timezone.utc) if settings.USE_TZ else data
+
+
+def hash_linha(valores: Iterable) -> str:
+    """Hash do conteudo de uma linha (valores ja convertidos)"""
+    texto = '\x1f'.join('' if valor is None else str(valor) for valor in valores)
+    return hashlib.md5(texto.encode('utf-8')).hexdigest()
+
+
+def _escapar_copy(valor) -> str:
+    """Valor no formato texto do COPY do PostgreSQL"""
+    if valor is None:
+        return '\\N'
+    if isinstance(valor, bool):
+        return 't' if valor else 'f'
+    if isinstance(valor, (bytes, bytearray, memoryview)):
+        return '\\\\x' + bytes(valor).hex()
+    return (
+        str(valor)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def _coordenada(valor: float) -> Decimal:
+    return Decimal(repr(valor)).quantize(Decimal('0.0000001'))
+
+
+def carregar_geometrias_geojson(arquivo) -> Dict[int, bytes]:
+    """
+    Geometrias dos trechos de um GeoJSON do Data.Rio (FeatureCollection)
+
+    Args:
+        arquivo: Arquivo texto aberto; cada feature traz cod_trecho nas
+            properties e uma LineString/MultiLineString em lon/lat
+
+    Returns:
+        {cod_trecho: geometria empacotada}
+    """
+    geometrias = {}
+    for feature in json.load(arquivo).get('features') or []:
+        cod_trecho = _inteiro(str((feature.get('properties') or {}).get('cod_trecho') or ''))
+        if cod_trecho is None:
+            continue
+        geometria = empacotar_linhas(ler_linhas(feature.get('geometry')))
+        if geometria:
+            geometrias[cod_trecho] = geometria
+    return geometrias
+
+
+class ImportadorLogradouros:
+    """
+    Importação em lotes do Logradouros.csv
+
+    Args:
+        tamanho_lote: Linhas alteradas por lote gravado
+        apenas_arteriais: Importa apenas arteriais e coletoras
+        progresso: Chamado com o resultado parcial após cada lote gravado
+        geometrias: {cod_trecho: geometria empacotada} para os trechos sem
+            geometria no próprio CSV (carregar_geometrias_geojson)
+    """
+
+    def __init__(self, tamanho_lote: int = 5000, apenas_arteriais: bool = False,
+                 progresso: Optional[Callable[[Dict], None]] = None,
+                 geometrias: Optional[Dict[int, bytes]] = None):
+        from ..models import Logradouro
+        from .via_matcher import ViaMatcher
+
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.apenas_arteriais = apenas_arteriais
+        self.progresso = progresso
+        self.geometrias = geometrias or {}
+
+        self._tabela = Logradouro._meta.db_table
+        self._versao_matcher = ViaMatcher.VERSAO_MATCHER
+
+        # Apenas decimais e datas precisam de conversao para o banco
+        self._conversoes = [
+            (indice, Logradouro._meta.get_field(nome))
+            for indice, nome in enumerate(COLUNAS_CSV)
+            if isinstance(Logradouro._meta.get_field(nome), (models.DecimalField, models.DateTimeField))
+        ]
+
+    # ========================================
+    # LEITURA
+    # ========================================
+
+    def _ler_linha(self, row: Dict) -> Tuple:
+        """
+        Tupla com os valores de COLUNAS_CSV
+
+        O hash inclui a versao do ViaMatcher: mudando a normalizacao,
+        todas as linhas sao regravadas com o novo nome_busca.
+        """
+        cod_trecho = int(row['cod_trecho'])
+
+        # Texto da geometria no CSV (convertido so se a linha mudou, em
+        # _preparar) ou geometria ja empacotada do GeoJSON
+        geometria = None
+        for coluna in COLUNAS_GEOMETRIA:
+            if row.get(coluna):
+                geometria = row[coluna].strip()
+                break
+        if geometria is None:
+            geometria = self.geometrias.get(cod_trecho)
+
+        valores = (
+            cod_trecho,
+            _texto(row, 'cl'),
+            _texto(row, 'tipo_logra_abr'),
+            _texto(row, 'tipo_logra_ext'),
+            _texto(row, 'nome_parcial'),
+            _texto(row, 'completo'),
+            _texto(row, 'nome_mapa'),
+            _texto(row, 'bairro') or None,
+            _inteiro(row.get('cod_bairro')),
+            _decimal(row.get('latitude') or row.get('lat')),
+            _decimal(row.get('longitude') or row.get('lon')),
+            geometria,
+            _texto(row, 'hierarquia') or None,
+            _texto(row, 'oneway') or None,
+            _inteiro(row.get('velocidade_regulamentada')),
+            _texto(row, 'tipo_trecho') or None,
+            _inteiro(row.get('np_ini_par')),
+            _inteiro(row.get('np_fin_par')),
+            _inteiro(row.get('np_ini_imp')),
+            _inteiro(row.get('np_fin_imp')),
+            _inteiro(row.get('objectid')),
+            _data_edicao(row.get('last_edited_date')),
+        )
+        return valores + (hash_linha(valores + (self._versao_matcher,)),)
+
+    # ========================================
+    # IMPORTAÇÃO
+    # ========================================
+
+    def importar(self, arquivo: Iterable[str]) -> Dict:
+        """
+        Importa as linhas do CSV (arquivo texto já aberto)
+
+        Returns:
+            Dict com linhas, inseridos, atualizados, inalterados,
+            ignorados, erros, segundos e linhas_por_segundo
+        """
+        from ..models import Logradouro
+
+        inicio = time.perf_counter()
+        resultado = {
+            'linhas': 0, 'inseridos': 0, 'atualizados': 0, 'inalterados': 0,
+            'ignorados': 0, 'erros': 0, 'segundos': 0.0, 'linhas_por_segundo': 0.0,
+        }
+
+        # Hash do que ja esta gravado: uma consulta, sem comparar campo a campo
+        hashes = dict(Logradouro.objects.values_list('cod_trecho', 'hash_conteudo'))
+
+        # cod_trecho -> valores (repetido no mesmo lote: vale a ultima linha)
+        lote = {}
+
+        for row in csv.DictReader(arquivo):
+            resultado['linhas'] += 1
+
+            if self.apenas_arteriais and _texto(row, 'hierarquia') not in HIERARQUIAS_ARTERIAIS:
+                resultado['ignorados'] += 1
+                continue
+
+            try:
+                valores = self._ler_linha(row)
+            except Exception as e:
+                resultado['erros'] += 1
+                if resultado['erros'] <= MAXIMO_ERROS_LOG:
+                    logger.error(f"Erro na linha {resultado['linhas']}: {e}")
+                continue
+
+            if hashes.get(valores[0]) == valores[-1]:
+                resultado['inalterados'] += 1
+                continue
+
+            lote[valores[0]] = valores
+            if len(lote) >= self.tamanho_lote:
+                self._gravar_lote(lote, hashes, resultado, inicio)
+                lote = {}
+
+        if lote:
+            self._gravar_lote(lote, hashes, resultado, inicio)
+
+        self._atualizar_taxa(resultado, inicio)
+        return resultado
+
+    def _atualizar_taxa(self, resultado: Dict, inicio: float):
+        resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+        resultado['linhas_por_segundo'] = round(
+            resultado['linhas'] / resultado['segundos'], 1
+        ) if resultado['segundos'] else 0.0
+
+    def _gravar_lote(self, lote: Dict[int, Tuple], hashes: Dict[int, str], resultado: Dict, inicio: float):
+        for cod_trecho, valores in lote.items():
+            if cod_trecho in hashes:
+                resultado['atualizados'] += 1
+            else:
+                resultado['inseridos'] += 1
+            hashes[cod_trecho] = valores[-1]
+
+        conexao = connections[DEFAULT_DB_ALIAS]
+        agora = conexao.ops.adapt_datetimefield_value(timezone.now())
+        linhas = [self._preparar(valores, agora, conexao) for valores in lote.values()]
+
+        with transaction.atomic():
+            with conexao.cursor() as cursor:
+                if conexao.vendor == 'postgresql' and hasattr(cursor.cursor, 'copy_expert'):
+                    self._gravar_copy(cursor, linhas)
+                else:
+                    cursor.executemany(self._sql_upsert(), linhas)
+
+        self._atualizar_taxa(resultado, inicio)
+        if self.progresso:
+            self.progresso(resultado)
+
+    # ========================================
+    # SQL
+    # ========================================
+
+    def _colunas(self) -> List[str]:
+        return COLUNAS_GRAVADAS + ['importado_em', 'atualizado_em', 'ativa']
+
+    def _preparar(self, valores: Tuple, agora, conexao) -> List:
+        """
+        Linha no formato do banco, com nome_busca e os campos de controle
+
+        A geometria em texto é empacotada aqui e, sem centroide no CSV, o
+        ponto médio da linha preenche latitude/longitude.
+        """
+        from .via_matcher import normalizar_nome_via
+
+        linha = list(valores)
+
+        geometria = linha[INDICE_GEOMETRIA]
+        if isinstance(geometria, str):
+            geometria = linha[INDICE_GEOMETRIA] = empacotar_linhas(ler_linhas(geometria))
+
+        # Sem centroide no CSV: ponto medio da linha
+        if geometria and (linha[INDICE_LATITUDE] is None or linha[INDICE_LONGITUDE] is None):
+            ponto = ponto_medio_linhas(desempacotar_linhas(geometria))
+            if ponto:
+                linha[INDICE_LONGITUDE], linha[INDICE_LATITUDE] = _coordenada(ponto[0]), _coordenada(ponto[1])
+
+        for indice, campo in self._conversoes:
+            linha[indice] = campo.get_db_prep_save(linha[indice], conexao)
+        linha.append(normalizar_nome_via(valores[INDICE_NOME_COMPLETO])[:300])
+        return linha + [agora, agora, True]
+
+    def _sql_conflito(self) -> str:
+        """ON CONFLICT (cod_trecho) DO UPDATE com os campos do CSV"""
+        q = connections[DEFAULT_DB_ALIAS].ops.quote_name
+        atribuicoes = []
+        for coluna in COLUNAS_GRAVADAS[1:]:
+            if coluna in COLUNAS_PRESERVADAS:
+                atribuicoes.append(f'{q(coluna)} = COALESCE(excluded.{q(coluna)}, {q(self._tabela)}.{q(coluna)})')
+            else:
+                atribuicoes.append(f'{q(coluna)} = excluded.{q(coluna)}')
+        atribuicoes.append(f"{q('atualizado_em')} = excluded.{q('atualizado_em')}")
+        return f"ON CONFLICT ({q('cod_trecho')}) DO UPDATE SET {', '.join(atribuicoes)}"
+
+    def _sql_upsert(self) -> str:
+        q = connections[DEFAULT_DB_ALIAS].ops.quote_name
+        colunas = self._colunas()
+        return (
+            f"INSERT INTO {q(self._tabela)} ({', '.join(q(c) for c in colunas)}) "
+            f"VALUES ({', '.join(['%s'] * len(colunas))}) {self._sql_conflito()}"
+        )
+
+    def _gravar_copy(self, cursor, linhas: List[List]):
+        """PostgreSQL: COPY para tabela temporaria e upsert em um comando"""
+        q = connections[DEFAULT_DB_ALIAS].ops.quote_name
+        colunas = ', '.join(q(c) for c in self._colunas())
+
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {TABELA_TEMPORARIA} "
+            f"(LIKE {q(self._tabela)} INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+
+        buffer = io.StringIO()
+        for linha in linhas:
+            buffer.write('\t'.join(_escapar_copy(valor) for valor in linha))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor.cursor.copy_expert(f"COPY {TABELA_TEMPORARIA} ({colunas}) FROM STDIN", buffer)
+
+        cursor.execute(
+            f"INSERT INTO {q(self._tabela)} ({colunas}) "
+            f"SELECT {colunas} FROM {TABELA_TEMPORARIA} {self._sql_conflito()}"
+        )
@@ -224,104 +224,61 @@ class IntegradorINMET:
 
         return cadastradas
 
-    def coletar_dados_openmeteo(self, latitude: float = None, longitude: float = None) -> Optional[object]:
+    def buscar_openmeteo(self, latitude: float = None, longitude: float = None, session=None) -> Dict:
         """
-        Coleta dados meteorológicos em tempo real da API Open-Meteo
+        Baixa as condições atuais da API Open-Meteo (sem gravar no banco)
 
         Args:
             latitude: Latitude (usa do cliente se não informada)
             longitude: Longitude (usa do cliente se não informada)
+            session: requests.Session opcional (pool de conexões)
 
         Returns:
-            Objeto DadosMeteorologicos criado ou None em caso de erro
-        """
-        from ..models import DadosMeteorologicos, EstacaoMeteorologica
+            JSON retornado pela API
 
+        Raises:
+            requests.RequestException em caso de falha HTTP
+        """
         lat = latitude or float(self.cliente.latitude)
         lon = longitude or float(self.cliente.longitude)
 
-        try:
-            logger.info(f"Coletando dados Open-Meteo para {self.cliente.nome} ({lat}, {lon})")
-
-            # Parâmetros da requisição Open-Meteo
-            params = {
-                'latitude': lat,
-                'longitude': lon,
-                'current': 'temperature_2m,relative_humidity_2m,precipitation,rain,wind_speed_10m,wind_gusts_10m,wind_direction_10m,pressure_msl',
-                'timezone': 'America/Sao_Paulo',
-            }
-
-            response = requests.get(
-                f"{self.BASE_URL_OPENMETEO}/forecast",
-                params=params,
-                timeout=self.TIMEOUT
-            )
-            response.raise_for_status()
-
-            dados_api = response.json()
+        # Parâmetros da requisição Open-Meteo
+        params = {
+            'latitude': lat,
+            'longitude': lon,
+            'current': 'temperature_2m,relative_humidity_2m,precipitation,rain,wind_speed_10m,wind_gusts_10m,wind_direction_10m,pressure_msl',
+            'timezone': 'America/Sao_Paulo',
+        }
 
-            if not dados_api or 'current' not in dados_api:
-                logger.warning(f"Sem dados Open-Meteo para {self.cliente.nome}")
-                return None
+        response = (session or requests).get(
+            f"{self.BASE_URL_OPENMETEO}/forecast",
+            params=params,
+            timeout=self.TIMEOUT
+        )
+        response.raise_for_status()
 
-            current = dados_api['current']
+        return response.json()
 
-            # Parsear data/hora (formato ISO: "2025-12-28T16:15")
-            data_hora_str = current.get('time')
-            if not data_hora_str:
-                logger.error("Sem timestamp nos dados Open-Meteo")
-                return None
+    def coletar_dados_openmeteo(self, latitude: float = None, longitude: float = None, session=None) -> Optional[object]:
+        """
+        Coleta dados meteorológicos em tempo real da API Open-Meteo
 
-            data_hora = datetime.strptime(data_hora_str, '%Y-%m-%dT%H:%M')
-            data_hora = timezone.make_aware(data_hora, timezone.get_current_timezone())
-
-            # Buscar ou criar estação virtual para Open-Meteo
-            estacao, est_created = EstacaoMeteorologica.objects.get_or_create(
-                codigo_inmet=f"OPENMETEO_{self.cliente.slug.upper()}",
-                defaults={
-                    'cliente': self.cliente,
-                    'nome': f"Open-Meteo - {self.cliente.cidade}",
-                    'tipo': 'automatica',
-                    'latitude': lat,
-                    'longitude': lon,
-                    'altitude': dados_api.get('elevation', 0),
-                    'distancia_km': 0,
-                    'principal': True,
-                    'ativa': True,
-                }
-            )
+        Args:
+            latitude: Latitude (usa do cliente se não informada)
+            longitude: Longitude (usa do cliente se não informada)
+            session: requests.Session opcional (pool de conexões)
 
-            if est_created:
-                logger.info(f"Estação virtual criada: {estacao.nome}")
-                # Desmarcar outras estações como principal
-                EstacaoMeteorologica.objects.filter(
-                    cliente=self.cliente
-                ).exclude(id=estacao.id).update(principal=False)
-
-            # Criar ou atualizar registro
-            dados_obj, created = DadosMeteorologicos.objects.update_or_create(
-                estacao=estacao,
-                data_hora=data_hora,
-                defaults={
-                    'temperatura': self._safe_decimal(current.get('temperature_2m')),
-                    'temperatura_max': None,
-                    'temperatura_min': None,
-                    'umidade': self._safe_decimal(current.get('relative_humidity_2m')),
-                    'pressao': self._safe_decimal(current.get('pressure_msl')),
-                    'precipitacao_horaria': self._safe_decimal(current.get('precipitation') or current.get('rain')),
-                    'vento_velocidade': self._safe_decimal(current.get('wind_speed_10m')),
-                    'vento_direcao': self._safe_decimal(current.get('wind_direction_10m')),
-                    'vento_rajada': self._safe_decimal(current.get('wind_gusts_10m')),
-                    'radiacao': None,
-                    'ponto_orvalho': None,
-                    'dados_raw': dados_api,
-                }
-            )
+        Returns:
+            Objeto DadosMeteorologicos criado ou None em caso de erro
+        """
+        lat = latitude or float(self.cliente.latitude)
+        lon = longitude or float(self.cliente.longitude)
 
-            acao = "criado" if created else "atualizado"
-            logger.info(f"Dado Open-Meteo {acao}: {estacao.nome} - {data_hora}")
+        try:
+            logger.info(f"Coletando dados Open-Meteo para {self.cliente.nome} ({lat}, {lon})")
 
-            return dados_obj
+            dados_api = self.buscar_openmeteo(lat, lon, session)
+            return self.salvar_openmeteo(dados_api, lat, lon)
 
         except requests.RequestException as e:
             logger.error(f"Erro HTTP ao coletar dados Open-Meteo: {e}")
@@ -332,6 +289,86 @@ class IntegradorINMET:
             traceback.print_exc()
             return None
 
+    def salvar_openmeteo(self, dados_api: Dict, latitude: float = None, longitude: float = None) -> Optional[object]:
+        """
+        Grava em DadosMeteorologicos uma resposta Open-Meteo já baixada
+
+        Args:
+            dados_api: JSON retornado pela API Open-Meteo
+            latitude: Latitude consultada (usa do cliente se não informada)
+            longitude: Longitude consultada (usa do cliente se não informada)
+
+        Returns:
+            Objeto DadosMeteorologicos ou None se a resposta não tem dados
+        """
+        from ..models import DadosMeteorologicos, EstacaoMeteorologica
+
+        lat = latitude or float(self.cliente.latitude)
+        lon = longitude or float(self.cliente.longitude)
+
+        if not dados_api or 'current' not in dados_api:
+            logger.warning(f"Sem dados Open-Meteo para {self.cliente.nome}")
+            return None
+
+        current = dados_api['current']
+
+        # Parsear data/hora (formato ISO: "2025-12-28T16:15")
+        data_hora_str = current.get('time')
+        if not data_hora_str:
+            logger.error("Sem timestamp nos dados Open-Meteo")
+            return None
+
+        data_hora = datetime.strptime(data_hora_str, '%Y-%m-%dT%H:%M')
+        data_hora = timezone.make_aware(data_hora, timezone.get_current_timezone())
+
+        # Buscar ou criar estação virtual para Open-Meteo
+        estacao, est_created = EstacaoMeteorologica.objects.get_or_create(
+            codigo_inmet=f"OPENMETEO_{self.cliente.slug.upper()}",
+            defaults={
+                'cliente': self.cliente,
+                'nome': f"Open-Meteo - {self.cliente.cidade}",
+                'tipo': 'automatica',
+                'latitude': lat,
+                'longitude': lon,
+                'altitude': dados_api.get('elevation', 0),
+                'distancia_km': 0,
+                'principal': True,
+                'ativa': True,
+            }
+        )
+
+        if est_created:
+            logger.info(f"Estação virtual criada: {estacao.nome}")
+            # Desmarcar outras estações como principal
+            EstacaoMeteorologica.objects.filter(
+                cliente=self.cliente
+            ).exclude(id=estacao.id).update(principal=False)
+
+        # Criar ou atualizar registro
+        dados_obj, created = DadosMeteorologicos.objects.update_or_create(
+            estacao=estacao,
+            data_hora=data_hora,
+            defaults={
+                'temperatura': self._safe_decimal(current.get('temperature_2m')),
+                'temperatura_max': None,
+                'temperatura_min': None,
+                'umidade': self._safe_decimal(current.get('relative_humidity_2m')),
+                'pressao': self._safe_decimal(current.get('pressure_msl')),
+                'precipitacao_horaria': self._safe_decimal(current.get('precipitation') or current.get('rain')),
+                'vento_velocidade': self._safe_decimal(current.get('wind_speed_10m')),
+                'vento_direcao': self._safe_decimal(current.get('wind_direction_10m')),
+                'vento_rajada': self._safe_decimal(current.get('wind_gusts_10m')),
+                'radiacao': None,
+                'ponto_orvalho': None,
+                'dados_raw': dados_api,
+            }
+        )
+
+        acao = "criado" if created else "atualizado"
+        logger.info(f"Dado Open-Meteo {acao}: {estacao.nome} - {data_hora}")
+
+        return dados_obj
+
     def coletar_dados_tempo_real(self, estacao) -> Optional[object]:
         """
         Coleta dados meteorológicos em tempo real
@@ -361,8 +398,6 @@ class IntegradorINMET:
         Returns:
             Tupla (sucesso, total)
         """
-        from ..models import EstacaoMeteorologica
-
         sucesso = 0
         total = 1  # Pelo menos a coleta principal
 
@@ -374,11 +409,7 @@ class IntegradorINMET:
             logger.warning(f"Falha na coleta Open-Meteo para {self.cliente.nome}")
 
         # Opcionalmente coletar de estações INMET adicionais (não principais)
-        estacoes_extras = EstacaoMeteorologica.objects.filter(
-            cliente=self.cliente,
-            ativa=True,
-            principal=False
-        ).exclude(codigo_inmet__startswith='OPENMETEO_')
+        estacoes_extras = self._estacoes_extras()
 
         total += estacoes_extras.count()
 
@@ -390,6 +421,29 @@ class IntegradorINMET:
 
         return sucesso, total
 
+    def _estacoes_extras(self):
+        """Estações INMET adicionais (não principais) coletadas via Open-Meteo"""
+        from ..models import EstacaoMeteorologica
+
+        return EstacaoMeteorologica.objects.filter(
+            cliente=self.cliente,
+            ativa=True,
+            principal=False
+        ).exclude(codigo_inmet__startswith='OPENMETEO_')
+
+    def pontos_coleta(self) -> List[Tuple[float, float]]:
+        """
+        Coordenadas consultadas por coletar_todas_estacoes
+
+        Returns:
+            Lista de (latitude, longitude): centro do cliente primeiro,
+            seguido das estações extras
+        """
+        pontos = [(float(self.cliente.latitude), float(self.cliente.longitude))]
+        for estacao in self._estacoes_extras():
+            pontos.append((float(estacao.latitude), float(estacao.longitude)))
+        return pontos
+
     def _safe_decimal(self, value) -> Optional[Decimal]:
         """Converte valor para Decimal com segurança"""
         if value is None or value == '' or value == '-' or value == 'null':
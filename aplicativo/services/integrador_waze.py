@@ -14,7 +14,11 @@ API: https://www.waze.com/row-partnerhub-api/feeds-tvt/
 Nota: API pública para demonstração (não requer parceria CCP)
 """
 
+import gzip
+import hashlib
+import json
 import requests
+import time
 from datetime import timedelta
 from decimal import Decimal
 from typing import Dict, Tuple, Optional, List
@@ -35,6 +39,12 @@ class IntegradorWaze:
     BASE_URL = "https://www.waze.com/row-partnerhub-api"
     TIMEOUT = 20
 
+    # Janela em que todos os snapshots são mantidos para compor deltas (?since=)
+    JANELA_DELTA = timedelta(hours=2)
+
+    # Período do histórico por trecho exibido em obter_vias_engarrafadas
+    JANELA_HISTORICO_VIAS = timedelta(days=7)
+
     # Feed IDs conhecidos (demonstração)
     # Descobertos via inspeção de rede em https://www.waze.com/live-map
     FEED_IDS = {
@@ -64,6 +74,12 @@ class IntegradorWaze:
         3: 1,   # E3: >= 1 via interditada
     }
 
+    # Trechos muito abaixo da velocidade típica do horário (LinhaBaseVia)
+    LIMIARES_ANOMALIAS = {
+        3: 20,  # E3: >= 20 trechos anômalos
+        2: 8,   # E2: >= 8 trechos anômalos
+    }
+
     def __init__(self, cliente):
         """
         Inicializa o integrador com um cliente específico
@@ -81,15 +97,48 @@ class IntegradorWaze:
             cidade_slug = cliente.cidade.lower().replace(' ', '-')
             self.feed_id = self.FEED_IDS.get(cidade_slug)
 
-    def coletar_dados(self):
+    def buscar_feed(self, session=None) -> Tuple[Dict, int]:
+        """
+        Baixa o feed TVT do Waze (sem gravar nada no banco)
+
+        Args:
+            session: requests.Session opcional (pool de conexões)
+
+        Returns:
+            Tupla (JSON do feed, tamanho da resposta em bytes)
+
+        Raises:
+            requests.RequestException em caso de falha HTTP
+        """
+        url = f"{self.BASE_URL}/feeds-tvt/"
+        params = {'id': self.feed_id}
+
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Accept': 'application/json',
+            'Referer': 'https://www.waze.com/live-map',
+        }
+
+        response = (session or requests).get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=self.TIMEOUT
+        )
+        response.raise_for_status()
+
+        return response.json(), len(response.content)
+
+    def coletar_dados(self, session=None):
         """
         Coleta dados do feed Waze e armazena em DadosMobilidade
 
+        Args:
+            session: requests.Session opcional (pool de conexões)
+
         Returns:
             DadosMobilidade object ou None
         """
-        from ..models import DadosMobilidade
-
         if not self.feed_id:
             logger.warning(f"Cliente {self.cliente.nome} sem feed_id do Waze configurado")
             return None
@@ -97,107 +146,359 @@ class IntegradorWaze:
         try:
             logger.info(f"Coletando dados Waze para {self.cliente.nome} (feed: {self.feed_id})")
 
-            url = f"{self.BASE_URL}/feeds-tvt/"
-            params = {'id': self.feed_id}
+            data, tamanho = self.buscar_feed(session)
+            return self.salvar_feed(data, tamanho)
 
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Accept': 'application/json',
-                'Referer': 'https://www.waze.com/live-map',
-            }
+        except requests.Timeout:
+            logger.error(f"Timeout ao coletar dados Waze para {self.cliente.nome}")
+            return None
+        except requests.RequestException as e:
+            logger.error(f"Erro HTTP ao coletar Waze: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Erro ao coletar dados Waze: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
 
-            response = requests.get(
-                url,
-                params=params,
-                headers=headers,
-                timeout=self.TIMEOUT
-            )
-            response.raise_for_status()
+    def salvar_feed(self, data: Dict, tamanho_original: int = 0):
+        """
+        Processa um feed já baixado e armazena em DadosMobilidade
 
-            data = response.json()
+        Args:
+            data: JSON retornado pela API Waze
+            tamanho_original: Tamanho em bytes da resposta HTTP
+
+        Returns:
+            DadosMobilidade object
+        """
+        from ..models import DadosMobilidade
 
-            # Processar dados
-            stats = self._processar_dados(data)
+        # Processar dados
+        stats = self._processar_dados(data)
 
-            # Salvar no banco (evitar duplicatas por hora)
-            agora = timezone.now()
-            # Arredondar para a hora mais próxima para evitar duplicatas
-            data_hora_arredondada = agora.replace(minute=0, second=0, microsecond=0)
+        # Salvar no banco (evitar duplicatas por hora)
+        agora = timezone.now()
+        # Arredondar para a hora mais próxima para evitar duplicatas
+        data_hora_arredondada = agora.replace(minute=0, second=0, microsecond=0)
 
-            # Verificar se já existe registro para esta hora
-            existente = DadosMobilidade.objects.filter(
+        # Verificar se já existe registro para esta hora
+        existente = DadosMobilidade.objects.filter(
+            cliente=self.cliente,
+            data_hora__gte=data_hora_arredondada,
+            data_hora__lt=data_hora_arredondada + timedelta(hours=1)
+        ).first()
+
+        if existente:
+            # Atualizar registro existente com mapeamento explícito
+            existente.total_jams = stats['total_jams']
+            existente.jams_severos = stats['jams_severos']
+            existente.jams_moderados = stats['jams_moderados']
+            existente.jams_leves = stats['jams_leves']
+            existente.total_alerts = stats['total_alerts']
+            existente.acidentes_maiores = stats['acidentes_maiores']
+            existente.acidentes_menores = stats['acidentes_menores']
+            existente.perigos = stats['perigos']
+            existente.total_irregularidades = stats['total_irregularidades']
+            existente.vias_interditadas = stats['vias_interditadas']
+            existente.obras = stats['obras']
+            existente.velocidade_media_kmh = stats['velocidade_media']
+            existente.atraso_medio_segundos = stats['atraso_medio']
+            existente.extensao_total_congestionamentos_m = stats['extensao_total']
+            existente.dados_raw = {}  # Feed fica no snapshot compacto
+            existente.save()
+            dados_obj = existente
+            logger.info(f"Dados atualizados para {self.cliente.nome}")
+        else:
+            # Criar novo registro
+            dados_obj = DadosMobilidade.objects.create(
                 cliente=self.cliente,
-                data_hora__gte=data_hora_arredondada,
-                data_hora__lt=data_hora_arredondada + timedelta(hours=1)
-            ).first()
-
-            if existente:
-                # Atualizar registro existente com mapeamento explícito
-                existente.total_jams = stats['total_jams']
-                existente.jams_severos = stats['jams_severos']
-                existente.jams_moderados = stats['jams_moderados']
-                existente.jams_leves = stats['jams_leves']
-                existente.total_alerts = stats['total_alerts']
-                existente.acidentes_maiores = stats['acidentes_maiores']
-                existente.acidentes_menores = stats['acidentes_menores']
-                existente.perigos = stats['perigos']
-                existente.total_irregularidades = stats['total_irregularidades']
-                existente.vias_interditadas = stats['vias_interditadas']
-                existente.obras = stats['obras']
-                existente.velocidade_media_kmh = stats['velocidade_media']
-                existente.atraso_medio_segundos = stats['atraso_medio']
-                existente.extensao_total_congestionamentos_m = stats['extensao_total']
-                existente.dados_raw = data
-                existente.save()
-                dados_obj = existente
-                logger.info(f"Dados atualizados para {self.cliente.nome}")
-            else:
-                # Criar novo registro
-                dados_obj = DadosMobilidade.objects.create(
-                    cliente=self.cliente,
-                    data_hora=agora,
-                    total_jams=stats['total_jams'],
-                    jams_severos=stats['jams_severos'],
-                    jams_moderados=stats['jams_moderados'],
-                    jams_leves=stats['jams_leves'],
-                    total_alerts=stats['total_alerts'],
-                    acidentes_maiores=stats['acidentes_maiores'],
-                    acidentes_menores=stats['acidentes_menores'],
-                    perigos=stats['perigos'],
-                    total_irregularidades=stats['total_irregularidades'],
-                    vias_interditadas=stats['vias_interditadas'],
-                    obras=stats['obras'],
-                    velocidade_media_kmh=stats['velocidade_media'],
-                    atraso_medio_segundos=stats['atraso_medio'],
-                    extensao_total_congestionamentos_m=stats['extensao_total'],
-                    dados_raw=data,
+                data_hora=agora,
+                total_jams=stats['total_jams'],
+                jams_severos=stats['jams_severos'],
+                jams_moderados=stats['jams_moderados'],
+                jams_leves=stats['jams_leves'],
+                total_alerts=stats['total_alerts'],
+                acidentes_maiores=stats['acidentes_maiores'],
+                acidentes_menores=stats['acidentes_menores'],
+                perigos=stats['perigos'],
+                total_irregularidades=stats['total_irregularidades'],
+                vias_interditadas=stats['vias_interditadas'],
+                obras=stats['obras'],
+                velocidade_media_kmh=stats['velocidade_media'],
+                atraso_medio_segundos=stats['atraso_medio'],
+                extensao_total_congestionamentos_m=stats['extensao_total'],
+            )
+            logger.info(f"Novos dados criados para {self.cliente.nome}")
+
+        # Feed completo em formato compacto (colunar + coordenadas empacotadas)
+        snapshot = self._salvar_snapshot(dados_obj, data, agora, tamanho_original)
+
+        # Linha de base de velocidade por trecho (não interrompe a coleta)
+        try:
+            from .linha_base_vias import atualizar_linha_base
+            resultado = atualizar_linha_base(self.cliente, self._velocidades_por_trecho(data), agora)
+            if resultado['anomalas']:
+                logger.info(f"{resultado['anomalas']} trechos abaixo da velocidade típica para {self.cliente.nome}")
+        except Exception as e:
+            logger.error(f"Erro ao atualizar linha de base das vias: {e}")
+
+        # Alertas das áreas de observação com eventos novos da coleta
+        try:
+            from .monitor_areas import verificar_coleta_waze
+            verificar_coleta_waze(self.cliente, snapshot)
+        except Exception as e:
+            logger.error(f"Erro ao verificar areas de observacao: {e}")
+
+        logger.info(
+            f"Dados coletados: {stats['total_jams']} jams ({stats['jams_severos']} severos), "
+            f"{stats['total_alerts']} alerts ({stats['acidentes_maiores']} maiores), "
+            f"{stats['total_irregularidades']} irregularidades ({stats['vias_interditadas']} interditadas)"
+        )
+
+        return dados_obj
+
+    def _velocidades_por_trecho(self, data: Dict) -> Dict[str, float]:
+        """
+        Velocidade média (km/h) de cada trecho do feed
+
+        Usa routes e irregularities DYNAMIC; trechos repetidos são
+        agregados por extensão total / tempo total.
+
+        Returns:
+            {nome do trecho: velocidade em km/h}
+        """
+        totais = {}
+
+        itens = list(data.get('routes') or [])
+        itens.extend(i for i in data.get('irregularities') or [] if i.get('type') == 'DYNAMIC')
+
+        for item in itens:
+            nome = item.get('name') or item.get('street')
+            length = item.get('length') or 0
+            time_s = item.get('time') or 0
+            if not nome or length <= 0 or time_s <= 0:
+                continue
+
+            chave = self._limpar_nome_via(nome)
+            extensao, tempo = totais.get(chave, (0, 0))
+            totais[chave] = (extensao + length, tempo + time_s)
+
+        return {
+            chave: round(extensao / tempo * 3.6, 2)
+            for chave, (extensao, tempo) in totais.items()
+        }
+
+    def _salvar_snapshot(self, dados_obj, data: Dict, data_hora, tamanho_original: int = 0):
+        """
+        Grava o feed no formato compacto vinculado à coleta
+
+        Monta e serializa o payload completo do mapa uma única vez
+        (PayloadMapaWaze; as faixas de zoom são gravadas na primeira
+        requisição, ver obter_payload_mapa) e calcula o delta (itens adicionados/alterados/removidos) em
+        relação ao snapshot anterior do cliente, usado por ?since=<id>.
+        Snapshots dentro de JANELA_DELTA são mantidos para compor os
+        deltas; os mais antigos seguem a retenção de um feed por hora.
+        Só o snapshot atual guarda payloads: os dos anteriores são
+        apagados (_payload_do_snapshot remonta a partir do snapshot).
+        Os alerts são gravados com o trecho oficial sob cada um
+        (coluna cod_trecho, ver _alertas_com_trecho).
+
+        Args:
+            dados_obj: DadosMobilidade da coleta
+            data: JSON retornado pela API Waze
+            data_hora: Momento da coleta
+            tamanho_original: Tamanho em bytes da resposta HTTP
+
+        Returns:
+            SnapshotMobilidade criado
+        """
+        from django.db.models import Max
+        from ..models import PayloadMapaWaze, SnapshotMobilidade
+        from .snapshot_waze import compactar_feed, SnapshotWaze, FORMATO_VERSAO
+        from .delta_waze import assinar_payload, calcular_delta, resumo_delta
+
+        conteudo = compactar_feed(self._alertas_com_trecho(data))
+        payload = self.montar_dados_mapa(SnapshotWaze(conteudo))
+
+        anterior = SnapshotMobilidade.objects.filter(
+            cliente=self.cliente
+        ).order_by('-id').first()
+
+        delta = {}
+        if anterior:
+            try:
+                delta = calcular_delta(
+                    assinar_payload(self._payload_do_snapshot(anterior)),
+                    assinar_payload(payload),
                 )
-                logger.info(f"Novos dados criados para {self.cliente.nome}")
+            except Exception as e:
+                logger.warning(f"Erro ao calcular delta do snapshot anterior {anterior.id}: {e}")
+                anterior = None
 
-            logger.info(
-                f"Dados coletados: {stats['total_jams']} jams ({stats['jams_severos']} severos), "
-                f"{stats['total_alerts']} alerts ({stats['acidentes_maiores']} maiores), "
-                f"{stats['total_irregularidades']} irregularidades ({stats['vias_interditadas']} interditadas)"
-            )
+        snapshot = SnapshotMobilidade.objects.create(
+            cliente=self.cliente,
+            dados_mobilidade=dados_obj,
+            anterior=anterior,
+            data_hora=data_hora,
+            formato=FORMATO_VERSAO,
+            conteudo=conteudo,
+            tamanho_original=tamanho_original,
+            tamanho_compactado=len(conteudo),
+            delta=delta,
+        )
+        registro_payload = self._salvar_payload_mapa(snapshot, payload)
 
-            return dados_obj
+        # Payloads dos snapshots substituídos
+        PayloadMapaWaze.objects.filter(snapshot__cliente=self.cliente).exclude(snapshot=snapshot).delete()
 
-        except requests.Timeout:
-            logger.error(f"Timeout ao coletar dados Waze para {self.cliente.nome}")
-            return None
-        except requests.RequestException as e:
-            logger.error(f"Erro HTTP ao coletar Waze: {e}")
-            return None
+        # Fora da janela de deltas: manter só o último snapshot de cada hora
+        antigos = SnapshotMobilidade.objects.filter(
+            cliente=self.cliente,
+            data_hora__lt=data_hora - self.JANELA_DELTA
+        )
+        manter = list(
+            antigos.values('dados_mobilidade').annotate(ultimo=Max('id')).values_list('ultimo', flat=True)
+        )
+        antigos.exclude(id__in=manter).delete()
+
+        logger.info(
+            f"Snapshot {snapshot.id} gravado: {len(conteudo) / 1024:.1f} KB "
+            f"(original {tamanho_original / 1024:.1f} KB), "
+            f"payload mapa {registro_payload.tamanho_compactado / 1024:.1f} KB, "
+            f"delta {resumo_delta(delta)}"
+        )
+
+        return snapshot
+
+    def _alertas_com_trecho(self, data: Dict) -> Dict:
+        """
+        Feed com o trecho oficial (cod_trecho) sob cada alert
+
+        O snapping é feito em lote na coleta, para que as consultas
+        (obter_alertas_categorizados) não montem o índice de trechos na
+        requisição. O feed recebido não é alterado.
+        """
+        alerts = (data or {}).get('alerts') or []
+        if not alerts:
+            return data
+
+        try:
+            from .snapping_vias import get_snapping_vias
+            trechos = get_snapping_vias().trechos_para_pontos([
+                ((alert.get('location') or {}).get('y'), (alert.get('location') or {}).get('x'))
+                for alert in alerts
+            ])
         except Exception as e:
-            logger.error(f"Erro ao coletar dados Waze: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error(f"Erro no snapping dos alerts: {e}")
+            return data
+
+        return {
+            **data,
+            'alerts': [
+                {**alert, 'cod_trecho': trecho[0] if trecho else None}
+                for alert, trecho in zip(alerts, trechos)
+            ],
+        }
+
+    def _salvar_payload_mapa(self, snapshot, payload: Dict, banda: Optional[str] = None):
+        """
+        Serializa e grava o payload do mapa (resposta de api_waze_completo)
+
+        Args:
+            snapshot: SnapshotMobilidade de origem
+            payload: Resultado de montar_dados_mapa
+            banda: Variante do payload (padrão: completo)
+
+        Returns:
+            PayloadMapaWaze criado
+        """
+        from django.core.serializers.json import DjangoJSONEncoder
+        from ..models import PayloadMapaWaze
+
+        corpo = json.dumps(
+            {
+                'success': True,
+                **payload,
+                'snapshot_id': snapshot.id,
+                'incremental': False,
+            },
+            cls=DjangoJSONEncoder,
+            separators=(',', ':'),
+        ).encode('utf-8')
+        comprimido = gzip.compress(corpo, compresslevel=6, mtime=0)
+
+        return PayloadMapaWaze.objects.create(
+            snapshot=snapshot,
+            banda=banda or PayloadMapaWaze.BANDA_COMPLETO,
+            conteudo=comprimido,
+            hash_conteudo=hashlib.sha256(corpo).hexdigest(),
+            tamanho_json=len(corpo),
+            tamanho_compactado=len(comprimido),
+        )
+
+    def _payload_do_snapshot(self, snapshot, banda: Optional[str] = None) -> Dict:
+        """
+        Payload do mapa de um snapshot: pré-calculado, ou montado na hora
+
+        Args:
+            snapshot: SnapshotMobilidade
+            banda: Faixa de zoom (ver services/geometria.py) ou None
+        """
+        from ..models import PayloadMapaWaze
+        from .geometria import simplificar_payload
+
+        registro = snapshot.payloads.filter(banda=banda or PayloadMapaWaze.BANDA_COMPLETO).first()
+        if registro:
+            return registro.carregar()
+
+        completo = snapshot.payloads.filter(banda=PayloadMapaWaze.BANDA_COMPLETO).first()
+        payload = completo.carregar() if completo else self.montar_dados_mapa(snapshot.leitor())
+        return simplificar_payload(payload, banda) if banda else payload
+
+    def obter_payload_mapa(self, banda: Optional[str] = None):
+        """
+        Retorna o payload pré-serializado do snapshot mais recente (última hora)
+
+        O conteúdo é carregado sob demanda, para que respostas 304
+        (ETag) não precisem ler os bytes do banco. A variante de uma faixa
+        de zoom é simplificada e gravada na primeira requisição; as
+        seguintes reutilizam o registro até a próxima coleta.
+
+        Returns:
+            PayloadMapaWaze ou None
+        """
+        from django.db import IntegrityError, transaction
+        from ..models import PayloadMapaWaze, SnapshotMobilidade
+
+        limite = timezone.now() - timedelta(hours=1)
+        atual = SnapshotMobilidade.objects.filter(
+            cliente=self.cliente,
+            data_hora__gte=limite
+        ).order_by('-id').first()
+        if not atual:
             return None
 
+        banda = banda or PayloadMapaWaze.BANDA_COMPLETO
+        registro = atual.payloads.filter(banda=banda).defer('conteudo').first()
+        if registro or banda == PayloadMapaWaze.BANDA_COMPLETO:
+            return registro
+
+        try:
+            with transaction.atomic():
+                return self._salvar_payload_mapa(atual, self._payload_do_snapshot(atual, banda), banda)
+        except IntegrityError:
+            # Gravado por outra requisição ao mesmo tempo
+            return atual.payloads.filter(banda=banda).defer('conteudo').first()
+
     def _processar_dados(self, data: Dict) -> Dict:
         """
         Processa dados brutos do Waze e extrai estatísticas
 
+        Todas as métricas são acumuladas em uma única passada sobre
+        routes, alerts e irregularities (sem listas intermediárias),
+        mantendo o custo linear mesmo em feeds muito grandes.
+
         Args:
             data: JSON retornado pela API Waze
 
@@ -213,99 +514,91 @@ class IntegradorWaze:
         alerts = data.get('alerts', [])
         irregularities = data.get('irregularities', [])
 
+        jams_severos = 0
+        jams_moderados = 0
+        jams_leves = 0
+
+        # Métricas de congestionamentos (irregularidades DYNAMIC)
+        total_jams = 0
+        extensao_total = 0
+        soma_velocidades = 0.0
+        qtd_velocidades = 0
+        soma_atrasos = 0
+        qtd_atrasos = 0
+
+        vias_interditadas = 0
+        obras = 0
+
         # ========================================
-        # API TVT: Usar routes.jamLevel e irregularities DYNAMIC
+        # IRREGULARities: DYNAMIC (congestionamentos), ROAD_CLOSED, CONSTRUCTION
         # ========================================
-        # Irregularities com type=DYNAMIC são os congestionamentos
-        irregularidades_dinamicas = [
-            i for i in irregularities
-            if i.get('type') == 'DYNAMIC'
-        ]
-
-        # Calcular nível de severidade baseado no atraso (historicTime vs tempo atual)
-        jams_severos = []
-        jams_moderados = []
-        jams_leves = []
-
-        for irreg in irregularidades_dinamicas:
-            historic_time = irreg.get('historicTime', 0)
-            current_time = irreg.get('time', historic_time)
-            # Calcular atraso percentual
-            if historic_time > 0:
-                atraso_pct = ((current_time - historic_time) / historic_time) * 100
-                if atraso_pct >= 50:  # Atraso >= 50% = severo
-                    jams_severos.append(irreg)
-                elif atraso_pct >= 20:  # Atraso >= 20% = moderado
-                    jams_moderados.append(irreg)
-                else:
-                    jams_leves.append(irreg)
+        for irreg in irregularities:
+            tipo = irreg.get('type')
+
+            if tipo == 'DYNAMIC':
+                total_jams += 1
+
+                length_m = irreg.get('length', 0)
+                time_s = irreg.get('time', 0)
+                historic_time = irreg.get('historicTime', 0)
+
+                extensao_total += length_m
+
+                # Calcular nível de severidade baseado no atraso (historicTime vs tempo atual)
+                if historic_time > 0:
+                    current_time = irreg.get('time', historic_time)
+                    atraso_pct = ((current_time - historic_time) / historic_time) * 100
+                    if atraso_pct >= 50:  # Atraso >= 50% = severo
+                        jams_severos += 1
+                    elif atraso_pct >= 20:  # Atraso >= 20% = moderado
+                        jams_moderados += 1
+                    else:
+                        jams_leves += 1
+
+                    # Atraso (diferença entre tempo atual e histórico)
+                    if time_s > 0:
+                        soma_atrasos += time_s - historic_time
+                        qtd_atrasos += 1
+
+                # Velocidade estimada a partir do length/time
+                if time_s > 0 and length_m > 0:
+                    soma_velocidades += (length_m / time_s) * 3.6  # m/s para km/h
+                    qtd_velocidades += 1
+
+            elif tipo == 'ROAD_CLOSED':
+                vias_interditadas += 1
+            elif tipo == 'CONSTRUCTION':
+                obras += 1
 
         # Também usar jamLevel das routes para classificar
         for route in routes:
             jam_level = route.get('jamLevel', 0)
             if jam_level >= 4:  # Muito lento/parado
-                jams_severos.append({'from_route': True, 'jamLevel': jam_level, 'name': route.get('name', '')})
+                jams_severos += 1
             elif jam_level >= 2:  # Moderado
-                jams_moderados.append({'from_route': True, 'jamLevel': jam_level, 'name': route.get('name', '')})
+                jams_moderados += 1
 
-        # Total de "jams" = irregularidades dinâmicas (são os congestionamentos reais)
-        total_jams = len(irregularidades_dinamicas)
-
-        # Métricas de congestionamentos (usando irregularidades DYNAMIC)
-        extensoes = [i.get('length', 0) for i in irregularidades_dinamicas]
-        extensao_total = sum(extensoes)
-
-        # Velocidade média estimada a partir do length/time
-        velocidades = []
-        for irreg in irregularidades_dinamicas:
-            length_m = irreg.get('length', 0)
-            time_s = irreg.get('time', 0)
-            if time_s > 0 and length_m > 0:
-                speed_kmh = (length_m / time_s) * 3.6  # m/s para km/h
-                velocidades.append(speed_kmh)
-
-        velocidade_media = sum(velocidades) / len(velocidades) if velocidades else None
-
-        # Atraso médio (diferença entre tempo atual e histórico)
-        atrasos = []
-        for irreg in irregularidades_dinamicas:
-            historic = irreg.get('historicTime', 0)
-            current = irreg.get('time', 0)
-            if historic > 0 and current > 0:
-                atrasos.append(current - historic)
-
-        atraso_medio = int(sum(atrasos) / len(atrasos)) if atrasos else None
+        velocidade_media = soma_velocidades / qtd_velocidades if qtd_velocidades else None
+        atraso_medio = int(soma_atrasos / qtd_atrasos) if qtd_atrasos else None
 
         # ========================================
         # Processar ALERTs (Alertas) - se disponíveis
         # ========================================
-        acidentes = [a for a in alerts if a.get('type') == 'ACCIDENT']
-        perigos = [a for a in alerts if a.get('type') == 'HAZARD']
-
-        acidentes_maiores = [
-            a for a in acidentes
-            if 'MAJOR' in a.get('subtype', '') or
-               a.get('reportRating', 0) >= 4 or
-               a.get('reliability', 0) >= 8
-        ]
-
-        acidentes_menores = [
-            a for a in acidentes
-            if a not in acidentes_maiores
-        ]
-
-        # ========================================
-        # Processar IRREGULARities (Outras)
-        # ========================================
-        vias_interditadas = [
-            i for i in irregularities
-            if i.get('type') == 'ROAD_CLOSED'
-        ]
+        acidentes_maiores = 0
+        acidentes_menores = 0
+        perigos = 0
 
-        obras = [
-            i for i in irregularities
-            if i.get('type') == 'CONSTRUCTION'
-        ]
+        for alert in alerts:
+            tipo = alert.get('type')
+            if tipo == 'ACCIDENT':
+                if ('MAJOR' in (alert.get('subtype') or '') or
+                        alert.get('reportRating', 0) >= 4 or
+                        alert.get('reliability', 0) >= 8):
+                    acidentes_maiores += 1
+                else:
+                    acidentes_menores += 1
+            elif tipo == 'HAZARD':
+                perigos += 1
 
         # Usar dados agregados do response
         # lengthOfJams é um array: [{'jamLevel': 1, 'jamLength': 30545}, ...]
@@ -328,23 +621,23 @@ class IntegradorWaze:
 
         # Log detalhado
         logger.info(
-            f"Processado: {len(routes)} routes, {len(irregularidades_dinamicas)} congestionamentos, "
+            f"Processado: {len(routes)} routes, {total_jams} congestionamentos, "
             f"{len(irregularities)} irregularities total, "
             f"extensão={final_extensao}m ({final_extensao/1000:.1f}km), users={users_on_jams}"
         )
 
         return {
             'total_jams': total_jams,  # Usando irregularidades DYNAMIC como jams
-            'jams_severos': len(jams_severos),
-            'jams_moderados': len(jams_moderados),
-            'jams_leves': len(jams_leves),
+            'jams_severos': jams_severos,
+            'jams_moderados': jams_moderados,
+            'jams_leves': jams_leves,
             'total_alerts': len(alerts),
-            'acidentes_maiores': len(acidentes_maiores),
-            'acidentes_menores': len(acidentes_menores),
-            'perigos': len(perigos),
+            'acidentes_maiores': acidentes_maiores,
+            'acidentes_menores': acidentes_menores,
+            'perigos': perigos,
             'total_irregularidades': len(irregularities),
-            'vias_interditadas': len(vias_interditadas),
-            'obras': len(obras),
+            'vias_interditadas': vias_interditadas,
+            'obras': obras,
             'velocidade_media': Decimal(str(round(velocidade_media, 2))) if velocidade_media else None,
             'atraso_medio': atraso_medio,
             'extensao_total': final_extensao,
@@ -450,6 +743,23 @@ class IntegradorWaze:
             nivel = max(nivel, min(nivel + 1, 5))
             razoes.append(f'{perigos} perigos reportados na via')
 
+        # ========================================
+        # REGRA 5: Trechos abaixo da velocidade típica do horário
+        # (linha de base por dia da semana e faixa de 15 minutos)
+        # ========================================
+        from .linha_base_vias import obter_anomalias
+
+        ultima_coleta = dados_recentes.snapshots.order_by('-id').values_list('data_hora', flat=True).first()
+        anomalias = obter_anomalias(self.cliente, ultima_coleta or dados_recentes.data_hora)
+        trechos_anomalos = anomalias.count()
+
+        if trechos_anomalos >= self.LIMIARES_ANOMALIAS[3]:
+            nivel = max(nivel, 3)
+            razoes.append(f'{trechos_anomalos} trechos muito abaixo da velocidade típica (Atenção)')
+        elif trechos_anomalos >= self.LIMIARES_ANOMALIAS[2]:
+            nivel = max(nivel, 2)
+            razoes.append(f'{trechos_anomalos} trechos abaixo da velocidade típica (Mobilização)')
+
         # Cores por nível (padrão COR Rio E1-E5)
         CORES_NIVEL = {
             1: '#00ff88',   # Verde - Normal
@@ -488,6 +798,16 @@ class IntegradorWaze:
             'velocidade_media_kmh': float(dados_recentes.velocidade_media_kmh) if dados_recentes.velocidade_media_kmh else None,
             'atraso_medio_minutos': round(dados_recentes.atraso_medio_segundos / 60, 1) if dados_recentes.atraso_medio_segundos else None,
             'extensao_total_km': dados_recentes.extensao_total_km,
+            'trechos_anomalos': trechos_anomalos,
+            'principais_anomalias': [
+                {
+                    'via': linha.chave_via,
+                    'velocidade_kmh': linha.ultima_velocidade_kmh,
+                    'velocidade_tipica_kmh': round(linha.media_kmh, 1),
+                    'zscore': round(linha.ultimo_zscore, 1),
+                }
+                for linha in anomalias[:5]
+            ] if trechos_anomalos else [],
             'razao': '; '.join(razoes) if razoes else 'Mobilidade normal - trânsito fluindo',
             'fonte': 'Waze',
         }
@@ -560,26 +880,26 @@ class IntegradorWaze:
             data_hora__gte=limite
         ).order_by('-data_hora').first()
 
-        if not dados or not dados.dados_raw:
+        snapshot = dados.obter_snapshot() if dados else None
+        if not snapshot:
             return []
 
         # Extrair jams de dentro das routes (API TVT)
-        routes = dados.dados_raw.get('routes', [])
-        jams_raw = []
-        for route in routes:
-            route_jams = route.get('jams', [])
-            jams_raw.extend(route_jams)
+        jams_raw = snapshot.tabela('routes').todos_filhos('jams')
 
         # Fallback para API com jams no nível raiz
-        if not jams_raw:
-            jams_raw = dados.dados_raw.get('jams', [])
+        if not len(jams_raw):
+            jams_raw = snapshot.tabela('jams')
 
         jams_formatados = []
 
-        for jam in jams_raw[:100]:  # Limitar a 100 para performance
+        for indice, jam in enumerate(jams_raw):
+            if indice >= 100:  # Limitar a 100 para performance
+                break
+
             # Extrair coordenadas da linha do congestionamento
-            line = jam.get('line', [])
-            if not line:
+            coordenadas = jam.coordenadas()
+            if not coordenadas:
                 continue
 
             jams_formatados.append({
@@ -591,15 +911,14 @@ class IntegradorWaze:
                 'length': jam.get('length', 0),
                 'delay': jam.get('delay', 0),
                 'type': jam.get('type', ''),
-                'coordinates': [(p.get('x'), p.get('y')) for p in line],
+                'coordinates': coordenadas,
             })
 
         # Também incluir irregularidades DYNAMIC como jams (são congestionamentos)
-        irregularities = dados.dados_raw.get('irregularities', [])
-        for irreg in irregularities:
+        for irreg in snapshot.tabela('irregularities'):
             if irreg.get('type') == 'DYNAMIC':
-                line = irreg.get('line', [])
-                if not line:
+                coordenadas = irreg.coordenadas()
+                if not coordenadas:
                     continue
 
                 # Extrair nome da via (name contém "Av. Brasil,Rio de Janeiro")
@@ -631,7 +950,7 @@ class IntegradorWaze:
                     'length': length_m,
                     'delay': delay,
                     'type': 'DYNAMIC',
-                    'coordinates': [(p.get('x'), p.get('y')) for p in line],
+                    'coordinates': coordenadas,
                 })
 
         return jams_formatados
@@ -651,15 +970,19 @@ class IntegradorWaze:
             data_hora__gte=limite
         ).order_by('-data_hora').first()
 
-        if not dados or not dados.dados_raw:
+        snapshot = dados.obter_snapshot() if dados else None
+        if not snapshot:
             return []
 
-        alerts_raw = dados.dados_raw.get('alerts', [])
         alerts_formatados = []
 
-        for alert in alerts_raw[:50]:  # Limitar a 50
-            location = alert.get('location', {})
-            if not location:
+        for indice, alert in enumerate(snapshot.tabela('alerts')):
+            if indice >= 50:  # Limitar a 50
+                break
+
+            lat = alert.get('location.y')
+            lon = alert.get('location.x')
+            if lat is None and lon is None:
                 continue
 
             alerts_formatados.append({
@@ -670,8 +993,8 @@ class IntegradorWaze:
                 'city': alert.get('city', ''),
                 'confidence': alert.get('confidence', 0),
                 'reliability': alert.get('reliability', 0),
-                'lat': location.get('y'),
-                'lon': location.get('x'),
+                'lat': lat,
+                'lon': lon,
             })
 
         return alerts_formatados
@@ -690,6 +1013,13 @@ class IntegradorWaze:
                 - estatisticas: Contagens por tipo
         """
         from ..models import DadosMobilidade
+        from .delta_waze import CATEGORIAS_MAPA
+
+        # Payload pré-calculado na coleta
+        registro = self.obter_payload_mapa()
+        if registro:
+            payload = registro.carregar()
+            return {chave: payload.get(chave) for chave in (*CATEGORIAS_MAPA, 'estatisticas')}
 
         limite = timezone.now() - timedelta(hours=1)
         dados = DadosMobilidade.objects.filter(
@@ -697,6 +1027,118 @@ class IntegradorWaze:
             data_hora__gte=limite
         ).order_by('-data_hora').first()
 
+        snapshot = dados.obter_snapshot() if dados else None
+        return self.montar_dados_mapa(snapshot)
+
+    def obter_mapa_incremental(self, since_id: Optional[int] = None, banda: Optional[str] = None) -> Dict:
+        """
+        Retorna o payload do mapa a partir do último snapshot armazenado
+
+        Com since_id, devolve apenas os itens adicionados/alterados desde
+        aquele snapshot e os ids removidos por categoria. Se a cadeia de
+        deltas não estiver disponível (snapshot expirado, de outro cliente
+        ou desconhecido), devolve o payload completo.
+
+        Args:
+            since_id: id do SnapshotMobilidade já carregado pelo cliente
+            banda: Faixa de zoom para simplificar as geometrias (opcional)
+
+        Returns:
+            Dict no formato de obter_dados_completos_mapa, acrescido de:
+                - snapshot_id: id do snapshot atual
+                - incremental: True se contém apenas mudanças
+                - since / removidos: apenas quando incremental
+        """
+        from ..models import SnapshotMobilidade
+        from .delta_waze import aplicar_filtro_delta
+
+        limite = timezone.now() - timedelta(hours=1)
+        atual = SnapshotMobilidade.objects.filter(
+            cliente=self.cliente,
+            data_hora__gte=limite
+        ).order_by('-id').first()
+
+        if not atual:
+            return {
+                **self.montar_dados_mapa(None),
+                'snapshot_id': None,
+                'incremental': False,
+            }
+
+        payload = self._payload_do_snapshot(atual, banda)
+        delta = self._compor_delta_desde(atual, since_id) if since_id is not None else None
+
+        if delta is None:
+            return {
+                **payload,
+                'snapshot_id': atual.id,
+                'incremental': False,
+            }
+
+        return {
+            **aplicar_filtro_delta(payload, delta),
+            'snapshot_id': atual.id,
+            'since': since_id,
+            'incremental': True,
+        }
+
+    def _compor_delta_desde(self, atual, since_id: int) -> Optional[Dict]:
+        """
+        Compõe os deltas da cadeia de snapshots entre since_id e o atual
+
+        Returns:
+            Delta composto, ou None se a cadeia estiver incompleta
+        """
+        from ..models import SnapshotMobilidade
+        from .delta_waze import compor_deltas
+
+        if since_id > atual.id:
+            return None
+
+        cadeia = {
+            registro['id']: registro
+            for registro in SnapshotMobilidade.objects.filter(
+                cliente=self.cliente,
+                id__gt=since_id,
+                id__lte=atual.id
+            ).values('id', 'anterior_id', 'delta')
+        }
+
+        deltas = []
+        snapshot_id = atual.id
+        while snapshot_id != since_id:
+            registro = cadeia.get(snapshot_id)
+            if not registro or registro['anterior_id'] is None:
+                return None
+            deltas.append(registro['delta'])
+            snapshot_id = registro['anterior_id']
+
+        return compor_deltas(reversed(deltas))
+
+    @staticmethod
+    def _limpar_nome_via(nome):
+        """Remove sufixo de cidade do nome da via ("Av. Brasil,Rio de Janeiro")"""
+        if not nome:
+            return 'Via não identificada'
+        if ',' in nome:
+            parts = nome.split(',')
+            if len(parts) >= 2 and parts[-1].strip().lower() in [
+                'rio de janeiro', 'niteroi', 'niterói', 'sao goncalo',
+                'são gonçalo', 'duque de caxias', 'nova iguacu', 'nova iguaçu'
+            ]:
+                return ','.join(parts[:-1]).strip()
+        return nome
+
+    def montar_dados_mapa(self, snapshot) -> Dict:
+        """
+        Monta o payload categorizado do mapa a partir de um snapshot
+
+        Args:
+            snapshot: SnapshotWaze (ou None)
+
+        Returns:
+            Dict no formato de obter_dados_completos_mapa
+        """
         resultado = {
             'congestionamentos': [],
             'interdicoes': [],
@@ -712,117 +1154,90 @@ class IntegradorWaze:
             }
         }
 
-        if not dados or not dados.dados_raw:
+        if not snapshot:
             return resultado
 
-        raw = dados.dados_raw
-        irregularities = raw.get('irregularities', [])
-        routes = raw.get('routes', [])
-        alerts = raw.get('alerts', [])
-
-        # Helper para limpar nome de cidade
-        def limpar_nome(nome):
-            if not nome:
-                return 'Via não identificada'
-            if ',' in nome:
-                parts = nome.split(',')
-                if len(parts) >= 2 and parts[-1].strip().lower() in [
-                    'rio de janeiro', 'niteroi', 'niterói', 'sao goncalo',
-                    'são gonçalo', 'duque de caxias', 'nova iguacu', 'nova iguaçu'
-                ]:
-                    return ','.join(parts[:-1]).strip()
-            return nome
+        limpar_nome = self._limpar_nome_via
 
-        # ========================================
-        # 1. CONGESTIONAMENTOS (DYNAMIC)
-        # ========================================
-        for irreg in irregularities:
-            if irreg.get('type') != 'DYNAMIC':
-                continue
+        for irreg in snapshot.tabela('irregularities'):
+            tipo = irreg.get('type')
 
-            line = irreg.get('line', [])
-            if not line:
-                continue
+            # ========================================
+            # 1. CONGESTIONAMENTOS (DYNAMIC)
+            # ========================================
+            if tipo == 'DYNAMIC':
+                coordenadas = irreg.coordenadas()
+                if not coordenadas:
+                    continue
 
-            length_m = irreg.get('length', 0)
-            time_s = irreg.get('time', 0)
-            speed = (length_m / time_s * 3.6) if time_s > 0 else 0
-            historic_time = irreg.get('historicTime', 0)
-            delay = time_s - historic_time if historic_time > 0 else 0
-
-            resultado['congestionamentos'].append({
-                'id': str(irreg.get('id', '')),
-                'category': 'congestionamento',
-                'street': limpar_nome(irreg.get('name', '')),
-                'toName': irreg.get('toName', ''),
-                'level': irreg.get('jamLevel', 3),
-                'speed': round(speed, 1),
-                'length': length_m,
-                'delay': delay,
-                'coordinates': [(p.get('x'), p.get('y')) for p in line],
-            })
+                length_m = irreg.get('length', 0)
+                time_s = irreg.get('time', 0)
+                speed = (length_m / time_s * 3.6) if time_s > 0 else 0
+                historic_time = irreg.get('historicTime', 0)
+                delay = time_s - historic_time if historic_time > 0 else 0
 
-        # ========================================
-        # 2. INTERDIÇÕES E EVENTOS (STATIC)
-        # ========================================
-        for irreg in irregularities:
-            if irreg.get('type') != 'STATIC':
-                continue
+                resultado['congestionamentos'].append({
+                    'id': str(irreg.get('id', '')),
+                    'category': 'congestionamento',
+                    'street': limpar_nome(irreg.get('name', '')),
+                    'toName': irreg.get('toName', ''),
+                    'level': irreg.get('jamLevel', 3),
+                    'speed': round(speed, 1),
+                    'length': length_m,
+                    'delay': delay,
+                    'coordinates': coordenadas,
+                })
 
-            # Verificar subRoutes para ROAD_CLOSED
-            sub_routes = irreg.get('subRoutes', [])
-            is_road_closed = False
-            alert_info = None
+            # ========================================
+            # 2. INTERDIÇÕES E EVENTOS (STATIC)
+            # ========================================
+            elif tipo == 'STATIC':
+                # Verificar subRoutes para ROAD_CLOSED
+                sub_routes = irreg.filhos('subRoutes')
+                alert_street = None
 
-            for sr in sub_routes:
-                lead_alert = sr.get('leadAlert', {})
-                if lead_alert.get('type') == 'ROAD_CLOSED':
-                    is_road_closed = True
-                    alert_info = lead_alert
-                    break
+                for sr in sub_routes:
+                    if sr.get('leadAlert.type') == 'ROAD_CLOSED':
+                        alert_street = sr.get('leadAlert.street', '')
+                        break
 
-            nome = limpar_nome(irreg.get('name', ''))
-            line = irreg.get('line', [])
+                nome = limpar_nome(irreg.get('name', ''))
 
-            # Se não tem line principal, usar das subRoutes
-            if not line and sub_routes:
-                all_coords = []
-                for sr in sub_routes:
-                    sr_line = sr.get('line', [])
-                    all_coords.extend([(p.get('x'), p.get('y')) for p in sr_line])
-                coords = all_coords
-            else:
-                coords = [(p.get('x'), p.get('y')) for p in line] if line else []
+                # Se não tem line principal, usar das subRoutes
+                coords = irreg.coordenadas()
+                if not coords and sub_routes:
+                    for sr in sub_routes:
+                        coords.extend(sr.coordenadas())
 
-            if not coords:
-                continue
+                if not coords:
+                    continue
 
-            item = {
-                'id': str(irreg.get('id', '')),
-                'street': nome,
-                'length': irreg.get('length', 0),
-                'coordinates': coords,
-            }
+                item = {
+                    'id': str(irreg.get('id', '')),
+                    'street': nome,
+                    'length': irreg.get('length', 0),
+                    'coordinates': coords,
+                }
 
-            if is_road_closed:
-                item['category'] = 'interdicao'
-                item['reason'] = nome
-                item['alert_street'] = alert_info.get('street', '') if alert_info else ''
-                resultado['interdicoes'].append(item)
-            else:
-                item['category'] = 'evento'
-                resultado['eventos'].append(item)
+                if alert_street is not None:
+                    item['category'] = 'interdicao'
+                    item['reason'] = nome
+                    item['alert_street'] = alert_street
+                    resultado['interdicoes'].append(item)
+                else:
+                    item['category'] = 'evento'
+                    resultado['eventos'].append(item)
 
         # ========================================
         # 3. ROTAS COM TRÂNSITO ALTO (jamLevel >= 3)
         # ========================================
-        for route in routes:
+        for route in snapshot.tabela('routes'):
             jam_level = route.get('jamLevel', 0)
             if jam_level < 3:  # Só mostrar trânsito moderado+
                 continue
 
-            line = route.get('line', [])
-            if not line:
+            coordenadas = route.coordenadas()
+            if not coordenadas:
                 continue
 
             length_m = route.get('length', 0)
@@ -838,41 +1253,44 @@ class IntegradorWaze:
                 'level': jam_level,
                 'speed': round(speed, 1),
                 'length': length_m,
-                'coordinates': [(p.get('x'), p.get('y')) for p in line],
+                'coordinates': coordenadas,
             })
 
         # ========================================
         # 4. ALERTAS (Acidentes, Perigos, etc)
         # ========================================
-        for alert in alerts[:100]:
-            location = alert.get('location', {})
-            if not location:
+        # Mapear ícones por tipo
+        icon_map = {
+            'ACCIDENT': 'fa-car-crash',
+            'HAZARD': 'fa-exclamation-triangle',
+            'ROAD_CLOSED': 'fa-road-barrier',
+            'JAM': 'fa-car',
+            'POLICE': 'fa-user-shield',
+            'CONSTRUCTION': 'fa-hard-hat',
+        }
+
+        for indice, alert in enumerate(snapshot.tabela('alerts')):
+            if indice >= 100:
+                break
+
+            lat = alert.get('location.y')
+            lon = alert.get('location.x')
+            if lat is None and lon is None:
                 continue
 
             alert_type = alert.get('type', '')
-            subtype = alert.get('subtype', '')
-
-            # Mapear ícones por tipo
-            icon_map = {
-                'ACCIDENT': 'fa-car-crash',
-                'HAZARD': 'fa-exclamation-triangle',
-                'ROAD_CLOSED': 'fa-road-barrier',
-                'JAM': 'fa-car',
-                'POLICE': 'fa-user-shield',
-                'CONSTRUCTION': 'fa-hard-hat',
-            }
 
             resultado['alertas'].append({
                 'id': alert.get('uuid', alert.get('id', '')),
                 'category': 'alerta',
                 'type': alert_type,
-                'subtype': subtype,
+                'subtype': alert.get('subtype', ''),
                 'street': alert.get('street', 'Local não identificado'),
                 'city': alert.get('city', ''),
                 'confidence': alert.get('confidence', 0),
                 'reliability': alert.get('reliability', 0),
-                'lat': location.get('y'),
-                'lon': location.get('x'),
+                'lat': lat,
+                'lon': lon,
                 'icon': icon_map.get(alert_type, 'fa-info-circle'),
             })
 
@@ -892,15 +1310,23 @@ class IntegradorWaze:
         Processa dados brutos e cria registros de CongestionamentoVia
         vinculados aos logradouros oficiais
 
+        Pipeline em lote: extrai os congestionamentos do snapshot, resolve
+        cada nome de via distinto uma única vez no matcher, calcula a
+        criticidade em memória e grava tudo com bulk_create em uma única
+        transação.
+
         Args:
             dados_mobilidade: Objeto DadosMobilidade (usa mais recente se None)
 
         Returns:
-            dict: Estatisticas do processamento
+            dict: Estatisticas do processamento (inclui 'tempos' em ms)
         """
+        from django.db import transaction
         from ..models import DadosMobilidade, CongestionamentoVia, Logradouro
         from .via_matcher import get_via_matcher
 
+        inicio = time.perf_counter()
+
         # Buscar dados mais recentes se nao fornecido
         if not dados_mobilidade:
             limite = timezone.now() - timedelta(hours=1)
@@ -909,7 +1335,8 @@ class IntegradorWaze:
                 data_hora__gte=limite
             ).order_by('-data_hora').first()
 
-        if not dados_mobilidade or not dados_mobilidade.dados_raw:
+        snapshot = dados_mobilidade.obter_snapshot() if dados_mobilidade else None
+        if not snapshot:
             logger.warning(f"Sem dados para processar congestionamentos - {self.cliente.nome}")
             return {'erro': 'Sem dados disponíveis'}
 
@@ -918,30 +1345,32 @@ class IntegradorWaze:
             logger.warning("Nenhum logradouro importado. Execute: python manage.py importar_logradouros")
             return {'erro': 'Logradouros nao importados'}
 
-        # Inicializar matcher
-        matcher = get_via_matcher()
-
         # Estatisticas
         stats = {
             'total_processados': 0,
             'match_exato': 0,
             'match_fuzzy': 0,
+            'match_espacial': 0,
             'nao_encontrados': 0,
+            'vias_distintas': 0,
             'criticidade': {
                 'normal': 0,
                 'leve': 0,
                 'moderada': 0,
                 'severa': 0,
                 'critica': 0,
-            }
+            },
+            'tempos': {},
         }
 
-        agora = timezone.now()
-        raw_data = dados_mobilidade.dados_raw
+        # ========================================
+        # 1. EXTRAÇÃO
+        # ========================================
+        # (via_nome, jam_level, velocidade, atraso, extensao, lat, lon, linha)
+        registros = []
 
         # Processar routes (API TVT)
-        routes = raw_data.get('routes', [])
-        for route in routes:
+        for route in snapshot.tabela('routes'):
             via_nome = route.get('name', '') or route.get('fromName', '')
             if not via_nome:
                 continue
@@ -955,50 +1384,18 @@ class IntegradorWaze:
             time_s = route.get('time', 0)
             velocidade = (length / time_s * 3.6) if time_s > 0 else None
 
-            # Buscar logradouro oficial
-            logradouro, score, metodo = matcher.buscar_via(via_nome)
-
-            # Extrair coordenadas do primeiro ponto
-            line = route.get('line', [])
-            lat = line[0].get('y') if line else None
-            lon = line[0].get('x') if line else None
-
             # Calcular atraso
             historic_time = route.get('historicTime', 0)
-            current_time = route.get('time', 0)
-            atraso = current_time - historic_time if historic_time > 0 else None
+            atraso = time_s - historic_time if historic_time > 0 else None
 
-            # Criar registro
-            congestionamento = CongestionamentoVia(
-                cliente=self.cliente,
-                dados_mobilidade=dados_mobilidade,
-                logradouro=logradouro,
-                data_hora=agora,
-                via_nome_waze=via_nome,
-                jam_level=jam_level,
-                velocidade_atual=Decimal(str(round(velocidade, 2))) if velocidade else None,
-                atraso_segundos=atraso,
-                extensao_metros=length,
-                latitude=Decimal(str(lat)) if lat else None,
-                longitude=Decimal(str(lon)) if lon else None,
-                match_score=score,
-                match_metodo=metodo,
-            )
-            congestionamento.save()  # Trigger calculo de criticidade
+            # Extrair coordenadas do primeiro ponto
+            line = route.coordenadas()
+            lon, lat = line[0] if line else (None, None)
 
-            # Atualizar estatisticas
-            stats['total_processados'] += 1
-            if metodo and 'exato' in metodo:
-                stats['match_exato'] += 1
-            elif metodo and 'fuzzy' in metodo:
-                stats['match_fuzzy'] += 1
-            else:
-                stats['nao_encontrados'] += 1
-            stats['criticidade'][congestionamento.criticidade] += 1
+            registros.append((via_nome, jam_level, velocidade, atraso, length, lat, lon, line))
 
         # Processar irregularities DYNAMIC (congestionamentos)
-        irregularities = raw_data.get('irregularities', [])
-        for irreg in irregularities:
+        for irreg in snapshot.tabela('irregularities'):
             if irreg.get('type') != 'DYNAMIC':
                 continue
 
@@ -1024,15 +1421,40 @@ class IntegradorWaze:
             else:
                 jam_level = 2
 
-            # Buscar logradouro
-            logradouro, score, metodo = matcher.buscar_via(via_nome)
+            atraso = time_s - historic_time if historic_time > 0 else None
 
             # Coordenadas
-            line = irreg.get('line', [])
-            lat = line[0].get('y') if line else None
-            lon = line[0].get('x') if line else None
+            line = irreg.coordenadas()
+            lon, lat = line[0] if line else (None, None)
 
-            atraso = time_s - historic_time if historic_time > 0 else None
+            registros.append((via_nome, jam_level, velocidade, atraso, length, lat, lon, line))
+
+        fim_extracao = time.perf_counter()
+
+        # ========================================
+        # 2. MATCHING (um lote por feed, com a posicao de cada registro)
+        # ========================================
+        matcher = get_via_matcher()
+        vias_resolvidas = matcher.buscar_vias_posicionadas(
+            [(via_nome, lat, lon) for via_nome, _, _, _, _, lat, lon, _ in registros]
+        )
+        stats['vias_distintas'] = len({registro[0] for registro in registros})
+        matcher.metricas.publicar()
+
+        # Snapping das linhas na malha oficial: trecho exato da via
+        # encontrada pelo nome ou, sem match pelo nome, o trecho sob a linha
+        vias_resolvidas = self._refinar_com_snapping(registros, vias_resolvidas)
+
+        fim_matching = time.perf_counter()
+
+        # ========================================
+        # 3. MONTAGEM E CRITICIDADE (em memória)
+        # ========================================
+        agora = timezone.now()
+        congestionamentos = []
+
+        for (via_nome, jam_level, velocidade, atraso, length, lat, lon, _), resolucao in zip(registros, vias_resolvidas):
+            logradouro, score, metodo = resolucao
 
             congestionamento = CongestionamentoVia(
                 cliente=self.cliente,
@@ -1049,78 +1471,120 @@ class IntegradorWaze:
                 match_score=score,
                 match_metodo=metodo,
             )
-            congestionamento.save()
+            # Mesma regra de CongestionamentoVia.save() (bulk_create não chama save)
+            congestionamento.criticidade, congestionamento.percentual_abaixo_regulamentada = (
+                congestionamento.calcular_criticidade()
+            )
+            congestionamentos.append(congestionamento)
 
+            # Atualizar estatisticas
             stats['total_processados'] += 1
             if metodo and 'exato' in metodo:
                 stats['match_exato'] += 1
             elif metodo and 'fuzzy' in metodo:
                 stats['match_fuzzy'] += 1
+            elif metodo in ('espacial', 'snap'):
+                stats['match_espacial'] += 1
             else:
                 stats['nao_encontrados'] += 1
             stats['criticidade'][congestionamento.criticidade] += 1
 
+        fim_montagem = time.perf_counter()
+
+        # ========================================
+        # 4. GRAVAÇÃO EM LOTE
+        # ========================================
+        with transaction.atomic():
+            CongestionamentoVia.objects.bulk_create(congestionamentos, batch_size=500)
+
+        fim_gravacao = time.perf_counter()
+
+        # Histórico por trecho e hora (não interrompe o processamento)
+        try:
+            from .historico_congestionamentos import atualizar_historico
+            stats['historico'] = atualizar_historico(self.cliente, congestionamentos)
+        except Exception as e:
+            logger.error(f"Erro ao atualizar historico de congestionamentos: {e}")
+
+        fim = time.perf_counter()
+
+        stats['tempos'] = {
+            'extracao_ms': round((fim_extracao - inicio) * 1000, 1),
+            'matching_ms': round((fim_matching - fim_extracao) * 1000, 1),
+            'montagem_ms': round((fim_montagem - fim_matching) * 1000, 1),
+            'gravacao_ms': round((fim_gravacao - fim_montagem) * 1000, 1),
+            'historico_ms': round((fim - fim_gravacao) * 1000, 1),
+            'total_ms': round((fim - inicio) * 1000, 1),
+        }
+
         logger.info(
             f"Processados {stats['total_processados']} congestionamentos para {self.cliente.nome}: "
             f"{stats['match_exato']} exatos, {stats['match_fuzzy']} fuzzy, "
-            f"{stats['nao_encontrados']} nao encontrados"
+            f"{stats['match_espacial']} espaciais, {stats['nao_encontrados']} nao encontrados "
+            f"({stats['vias_distintas']} vias distintas, {stats['tempos']['total_ms']} ms)"
         )
 
         return stats
 
+    def _refinar_com_snapping(self, registros: List[Tuple], vias_resolvidas: List[Tuple]) -> List[Tuple]:
+        """
+        Ajusta as resoluções do ViaMatcher com o snapping das linhas
+
+        - Mesmo logradouro (CL) da via encontrada pelo nome: usa o trecho
+          sob a linha no lugar do trecho representativo
+        - Sem match pelo nome: usa o trecho sob a linha (metodo 'snap')
+        - Logradouro diferente do nome: mantém o match pelo nome
+
+        Sem geometrias importadas, devolve as resoluções sem alteração.
+        """
+        from ..models import Logradouro
+        from .snapping_vias import get_snapping_vias
+
+        snapping = get_snapping_vias()
+        if not snapping.estatisticas()['trechos']:
+            return vias_resolvidas
+
+        trechos = snapping.trechos_para_linhas([registro[7] for registro in registros])
+
+        trocas = {}
+        for i, (trecho, (logradouro, score, metodo)) in enumerate(zip(trechos, vias_resolvidas)):
+            if not trecho:
+                continue
+            cod_trecho = trecho[0]
+            if logradouro is None:
+                trocas[i] = (cod_trecho, None, 'snap')
+            elif (logradouro.cod_trecho != cod_trecho
+                    and snapping.cod_logradouro(cod_trecho) == logradouro.cod_logradouro):
+                trocas[i] = (cod_trecho, score, metodo)
+
+        if not trocas:
+            return vias_resolvidas
+
+        vias = Logradouro.objects.in_bulk({cod_trecho for cod_trecho, _, _ in trocas.values()})
+        resultado = list(vias_resolvidas)
+        for i, (cod_trecho, score, metodo) in trocas.items():
+            if cod_trecho in vias:
+                resultado[i] = (vias[cod_trecho], score, metodo)
+        return resultado
+
     def obter_congestionamentos_criticos(self, limit: int = 10) -> List[Dict]:
         """
         Retorna lista dos congestionamentos mais criticos (com dados oficiais)
 
+        Lê o histórico por trecho e hora (CongestionamentoViaHora): um item
+        por trecho na última hora, com velocidade, atraso e extensão médios
+        dos registros.
+
         Args:
             limit: Numero maximo de registros
 
         Returns:
             Lista de dicts com dados combinados Waze + Logradouro
         """
-        from ..models import CongestionamentoVia
-
-        limite = timezone.now() - timedelta(hours=1)
-
-        congestionamentos = CongestionamentoVia.objects.filter(
-            cliente=self.cliente,
-            data_hora__gte=limite,
-            criticidade__in=['moderada', 'severa', 'critica']
-        ).select_related('logradouro').order_by(
-            '-criticidade', '-jam_level', '-extensao_metros'
-        )[:limit]
-
-        resultado = []
-        for cong in congestionamentos:
-            item = {
-                'via_waze': cong.via_nome_waze,
-                'jam_level': cong.jam_level,
-                'velocidade_atual': float(cong.velocidade_atual) if cong.velocidade_atual else None,
-                'atraso_segundos': cong.atraso_segundos,
-                'extensao_metros': cong.extensao_metros,
-                'criticidade': cong.criticidade,
-                'percentual_deficit': cong.percentual_abaixo_regulamentada,
-                'latitude': float(cong.latitude) if cong.latitude else None,
-                'longitude': float(cong.longitude) if cong.longitude else None,
-                'match_score': cong.match_score,
-                'match_metodo': cong.match_metodo,
-            }
-
-            # Dados oficiais do logradouro
-            if cong.logradouro:
-                item['oficial'] = {
-                    'nome_completo': cong.logradouro.nome_completo,
-                    'bairro': cong.logradouro.bairro,
-                    'hierarquia': cong.logradouro.hierarquia,
-                    'velocidade_regulamentada': cong.logradouro.velocidade_regulamentada,
-                    'tipo_trecho': cong.logradouro.tipo_trecho,
-                }
-            else:
-                item['oficial'] = None
+        from .historico_congestionamentos import congestionamentos_criticos
 
-            resultado.append(item)
+        return congestionamentos_criticos(self.cliente, timezone.now() - timedelta(hours=1), limit)
 
-        return resultado
     def obter_vias_engarrafadas(self, nivel_minimo=2):
         """
         Retorna lista de vias com congestionamento
@@ -1138,14 +1602,14 @@ class IntegradorWaze:
             cliente=self.cliente
         ).order_by('-data_hora').first()
         
-        if not ultimo or not ultimo.dados_raw:
+        snapshot = ultimo.obter_snapshot() if ultimo else None
+        if not snapshot:
             return []
         
         vias = []
-        data_raw = ultimo.dados_raw
         
         # Processar rotas principais
-        routes = data_raw.get('routes', [])
+        routes = snapshot.tabela('routes')
         for route in routes:
             jam_level = route.get('jamLevel', 0)
             
@@ -1174,7 +1638,7 @@ class IntegradorWaze:
         
         # Processar sub-rotas (trechos específicos)
         for route in routes:
-            sub_routes = route.get('subRoutes', [])
+            sub_routes = route.filhos('subRoutes')
             for sub in sub_routes:
                 jam_level = sub.get('jamLevel', 0)
                 
@@ -1200,11 +1664,61 @@ class IntegradorWaze:
                         'atraso_percent': round(atraso_percent, 1),
                     })
         
+        self._comparar_com_linha_base(vias, ultimo.data_hora)
+        self._acrescentar_historico(vias, ultimo.data_hora)
+
         # Ordenar por nível (maior primeiro) e depois por atraso
         vias.sort(key=lambda x: (-x['nivel'], -x['atraso_percent']))
         
         return vias
+
+    def _comparar_com_linha_base(self, vias: List[Dict], data_hora):
+        """
+        Acrescenta a velocidade típica do horário (LinhaBaseVia) a cada via
+
+        Campos: velocidade_kmh, velocidade_tipica_kmh, zscore_velocidade
+        e anomala (velocidade muito abaixo do normal para o horário).
+        """
+        from .linha_base_vias import LIMIAR_ZSCORE, MINIMO_AMOSTRAS, obter_linhas_base
+
+        linhas = obter_linhas_base(self.cliente, (self._limpar_nome_via(via['nome']) for via in vias), data_hora)
+
+        for via in vias:
+            tempo_s = via['tempo_atual_min'] * 60
+            velocidade = round(via['extensao_m'] / tempo_s * 3.6, 1) if tempo_s else None
+            linha = linhas.get(self._limpar_nome_via(via['nome']))
+
+            zscore = None
+            if linha and linha.ultima_amostra and linha.ultima_amostra >= data_hora:
+                # Amostra desta coleta já incluída: usa o z-score da ingestão
+                zscore = linha.ultimo_zscore
+            elif linha and velocidade is not None and linha.amostras >= MINIMO_AMOSTRAS:
+                zscore = linha.zscore(velocidade)
+
+            via['velocidade_kmh'] = velocidade
+            via['velocidade_tipica_kmh'] = round(linha.media_kmh, 1) if linha and linha.amostras else None
+            via['zscore_velocidade'] = round(zscore, 1) if zscore is not None else None
+            via['anomala'] = zscore is not None and zscore >= LIMIAR_ZSCORE
     
+    def _acrescentar_historico(self, vias: List[Dict], data_hora):
+        """
+        Acrescenta a cada via o histórico recente (CongestionamentoViaHora)
+
+        Campos: horas_congestionada, registros_historico e
+        pior_nivel_historico nos JANELA_HISTORICO_VIAS anteriores à coleta.
+        """
+        from .historico_congestionamentos import historico_por_nome
+
+        historico = historico_por_nome(
+            self.cliente, (via['nome'] for via in vias), data_hora - self.JANELA_HISTORICO_VIAS
+        )
+
+        for via in vias:
+            resumo = historico.get(via['nome'])
+            via['horas_congestionada'] = resumo['horas'] if resumo else 0
+            via['registros_historico'] = resumo['registros'] if resumo else 0
+            via['pior_nivel_historico'] = resumo['jam_level_max'] if resumo else None
+
     def obter_alertas_categorizados(self):
         """
         Retorna alertas separados por categoria
@@ -1218,7 +1732,8 @@ class IntegradorWaze:
             cliente=self.cliente
         ).order_by('-data_hora').first()
         
-        if not ultimo or not ultimo.dados_raw:
+        snapshot = ultimo.obter_snapshot() if ultimo else None
+        if not snapshot:
             return {
                 'acidentes': [],
                 'interdicoes': [],
@@ -1226,20 +1741,18 @@ class IntegradorWaze:
                 'outros': [],
             }
         
-        data_raw = ultimo.dados_raw
-        alerts = data_raw.get('alerts', [])
-        irregularities = data_raw.get('irregularities', [])
+        alerts = snapshot.tabela('alerts')
+        irregularities = snapshot.tabela('irregularities')
         
         acidentes = []
         interdicoes = []
         perigos = []
         outros = []
         
-        # Processar alerts
+        # Processar alerts (cod_trecho gravado na coleta, ver _alertas_com_trecho)
         for alert in alerts:
             alert_type = alert.get('type', '')
             subtype = alert.get('subtype', '')
-            location = alert.get('location', {})
             
             item = {
                 'tipo': alert_type,
@@ -1248,9 +1761,10 @@ class IntegradorWaze:
                 'cidade': alert.get('city', ''),
                 'confianca': alert.get('confidence', 0),
                 'confiabilidade': alert.get('reliability', 0),
-                'latitude': location.get('y'),
-                'longitude': location.get('x'),
+                'latitude': alert.get('location.y'),
+                'longitude': alert.get('location.x'),
                 'timestamp': alert.get('pubMillis', 0),
+                'cod_trecho': alert.get('cod_trecho'),
             }
             
             if 'ACCIDENT' in alert_type:
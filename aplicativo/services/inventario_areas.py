@@ -0,0 +1,750 @@
+"""
+Inventário das Áreas de Observação
+==================================
+
+Inventaria várias áreas (AreaObservacao) em uma única passada: cada camada
+de pontos (ocorrências, escolas, sirenes, câmeras) é carregada uma vez em
+um índice espacial (STRtree), e os polígonos de todas as áreas são
+consultados de uma vez contra cada índice.
+
+Alerts e jams do Waze (jams das routes e irregularities DYNAMIC, ver
+jams_do_snapshot) são testados direto nas coordenadas empacotadas do
+snapshot pelo kernel vetorizado (services/kernel_poligonos.py): todos os
+vértices de cada jam, com interseção segmento × borda da área, então um
+jam que só cruza a área no meio da linha também conta.
+
+Escolas, sirenes e câmeras mudam pouco e ficam em cache por
+CACHE_CAMADAS_FIXAS segundos em cada processo; ocorrências, o snapshot do
+Waze e o estado das sirenes são lidos a cada inventário.
+
+O resultado de cada área tem o mesmo formato de AreaObservacao.inventariar.
+
+Os polígonos de cada área vêm dos vértices empacotados da própria área
+(AreaObservacao.vertices) e a geometria preparada fica em cache por
+processo, por id e atualizado_em (geometria_da_area). O retângulo
+envolvente gravado na área (bbox_*) permite recortar no banco as áreas de
+um retângulo do mapa ou que podem conter um ponto (filtrar_por_retangulo,
+filtrar_por_ponto, areas_contendo).
+
+O comando inventariar_areas (cron) grava um snapshot (InventarioArea) por
+área agendada a cada INTERVALO_INVENTARIO; as páginas e APIs leem o
+último snapshot com obter_inventario e só recalculam quando forçado.
+
+Exemplo:
+    inventarios = inventariar_areas(AreaObservacao.objects.filter(ativa=True))
+    inventarios[area.id]['ocorrencias']['total']
+    resultado = inventariar_agendadas()
+    areas = areas_contendo(ocorrencia.longitude, ocorrencia.latitude)
+"""
+
+import logging
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import shapely
+from django.utils import timezone
+from shapely import STRtree
+
+from .geometria import ler_poligonos
+from .kernel_poligonos import PoligonosVetorizados
+
+logger = logging.getLogger(__name__)
+
+STATUS_OCORRENCIAS_ATIVAS = ['aberta', 'em_andamento', 'aguardando']
+PRIORIDADES_GRAVES = ('alta', 'urgente', 'critica')
+PRIORIDADES_LEVES = ('baixa', 'normal')
+MAXIMO_LISTA_OCORRENCIAS = 10
+
+# Segundos de cache das camadas fixas (escolas, sirenes, câmeras)
+CACHE_CAMADAS_FIXAS = 300
+
+# Intervalo entre snapshots de cada área no inventário agendado
+INTERVALO_INVENTARIO = timedelta(minutes=5)
+FOLGA_AGENDAMENTO = timedelta(seconds=30)
+
+# Áreas com geometria em cache por processo (o cache é esvaziado ao passar disso)
+MAXIMO_CACHE_GEOMETRIAS = 5000
+
+_camadas_fixas = None
+_camadas_fixas_em = 0.0
+
+# {area.id: (atualizado_em, poligonos, geometria preparada)}
+_geometrias_areas = {}
+
+
+def _coordenada(valor) -> Optional[float]:
+    """Converte latitude/longitude (número ou texto, com vírgula ou ponto)"""
+    if valor is None or valor == '':
+        return None
+    try:
+        return float(str(valor).strip().replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def sirene_acionada(fonte, status, tipo) -> bool:
+    """Mesma regra do mapa: COR pelo status 'ativa', Defesa Civil pelo tipo diferente de 'Desligada'"""
+    if fonte == 'COR':
+        return (status or '').lower() == 'ativa'
+    return bool(tipo) and tipo != 'Desligada'
+
+
+def poligono_da_area(geojson, partes=None):
+    """
+    Geometria Shapely (preparada) do polígono da área; None se não for polígono
+
+    `partes` evita ler o GeoJSON de novo quando o chamador já tem
+    ler_poligonos(geojson).
+    """
+    if partes is None:
+        partes = ler_poligonos(geojson)
+    poligonos = [shapely.Polygon(aneis[0], aneis[1:]) for aneis in partes]
+    if not poligonos:
+        return None
+
+    geometria = poligonos[0] if len(poligonos) == 1 else shapely.MultiPolygon(poligonos)
+    if not geometria.is_valid:
+        geometria = shapely.make_valid(geometria)
+    shapely.prepare(geometria)
+    return geometria
+
+
+def _coordenadas_coluna(valores: Iterable) -> np.ndarray:
+    """Coluna de coordenadas como float64 (ausentes e inválidas viram NaN)"""
+    coordenadas = [_coordenada(valor) for valor in valores]
+    return np.array([np.nan if valor is None else valor for valor in coordenadas], dtype=np.float64)
+
+
+def _linhas_selecionadas(tabela, indices: np.ndarray):
+    """Vértices (n, 2) e offsets das polylines 'line' dos registros `indices` da tabela"""
+    coordenadas, offsets = tabela.coordenadas_empacotadas()
+    vertices = np.frombuffer(coordenadas, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+
+    inicios = offsets[indices]
+    tamanhos = offsets[indices + 1] - inicios
+    novos_offsets = np.concatenate(([0], np.cumsum(tamanhos))).astype(np.int64)
+    posicoes = np.repeat(inicios - novos_offsets[:-1], tamanhos) + np.arange(novos_offsets[-1])
+    return vertices[posicoes], novos_offsets
+
+
+def jams_do_snapshot(snapshot) -> Dict:
+    """
+    Linhas e níveis de todos os congestionamentos do snapshot do Waze
+
+    Mesmas fontes de IntegradorWaze.obter_jams_para_mapa: jams das routes
+    (API TVT) ou, na falta deles, jams no nível raiz (API CCP), mais as
+    irregularities DYNAMIC (jamLevel).
+
+    Returns:
+        Dict com 'x', 'y' (vértices em sequência), 'offsets' (o jam i são
+        os vértices offsets[i]:offsets[i + 1]), 'niveis' e 'chaves'
+        (identificador do jam, para comparar coletas)
+    """
+    jams = snapshot.tabela('routes').todos_filhos('jams')
+    if not len(jams):
+        jams = snapshot.tabela('jams')
+    irregularidades = snapshot.tabela('irregularities')
+    dinamicas = np.array(
+        [i for i, tipo in enumerate(irregularidades.coluna('type')) if tipo == 'DYNAMIC'], dtype=np.int64
+    )
+
+    fontes = [
+        (
+            jams, np.arange(len(jams), dtype=np.int64),
+            [nivel or 0 for nivel in jams.coluna('level')],
+            [('jam', uuid if uuid is not None else id_) for uuid, id_ in zip(jams.coluna('uuid'), jams.coluna('id'))],
+        ),
+        (
+            irregularidades, dinamicas,
+            [3 if nivel is None else nivel for nivel in irregularidades.coluna('jamLevel')],
+            [('irregularidade', id_) for id_ in irregularidades.coluna('id')],
+        ),
+    ]
+
+    vertices, offsets, niveis, chaves = [], [np.zeros(1, dtype=np.int64)], [], []
+    total = 0
+    for tabela, indices, niveis_tabela, chaves_tabela in fontes:
+        if not len(indices):
+            continue
+        vertices_fonte, offsets_fonte = _linhas_selecionadas(tabela, indices)
+        vertices.append(vertices_fonte)
+        offsets.append(offsets_fonte[1:] + total)
+        total += int(offsets_fonte[-1])
+        niveis.extend(niveis_tabela[i] for i in indices.tolist())
+        chaves.extend(chaves_tabela[i] for i in indices.tolist())
+
+    vertices = np.concatenate(vertices) if vertices else np.empty((0, 2), dtype=np.float64)
+    return {
+        'x': vertices[:, 0],
+        'y': vertices[:, 1],
+        'offsets': np.concatenate(offsets),
+        'niveis': np.array(niveis, dtype=np.int64),
+        'chaves': chaves,
+    }
+
+
+# ========================================
+# GEOMETRIA DAS ÁREAS
+# ========================================
+
+def geometria_da_area(area):
+    """
+    Polígonos (formato de ler_poligonos) e geometria preparada da área
+
+    Em cache por processo enquanto area.atualizado_em não muda; áreas não
+    salvas são sempre lidas de novo.
+
+    Returns:
+        (poligonos, geometria); geometria é None se a área não é polígono
+    """
+    chave = area.atualizado_em
+    if chave is not None:
+        cacheada = _geometrias_areas.get(area.id)
+        if cacheada is not None and cacheada[0] == chave:
+            return cacheada[1], cacheada[2]
+
+    poligonos = area.poligonos
+    geometria = poligono_da_area(None, poligonos)
+    if chave is not None:
+        if len(_geometrias_areas) >= MAXIMO_CACHE_GEOMETRIAS:
+            _geometrias_areas.clear()
+        _geometrias_areas[area.id] = (chave, poligonos, geometria)
+    return poligonos, geometria
+
+
+def ponto_na_area(area, lon: float, lat: float) -> bool:
+    """Testa o ponto contra o retângulo da área e depois contra a geometria em cache"""
+    limites = area._get_bounds()
+    if not limites or not (limites['west'] <= lon <= limites['east'] and limites['south'] <= lat <= limites['north']):
+        return False
+    _, geometria = geometria_da_area(area)
+    return geometria is not None and bool(shapely.intersects_xy(geometria, lon, lat))
+
+
+def filtrar_por_retangulo(areas, limites):
+    """Áreas cujo retângulo envolvente cruza os limites (LimitesMapa), no banco"""
+    return areas.filter(
+        bbox_oeste__lte=limites.leste,
+        bbox_leste__gte=limites.oeste,
+        bbox_sul__lte=limites.norte,
+        bbox_norte__gte=limites.sul,
+    )
+
+
+def filtrar_por_ponto(areas, lon: float, lat: float):
+    """Áreas cujo retângulo envolvente contém o ponto, no banco"""
+    return areas.filter(
+        bbox_oeste__lte=lon,
+        bbox_leste__gte=lon,
+        bbox_sul__lte=lat,
+        bbox_norte__gte=lat,
+    )
+
+
+def areas_contendo(lon, lat, areas=None) -> List:
+    """
+    Áreas cujo polígono contém o ponto (padrão: áreas ativas)
+
+    O retângulo recorta as candidatas no banco; o teste exato usa a
+    geometria preparada em cache.
+    """
+    from ..models import AreaObservacao
+
+    lon, lat = _coordenada(lon), _coordenada(lat)
+    if lon is None or lat is None:
+        return []
+    if areas is None:
+        areas = AreaObservacao.objects.filter(ativa=True)
+
+    resultado = []
+    for area in filtrar_por_ponto(areas, lon, lat):
+        _, geometria = geometria_da_area(area)
+        if geometria is not None and shapely.intersects_xy(geometria, lon, lat):
+            resultado.append(area)
+    return resultado
+
+
+class CamadaInventario:
+    """Itens de uma camada com as geometrias em uma STRtree"""
+
+    def __init__(self, itens: List, geometrias: Sequence):
+        self.itens = itens
+        self.arvore = STRtree(geometrias) if itens else None
+
+    @classmethod
+    def de_pontos(cls, registros: Iterable, latitude, longitude, item=None) -> 'CamadaInventario':
+        """
+        Camada de pontos
+
+        Args:
+            registros: Registros da camada
+            latitude, longitude: Funções que extraem a coordenada do registro
+            item: Função que extrai o item guardado (padrão: o registro)
+        """
+        itens, xs, ys = [], [], []
+        for registro in registros:
+            lat = _coordenada(latitude(registro))
+            lon = _coordenada(longitude(registro))
+            if not lat or not lon:
+                continue
+            itens.append(item(registro) if item else registro)
+            xs.append(lon)
+            ys.append(lat)
+        return cls(itens, shapely.points(np.array(xs), np.array(ys)) if itens else [])
+
+    def __len__(self):
+        return len(self.itens)
+
+    def itens_por_area(self, poligonos: Sequence) -> List[List]:
+        """Itens que tocam cada polígono, na ordem original da camada"""
+        resultado = [[] for _ in poligonos]
+        if self.arvore is None or not len(poligonos):
+            return resultado
+
+        indices_area, indices_item = self.arvore.query(poligonos, predicate='intersects')
+        ordem = np.lexsort((indices_item, indices_area))
+        for area, item in zip(indices_area[ordem].tolist(), indices_item[ordem].tolist()):
+            resultado[area].append(self.itens[item])
+        return resultado
+
+
+def _carregar_camadas_fixas() -> Dict[str, CamadaInventario]:
+    """Escolas, sirenes e câmeras (cache por processo)"""
+    global _camadas_fixas, _camadas_fixas_em
+    from ..models import Cameras, EscolasMunicipais, Sirene
+
+    if _camadas_fixas is not None and time.monotonic() - _camadas_fixas_em < CACHE_CAMADAS_FIXAS:
+        return _camadas_fixas
+
+    camadas = {}
+    carregadores = {
+        'escolas': lambda: CamadaInventario.de_pontos(
+            EscolasMunicipais.objects.values_list('id', 'latitude', 'longitude'),
+            lambda r: r[1], lambda r: r[2], lambda r: r[0],
+        ),
+        'sirenes': lambda: CamadaInventario.de_pontos(
+            Sirene.objects.values_list('id', 'lat', 'lon'),
+            lambda r: r[1], lambda r: r[2], lambda r: r[0],
+        ),
+        'cameras': lambda: CamadaInventario.de_pontos(
+            Cameras.objects.values_list('id', 'lat', 'lon'),
+            lambda r: r[1], lambda r: r[2], lambda r: r[0],
+        ),
+    }
+    for nome, carregar in carregadores.items():
+        try:
+            camadas[nome] = carregar()
+        except Exception as e:
+            logger.error(f"Erro ao carregar camada {nome} do inventario: {e}")
+            camadas[nome] = None
+
+    _camadas_fixas = camadas
+    _camadas_fixas_em = time.monotonic()
+    return camadas
+
+
+def _sirenes_acionadas(ids: Iterable[int]) -> set:
+    """Ids das sirenes acionadas pelo último DadosSirene de cada uma"""
+    from django.db.models import Max
+    from ..models import DadosSirene
+
+    ids = set(ids)
+    if not ids:
+        return set()
+
+    ultimos = DadosSirene.objects.filter(estacao_id__in=ids).values('estacao_id').annotate(ultimo=Max('id'))
+    return {
+        estacao_id
+        for estacao_id, fonte, status, tipo in DadosSirene.objects.filter(
+            id__in=[linha['ultimo'] for linha in ultimos]
+        ).values_list('estacao_id', 'estacao__fonte', 'status', 'tipo')
+        if sirene_acionada(fonte, status, tipo)
+    }
+
+
+class InventarioAreas:
+    """
+    Inventário de um conjunto de áreas
+
+    Ocorrências são carregadas uma vez, limitadas ao retângulo que envolve
+    todas as áreas; o snapshot do Waze, uma vez por cliente.
+    """
+
+    def __init__(self, areas: Iterable):
+        self.areas = []
+        self.poligonos = []
+        self.partes = []
+        self.sem_poligono = []
+        for area in areas:
+            partes, poligono = geometria_da_area(area)
+            if poligono is None:
+                self.sem_poligono.append(area)
+            else:
+                self.areas.append(area)
+                self.poligonos.append(poligono)
+                self.partes.append(partes)
+
+    def inventariar(self) -> Dict:
+        """
+        Returns:
+            {area.id: inventario}; áreas sem polígono recebem {}
+        """
+        inventarios = {area.id: {} for area in self.sem_poligono}
+        if not self.areas:
+            return inventarios
+
+        for area, ocorrencias in zip(self.areas, self._ocorrencias()):
+            inventarios[area.id] = {'ocorrencias': ocorrencias}
+
+        por_cliente = {}
+        for i, area in enumerate(self.areas):
+            por_cliente.setdefault(area.cliente_id, []).append(i)
+
+        for cliente_id, indices in por_cliente.items():
+            waze = self._waze(cliente_id, PoligonosVetorizados([self.partes[i] for i in indices]))
+            for posicao, i in enumerate(indices):
+                inventarios[self.areas[i].id]['waze'] = waze[posicao]
+
+        camadas = _carregar_camadas_fixas()
+        self._fixas(camadas, inventarios)
+        return inventarios
+
+    # ========================================
+    # OCORRÊNCIAS E WAZE
+    # ========================================
+
+    def _ocorrencias(self) -> List[Dict]:
+        from ..models import OcorrenciaGerenciada
+
+        poligonos = self.poligonos
+        try:
+            oeste, sul, leste, norte = shapely.total_bounds(poligonos)
+            registros = OcorrenciaGerenciada.objects.filter(
+                status__in=STATUS_OCORRENCIAS_ATIVAS,
+                latitude__gte=sul,
+                latitude__lte=norte,
+                longitude__gte=oeste,
+                longitude__lte=leste,
+            ).values_list('id', 'titulo', 'status', 'prioridade', 'latitude', 'longitude')
+
+            camada = CamadaInventario.de_pontos(registros, lambda r: r[4], lambda r: r[5], lambda r: r[:4])
+        except Exception as e:
+            return [{'total': 0, 'erro': str(e)} for _ in poligonos]
+
+        resultado = []
+        for dentro in camada.itens_por_area(poligonos):
+            resultado.append({
+                'total': len(dentro),
+                'graves': len([o for o in dentro if o[3] in PRIORIDADES_GRAVES]),
+                'moderadas': len([o for o in dentro if o[3] == 'media']),
+                'leves': len([o for o in dentro if o[3] in PRIORIDADES_LEVES]),
+                'lista': [
+                    {'id': str(id_), 'titulo': titulo, 'status': status}
+                    for id_, titulo, status, _ in dentro[:MAXIMO_LISTA_OCORRENCIAS]
+                ],
+            })
+        return resultado
+
+    def _waze(self, cliente_id, kernel: PoligonosVetorizados) -> List[Dict]:
+        from ..models import DadosMobilidade
+
+        vazio = {'jams_total': 0, 'jams_severos': 0, 'acidentes': 0, 'interdicoes': 0, 'perigos': 0}
+        try:
+            ultimo = DadosMobilidade.objects.filter(cliente_id=cliente_id).order_by('-data_hora').first()
+            snapshot = ultimo.obter_snapshot() if ultimo else None
+            if not snapshot:
+                return [dict(vazio) for _ in range(len(kernel))]
+
+            jams = jams_do_snapshot(snapshot)
+            niveis = jams['niveis']
+            jams_por_area = kernel.linhas_por_poligono(jams['x'], jams['y'], jams['offsets'])
+
+            alerts = snapshot.tabela('alerts')
+            tipos = np.array([(tipo or '').upper() for tipo in alerts.coluna('type')], dtype=object)
+            alerts_por_area = kernel.pontos_por_poligono(
+                _coordenadas_coluna(alerts.coluna('location.x')),
+                _coordenadas_coluna(alerts.coluna('location.y')),
+            )
+        except Exception as e:
+            return [{'jams_total': 0, 'erro': str(e)} for _ in range(len(kernel))]
+
+        resultado = []
+        for indices_jams, indices_alerts in zip(jams_por_area, alerts_por_area):
+            tipos_dentro = tipos[indices_alerts]
+            resultado.append({
+                'jams_total': len(indices_jams),
+                'jams_severos': int(np.count_nonzero(niveis[indices_jams] >= 4)),
+                'acidentes': len([tipo for tipo in tipos_dentro if 'ACCIDENT' in tipo]),
+                'interdicoes': len([tipo for tipo in tipos_dentro if 'ROAD_CLOSED' in tipo]),
+                'perigos': len([tipo for tipo in tipos_dentro if 'HAZARD' in tipo]),
+            })
+        return resultado
+
+    # ========================================
+    # CAMADAS FIXAS
+    # ========================================
+
+    def _fixas(self, camadas: Dict, inventarios: Dict):
+        escolas = camadas.get('escolas')
+        cameras = camadas.get('cameras')
+        sirenes = camadas.get('sirenes')
+
+        por_area_escolas = escolas.itens_por_area(self.poligonos) if escolas else None
+        por_area_cameras = cameras.itens_por_area(self.poligonos) if cameras else None
+        por_area_sirenes = sirenes.itens_por_area(self.poligonos) if sirenes else None
+
+        acionadas = set()
+        if por_area_sirenes:
+            try:
+                acionadas = _sirenes_acionadas(
+                    sirene_id for dentro in por_area_sirenes for sirene_id in dentro
+                )
+            except Exception as e:
+                logger.error(f"Erro ao consultar estado das sirenes: {e}")
+
+        for i, area in enumerate(self.areas):
+            inventario = inventarios[area.id]
+            inventario['escolas'] = len(por_area_escolas[i]) if por_area_escolas else 0
+            if por_area_sirenes:
+                dentro = por_area_sirenes[i]
+                inventario['sirenes'] = {
+                    'total': len(dentro),
+                    'acionadas': len([sirene_id for sirene_id in dentro if sirene_id in acionadas]),
+                }
+            else:
+                inventario['sirenes'] = {'total': 0, 'acionadas': 0}
+            inventario['cameras'] = len(por_area_cameras[i]) if por_area_cameras else 0
+
+
+def inventariar_areas(areas: Optional[Iterable] = None) -> Dict:
+    """
+    Inventaria as áreas em uma passada (padrão: todas as áreas ativas)
+
+    Returns:
+        {area.id: inventario}
+    """
+    if areas is None:
+        from ..models import AreaObservacao
+        areas = AreaObservacao.objects.filter(ativa=True)
+
+    return InventarioAreas(areas).inventariar()
+
+
+# ========================================
+# ALERTAS E INVENTÁRIO AGENDADO
+# ========================================
+
+def verificar_e_gerar_alertas(area, inventario, nivel_atual, nivel_anterior=None):
+    """
+    Verifica condições e gera alertas se necessário
+
+    Deve ser chamada antes de gravar o snapshot do inventário atual: o
+    nível é comparado com o último snapshot da área (ou com
+    `nivel_anterior`, quando o chamador já o tem).
+
+    Returns:
+        Quantidade de alertas gerados
+    """
+    from ..models import AlertaArea
+
+    if not area.alerta_habilitado:
+        return 0
+
+    gerados = 0
+
+    # Buscar último inventário para comparar
+    if nivel_anterior is None:
+        ultimo_inv = area.inventarios.order_by('-data_hora').first()
+        nivel_anterior = ultimo_inv.nivel_operacional if ultimo_inv else 1
+
+    # Verificar mudança de nível
+    if nivel_atual > nivel_anterior:
+        gerados += 1
+        AlertaArea.objects.create(
+            area=area,
+            tipo='nivel_mudou',
+            titulo=f'Nível subiu para E{nivel_atual}',
+            descricao=f'O nível operacional da área "{area.nome}" subiu de E{nivel_anterior} para E{nivel_atual}.',
+            gravidade='critico' if nivel_atual >= 4 else 'atencao'
+        )
+
+    # Verificar ocorrências graves
+    ocorrencias_graves = inventario.get('ocorrencias', {}).get('graves', 0)
+    if ocorrencias_graves >= 3:
+        # Verificar se já não tem alerta recente
+        alerta_recente = AlertaArea.objects.filter(
+            area=area,
+            tipo='ocorrencia_grave',
+            data_hora__gte=timezone.now() - timedelta(minutes=30)
+        ).exists()
+
+        if not alerta_recente:
+            gerados += 1
+            AlertaArea.objects.create(
+                area=area,
+                tipo='ocorrencia_grave',
+                titulo=f'{ocorrencias_graves} ocorrências graves na área',
+                descricao=f'A área "{area.nome}" possui {ocorrencias_graves} ocorrências com prioridade alta/urgente/crítica.',
+                gravidade='critico'
+            )
+
+    # Verificar congestionamentos severos
+    jams_severos = inventario.get('waze', {}).get('jams_severos', 0)
+    if jams_severos >= 5:
+        alerta_recente = AlertaArea.objects.filter(
+            area=area,
+            tipo='jam_severo',
+            data_hora__gte=timezone.now() - timedelta(minutes=30)
+        ).exists()
+
+        if not alerta_recente:
+            gerados += 1
+            AlertaArea.objects.create(
+                area=area,
+                tipo='jam_severo',
+                titulo=f'{jams_severos} congestionamentos severos',
+                descricao=f'A área "{area.nome}" possui {jams_severos} congestionamentos de nível 4-5.',
+                gravidade='atencao'
+            )
+
+    # Verificar sirenes acionadas
+    sirenes_acionadas = inventario.get('sirenes', {}).get('acionadas', 0)
+    if sirenes_acionadas >= 1:
+        alerta_recente = AlertaArea.objects.filter(
+            area=area,
+            tipo='sirene_acionada',
+            data_hora__gte=timezone.now() - timedelta(minutes=60)
+        ).exists()
+
+        if not alerta_recente:
+            gerados += 1
+            AlertaArea.objects.create(
+                area=area,
+                tipo='sirene_acionada',
+                titulo=f'Sirene acionada na área!',
+                descricao=f'{sirenes_acionadas} sirene(s) acionada(s) na área "{area.nome}".',
+                gravidade='critico'
+            )
+
+    return gerados
+
+
+def areas_agendadas(agora=None):
+    """
+    Áreas ativas dentro do agendamento (mesma regra da listagem do mapa)
+
+    Áreas temporárias só entram entre evento_inicio e evento_fim do seu
+    grupo de importação (api_atualizar_agendamento_grupo).
+    """
+    from django.db.models import Q
+    from ..models import AreaObservacao
+
+    agora = agora or timezone.now()
+    return AreaObservacao.objects.filter(ativa=True).exclude(
+        Q(temporaria=True) & (Q(evento_inicio__gt=agora) | Q(evento_fim__lt=agora))
+    )
+
+
+def anotar_ultimo_inventario(areas):
+    """Anota ultimo_inventario (data_hora) e nivel_anterior do último snapshot de cada área"""
+    from django.db.models import OuterRef, Subquery
+    from ..models import InventarioArea
+
+    ultimo = InventarioArea.objects.filter(area=OuterRef('pk')).order_by('-data_hora')
+    return areas.annotate(
+        ultimo_inventario=Subquery(ultimo.values('data_hora')[:1]),
+        nivel_anterior=Subquery(ultimo.values('nivel_operacional')[:1]),
+    )
+
+
+def inventariar_e_alertar(areas: List, gerar_alertas: bool = True) -> Dict[str, int]:
+    """
+    Inventaria as áreas em uma passada e grava um snapshot por área
+
+    Os alertas são verificados antes de gravar os snapshots, contra o
+    nivel_anterior de anotar_ultimo_inventario.
+
+    Returns:
+        Dict com 'inventariadas' e 'alertas'
+    """
+    from ..models import InventarioArea
+
+    inventarios = inventariar_areas(areas)
+
+    snapshots = []
+    alertas = 0
+    for area in areas:
+        inventario = inventarios.get(area.id, {})
+        nivel = area.calcular_nivel_operacional(inventario)
+        if gerar_alertas:
+            try:
+                alertas += verificar_e_gerar_alertas(area, inventario, nivel, area.nivel_anterior or 1)
+            except Exception as e:
+                logger.error(f"Erro ao gerar alertas da area {area.nome}: {e}")
+        snapshots.append(InventarioArea(area=area, dados=inventario, nivel_operacional=nivel))
+
+    InventarioArea.objects.bulk_create(snapshots, batch_size=500)
+    return {'inventariadas': len(snapshots), 'alertas': alertas}
+
+
+def inventariar_agendadas(intervalo: timedelta = INTERVALO_INVENTARIO, forcar: bool = False,
+                          gerar_alertas: bool = True) -> Dict[str, int]:
+    """
+    Inventário em lote das áreas agendadas, um snapshot por área e intervalo
+
+    Áreas com snapshot mais recente que `intervalo` são puladas (a menos
+    que `forcar`), então o job pode rodar com qualquer frequência. Áreas
+    já atualizadas por eventos na ingestão (services/monitor_areas.py)
+    também são puladas.
+
+    Returns:
+        Dict com 'areas', 'inventariadas', 'puladas', 'alertas' e 'segundos'
+    """
+    inicio = time.perf_counter()
+    agora = timezone.now()
+
+    areas = list(anotar_ultimo_inventario(areas_agendadas(agora)))
+    # Folga para o job agendado exatamente no intervalo não pular uma execução
+    limite = agora - intervalo + FOLGA_AGENDAMENTO
+    pendentes = [
+        area for area in areas
+        if forcar or area.ultimo_inventario is None or area.ultimo_inventario <= limite
+    ]
+
+    resultado = inventariar_e_alertar(pendentes, gerar_alertas)
+
+    return {
+        'areas': len(areas),
+        'inventariadas': resultado['inventariadas'],
+        'puladas': len(areas) - resultado['inventariadas'],
+        'alertas': resultado['alertas'],
+        'segundos': round(time.perf_counter() - inicio, 2),
+    }
+
+
+def obter_inventario(area, forcar: bool = False, gerar_alertas: bool = True):
+    """
+    Último snapshot (InventarioArea) da área
+
+    Só inventaria quando `forcar` ou quando a área ainda não tem snapshot;
+    nesse caso grava um novo, depois de verificar os alertas.
+
+    Returns:
+        (InventarioArea, recalculado)
+    """
+    from ..models import InventarioArea
+
+    ultimo = area.inventarios.order_by('-data_hora').first()
+    if ultimo is not None and not forcar:
+        return ultimo, False
+
+    inventario = area.inventariar()
+    nivel = area.calcular_nivel_operacional(inventario)
+    if gerar_alertas:
+        verificar_e_gerar_alertas(area, inventario, nivel, ultimo.nivel_operacional if ultimo else 1)
+
+    snapshot = InventarioArea.objects.create(area=area, dados=inventario, nivel_operacional=nivel)
+    return snapshot, True
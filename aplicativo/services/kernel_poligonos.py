@@ -0,0 +1,292 @@
+"""
+Teste Vetorizado de Pontos e Linhas em Polígonos
+================================================
+
+Testa arrays inteiros de coordenadas (todos os alerts, todos os vértices
+dos jams) contra vários polígonos de uma vez, com NumPy:
+
+    - ponto em polígono: regra par-ímpar (ray casting) sobre todas as
+      arestas do polígono, em blocos de pontos × arestas
+    - linha em polígono: a linha toca o polígono se algum vértice está
+      dentro ou se algum segmento cruza alguma aresta (teste de
+      orientação, incluindo toques e segmentos colineares)
+
+Cada polígono pode ter várias partes e buracos (saída de ler_poligonos):
+todos os anéis entram na contagem par-ímpar. Antes do teste exato, os
+candidatos são recortados pelo retângulo envolvente do polígono, a partir
+de uma grade regular com células do tamanho típico dos polígonos.
+
+Coordenadas em (x, y) = (longitude, latitude). As linhas usam o mesmo
+formato empacotado do snapshot do Waze: arrays x e y de todos os
+vértices e offsets (a linha i são os vértices offsets[i]:offsets[i + 1]).
+
+Exemplo:
+    kernel = PoligonosVetorizados([ler_poligonos(area.geojson) for area in areas])
+    alerts_por_area = kernel.pontos_por_poligono(xs, ys)
+    jams_por_area = kernel.linhas_por_poligono(xs_jams, ys_jams, offsets)
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+
+# Elementos (pontos × arestas) de cada bloco das matrizes temporárias
+ELEMENTOS_BLOCO = 1 << 18
+
+# Máximo de células por lado da grade de candidatos
+CELULAS_POR_LADO = 1024
+
+_VAZIO = np.empty(0, dtype=np.int64)
+
+
+class PoligonosVetorizados:
+    """Arestas de vários polígonos em arrays contíguos, um intervalo por polígono"""
+
+    def __init__(self, poligonos: Sequence[List]):
+        """
+        Args:
+            poligonos: Um item por polígono, no formato de ler_poligonos
+                (lista de partes, cada parte [anel externo, buracos...])
+        """
+        origens, destinos = [], []
+        inicios = [0]
+        for partes in poligonos:
+            for aneis in partes:
+                for anel in aneis:
+                    vertices = np.asarray(anel, dtype=np.float64).reshape(-1, 2)
+                    # Anel fechado (último = primeiro): sem a aresta degenerada
+                    if len(vertices) > 1 and np.array_equal(vertices[0], vertices[-1]):
+                        vertices = vertices[:-1]
+                    if len(vertices) < 3:
+                        continue
+                    origens.append(vertices)
+                    destinos.append(np.roll(vertices, -1, axis=0))
+            inicios.append(sum(len(v) for v in origens))
+
+        origens = np.concatenate(origens) if origens else np.empty((0, 2))
+        destinos = np.concatenate(destinos) if destinos else np.empty((0, 2))
+        self._x1, self._y1 = origens[:, 0].copy(), origens[:, 1].copy()
+        self._x2, self._y2 = destinos[:, 0].copy(), destinos[:, 1].copy()
+        self._inicios = np.asarray(inicios, dtype=np.int64)
+
+        # Variação de x por unidade de y (arestas horizontais nunca são cruzadas pelo raio)
+        dy = self._y2 - self._y1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._inclinacao = np.where(dy != 0, (self._x2 - self._x1) / dy, 0.0)
+
+        # (oeste, sul, leste, norte) de cada polígono; NaN quando não há arestas
+        self.limites = np.full((len(poligonos), 4), np.nan)
+        for k in range(len(poligonos)):
+            a, b = self._inicios[k], self._inicios[k + 1]
+            if a < b:
+                self.limites[k] = (
+                    self._x1[a:b].min(), self._y1[a:b].min(),
+                    self._x1[a:b].max(), self._y1[a:b].max(),
+                )
+
+    def __len__(self):
+        return len(self.limites)
+
+    # ========================================
+    # PONTOS
+    # ========================================
+
+    def _dentro(self, k: int, px: np.ndarray, py: np.ndarray) -> np.ndarray:
+        """Máscara dos pontos dentro do polígono k (par-ímpar sobre todas as arestas)"""
+        a, b = self._inicios[k], self._inicios[k + 1]
+        x1, y1, y2 = self._x1[a:b], self._y1[a:b], self._y2[a:b]
+        inclinacao = self._inclinacao[a:b]
+
+        dentro = np.zeros(len(px), dtype=bool)
+        passo = max(1, ELEMENTOS_BLOCO // max(b - a, 1))
+        for i in range(0, len(px), passo):
+            bx = px[i:i + passo, None]
+            by = py[i:i + passo, None]
+            cruza = (y1 > by) != (y2 > by)
+            cruza &= bx < x1 + (by - y1) * inclinacao
+            dentro[i:i + passo] = np.count_nonzero(cruza, axis=1) & 1
+        return dentro
+
+    def _grade(self, xs, ys) -> '_Grade':
+        """Grade com células do tamanho típico dos polígonos"""
+        validos = self.limites[~np.isnan(self.limites[:, 0])]
+        lados = np.maximum(validos[:, 2] - validos[:, 0], validos[:, 3] - validos[:, 1])
+        return _Grade(xs, ys, float(np.median(lados)) if len(lados) else 0.0)
+
+    def pontos_por_poligono(self, xs, ys) -> List[np.ndarray]:
+        """
+        Pontos dentro de cada polígono
+
+        Args:
+            xs, ys: Coordenadas dos pontos (NaN nunca está dentro)
+
+        Returns:
+            Um array de índices (crescentes) dos pontos por polígono
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        resultado = [_VAZIO] * len(self)
+        if not len(xs):
+            return resultado
+
+        grade = self._grade(xs, ys)
+        for k, (oeste, sul, leste, norte) in enumerate(self.limites):
+            if np.isnan(oeste):
+                continue
+            candidatos = grade.candidatos(oeste, sul, leste, norte)
+            candidatos = candidatos[
+                (xs[candidatos] >= oeste) & (xs[candidatos] <= leste)
+                & (ys[candidatos] >= sul) & (ys[candidatos] <= norte)
+            ]
+            if not len(candidatos):
+                continue
+            candidatos.sort()
+            resultado[k] = candidatos[self._dentro(k, xs[candidatos], ys[candidatos])]
+        return resultado
+
+    # ========================================
+    # LINHAS
+    # ========================================
+
+    def _cruzam(self, k: int, sx1, sy1, sx2, sy2) -> np.ndarray:
+        """Máscara dos segmentos que cruzam ou tocam alguma aresta do polígono k"""
+        a, b = self._inicios[k], self._inicios[k + 1]
+        ex1, ey1, ex2, ey2 = self._x1[a:b], self._y1[a:b], self._x2[a:b], self._y2[a:b]
+        edx, edy = ex2 - ex1, ey2 - ey1
+        e_xmin, e_xmax = np.minimum(ex1, ex2), np.maximum(ex1, ex2)
+        e_ymin, e_ymax = np.minimum(ey1, ey2), np.maximum(ey1, ey2)
+
+        cruzam = np.zeros(len(sx1), dtype=bool)
+        passo = max(1, ELEMENTOS_BLOCO // max(b - a, 1))
+        for i in range(0, len(sx1), passo):
+            ax, ay = sx1[i:i + passo, None], sy1[i:i + passo, None]
+            bx, by = sx2[i:i + passo, None], sy2[i:i + passo, None]
+            sdx, sdy = bx - ax, by - ay
+
+            # Extremos do segmento em lados opostos (ou sobre) a aresta, e vice-versa
+            d1 = edx * (ay - ey1) - edy * (ax - ex1)
+            d2 = edx * (by - ey1) - edy * (bx - ex1)
+            teste = d1 * d2 <= 0
+            d3 = sdx * (ey1 - ay) - sdy * (ex1 - ax)
+            d4 = sdx * (ey2 - ay) - sdy * (ex2 - ax)
+            teste &= d3 * d4 <= 0
+
+            # Retângulos sobrepostos: descarta colineares sem sobreposição
+            teste &= (np.minimum(ax, bx) <= e_xmax) & (np.maximum(ax, bx) >= e_xmin)
+            teste &= (np.minimum(ay, by) <= e_ymax) & (np.maximum(ay, by) >= e_ymin)
+            cruzam[i:i + passo] = teste.any(axis=1)
+        return cruzam
+
+    def linhas_por_poligono(self, xs, ys, offsets) -> List[np.ndarray]:
+        """
+        Linhas que tocam cada polígono (vértice dentro ou segmento cruzando a borda)
+
+        Args:
+            xs, ys: Vértices de todas as linhas, em sequência
+            offsets: len(linhas) + 1 posições; a linha i são os vértices
+                offsets[i]:offsets[i + 1]
+
+        Returns:
+            Um array de índices (crescentes) das linhas por polígono
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        resultado = [_VAZIO] * len(self)
+        if not len(xs) or len(offsets) < 2:
+            return resultado
+
+        linha_do_vertice = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        vertices_dentro = self.pontos_por_poligono(xs, ys)
+
+        # Segmentos: todo vértice que não é o último da sua linha
+        inicio_segmento = np.ones(len(xs), dtype=bool)
+        inicio_segmento[offsets[1:][offsets[1:] > 0] - 1] = False
+        segmentos = np.flatnonzero(inicio_segmento)
+        sx1, sy1 = xs[segmentos], ys[segmentos]
+        sx2, sy2 = xs[segmentos + 1], ys[segmentos + 1]
+        linha_do_segmento = linha_do_vertice[segmentos]
+
+        s_xmin = np.minimum(sx1, sx2)
+        s_xmax = np.maximum(sx1, sx2)
+        s_ymin = np.minimum(sy1, sy2)
+        s_ymax = np.maximum(sy1, sy2)
+
+        # Segmentos na grade pelo canto sudoeste; a busca estende o retângulo
+        # do polígono pela maior largura/altura de segmento
+        grade = self._grade(s_xmin, s_ymin)
+        largura = float(np.nanmax(s_xmax - s_xmin)) if len(segmentos) else 0.0
+        altura = float(np.nanmax(s_ymax - s_ymin)) if len(segmentos) else 0.0
+
+        marcadas = np.zeros(len(offsets) - 1, dtype=bool)
+        for k, (oeste, sul, leste, norte) in enumerate(self.limites):
+            if np.isnan(oeste):
+                continue
+            dentro = np.unique(linha_do_vertice[vertices_dentro[k]])
+            marcadas[dentro] = True
+
+            # Segmentos cujo retângulo cruza o do polígono, de linhas ainda sem vértice dentro
+            candidatos = grade.candidatos(oeste - largura, sul - altura, leste, norte)
+            candidatos = candidatos[
+                (s_xmin[candidatos] <= leste) & (s_xmax[candidatos] >= oeste)
+                & (s_ymin[candidatos] <= norte) & (s_ymax[candidatos] >= sul)
+            ]
+            candidatos = candidatos[~marcadas[linha_do_segmento[candidatos]]]
+            marcadas[dentro] = False
+
+            if len(candidatos):
+                cruzam = self._cruzam(k, sx1[candidatos], sy1[candidatos], sx2[candidatos], sy2[candidatos])
+                dentro = np.union1d(dentro, linha_do_segmento[candidatos[cruzam]])
+            resultado[k] = dentro
+        return resultado
+
+
+class _Grade:
+    """
+    Índice de pontos em uma grade regular
+
+    Os pontos ficam ordenados pela célula (linha * colunas + coluna), então
+    as células de uma linha da grade dentro de um retângulo formam um
+    intervalo contíguo, encontrado por busca binária.
+    """
+
+    def __init__(self, xs: np.ndarray, ys: np.ndarray, celula: float):
+        validos = np.flatnonzero(~(np.isnan(xs) | np.isnan(ys)))
+        self.vazia = not len(validos)
+        if self.vazia:
+            return
+
+        xs, ys = xs[validos], ys[validos]
+        self.x0, self.y0 = float(xs.min()), float(ys.min())
+        extensao = max(float(xs.max()) - self.x0, float(ys.max()) - self.y0)
+        # Célula nula (polígonos degenerados) ou grade grande demais: limitar as células por lado
+        self.celula = max(celula, extensao / CELULAS_POR_LADO, 1e-9)
+
+        colunas = ((xs - self.x0) / self.celula).astype(np.int64)
+        linhas = ((ys - self.y0) / self.celula).astype(np.int64)
+        self.colunas = int(colunas.max()) + 1
+        self.linhas = int(linhas.max()) + 1
+
+        chaves = linhas * self.colunas + colunas
+        ordem = np.argsort(chaves, kind='stable')
+        self.indices = validos[ordem]
+        self.chaves = chaves[ordem]
+
+    def _celula(self, valor: float, origem: float) -> int:
+        return int(np.floor((valor - origem) / self.celula))
+
+    def candidatos(self, oeste: float, sul: float, leste: float, norte: float) -> np.ndarray:
+        """Índices dos pontos nas células que cruzam o retângulo"""
+        if self.vazia:
+            return _VAZIO
+
+        c0, c1 = self._celula(oeste, self.x0), self._celula(leste, self.x0)
+        l0, l1 = self._celula(sul, self.y0), self._celula(norte, self.y0)
+        if c1 < 0 or l1 < 0 or c0 >= self.colunas or l0 >= self.linhas:
+            return _VAZIO
+        c0, c1 = max(c0, 0), min(c1, self.colunas - 1)
+        linhas = np.arange(max(l0, 0), min(l1, self.linhas - 1) + 1) * self.colunas
+
+        inicios = np.searchsorted(self.chaves, linhas + c0, side='left')
+        fins = np.searchsorted(self.chaves, linhas + c1, side='right')
+        return np.concatenate([self.indices[a:b] for a, b in zip(inicios, fins)])
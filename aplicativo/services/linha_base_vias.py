@@ -0,0 +1,132 @@
+"""
+Linha de Base de Velocidade por Trecho
+======================================
+
+Mantém, para cada trecho do feed Waze, a velocidade típica por dia da
+semana e faixa de 15 minutos (LinhaBaseVia), atualizada a cada coleta
+com média e variância incrementais (Welford). Não há varredura do
+histórico: cada coleta lê e grava apenas as linhas da faixa atual.
+
+Uma amostra é anômala quando está LIMIAR_ZSCORE desvios-padrão abaixo da
+média da sua faixa (com pelo menos MINIMO_AMOSTRAS amostras anteriores).
+
+Exemplo:
+    atualizar_linha_base(cliente, {'Av. Brasil': 18.5}, timezone.now())
+    anomalias = obter_anomalias(cliente, desde=snapshot.data_hora)
+"""
+
+from typing import Dict, Iterable, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+# Amostras anteriores necessárias para avaliar anomalias
+MINIMO_AMOSTRAS = 4
+
+# Desvios-padrão abaixo da média para considerar o trecho anômalo
+LIMIAR_ZSCORE = 2.0
+
+MINUTOS_FAIXA = 15
+
+
+def faixa_do_horario(data_hora) -> Tuple[int, int]:
+    """Retorna (dia da semana, faixa de 15 minutos) no fuso local"""
+    local = timezone.localtime(data_hora)
+    return local.weekday(), (local.hour * 60 + local.minute) // MINUTOS_FAIXA
+
+
+def atualizar_linha_base(cliente, velocidades: Dict[str, float], data_hora) -> Dict[str, int]:
+    """
+    Inclui as velocidades de uma coleta na linha de base
+
+    Args:
+        cliente: Cliente da coleta
+        velocidades: {chave_via: velocidade em km/h}
+        data_hora: Momento da coleta
+
+    Returns:
+        Dict com 'atualizadas', 'criadas' e 'anomalas'
+    """
+    from ..models import LinhaBaseVia
+
+    dia_semana, faixa = faixa_do_horario(data_hora)
+
+    existentes = {
+        linha.chave_via: linha
+        for linha in LinhaBaseVia.objects.filter(
+            cliente=cliente,
+            dia_semana=dia_semana,
+            faixa_horaria=faixa,
+        )
+    }
+
+    linhas = []
+    criadas = anomalas = 0
+    for chave, velocidade in velocidades.items():
+        linha = existentes.get(chave[:300])
+        if linha is None:
+            linha = LinhaBaseVia(
+                cliente=cliente,
+                chave_via=chave[:300],
+                dia_semana=dia_semana,
+                faixa_horaria=faixa,
+            )
+            criadas += 1
+        else:
+            # Regravada pelo upsert (conflito na chave única), não pelo id
+            linha.pk = None
+
+        linha.registrar(velocidade, data_hora, MINIMO_AMOSTRAS)
+        if linha.ultimo_zscore is not None and linha.ultimo_zscore >= LIMIAR_ZSCORE:
+            anomalas += 1
+        linhas.append(linha)
+
+    # Upsert em lote: bulk_update (CASE WHEN) fica lento com milhares de trechos
+    with transaction.atomic():
+        LinhaBaseVia.objects.bulk_create(
+            linhas,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['cliente', 'chave_via', 'dia_semana', 'faixa_horaria'],
+            update_fields=['amostras', 'media_kmh', 'm2', 'ultima_velocidade_kmh', 'ultimo_zscore', 'ultima_amostra'],
+        )
+
+    return {'atualizadas': len(linhas) - criadas, 'criadas': criadas, 'anomalas': anomalas}
+
+
+def obter_linhas_base(cliente, chaves: Iterable[str], data_hora=None) -> Dict:
+    """
+    Linhas de base da faixa de data_hora (padrão: agora) para os trechos
+
+    Returns:
+        {chave_via: LinhaBaseVia}
+    """
+    from ..models import LinhaBaseVia
+
+    dia_semana, faixa = faixa_do_horario(data_hora or timezone.now())
+
+    return {
+        linha.chave_via: linha
+        for linha in LinhaBaseVia.objects.filter(
+            cliente=cliente,
+            dia_semana=dia_semana,
+            faixa_horaria=faixa,
+            chave_via__in=list(set(chaves)),
+        )
+    }
+
+
+def obter_anomalias(cliente, desde):
+    """
+    Trechos anômalos na última amostra (a partir de `desde`)
+
+    Returns:
+        QuerySet de LinhaBaseVia, mais anômalos primeiro
+    """
+    from ..models import LinhaBaseVia
+
+    return LinhaBaseVia.objects.filter(
+        cliente=cliente,
+        ultima_amostra__gte=desde,
+        ultimo_zscore__gte=LIMIAR_ZSCORE,
+    ).order_by('-ultimo_zscore')
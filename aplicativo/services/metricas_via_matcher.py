@@ -0,0 +1,229 @@
+"""
+Métricas do ViaMatcher
+======================
+
+Contadores e histogramas de latência por etapa do matching (exato_cache,
+exato_banco, fuzzy_cache, fuzzy_banco, espacial, nao_encontrado), origem
+da resolução (cache, LRU, tabela ResolucaoVia, calculada) e os nomes do
+Waze mais frequentes sem match.
+
+Cada processo acumula em memória e publica a cada INTERVALO_PUBLICACAO
+segundos uma linha em MetricaViaMatcher (uma por processo); o comando
+metricas_via_matcher e a API /api/mob/via-matcher/metricas/ somam as
+linhas recentes de todos os workers.
+
+Exemplo:
+    metricas = MetricasViaMatcher()
+    metricas.registrar('fuzzy_cache', 'calculado', 0.0042)
+    resumo = resumir_metricas(agregar_metricas(horas=24))
+"""
+
+import logging
+import os
+import socket
+import time
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Limites superiores (microssegundos) das faixas do histograma; a última
+# faixa acumula o que passar de 1 s
+LIMITES_US = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 1000000]
+
+# Segundos entre publicações de cada processo
+INTERVALO_PUBLICACAO = 60
+
+# Nomes sem match mantidos por processo (e publicados)
+MAXIMO_NAO_ENCONTRADOS = 2000
+TOP_NAO_ENCONTRADOS_PUBLICADOS = 200
+
+
+def _etapa_vazia() -> Dict:
+    return {'total': 0, 'soma_us': 0.0, 'max_us': 0.0, 'histograma': [0] * (len(LIMITES_US) + 1)}
+
+
+def _somar_etapa(destino: Dict, origem: Dict):
+    destino['total'] += origem['total']
+    destino['soma_us'] += origem['soma_us']
+    destino['max_us'] = max(destino['max_us'], origem['max_us'])
+    for i, quantidade in enumerate(origem['histograma'][:len(destino['histograma'])]):
+        destino['histograma'][i] += quantidade
+
+
+def _percentil_us(etapa: Dict, fracao: float) -> Optional[float]:
+    """Limite superior da faixa que contém o percentil (no máximo, o maior valor medido)"""
+    histograma = etapa['histograma']
+    total = sum(histograma)
+    if not total:
+        return None
+    alvo = total * fracao
+    acumulado = 0
+    for i, quantidade in enumerate(histograma):
+        acumulado += quantidade
+        if acumulado >= alvo:
+            limite = LIMITES_US[i] if i < len(LIMITES_US) else etapa['max_us']
+            return round(min(float(limite), etapa['max_us']), 1)
+    return None
+
+
+class MetricasViaMatcher:
+    """Métricas de um processo (uma instância por ViaMatcher)"""
+
+    def __init__(self):
+        self.processo = f'{socket.gethostname()}:{os.getpid()}'
+        self.zerar()
+
+    def zerar(self):
+        self.inicio = timezone.now()
+        self.etapas = {}
+        self.origens = Counter()
+        self.nao_encontrados = Counter()
+        self._ultima_publicacao = time.monotonic()
+
+    def registrar(self, metodo: str, origem: str, duracao_s: float, nome: Optional[str] = None):
+        """
+        Registra uma busca
+
+        Args:
+            metodo: Metodo retornado pelo matcher (etapa)
+            origem: cache, lru, tabela, banco, calculado, espacial ou vazio
+            duracao_s: Duração da busca em segundos
+            nome: Nome do Waze (contado quando não há match)
+        """
+        duracao_us = duracao_s * 1_000_000
+        etapa = self.etapas.get(metodo)
+        if etapa is None:
+            etapa = self.etapas[metodo] = _etapa_vazia()
+
+        etapa['total'] += 1
+        etapa['soma_us'] += duracao_us
+        if duracao_us > etapa['max_us']:
+            etapa['max_us'] = duracao_us
+
+        faixa = len(LIMITES_US)
+        for i, limite in enumerate(LIMITES_US):
+            if duracao_us <= limite:
+                faixa = i
+                break
+        etapa['histograma'][faixa] += 1
+
+        self.origens[origem] += 1
+
+        if metodo == 'nao_encontrado' and nome:
+            self.nao_encontrados[nome] += 1
+            if len(self.nao_encontrados) > MAXIMO_NAO_ENCONTRADOS:
+                self.nao_encontrados = Counter(dict(
+                    self.nao_encontrados.most_common(MAXIMO_NAO_ENCONTRADOS // 2)
+                ))
+
+        if time.monotonic() - self._ultima_publicacao >= INTERVALO_PUBLICACAO:
+            self.publicar()
+
+    def como_dict(self) -> Dict:
+        return {
+            'inicio': self.inicio.isoformat(),
+            'etapas': self.etapas,
+            'origens': dict(self.origens),
+            'nao_encontrados': dict(self.nao_encontrados.most_common(TOP_NAO_ENCONTRADOS_PUBLICADOS)),
+        }
+
+    def publicar(self):
+        """Grava as métricas deste processo em MetricaViaMatcher"""
+        from ..models import MetricaViaMatcher
+
+        self._ultima_publicacao = time.monotonic()
+        if not self.etapas:
+            return
+
+        try:
+            with transaction.atomic():
+                MetricaViaMatcher.objects.update_or_create(
+                    processo=self.processo,
+                    defaults={'dados': self.como_dict(), 'inicio': self.inicio},
+                )
+        except DatabaseError as e:
+            logger.warning(f"Erro ao publicar metricas do ViaMatcher: {e}")
+
+
+def agregar_metricas(horas: int = 24, locais: Optional[MetricasViaMatcher] = None) -> Dict:
+    """
+    Soma as métricas publicadas nas últimas `horas`
+
+    Args:
+        horas: Janela de atualização das linhas consideradas
+        locais: Métricas em memória deste processo (substituem a linha
+            publicada por ele, que pode estar defasada)
+
+    Returns:
+        Dict com 'processos', 'etapas', 'origens' e 'nao_encontrados'
+    """
+    from ..models import MetricaViaMatcher
+
+    linhas = MetricaViaMatcher.objects.filter(
+        atualizado_em__gte=timezone.now() - timedelta(hours=horas)
+    )
+    if locais is not None:
+        linhas = linhas.exclude(processo=locais.processo)
+
+    dados = [linha.dados for linha in linhas]
+    if locais is not None and locais.etapas:
+        dados.append(locais.como_dict())
+
+    etapas = {}
+    origens = Counter()
+    nao_encontrados = Counter()
+    for item in dados:
+        for metodo, etapa in (item.get('etapas') or {}).items():
+            _somar_etapa(etapas.setdefault(metodo, _etapa_vazia()), etapa)
+        origens.update(item.get('origens') or {})
+        nao_encontrados.update(item.get('nao_encontrados') or {})
+
+    return {
+        'processos': len(dados),
+        'etapas': etapas,
+        'origens': dict(origens),
+        'nao_encontrados': dict(nao_encontrados),
+    }
+
+
+def resumir_metricas(metricas: Dict, top: int = 20) -> Dict:
+    """
+    Resumo legível: latência (média, p50, p95, p99, máx) por etapa,
+    taxas de acerto e os `top` nomes sem match
+    """
+    etapas = metricas.get('etapas') or {}
+    total = sum(etapa['total'] for etapa in etapas.values())
+
+    resumo_etapas = {}
+    for metodo, etapa in sorted(etapas.items(), key=lambda item: -item[1]['total']):
+        resumo_etapas[metodo] = {
+            'total': etapa['total'],
+            'percentual': round(etapa['total'] / total * 100, 1) if total else 0,
+            'media_us': round(etapa['soma_us'] / etapa['total'], 1) if etapa['total'] else 0,
+            'p50_us': _percentil_us(etapa, 0.50),
+            'p95_us': _percentil_us(etapa, 0.95),
+            'p99_us': _percentil_us(etapa, 0.99),
+            'max_us': round(etapa['max_us'], 1),
+            'histograma': dict(zip([str(limite) for limite in LIMITES_US] + ['mais'], etapa['histograma'])),
+        }
+
+    origens = metricas.get('origens') or {}
+    total_origens = sum(origens.values())
+    sem_match = etapas.get('nao_encontrado', {}).get('total', 0)
+
+    return {
+        'processos': metricas.get('processos', 1),
+        'total_buscas': total,
+        'taxa_match': round((total - sem_match) / total * 100, 1) if total else None,
+        'taxa_sem_matching': round(
+            sum(origens.get(origem, 0) for origem in ('cache', 'lru', 'tabela')) / total_origens * 100, 1
+        ) if total_origens else None,
+        'origens': origens,
+        'etapas': resumo_etapas,
+        'top_nao_encontrados': Counter(metricas.get('nao_encontrados') or {}).most_common(top),
+    }
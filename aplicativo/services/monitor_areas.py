@@ -0,0 +1,242 @@
+"""
+Monitoramento das Áreas de Observação na Ingestão
+=================================================
+
+Quando chega um evento novo (ocorrência gravada, alert ou jam severo novo
+em uma coleta do Waze, sirene que passou a acionada), descobre quais
+áreas o contêm por um índice espacial (STRtree) sobre os polígonos de
+todas as áreas agendadas, e inventaria e verifica os alertas apenas
+dessas áreas (inventario_areas.inventariar_e_alertar).
+
+Assim os alertas das áreas saem no momento da ingestão; o inventário
+agendado (comando inventariar_areas) pula as áreas já atualizadas por
+eventos e fica para o que não gera evento (ex.: jams que se desfazem).
+
+O índice é mantido por processo e refeito quando muda o conjunto de
+áreas agendadas (quantidade ou último atualizado_em).
+
+Ganchos (erros são registrados no log e nunca interrompem a ingestão):
+    post_save de OcorrenciaGerenciada  -> verificar_ocorrencia (após o commit)
+    post_save de DadosSirene           -> verificar_dados_sirene (após o commit)
+    IntegradorWaze.coletar_dados       -> verificar_coleta_waze
+
+Exemplo:
+    ids = indice_areas().areas_com([shapely.Point(lon, lat)])
+    atualizar_areas(ids)
+"""
+
+import logging
+from typing import Dict, Iterable, Optional, Set
+
+import numpy as np
+import shapely
+from django.db import transaction
+from shapely import STRtree
+
+from .inventario_areas import (
+    _coordenada,
+    anotar_ultimo_inventario,
+    areas_agendadas,
+    geometria_da_area,
+    inventariar_e_alertar,
+    jams_do_snapshot,
+    sirene_acionada,
+)
+
+logger = logging.getLogger(__name__)
+
+# Tipos de alert do Waze que entram no inventário das áreas
+TIPOS_ALERTA_WAZE = ('ACCIDENT', 'ROAD_CLOSED', 'HAZARD')
+
+# Nível mínimo dos jams que disparam a verificação (jams_severos do inventário)
+NIVEL_JAM_SEVERO = 4
+
+_indice = None
+_indice_versao = None
+
+
+class IndiceAreas:
+    """STRtree com os polígonos (preparados) de um conjunto de áreas"""
+
+    def __init__(self, areas: Iterable):
+        self.ids = []
+        self.clientes = []
+        geometrias = []
+        for area in areas:
+            _, geometria = geometria_da_area(area)
+            if geometria is None:
+                continue
+            self.ids.append(area.id)
+            self.clientes.append(area.cliente_id)
+            geometrias.append(geometria)
+        self.arvore = STRtree(geometrias) if geometrias else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def areas_com(self, geometrias, cliente_id=None) -> Set:
+        """
+        Ids das áreas que tocam alguma das geometrias
+
+        Args:
+            geometrias: Pontos ou linhas (Shapely)
+            cliente_id: Restringe às áreas do cliente (eventos do Waze)
+        """
+        geometrias = [g for g in geometrias if g is not None]
+        if self.arvore is None or not geometrias:
+            return set()
+
+        _, indices = self.arvore.query(geometrias, predicate='intersects')
+        return {
+            self.ids[i] for i in np.unique(indices).tolist()
+            if cliente_id is None or self.clientes[i] == cliente_id
+        }
+
+
+def indice_areas() -> IndiceAreas:
+    """Índice das áreas agendadas (cache por processo, refeito quando as áreas mudam)"""
+    global _indice, _indice_versao
+    from django.db.models import Count, Max
+
+    areas = areas_agendadas()
+    versao = areas.aggregate(total=Count('id'), atualizado_em=Max('atualizado_em'))
+    versao = (versao['total'], versao['atualizado_em'])
+    if _indice is None or versao != _indice_versao:
+        _indice = IndiceAreas(areas.only('id', 'cliente_id', 'geojson', 'vertices', 'atualizado_em'))
+        _indice_versao = versao
+    return _indice
+
+
+def atualizar_areas(ids: Iterable, motivo: str = '') -> Dict[str, int]:
+    """
+    Inventaria as áreas, verifica os alertas e grava um snapshot de cada
+
+    Returns:
+        Dict com 'inventariadas' e 'alertas'
+    """
+    from ..models import AreaObservacao
+
+    ids = set(ids)
+    if not ids:
+        return {'inventariadas': 0, 'alertas': 0}
+
+    areas = list(anotar_ultimo_inventario(AreaObservacao.objects.filter(id__in=ids)))
+    resultado = inventariar_e_alertar(areas)
+    if resultado['alertas']:
+        logger.info(f"{resultado['alertas']} alertas de area gerados ({motivo or 'evento'})")
+    return resultado
+
+
+def _ponto(longitude, latitude) -> Optional[shapely.Point]:
+    lon, lat = _coordenada(longitude), _coordenada(latitude)
+    if lon is None or lat is None:
+        return None
+    return shapely.Point(lon, lat)
+
+
+# ========================================
+# GANCHOS DE INGESTÃO
+# ========================================
+
+def agendar_verificacao(funcao, objeto, **kwargs):
+    """Executa funcao(objeto, **kwargs) depois do commit da transação corrente"""
+    def executar():
+        try:
+            funcao(objeto, **kwargs)
+        except Exception as e:
+            logger.error(f"Erro ao verificar areas de observacao ({funcao.__name__}): {e}")
+
+    transaction.on_commit(executar)
+
+
+def verificar_ocorrencia(ocorrencia, localizacao_anterior=None) -> Dict[str, int]:
+    """
+    Atualiza as áreas que contêm a ocorrência (entrada, mudança de prioridade ou status)
+
+    Args:
+        ocorrencia: OcorrenciaGerenciada gravada
+        localizacao_anterior: (longitude, latitude) antes da edição; as
+            áreas que continham a posição anterior também são atualizadas
+    """
+    pontos = [_ponto(ocorrencia.longitude, ocorrencia.latitude)]
+    if localizacao_anterior is not None:
+        pontos.append(_ponto(*localizacao_anterior))
+    return atualizar_areas(indice_areas().areas_com(pontos), f'ocorrencia {ocorrencia.numero_protocolo}')
+
+
+def verificar_dados_sirene(dados) -> Dict[str, int]:
+    """Atualiza as áreas que contêm a sirene quando ela passa a acionada"""
+    from ..models import DadosSirene
+
+    sirene = dados.estacao
+    if not sirene_acionada(sirene.fonte, dados.status, dados.tipo):
+        return {'inventariadas': 0, 'alertas': 0}
+
+    anterior = DadosSirene.objects.filter(estacao_id=sirene.id, id__lt=dados.id).order_by('-id').first()
+    if anterior is not None and sirene_acionada(sirene.fonte, anterior.status, anterior.tipo):
+        return {'inventariadas': 0, 'alertas': 0}
+
+    ponto = _ponto(sirene.lon, sirene.lat)
+    if ponto is None:
+        return {'inventariadas': 0, 'alertas': 0}
+    return atualizar_areas(indice_areas().areas_com([ponto]), f'sirene {sirene.nome}')
+
+
+def _identificadores(tabela) -> list:
+    """uuid (ou id) de cada registro da tabela do snapshot"""
+    uuids = tabela.coluna('uuid')
+    ids = tabela.coluna('id')
+    return [uuid if uuid is not None else id_ for uuid, id_ in zip(uuids, ids)]
+
+
+def _novos(chaves: list, chaves_anteriores: Optional[list]) -> list:
+    """Índices das chaves sem identificador ou ausentes da coleta anterior"""
+    vistos = set(chaves_anteriores or ())
+    return [
+        i for i, chave in enumerate(chaves)
+        if chave is None or (isinstance(chave, tuple) and chave[-1] is None) or chave not in vistos
+    ]
+
+
+def verificar_coleta_waze(cliente, snapshot) -> Dict[str, int]:
+    """
+    Atualiza as áreas do cliente que contêm alerts (acidente, interdição,
+    perigo) ou jams severos que não estavam na coleta anterior
+
+    Jams são os de inventario_areas.jams_do_snapshot (irregularities
+    DYNAMIC pelo id, jams das routes pelo uuid).
+
+    Args:
+        cliente: Cliente da coleta
+        snapshot: SnapshotMobilidade gravado na coleta
+    """
+    atual = snapshot.leitor()
+    anterior = snapshot.anterior.leitor() if snapshot.anterior_id else None
+
+    geometrias = []
+
+    alerts = atual.tabela('alerts')
+    tipos = alerts.coluna('type')
+    novos = _novos(
+        _identificadores(alerts), _identificadores(anterior.tabela('alerts')) if anterior else None
+    )
+    for i in novos:
+        tipo = (tipos[i] or '').upper()
+        if any(t in tipo for t in TIPOS_ALERTA_WAZE):
+            geometrias.append(_ponto(alerts[i].get('location.x'), alerts[i].get('location.y')))
+
+    jams = jams_do_snapshot(atual)
+    offsets = jams['offsets'].tolist()
+    for i in _novos(jams['chaves'], jams_do_snapshot(anterior)['chaves'] if anterior else None):
+        if jams['niveis'][i] < NIVEL_JAM_SEVERO:
+            continue
+        inicio, fim = offsets[i], offsets[i + 1]
+        coordenadas = np.column_stack((jams['x'][inicio:fim], jams['y'][inicio:fim]))
+        if len(coordenadas) > 1:
+            geometrias.append(shapely.LineString(coordenadas))
+        elif len(coordenadas):
+            geometrias.append(shapely.Point(coordenadas[0]))
+
+    if not geometrias:
+        return {'inventariadas': 0, 'alertas': 0}
+    return atualizar_areas(indice_areas().areas_com(geometrias, cliente.id), f'coleta Waze {cliente.nome}')
@@ -0,0 +1,357 @@
+"""
+Snapping na Malha Viária Oficial
+================================
+
+Associa pontos e linhas (ocorrências, alertas do Waze, congestionamentos)
+ao trecho de Logradouro mais próximo dentro de uma tolerância em metros,
+usando a geometria gravada na importação (Logradouro.geometria).
+
+As linhas dos trechos ficam em um STRtree do Shapely, em uma projeção
+equirretangular local (metros) centrada no Rio. Assim a distância do
+query_nearest já sai em metros, e cada lote de pontos é uma única
+consulta vetorizada.
+
+O índice é montado uma vez por processo (get_snapping_vias) e refeito
+quando a versão dos logradouros muda (ViaMatcher.calcular_versao_dados).
+
+Exemplo:
+    snapping = get_snapping_vias()
+    snapping.trechos_para_pontos([(-22.9068, -43.1729), (None, None)])
+    # [(cod_trecho, distancia_m), None]
+    snapping.trechos_para_linhas([[(-43.17, -22.90), (-43.16, -22.91)]])
+"""
+
+import logging
+import math
+import struct
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from .geometria import FATOR_EMPACOTAMENTO
+
+logger = logging.getLogger(__name__)
+
+# Origem e escala da projeção local (erro < 0,5% na região metropolitana)
+LATITUDE_REFERENCIA = -22.9
+LONGITUDE_REFERENCIA = -43.3
+METROS_POR_GRAU_LAT = 110_574.0
+METROS_POR_GRAU_LON = 111_320.0 * math.cos(math.radians(LATITUDE_REFERENCIA))
+
+# Vértices de cada linha usados na votação do trecho (trechos_para_linhas)
+MAXIMO_PONTOS_LINHA = 12
+
+
+def _projetar(longitudes, latitudes) -> Tuple[np.ndarray, np.ndarray]:
+    """(lon, lat) em graus -> (x, y) em metros na projeção local"""
+    x = (np.asarray(longitudes, dtype=np.float64) - LONGITUDE_REFERENCIA) * METROS_POR_GRAU_LON
+    y = (np.asarray(latitudes, dtype=np.float64) - LATITUDE_REFERENCIA) * METROS_POR_GRAU_LAT
+    return x, y
+
+
+def _vertices_empacotados(dados: bytes) -> List[np.ndarray]:
+    """Partes de uma geometria empacotada como arrays (n, 2) de inteiros"""
+    dados = bytes(dados)
+    (quantidade,) = struct.unpack_from('<I', dados, 0)
+    contagens = struct.unpack_from(f'<{quantidade}I', dados, 4)
+    vertices = np.frombuffer(
+        dados, dtype='<i4', count=sum(contagens) * 2, offset=4 * (quantidade + 1)
+    ).reshape(-1, 2)
+
+    partes = []
+    posicao = 0
+    for contagem in contagens:
+        partes.append(vertices[posicao:posicao + contagem])
+        posicao += contagem
+    return partes
+
+
+class SnappingVias:
+    """Índice espacial dos trechos de logradouros com geometria"""
+
+    # Distância máxima (metros) entre o ponto e o trecho
+    TOLERANCIA_METROS = 30.0
+
+    # Segundos entre verificações da versão dos logradouros
+    INTERVALO_VERSAO = 60
+
+    def __init__(self):
+        self._arvore = None
+        self._cod_trecho_parte = np.empty(0, dtype=np.int64)
+        self._cod_logradouro = {}
+        self._versao_dados = None
+        self._versao_verificada_em = 0.0
+        self._tempo_carga_ms = 0.0
+        self._verificar_versao()
+
+    # ========================================
+    # CARGA
+    # ========================================
+
+    def _carregar(self):
+        """Monta o STRtree com uma linha por parte de cada trecho"""
+        from ..models import Logradouro
+
+        inicio = time.perf_counter()
+        vertices = []
+        cod_trecho_parte = []
+        cod_logradouro = {}
+
+        trechos = Logradouro.objects.filter(
+            ativa=True,
+            geometria__isnull=False,
+        ).values_list('cod_trecho', 'cod_logradouro', 'geometria')
+
+        for cod_trecho, cod_log, geometria in trechos.iterator(chunk_size=5000):
+            try:
+                partes = _vertices_empacotados(geometria)
+            except (struct.error, ValueError):
+                logger.warning(f"Geometria invalida no trecho {cod_trecho}")
+                continue
+            for parte in partes:
+                if len(parte) >= 2:
+                    vertices.append(parte)
+                    cod_trecho_parte.append(cod_trecho)
+            cod_logradouro[cod_trecho] = cod_log
+
+        self._cod_logradouro = cod_logradouro
+        self._cod_trecho_parte = np.asarray(cod_trecho_parte, dtype=np.int64)
+        self._arvore = None
+
+        if vertices:
+            todos = np.concatenate(vertices) / FATOR_EMPACOTAMENTO
+            x, y = _projetar(todos[:, 0], todos[:, 1])
+            indices = np.repeat(np.arange(len(vertices)), [len(parte) for parte in vertices])
+            linhas = shapely.linestrings(np.column_stack((x, y)), indices=indices)
+            self._arvore = STRtree(linhas)
+
+        self._tempo_carga_ms = (time.perf_counter() - inicio) * 1000
+        logger.info(
+            f"SnappingVias: {len(cod_logradouro)} trechos ({len(vertices)} linhas) "
+            f"em {self._tempo_carga_ms:.0f} ms"
+        )
+
+    def _verificar_versao(self):
+        """Refaz o índice se os logradouros mudaram (a cada INTERVALO_VERSAO segundos)"""
+        from .via_matcher import ViaMatcher
+
+        agora = time.monotonic()
+        if self._versao_dados is not None and agora - self._versao_verificada_em < self.INTERVALO_VERSAO:
+            return
+
+        versao = ViaMatcher.calcular_versao_dados()
+        self._versao_verificada_em = agora
+        if versao != self._versao_dados:
+            self._carregar()
+            self._versao_dados = versao
+
+    # ========================================
+    # CONSULTAS
+    # ========================================
+
+    def _mais_proximos(self, longitudes, latitudes, tolerancia: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Trecho mais próximo de cada ponto (uma consulta para o lote)
+
+        Returns:
+            (índices dos pontos com trecho, cod_trecho, distâncias em metros)
+        """
+        x, y = _projetar(longitudes, latitudes)
+        indices, distancias = self._arvore.query_nearest(
+            shapely.points(x, y),
+            max_distance=tolerancia,
+            return_distance=True,
+            all_matches=False,
+        )
+        return indices[0], self._cod_trecho_parte[indices[1]], distancias
+
+    def trechos_para_pontos(self, pontos: Sequence[Tuple], tolerancia_metros: Optional[float] = None) -> List[Optional[Tuple[int, float]]]:
+        """
+        Snapping de pontos em lote
+
+        Args:
+            pontos: [(latitude, longitude)]; coordenadas None são ignoradas
+            tolerancia_metros: Distância máxima (padrão TOLERANCIA_METROS)
+
+        Returns:
+            Lista alinhada com `pontos`: (cod_trecho, distancia_m) ou None
+        """
+        self._verificar_versao()
+        resultado = [None] * len(pontos)
+
+        validos = [
+            (i, float(lat), float(lon))
+            for i, (lat, lon) in enumerate(pontos)
+            if lat is not None and lon is not None
+        ]
+        if not validos or self._arvore is None:
+            return resultado
+
+        tolerancia = tolerancia_metros or self.TOLERANCIA_METROS
+        entradas, cods, distancias = self._mais_proximos(
+            [lon for _, _, lon in validos],
+            [lat for _, lat, _ in validos],
+            tolerancia,
+        )
+        for entrada, cod_trecho, distancia in zip(entradas, cods, distancias):
+            resultado[validos[entrada][0]] = (int(cod_trecho), round(float(distancia), 1))
+        return resultado
+
+    def trechos_para_linhas(self, linhas: Sequence[Sequence[Sequence[float]]], tolerancia_metros: Optional[float] = None) -> List[Optional[Tuple[int, float]]]:
+        """
+        Snapping de linhas em lote (congestionamentos, irregularidades)
+
+        Até MAXIMO_PONTOS_LINHA vértices de cada linha são projetados na
+        malha; vence o trecho com mais vértices (empate: menor distância
+        média).
+
+        Args:
+            linhas: [[(x, y), ...]] com x = longitude, y = latitude
+            tolerancia_metros: Distância máxima (padrão TOLERANCIA_METROS)
+
+        Returns:
+            Lista alinhada com `linhas`: (cod_trecho, distancia_media_m) ou None
+        """
+        self._verificar_versao()
+        resultado = [None] * len(linhas)
+        if self._arvore is None:
+            return resultado
+
+        origem, longitudes, latitudes = [], [], []
+        for i, linha in enumerate(linhas):
+            if not linha:
+                continue
+            passo = max(1, math.ceil(len(linha) / MAXIMO_PONTOS_LINHA))
+            amostra = list(linha[::passo])
+            if (len(linha) - 1) % passo:
+                amostra.append(linha[-1])
+            for ponto in amostra:
+                origem.append(i)
+                longitudes.append(float(ponto[0]))
+                latitudes.append(float(ponto[1]))
+
+        if not origem:
+            return resultado
+
+        tolerancia = tolerancia_metros or self.TOLERANCIA_METROS
+        entradas, cods, distancias = self._mais_proximos(longitudes, latitudes, tolerancia)
+
+        # linha -> cod_trecho -> [votos, soma das distancias]
+        votos = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        for entrada, cod_trecho, distancia in zip(entradas, cods, distancias):
+            voto = votos[origem[entrada]][int(cod_trecho)]
+            voto[0] += 1
+            voto[1] += float(distancia)
+
+        for i, por_trecho in votos.items():
+            cod_trecho, (quantidade, soma) = max(
+                por_trecho.items(), key=lambda item: (item[1][0], -item[1][1])
+            )
+            resultado[i] = (cod_trecho, round(soma / quantidade, 1))
+        return resultado
+
+    def cod_logradouro(self, cod_trecho: int) -> Optional[str]:
+        """Código do logradouro (CL) de um trecho do índice"""
+        return self._cod_logradouro.get(cod_trecho)
+
+    def estatisticas(self) -> Dict:
+        return {
+            'trechos': len(self._cod_logradouro),
+            'linhas': len(self._cod_trecho_parte),
+            'tempo_carga_ms': round(self._tempo_carga_ms, 1),
+            'tolerancia_metros': self.TOLERANCIA_METROS,
+        }
+
+
+# ========================================
+# INTEGRAÇÕES EM LOTE
+# ========================================
+
+def vincular_ocorrencias(ocorrencias, tolerancia_metros: Optional[float] = None) -> int:
+    """
+    Preenche OcorrenciaGerenciada.logradouro pelo trecho mais próximo
+
+    Args:
+        ocorrencias: Iterável de OcorrenciaGerenciada (com latitude/longitude)
+
+    Returns:
+        Quantidade de ocorrências cujo trecho mudou
+    """
+    from ..models import OcorrenciaGerenciada
+
+    ocorrencias = list(ocorrencias)
+    if not ocorrencias:
+        return 0
+
+    trechos = get_snapping_vias().trechos_para_pontos(
+        [(o.latitude, o.longitude) for o in ocorrencias], tolerancia_metros
+    )
+
+    alteradas = []
+    for ocorrencia, trecho in zip(ocorrencias, trechos):
+        cod_trecho = trecho[0] if trecho else None
+        if ocorrencia.logradouro_id != cod_trecho:
+            ocorrencia.logradouro_id = cod_trecho
+            alteradas.append(ocorrencia)
+
+    if alteradas:
+        OcorrenciaGerenciada.objects.bulk_update(alteradas, ['logradouro'], batch_size=500)
+    return len(alteradas)
+
+
+def vincular_congestionamentos(congestionamentos, tolerancia_metros: Optional[float] = None) -> int:
+    """
+    Vincula CongestionamentoVia sem logradouro ao trecho sob o ponto inicial
+
+    Recalcula a criticidade com a velocidade regulamentada do trecho.
+
+    Returns:
+        Quantidade de congestionamentos vinculados
+    """
+    from ..models import CongestionamentoVia, Logradouro
+
+    congestionamentos = [c for c in congestionamentos if c.logradouro_id is None]
+    if not congestionamentos:
+        return 0
+
+    trechos = get_snapping_vias().trechos_para_pontos(
+        [(c.latitude, c.longitude) for c in congestionamentos], tolerancia_metros
+    )
+    vias = Logradouro.objects.in_bulk({trecho[0] for trecho in trechos if trecho})
+
+    vinculados = []
+    for congestionamento, trecho in zip(congestionamentos, trechos):
+        if not trecho or trecho[0] not in vias:
+            continue
+        congestionamento.logradouro = vias[trecho[0]]
+        congestionamento.match_metodo = 'snap'
+        congestionamento.criticidade, congestionamento.percentual_abaixo_regulamentada = (
+            congestionamento.calcular_criticidade()
+        )
+        vinculados.append(congestionamento)
+
+    if vinculados:
+        CongestionamentoVia.objects.bulk_update(
+            vinculados,
+            ['logradouro', 'match_metodo', 'criticidade', 'percentual_abaixo_regulamentada'],
+            batch_size=500,
+        )
+    return len(vinculados)
+
+
+# Instancia singleton para reutilizacao
+_snapping_instance = None
+
+
+def get_snapping_vias() -> SnappingVias:
+    """Retorna instancia singleton do SnappingVias (índice montado uma vez por processo)"""
+    global _snapping_instance
+
+    if _snapping_instance is None:
+        _snapping_instance = SnappingVias()
+
+    return _snapping_instance
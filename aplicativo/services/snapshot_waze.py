@@ -0,0 +1,343 @@
+"""
+Snapshot Compacto do Feed Waze
+==============================
+
+Formato binário colunar para armazenar os feeds TVT/partner do Waze sem
+guardar o JSON completo em DadosMobilidade.dados_raw.
+
+Estrutura do arquivo (versão 1):
+    b'WZS1' + <II> (tamanho cabecalho, tamanho coordenadas)
+    zlib(JSON do cabecalho)  -> tabelas colunares (sem coordenadas)
+    zlib(float64[] x,y ...)  -> todas as polylines empacotadas
+
+Cada lista de objetos do feed (routes, irregularities, alerts, jams...)
+vira uma tabela:
+    - campos escalares           -> colunas (listas de valores)
+    - objetos aninhados          -> colunas com chave pontuada ('location.x')
+    - polylines [{'x', 'y'}, ...] -> offsets no array de coordenadas
+    - listas de objetos          -> tabelas filhas (ex: subRoutes)
+
+A leitura decodifica apenas o cabeçalho; as coordenadas são expostas
+como tuplas (x, y) a partir do array empacotado, sob demanda.
+
+Exemplo:
+    conteudo = compactar_feed(feed)
+    snapshot = SnapshotWaze(conteudo)
+    for irreg in snapshot.tabela('irregularities'):
+        if irreg.get('type') == 'DYNAMIC':
+            coords = irreg.coordenadas()
+"""
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+FORMATO_VERSAO = 1
+
+_MAGIC = b'WZS1'
+_CABECALHO = struct.Struct('<II')
+_NIVEL_COMPRESSAO = 6
+
+
+def _eh_polyline(valor) -> bool:
+    """Verifica se o valor é uma lista de pontos {'x', 'y'}"""
+    if not isinstance(valor, list) or not valor:
+        return False
+    for ponto in valor:
+        if not isinstance(ponto, dict) or 'x' not in ponto or 'y' not in ponto or len(ponto) != 2:
+            return False
+    return True
+
+
+def _eh_lista_objetos(valor) -> bool:
+    """Verifica se o valor é uma lista (não vazia) de objetos"""
+    return isinstance(valor, list) and bool(valor) and all(isinstance(v, dict) for v in valor)
+
+
+def _achatar(prefixo: str, valor: Dict, destino: Dict):
+    """Achata objetos aninhados em chaves pontuadas ('location.x')"""
+    for chave, item in valor.items():
+        chave_completa = f'{prefixo}.{chave}'
+        if isinstance(item, dict):
+            _achatar(chave_completa, item, destino)
+        else:
+            destino[chave_completa] = item
+
+
+class _CodificadorTabela:
+    """Converte uma lista de objetos do feed em tabela colunar"""
+
+    def __init__(self, coordenadas: array):
+        self.coordenadas = coordenadas
+
+    def codificar(self, registros: List[Dict]) -> Dict:
+        total = len(registros)
+
+        # Descobrir o papel de cada campo (coluna, polyline ou tabela filha)
+        campos_linha = set()
+        campos_filhos = set()
+        linhas_achatadas = []
+        for registro in registros:
+            achatado = {}
+            for chave, valor in registro.items():
+                if isinstance(valor, dict):
+                    _achatar(chave, valor, achatado)
+                elif _eh_polyline(valor):
+                    campos_linha.add(chave)
+                elif _eh_lista_objetos(valor):
+                    campos_filhos.add(chave)
+                else:
+                    achatado[chave] = valor
+            linhas_achatadas.append(achatado)
+
+        # Campo com polyline em algum registro é sempre tratado como polyline
+        campos_filhos -= campos_linha
+
+        colunas = {}
+        for indice, achatado in enumerate(linhas_achatadas):
+            for chave, valor in achatado.items():
+                if chave in campos_linha or chave in campos_filhos:
+                    continue
+                coluna = colunas.get(chave)
+                if coluna is None:
+                    coluna = colunas[chave] = [None] * total
+                coluna[indice] = valor
+
+        linhas = {}
+        for campo in campos_linha:
+            offsets = [len(self.coordenadas) // 2]
+            for registro in registros:
+                valor = registro.get(campo)
+                if _eh_polyline(valor):
+                    for ponto in valor:
+                        self.coordenadas.append(float(ponto['x']))
+                        self.coordenadas.append(float(ponto['y']))
+                offsets.append(len(self.coordenadas) // 2)
+            linhas[campo] = offsets
+
+        filhos = {}
+        for campo in campos_filhos:
+            inicios = [0]
+            itens = []
+            for registro in registros:
+                valor = registro.get(campo)
+                if _eh_lista_objetos(valor):
+                    itens.extend(valor)
+                inicios.append(len(itens))
+            filhos[campo] = {
+                'inicios': inicios,
+                'tabela': self.codificar(itens),
+            }
+
+        return {
+            'n': total,
+            'colunas': colunas,
+            'linhas': linhas,
+            'filhos': filhos,
+        }
+
+
+def compactar_feed(data: Dict) -> bytes:
+    """
+    Compacta um feed Waze no formato colunar binário
+
+    Args:
+        data: JSON retornado pela API Waze
+
+    Returns:
+        bytes do snapshot compactado
+    """
+    coordenadas = array('d')
+    codificador = _CodificadorTabela(coordenadas)
+
+    tabelas = {}
+    meta = {}
+    for chave, valor in (data or {}).items():
+        if isinstance(valor, list) and all(isinstance(v, dict) for v in valor):
+            tabelas[chave] = codificador.codificar(valor)
+        else:
+            meta[chave] = valor
+
+    cabecalho = json.dumps(
+        {'versao': FORMATO_VERSAO, 'meta': meta, 'tabelas': tabelas},
+        separators=(',', ':'),
+        ensure_ascii=False,
+    ).encode('utf-8')
+
+    if sys.byteorder != 'little':
+        coordenadas.byteswap()
+
+    cabecalho_z = zlib.compress(cabecalho, _NIVEL_COMPRESSAO)
+    coordenadas_z = zlib.compress(coordenadas.tobytes(), _NIVEL_COMPRESSAO)
+
+    return b''.join([
+        _MAGIC,
+        _CABECALHO.pack(len(cabecalho_z), len(coordenadas_z)),
+        cabecalho_z,
+        coordenadas_z,
+    ])
+
+
+class RegistroSnapshot:
+    """Visão de um registro (linha) de uma tabela do snapshot"""
+
+    __slots__ = ('_tabela', '_indice')
+
+    def __init__(self, tabela: 'TabelaSnapshot', indice: int):
+        self._tabela = tabela
+        self._indice = indice
+
+    def get(self, campo: str, default=None):
+        """Equivalente a dict.get(); objetos aninhados usam 'location.x'"""
+        coluna = self._tabela._colunas.get(campo)
+        if coluna is None:
+            return default
+        valor = coluna[self._indice]
+        return default if valor is None else valor
+
+    def coordenadas(self, campo: str = 'line') -> List[Tuple[float, float]]:
+        """Retorna a polyline do campo como lista de tuplas (x, y)"""
+        return self._tabela.coordenadas(self._indice, campo)
+
+    def total_pontos(self, campo: str = 'line') -> int:
+        """Quantidade de pontos da polyline (sem decodificar coordenadas)"""
+        offsets = self._tabela._linhas.get(campo)
+        if not offsets:
+            return 0
+        return offsets[self._indice + 1] - offsets[self._indice]
+
+    def filhos(self, campo: str) -> List['RegistroSnapshot']:
+        """Retorna os registros de uma lista aninhada (ex: subRoutes)"""
+        return self._tabela.filhos_de(self._indice, campo)
+
+
+class TabelaSnapshot:
+    """Tabela colunar de um snapshot (routes, irregularities, alerts...)"""
+
+    def __init__(self, snapshot: 'SnapshotWaze', dados: Optional[Dict] = None):
+        dados = dados or {}
+        self._snapshot = snapshot
+        self._total = dados.get('n', 0)
+        self._colunas = dados.get('colunas', {})
+        self._linhas = dados.get('linhas', {})
+        self._filhos_raw = dados.get('filhos', {})
+        self._filhos = {}
+
+    def __len__(self):
+        return self._total
+
+    def __iter__(self):
+        for indice in range(self._total):
+            yield RegistroSnapshot(self, indice)
+
+    def __getitem__(self, indice: int) -> RegistroSnapshot:
+        if indice < 0:
+            indice += self._total
+        if not 0 <= indice < self._total:
+            raise IndexError(indice)
+        return RegistroSnapshot(self, indice)
+
+    def coluna(self, campo: str) -> list:
+        """Retorna a coluna inteira (lista de valores, None quando ausente)"""
+        return self._colunas.get(campo) or [None] * self._total
+
+    def coordenadas(self, indice: int, campo: str = 'line') -> List[Tuple[float, float]]:
+        offsets = self._linhas.get(campo)
+        if not offsets:
+            return []
+        inicio, fim = offsets[indice], offsets[indice + 1]
+        if inicio == fim:
+            return []
+        valores = self._snapshot._coordenadas()[inicio * 2:fim * 2]
+        return list(zip(valores[0::2], valores[1::2]))
+
+    def coordenadas_empacotadas(self, campo: str = 'line') -> Tuple[array, List[int]]:
+        """
+        Polylines de todos os registros sem criar tuplas por ponto
+
+        Returns:
+            (array com x, y intercalados, offsets); os pontos do registro i
+            são offsets[i]:offsets[i + 1] (len(tabela) + 1 posições)
+        """
+        offsets = self._linhas.get(campo)
+        if not offsets:
+            return array('d'), [0] * (self._total + 1)
+        inicio, fim = offsets[0], offsets[-1]
+        valores = self._snapshot._coordenadas()[inicio * 2:fim * 2]
+        return valores, [offset - inicio for offset in offsets]
+
+    def _tabela_filha(self, campo: str) -> Optional['TabelaSnapshot']:
+        if campo not in self._filhos:
+            raw = self._filhos_raw.get(campo)
+            self._filhos[campo] = TabelaSnapshot(self._snapshot, raw['tabela']) if raw else None
+        return self._filhos[campo]
+
+    def filhos_de(self, indice: int, campo: str) -> List[RegistroSnapshot]:
+        tabela = self._tabela_filha(campo)
+        if tabela is None:
+            return []
+        inicios = self._filhos_raw[campo]['inicios']
+        return [RegistroSnapshot(tabela, i) for i in range(inicios[indice], inicios[indice + 1])]
+
+    def todos_filhos(self, campo: str) -> 'TabelaSnapshot':
+        """Tabela filha completa (ex: todos os jams de todas as routes)"""
+        tabela = self._tabela_filha(campo)
+        return tabela if tabela is not None else TabelaSnapshot(self._snapshot)
+
+
+class SnapshotWaze:
+    """
+    Leitor de snapshots compactados do feed Waze
+
+    Decodifica apenas o cabeçalho colunar; as coordenadas são
+    descompactadas uma única vez, na primeira vez em que são acessadas.
+    """
+
+    def __init__(self, conteudo: bytes):
+        conteudo = bytes(conteudo)
+        if conteudo[:4] != _MAGIC:
+            raise ValueError('Snapshot Waze em formato desconhecido')
+
+        tam_cabecalho, tam_coordenadas = _CABECALHO.unpack_from(conteudo, 4)
+        inicio = 4 + _CABECALHO.size
+        cabecalho = json.loads(zlib.decompress(conteudo[inicio:inicio + tam_cabecalho]))
+
+        self.versao = cabecalho.get('versao', FORMATO_VERSAO)
+        self.meta = cabecalho.get('meta', {})
+        self._tabelas_raw = cabecalho.get('tabelas', {})
+        self._tabelas = {}
+
+        inicio += tam_cabecalho
+        self._coordenadas_z = conteudo[inicio:inicio + tam_coordenadas]
+        self._coordenadas_cache = None
+
+    @classmethod
+    def de_feed(cls, data: Dict) -> 'SnapshotWaze':
+        """Cria leitor a partir de um feed em JSON (registros legados)"""
+        return cls(compactar_feed(data))
+
+    def _coordenadas(self) -> array:
+        if self._coordenadas_cache is None:
+            coordenadas = array('d')
+            coordenadas.frombytes(zlib.decompress(self._coordenadas_z))
+            if sys.byteorder != 'little':
+                coordenadas.byteswap()
+            self._coordenadas_cache = coordenadas
+            self._coordenadas_z = None
+        return self._coordenadas_cache
+
+    def tabela(self, nome: str) -> TabelaSnapshot:
+        """Retorna a tabela pelo nome do array no feed (vazia se ausente)"""
+        if nome not in self._tabelas:
+            self._tabelas[nome] = TabelaSnapshot(self, self._tabelas_raw.get(nome))
+        return self._tabelas[nome]
+
+    def __contains__(self, nome: str) -> bool:
+        return nome in self._tabelas_raw
+
+    @property
+    def vazio(self) -> bool:
+        return not any(t.get('n') for t in self._tabelas_raw.values())
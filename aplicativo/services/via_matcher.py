@@ -8,9 +8,27 @@ do Rio de Janeiro.
 Estrategias de matching:
 1. Match exato (case insensitive)
 2. Match normalizado (sem acentos)
-3. Fuzzy match (fuzzywuzzy ratio)
+3. Fuzzy match (fuzzywuzzy ratio) - apenas nos candidatos com mais
+   trigramas em comum (indice invertido montado em _carregar_cache)
 4. Fuzzy parcial (partial_ratio para nomes incompletos)
 
+Com coordenadas (buscar_via(nome, coordenadas) / buscar_vias_posicionadas),
+o matching espacial vem antes: so os trechos a RAIO_ESPACIAL_METROS do ponto
+(grade uniforme de centroides em memoria) sao comparados pelo nome, o que
+desambigua nomes repetidos em varios bairros (metodo 'espacial').
+
+O estado carregado (chaves, indice de trigramas, grade) e gravado em um
+snapshot binario aberto com mmap por todos os workers (get_via_matcher),
+ver via_matcher_snapshot.
+
+Cada busca e contabilizada por etapa e origem em self.metricas (ver
+metricas_via_matcher).
+
+Resolucoes de nomes fora do cache ficam em um LRU em memoria e na tabela
+ResolucaoVia (compartilhada entre workers), validas enquanto a versao do
+matcher e dos logradouros nao mudar: em regime, cada nome recorrente do
+Waze custa uma consulta a dicionario.
+
 Exemplo:
     matcher = ViaMatcher()
     logradouro, score, metodo = matcher.buscar_via("Av. Visconde de Albuquerque")
@@ -19,14 +37,104 @@ Exemplo:
     # metodo = 'exato'
 """
 
+import hashlib
+import heapq
+import math
+import time
 import unicodedata
 import logging
-from typing import Optional, Tuple
-from django.db.models import Q
+from collections import Counter, OrderedDict
+from typing import List, Optional, Tuple
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Max, Q
+from django.db.models.expressions import RawSQL
 from fuzzywuzzy import fuzz
 
+from .metricas_via_matcher import MetricasViaMatcher, resumir_metricas
+
 logger = logging.getLogger(__name__)
 
+# Abreviacoes expandidas na normalizacao (Waze "Av." x Data.Rio "Avenida")
+ABREVIACOES = {
+    'av': 'avenida',
+    'av.': 'avenida',
+    'r': 'rua',
+    'r.': 'rua',
+    'pç': 'praca',
+    'pça': 'praca',
+    'pc': 'praca',
+    'etr': 'estrada',
+    'estr': 'estrada',
+    'est': 'estrada',
+    'trv': 'travessa',
+    'tv': 'travessa',
+    'al': 'alameda',
+    'ld': 'ladeira',
+    'lad': 'ladeira',
+    'bc': 'beco',
+    'vl': 'vila',
+    'lrg': 'largo',
+    'lg': 'largo',
+    'cam': 'caminho',
+    'via': 'via',
+    'vd': 'viaduto',
+    'tn': 'tunel',
+    'aut': 'autoestrada',
+    'rod': 'rodovia',
+    'br': 'rodovia',
+}
+
+# Tipos de via usados na busca por prefixo quando o nome do Waze nao tem tipo
+TIPOS_VIA = ('rua', 'avenida', 'estrada', 'travessa', 'praca', 'largo', 'ladeira', 'alameda', 'rodovia')
+
+# Indice textual de nome_busca (migration 0022), quando o banco suporta
+INDICE_TEXTO_SQLITE = 'logradouros_busca'              # FTS5 com tokenizer trigram
+INDICE_TEXTO_POSTGRES = 'logradouros_nome_busca_trgm'  # GIN gin_trgm_ops (pg_trgm)
+
+
+def normalizar_nome_via(texto: str) -> str:
+    """
+    Normaliza nome de via para comparacao
+
+    Mesma regra do ViaMatcher e da coluna Logradouro.nome_busca.
+
+    - Remove acentos
+    - Converte para minusculas
+    - Remove espacos extras
+    - Expande abreviacoes comuns (ABREVIACOES)
+
+    Args:
+        texto: Texto original
+
+    Returns:
+        Texto normalizado
+    """
+    if not texto:
+        return ""
+
+    # Minusculas
+    texto = texto.lower().strip()
+
+    # Remove acentos
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = texto.encode('ASCII', 'ignore').decode('ASCII')
+
+    # Remove pontuacao extra
+    texto = texto.replace('.', ' ').replace(',', ' ').replace('-', ' ')
+
+    # Remove espacos multiplos
+    palavras = texto.split()
+
+    # Expandir abreviacoes ("br 101" -> "rodovia 101", sem repetir "rodovia rodovia")
+    palavras_expandidas = []
+    for palavra in palavras:
+        palavra = ABREVIACOES.get(palavra, palavra)
+        if not palavras_expandidas or palavras_expandidas[-1] != palavra:
+            palavras_expandidas.append(palavra)
+
+    return ' '.join(palavras_expandidas)
+
+
 
 class ViaMatcher:
     """
@@ -42,48 +150,100 @@ class ViaMatcher:
     SCORE_MINIMO_PARCIAL = 75      # Partial ratio minimo
     SCORE_MINIMO_TOKEN = 80        # Token set ratio minimo
 
+    # Indice de trigramas (fuzzy no cache)
+    TOP_K_CANDIDATOS = 32          # Candidatos pontuados com fuzzywuzzy por nome
+    FRACAO_TRIGRAMA_COMUM = 0.1    # Trigramas presentes em mais de 10% das vias sao ignorados
+
+    # Resolucoes persistidas (ResolucaoVia)
+    VERSAO_MATCHER = '3'           # Alterar quando a logica de matching mudar
+    TAMANHO_LRU = 5000             # Resolucoes mantidas em memoria
+    INTERVALO_VERSAO = 60          # Segundos entre verificacoes da versao dos logradouros
+
+    # Matching espacial (grade uniforme de centroides dos trechos)
+    TAMANHO_CELULA_GRAUS = 0.003   # ~330 m; deve ser >= RAIO_ESPACIAL_METROS
+    RAIO_ESPACIAL_METROS = 300     # Distancia maxima do ponto ao centroide do trecho
+    CANDIDATOS_ESPACIAIS = 5       # Nomes proximos pontuados com fuzzywuzzy
+
     # Abreviacoes comuns para normalizacao
-    ABREVIACOES = {
-        'av': 'avenida',
-        'av.': 'avenida',
-        'r': 'rua',
-        'r.': 'rua',
-        'pç': 'praca',
-        'pça': 'praca',
-        'pc': 'praca',
-        'etr': 'estrada',
-        'estr': 'estrada',
-        'est': 'estrada',
-        'trv': 'travessa',
-        'tv': 'travessa',
-        'al': 'alameda',
-        'ld': 'ladeira',
-        'lad': 'ladeira',
-        'bc': 'beco',
-        'vl': 'vila',
-        'lrg': 'largo',
-        'lg': 'largo',
-        'cam': 'caminho',
-        'via': 'via',
-        'vd': 'viaduto',
-        'tn': 'tunel',
-        'aut': 'autoestrada',
-        'rod': 'rodovia',
-        'br': 'rodovia',
-    }
-
-    def __init__(self, carregar_cache: bool = True):
+    ABREVIACOES = ABREVIACOES
+
+    def __init__(self, carregar_cache: bool = True, snapshot: Optional[str] = None):
         """
         Inicializa o matcher
 
         Args:
             carregar_cache: Se True, carrega vias importantes em memoria
+            snapshot: Arquivo de snapshot compartilhado (mmap); usado se
+                for da versao atual, senao gravado apos carregar do banco
         """
         self._cache_vias = {}
         self._cache_nomes_normalizados = {}
 
+        # Indice invertido: trigrama -> posicoes em _chaves_cache
+        self._chaves_cache = []
+        self._indice_trigramas = {}
+        self._total_trigramas = []
+
+        # Resolucoes: nome normalizado -> (Logradouro|None, score, metodo)
+        self._resolucoes = OrderedDict()
+        self._versao_dados = None
+        self._versao_verificada_em = 0.0
+        self._cache_carregado = carregar_cache
+
+        # Grade espacial: (linha, coluna) -> [(lat, lon, cod_trecho, nome_busca)]
+        self._grade = {}
+        self._trechos_grade = 0
+
+        # Snapshot em uso (None = estruturas carregadas do banco)
+        self._caminho_snapshot = snapshot
+        self._snapshot = None
+
+        # Contadores e latencias por etapa (publicados periodicamente)
+        self.metricas = MetricasViaMatcher()
+
+        # Indice textual de nome_busca: None = ainda nao verificado
+        self._indice_texto = None
+
         if carregar_cache:
+            if snapshot:
+                self._carregar_estado()
+            else:
+                self._carregar_cache()
+
+    def _carregar_estado(self):
+        """Abre o snapshot da versao atual ou carrega do banco e grava um novo"""
+        from .via_matcher_snapshot import abrir_snapshot, gravar_snapshot
+
+        versao = self.calcular_versao_dados()
+        snapshot = abrir_snapshot(self._caminho_snapshot)
+
+        if snapshot and snapshot.versao_matcher == self.VERSAO_MATCHER and snapshot.versao_dados == versao:
+            self._usar_snapshot(snapshot)
+            logger.info(f"ViaMatcher: snapshot {self._caminho_snapshot} ({len(self._cache_vias):,} vias)")
+        else:
+            self._snapshot = None
             self._carregar_cache()
+            # Dentro de transacao os dados podem ser desfeitos: nao publicar
+            if not connection.in_atomic_block:
+                try:
+                    tamanho = gravar_snapshot(self, self._caminho_snapshot, versao)
+                    logger.info(f"ViaMatcher: snapshot gravado em {self._caminho_snapshot} ({tamanho / 1024:,.0f} KB)")
+                except OSError as e:
+                    logger.warning(f"Erro ao gravar snapshot do ViaMatcher: {e}")
+
+        self._versao_dados = versao
+        self._versao_verificada_em = time.monotonic()
+
+    def _usar_snapshot(self, snapshot):
+        """Passa a consultar as estruturas do snapshot (somente leitura)"""
+        self._snapshot = snapshot
+        self._cache_vias = snapshot.vias
+        self._cache_nomes_normalizados = {}
+        self._chaves_cache = snapshot.chaves
+        self._indice_trigramas = snapshot.indice_trigramas
+        self._total_trigramas = snapshot.total_trigramas
+        self._grade = snapshot.grade
+        self._trechos_grade = snapshot.total_trechos_grade
 
     def _carregar_cache(self):
         """Carrega vias importantes em memoria para matching rapido"""
@@ -91,6 +251,9 @@ class ViaMatcher:
 
         logger.info("Carregando cache de logradouros...")
 
+        self._cache_vias = {}
+        self._cache_nomes_normalizados = {}
+
         # Priorizar vias arteriais e coletoras (mais importantes para transito)
         vias_importantes = Logradouro.objects.filter(
             Q(hierarquia__in=['Arterial primária', 'Arterial secundária', 'Coletora']) |
@@ -106,65 +269,376 @@ class ViaMatcher:
                 self._cache_vias[chave] = via
                 self._cache_nomes_normalizados[via.cod_trecho] = chave
 
-        logger.info(f"Cache carregado: {len(self._cache_vias):,} vias importantes")
+        self._indexar_trigramas()
+        self._indexar_grade()
 
-    def _normalizar(self, texto: str) -> str:
+        logger.info(
+            f"Cache carregado: {len(self._cache_vias):,} vias importantes, "
+            f"{len(self._indice_trigramas):,} trigramas, "
+            f"{self._trechos_grade:,} trechos na grade"
+        )
+
+    @staticmethod
+    def _trigramas(texto: str) -> set:
+        """Trigramas de caracteres do texto normalizado (com bordas)"""
+        texto = f'  {texto} '
+        return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+    def _indexar_trigramas(self):
+        """Monta o indice invertido de trigramas das chaves do cache"""
+        self._chaves_cache = list(self._cache_vias)
+        self._total_trigramas = []
+        indice = {}
+        for posicao, chave in enumerate(self._chaves_cache):
+            trigramas = self._trigramas(chave)
+            self._total_trigramas.append(len(trigramas))
+            for trigrama in trigramas:
+                indice.setdefault(trigrama, []).append(posicao)
+        self._indice_trigramas = indice
+
+    # ========================================
+    # GRADE ESPACIAL
+    # ========================================
+
+    def _celula(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        """Celula da grade que contem o ponto"""
+        return (
+            math.floor(latitude / self.TAMANHO_CELULA_GRAUS),
+            math.floor(longitude / self.TAMANHO_CELULA_GRAUS),
+        )
+
+    def _indexar_grade(self):
+        """Monta a grade com os centroides de todos os trechos com coordenadas"""
+        from ..models import Logradouro
+
+        grade = {}
+        trechos = Logradouro.objects.filter(
+            latitude__isnull=False,
+            longitude__isnull=False,
+        ).values_list('cod_trecho', 'nome_busca', 'latitude', 'longitude')
+
+        for cod_trecho, chave, latitude, longitude in trechos.iterator(chunk_size=5000):
+            latitude, longitude = float(latitude), float(longitude)
+            grade.setdefault(self._celula(latitude, longitude), []).append(
+                (latitude, longitude, cod_trecho, chave)
+            )
+        self._grade = grade
+        self._trechos_grade = sum(len(celula) for celula in grade.values())
+
+    def _trecho_espacial(self, nome_normalizado: str, latitude: float, longitude: float) -> Optional[Tuple[int, float]]:
+        """
+        Trecho proximo ao ponto com nome compativel
+
+        Considera apenas os centroides a RAIO_ESPACIAL_METROS do ponto
+        (celula do ponto e as 8 vizinhas). Nome igual vence; senao pontua
+        os CANDIDATOS_ESPACIAIS nomes com mais trigramas em comum.
+
+        Returns:
+            tuple: (cod_trecho, score) ou None
+        """
+        if not self._grade or not nome_normalizado:
+            return None
+
+        linha, coluna = self._celula(latitude, longitude)
+        raio_graus = self.RAIO_ESPACIAL_METROS / 111320
+        raio2 = raio_graus * raio_graus
+        fator_lon = math.cos(math.radians(latitude))
+
+        # Nome normalizado -> (distancia^2, cod_trecho) do trecho mais proximo
+        proximos = {}
+        for d_linha in (-1, 0, 1):
+            for d_coluna in (-1, 0, 1):
+                for lat, lon, cod_trecho, chave in self._grade.get((linha + d_linha, coluna + d_coluna), ()):
+                    dy = lat - latitude
+                    dx = (lon - longitude) * fator_lon
+                    distancia2 = dy * dy + dx * dx
+                    if distancia2 <= raio2 and (chave not in proximos or distancia2 < proximos[chave][0]):
+                        proximos[chave] = (distancia2, cod_trecho)
+
+        if not proximos:
+            return None
+
+        if nome_normalizado in proximos:
+            return proximos[nome_normalizado][1], 100
+
+        trigramas = self._trigramas(nome_normalizado)
+        candidatos = heapq.nlargest(
+            self.CANDIDATOS_ESPACIAIS,
+            proximos,
+            key=lambda chave: len(trigramas & self._trigramas(chave)),
+        )
+
+        melhor_score = 0
+        melhor_trecho = None
+        for chave in candidatos:
+            score = max(fuzz.ratio(nome_normalizado, chave), fuzz.token_set_ratio(nome_normalizado, chave))
+            if score > melhor_score:
+                melhor_score = score
+                melhor_trecho = proximos[chave][1]
+
+        if melhor_score >= self.SCORE_MINIMO_FUZZY:
+            return melhor_trecho, melhor_score
+        return None
+
+    def _candidatos_fuzzy(self, nome_normalizado: str) -> List[str]:
         """
-        Normaliza texto para comparacao
+        Chaves do cache com mais trigramas em comum com o nome
+
+        Trigramas muito frequentes ("rua", "av ") quase nao discriminam
+        e sao ignorados, a menos que sejam os unicos do nome. Empates sao
+        decididos pela via com menos trigramas (mais parecida em tamanho).
 
-        - Remove acentos
-        - Converte para minusculas
-        - Remove espacos extras
-        - Expande abreviacoes comuns
+        Returns:
+            Ate TOP_K_CANDIDATOS chaves, na ordem do cache
+        """
+        limite = max(1, int(len(self._chaves_cache) * self.FRACAO_TRIGRAMA_COMUM))
+        listas = [
+            self._indice_trigramas[t]
+            for t in self._trigramas(nome_normalizado)
+            if t in self._indice_trigramas
+        ]
+
+        contagem = Counter()
+        for posicoes in listas:
+            if len(posicoes) <= limite:
+                contagem.update(posicoes)
+        if not contagem:
+            for posicoes in listas:
+                contagem.update(posicoes)
+
+        total = self._total_trigramas
+        melhores = heapq.nlargest(
+            self.TOP_K_CANDIDATOS,
+            contagem.items(),
+            key=lambda item: (item[1], -total[item[0]], -item[0]),
+        )
+        return [self._chaves_cache[posicao] for posicao, _ in sorted(melhores)]
+
+    def _fuzzy_cache(self, nome_normalizado: str, usar_indice: bool = True) -> Tuple[Optional['Logradouro'], float]:
+        """
+        Melhor via do cache por ratio / token_set_ratio
 
         Args:
-            texto: Texto original
+            nome_normalizado: Nome ja normalizado
+            usar_indice: False pontua todas as vias do cache (referencia
+                usada pelo benchmark_via_matcher)
 
         Returns:
-            Texto normalizado
+            tuple: (Logradouro|None, score)
         """
-        if not texto:
-            return ""
+        chaves = self._candidatos_fuzzy(nome_normalizado) if usar_indice else self._cache_vias
 
-        # Minusculas
-        texto = texto.lower().strip()
+        melhor_score = 0
+        melhor_via = None
+        for chave in chaves:
+            # Ratio simples
+            score_ratio = fuzz.ratio(nome_normalizado, chave)
 
-        # Remove acentos
-        texto = unicodedata.normalize('NFKD', texto)
-        texto = texto.encode('ASCII', 'ignore').decode('ASCII')
+            # Token set ratio (ignora ordem das palavras)
+            score_token = fuzz.token_set_ratio(nome_normalizado, chave)
 
-        # Remove pontuacao extra
-        texto = texto.replace('.', ' ').replace(',', ' ').replace('-', ' ')
+            # Usar o melhor score
+            score = max(score_ratio, score_token)
 
-        # Remove espacos multiplos
-        palavras = texto.split()
+            if score > melhor_score:
+                melhor_score = score
+                melhor_via = self._cache_vias[chave]
+                if score >= self.SCORE_EXATO:
+                    break
+
+        return melhor_via, melhor_score
+
+    def _normalizar(self, texto: str) -> str:
+        """Normaliza texto para comparacao (ver normalizar_nome_via)"""
+        return normalizar_nome_via(texto)
 
-        # Expandir abreviacoes (opcional - pode melhorar ou piorar o match)
-        # palavras_expandidas = []
-        # for palavra in palavras:
-        #     palavras_expandidas.append(self.ABREVIACOES.get(palavra, palavra))
-        # return ' '.join(palavras_expandidas)
+    # ========================================
+    # RESOLUCOES PERSISTIDAS
+    # ========================================
 
-        return ' '.join(palavras)
+    @staticmethod
+    def calcular_versao_dados() -> str:
+        """Versao dos logradouros: muda a cada importacao/alteracao"""
+        from ..models import Logradouro
 
-    def buscar_via(self, nome_waze: str) -> Tuple[Optional['Logradouro'], float, str]:
+        agregado = Logradouro.objects.aggregate(
+            total=Count('cod_trecho'),
+            ultima=Max('atualizado_em'),
+            importado=Max('importado_em'),
+        )
+        assinatura = f"{agregado['total']}|{agregado['ultima']}|{agregado['importado']}"
+        return hashlib.md5(assinatura.encode('utf-8')).hexdigest()
+
+    def _verificar_versao(self):
         """
-        Busca via oficial pelo nome retornado pelo Waze
+        Confere a versao dos logradouros a cada INTERVALO_VERSAO segundos
 
-        Args:
-            nome_waze: Nome da via como retornado pelo Waze
+        Se mudou (importacao em outro processo), descarta as resolucoes em
+        memoria e recarrega o cache de vias.
+        """
+        agora = time.monotonic()
+        if self._versao_dados is not None and agora - self._versao_verificada_em < self.INTERVALO_VERSAO:
+            return
+
+        versao = self.calcular_versao_dados()
+        self._versao_verificada_em = agora
+        if versao == self._versao_dados:
+            return
+
+        if self._versao_dados is not None:
+            logger.info("Logradouros alterados: descartando resolucoes e recarregando cache")
+            self._resolucoes.clear()
+            if self._cache_carregado and self._caminho_snapshot:
+                self._carregar_estado()
+            elif self._cache_carregado:
+                self._carregar_cache()
+        self._versao_dados = versao
+
+    def _lembrar(self, nome_normalizado: str, resultado: Tuple):
+        """Guarda a resolucao no LRU em memoria"""
+        self._resolucoes[nome_normalizado] = resultado
+        self._resolucoes.move_to_end(nome_normalizado)
+        if len(self._resolucoes) > self.TAMANHO_LRU:
+            self._resolucoes.popitem(last=False)
+
+    def _resolucao_gravada(self, nome_normalizado: str) -> Optional[Tuple]:
+        """Resolucao da tabela ResolucaoVia valida para as versoes atuais"""
+        from ..models import ResolucaoVia
+
+        resolucao = ResolucaoVia.objects.select_related('logradouro').filter(
+            nome_normalizado=nome_normalizado[:300],
+            versao_matcher=self.VERSAO_MATCHER,
+            versao_dados=self._versao_dados,
+        ).first()
 
-        Returns:
-            tuple: (Logradouro|None, score, metodo)
-                - logradouro: Objeto Logradouro encontrado ou None
-                - score: Score de confianca (0-100)
-                - metodo: Metodo usado para match
+        if resolucao is None:
+            return None
+        return resolucao.logradouro, resolucao.score, resolucao.metodo
+
+    def _gravar_resolucao(self, nome_normalizado: str, resultado: Tuple):
+        """Grava (ou substitui) a resolucao na tabela ResolucaoVia"""
+        self._gravar_resolucoes({nome_normalizado: resultado})
+
+    def _gravar_resolucoes(self, resultados: dict):
+        """Grava (ou substitui) resolucoes {nome normalizado: resultado} em um upsert"""
+        from ..models import ResolucaoVia
+
+        if not resultados:
+            return
+
+        try:
+            with transaction.atomic():
+                ResolucaoVia.objects.bulk_create(
+                    [
+                        ResolucaoVia(
+                            nome_normalizado=nome_normalizado[:300],
+                            logradouro=via,
+                            score=score,
+                            metodo=metodo,
+                            versao_matcher=self.VERSAO_MATCHER,
+                            versao_dados=self._versao_dados,
+                        )
+                        for nome_normalizado, (via, score, metodo) in resultados.items()
+                    ],
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=['nome_normalizado'],
+                    update_fields=['logradouro', 'score', 'metodo', 'versao_matcher', 'versao_dados', 'criado_em'],
+                )
+        except DatabaseError as e:
+            # Sem persistencia a resolucao continua valendo no LRU
+            logger.warning(f"Erro ao gravar {len(resultados)} resolucoes de vias: {e}")
+
+    # ========================================
+    # CANDIDATOS NO BANCO (nome_busca)
+    # ========================================
+
+    def _filtro_prefixo(self, prefixo: str) -> Q:
+        """Prefixo de nome_busca que usa o indice da coluna"""
+        if connection.vendor == 'sqlite':
+            # LIKE do SQLite ignora caixa e nao usa o indice: intervalo binario
+            return Q(nome_busca__gte=prefixo, nome_busca__lt=prefixo + '\uffff')
+        # PostgreSQL: startswith usa o indice varchar_pattern_ops (_like)
+        return Q(nome_busca__startswith=prefixo)
+
+    def _verificar_indice_texto(self) -> str:
+        """Indice textual criado pela migration ('fts5', 'pg_trgm' ou '')"""
+        if self._indice_texto is None:
+            self._indice_texto = ''
+            try:
+                with connection.cursor() as cursor:
+                    if connection.vendor == 'sqlite':
+                        # Sem o trigger de insercao o indice esta defasado
+                        cursor.execute(
+                            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = %s",
+                            [f'{INDICE_TEXTO_SQLITE}_ai']
+                        )
+                        if cursor.fetchone():
+                            self._indice_texto = 'fts5'
+                    elif connection.vendor == 'postgresql':
+                        cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [INDICE_TEXTO_POSTGRES])
+                        if cursor.fetchone():
+                            self._indice_texto = 'pg_trgm'
+            except DatabaseError as e:
+                logger.warning(f"Erro ao verificar indice textual de logradouros: {e}")
+        return self._indice_texto
+
+    def _candidatos_banco(self, palavras: List[str], limite: int = 100) -> list:
+        """
+        Logradouros candidatos para o fuzzy no banco
+
+        1. Prefixo de nome_busca: tipo + primeira palavra do nome (com o
+           tipo do Waze ou, sem ele, com cada tipo de TIPOS_VIA)
+        2. Sem candidatos: similaridade pg_trgm do nome inteiro ou
+           substring da palavra principal (FTS5 trigram / sem indice)
         """
         from ..models import Logradouro
 
-        if not nome_waze or not nome_waze.strip():
-            return None, 0, 'vazio'
+        tem_tipo = palavras[0] in TIPOS_VIA or palavras[0] in ABREVIACOES.values()
+        if tem_tipo and len(palavras) > 1:
+            prefixos = [f'{palavras[0]} {palavras[1]}']
+        else:
+            prefixos = [f'{tipo} {palavras[0]}' for tipo in TIPOS_VIA]
+
+        filtro = Q()
+        for prefixo in prefixos:
+            filtro |= self._filtro_prefixo(prefixo)
+        candidatos = list(Logradouro.objects.filter(filtro).order_by('cod_trecho')[:limite])
+        if candidatos:
+            return candidatos
+
+        indice = self._verificar_indice_texto()
+        if indice == 'pg_trgm':
+            nome = ' '.join(palavras)
+            consulta = RawSQL(
+                "SELECT cod_trecho FROM logradouros WHERE nome_busca %% %s "
+                f"ORDER BY similarity(nome_busca, %s) DESC LIMIT {limite}",
+                [nome, nome]
+            )
+            return list(Logradouro.objects.filter(cod_trecho__in=consulta))
+
+        # Palavra significativa (pula o tipo de via e palavras curtas)
+        palavra_busca = palavras[0]
+        if (tem_tipo or len(palavra_busca) <= 3) and len(palavras) > 1:
+            palavra_busca = palavras[1]
 
+        if indice == 'fts5' and len(palavra_busca) >= 3:
+            # Tokenizer trigram: MATCH de frase = substring, pelo indice
+            consulta = RawSQL(
+                f"SELECT rowid FROM {INDICE_TEXTO_SQLITE} WHERE {INDICE_TEXTO_SQLITE} MATCH %s LIMIT {limite}",
+                ['"' + palavra_busca.replace('"', '""') + '"']
+            )
+            return list(Logradouro.objects.filter(cod_trecho__in=consulta))
+
+        return list(Logradouro.objects.filter(nome_busca__contains=palavra_busca)[:limite])
+
+    def _preparar_nome(self, nome_waze: str) -> Tuple[str, str]:
+        """
+        Remove o sufixo de cidade e normaliza o nome do Waze
+
+        Returns:
+            tuple: (nome sem cidade, nome normalizado)
+        """
         nome_waze = nome_waze.strip()
 
         # Remover sufixo de cidade (ex: "Av. Brasil,Rio de Janeiro" -> "Av. Brasil")
@@ -186,79 +660,121 @@ class ViaMatcher:
                 if parte_cidade in cidades_conhecidas:
                     nome_waze = ','.join(partes[:-1]).strip()
 
-        nome_normalizado = self._normalizar(nome_waze)
+        return nome_waze, self._normalizar(nome_waze)
+
+    def buscar_via(self, nome_waze: str, coordenadas: Optional[Tuple[float, float]] = None) -> Tuple[Optional['Logradouro'], float, str]:
+        """
+        Busca via oficial pelo nome retornado pelo Waze
+
+        Ordem: trechos proximos das coordenadas (se informadas), cache de
+        vias importantes, LRU de resolucoes, tabela ResolucaoVia e, so
+        para nomes novos, as estrategias de matching (resultado gravado
+        na tabela).
+
+        Args:
+            nome_waze: Nome da via como retornado pelo Waze
+            coordenadas: (latitude, longitude) de um ponto da via
+
+        Returns:
+            tuple: (Logradouro|None, score, metodo)
+                - logradouro: Objeto Logradouro encontrado ou None
+                - score: Score de confianca (0-100)
+                - metodo: Metodo usado para match
+        """
+        inicio = time.perf_counter()
+        resultado, origem, nome = self._buscar_via(nome_waze, coordenadas)
+        self.metricas.registrar(resultado[2], origem, time.perf_counter() - inicio, nome)
+        return resultado
+
+    def _buscar_via(self, nome_waze: str, coordenadas) -> Tuple[Tuple, str, str]:
+        """
+        Etapas de buscar_via
+
+        Returns:
+            tuple: (resultado, origem, nome sem cidade)
+        """
+        if not nome_waze or not nome_waze.strip():
+            return (None, 0, 'vazio'), 'vazio', ''
+
+        self._verificar_versao()
+
+        nome_limpo, nome_normalizado = self._preparar_nome(nome_waze)
+
+        # ========================================
+        # 0. MATCH ESPACIAL (trechos proximos)
+        # ========================================
+        if coordenadas and coordenadas[0] is not None and coordenadas[1] is not None:
+            from ..models import Logradouro
+
+            trecho = self._trecho_espacial(nome_normalizado, float(coordenadas[0]), float(coordenadas[1]))
+            if trecho:
+                via = Logradouro.objects.filter(cod_trecho=trecho[0]).first()
+                if via:
+                    return (via, trecho[1], 'espacial'), 'espacial', nome_limpo
 
         # ========================================
         # 1. MATCH EXATO NO CACHE (mais rapido)
         # ========================================
         if nome_normalizado in self._cache_vias:
-            return self._cache_vias[nome_normalizado], 100, 'exato_cache'
+            return (self._cache_vias[nome_normalizado], 100, 'exato_cache'), 'cache', nome_limpo
+
+        if not nome_normalizado:
+            return (None, 0, 'vazio'), 'vazio', nome_limpo
+
+        # Resolucao ja calculada (neste processo ou por outro worker)
+        resultado = self._resolucoes.get(nome_normalizado)
+        if resultado is not None:
+            self._resolucoes.move_to_end(nome_normalizado)
+            return resultado, 'lru', nome_limpo
+
+        origem = 'tabela'
+        resultado = self._resolucao_gravada(nome_normalizado)
+        if resultado is None:
+            origem = 'calculado'
+            resultado = self._resolver(nome_normalizado)
+            self._gravar_resolucao(nome_normalizado, resultado)
+
+        self._lembrar(nome_normalizado, resultado)
+        return resultado, origem, nome_limpo
+
+    def _resolver(self, nome_normalizado: str) -> Tuple[Optional['Logradouro'], float, str]:
+        """Estrategias de matching 2 a 5 para um nome fora do cache"""
+        from ..models import Logradouro
 
         # ========================================
-        # 2. MATCH EXATO NO BANCO (case insensitive)
+        # 2. MATCH EXATO NO BANCO (nome normalizado, indexado)
         # ========================================
         via_exata = Logradouro.objects.filter(
-            nome_completo__iexact=nome_waze
-        ).first()
+            nome_busca=nome_normalizado[:300]
+        ).order_by('cod_trecho').first()
 
         if via_exata:
             return via_exata, 100, 'exato_banco'
 
-        # Tentar tambem com nome normalizado
-        via_normalizada = Logradouro.objects.filter(
-            nome_completo__iexact=nome_waze.title()
-        ).first()
+        return self._resolver_fuzzy(nome_normalizado)
 
-        if via_normalizada:
-            return via_normalizada, 98, 'exato_normalizado'
+    def _resolver_fuzzy(self, nome_normalizado: str) -> Tuple[Optional['Logradouro'], float, str]:
+        """Estrategias de matching 3 a 5 (sem match exato)"""
+        from ..models import Logradouro
 
         # ========================================
         # 3. FUZZY MATCH NO CACHE (vias importantes)
         # ========================================
-        melhor_score = 0
-        melhor_via = None
-        melhor_metodo = 'nao_encontrado'
-
-        for chave, via in self._cache_vias.items():
-            # Ratio simples
-            score_ratio = fuzz.ratio(nome_normalizado, chave)
-
-            # Token set ratio (ignora ordem das palavras)
-            score_token = fuzz.token_set_ratio(nome_normalizado, chave)
-
-            # Usar o melhor score
-            score = max(score_ratio, score_token)
-
-            if score > melhor_score:
-                melhor_score = score
-                melhor_via = via
-                melhor_metodo = 'fuzzy_cache'
+        melhor_via, melhor_score = self._fuzzy_cache(nome_normalizado)
+        melhor_metodo = 'fuzzy_cache' if melhor_via else 'nao_encontrado'
 
         if melhor_score >= self.SCORE_MINIMO_FUZZY:
             return melhor_via, melhor_score, melhor_metodo
 
         # ========================================
-        # 4. BUSCA PARCIAL NO BANCO (mais lento)
+        # 4. BUSCA PARCIAL NO BANCO (prefixo / indice textual)
         # ========================================
-        # Extrair primeira palavra significativa para busca inicial
         palavras = nome_normalizado.split()
         if not palavras:
             return None, 0, 'vazio'
 
-        # Pular tipo de via para buscar pelo nome
-        palavra_busca = palavras[0]
-        if palavra_busca in self.ABREVIACOES or len(palavra_busca) <= 3:
-            if len(palavras) > 1:
-                palavra_busca = palavras[1]
-
-        # Buscar candidatos no banco
-        candidatos = Logradouro.objects.filter(
-            Q(nome_completo__icontains=palavra_busca) |
-            Q(nome_parcial__icontains=palavra_busca)
-        )[:100]  # Limitar para performance
-
-        for via in candidatos:
-            chave_via = self._normalizar(via.nome_completo)
+        for via in self._candidatos_banco(palavras):
+            chave_via = via.nome_busca or self._normalizar(via.nome_completo)
 
             # Ratio simples
             score_ratio = fuzz.ratio(nome_normalizado, chave_via)
@@ -282,32 +798,178 @@ class ViaMatcher:
         # ========================================
         # 5. NAO ENCONTRADO
         # ========================================
-        logger.debug(f"Via nao encontrada: '{nome_waze}' (melhor score: {melhor_score})")
+        logger.debug(f"Via nao encontrada: '{nome_normalizado}' (melhor score: {melhor_score})")
         return None, melhor_score, 'nao_encontrado'
 
     def buscar_vias_multiplas(self, nomes: list) -> dict:
         """
         Busca multiplas vias de uma vez (otimizado para batch)
 
+        Mesmo resultado de buscar_via para cada nome, com consultas por
+        conjunto: nomes repetidos sao resolvidos uma vez, o que nao esta
+        no cache nem no LRU sai de uma consulta IN em ResolucaoVia e de
+        outra em Logradouro.nome_busca; so o restante passa pelo fuzzy.
+        As novas resolucoes sao gravadas em um unico upsert.
+
         Args:
             nomes: Lista de nomes de vias do Waze
 
         Returns:
             dict: {nome_waze: (logradouro, score, metodo)}
         """
-        resultados = {}
+        from ..models import Logradouro, ResolucaoVia
+
+        inicio = time.perf_counter()
+        self._verificar_versao()
 
+        # Nome normalizado -> nomes do Waze que levam a ele
+        por_normalizado = {}
+        resultados = {}
         for nome in nomes:
-            if nome:
-                resultados[nome] = self.buscar_via(nome)
+            if not nome or nome in resultados:
+                continue
+            if not nome.strip():
+                resultados[nome] = (None, 0, 'vazio')
+                continue
+            resultados[nome] = None
+            _, nome_normalizado = self._preparar_nome(nome)
+            por_normalizado.setdefault(nome_normalizado, []).append(nome)
+
+        resolvidos = {}
+        origens = {}
+        pendentes = []
+        for nome_normalizado in por_normalizado:
+            if nome_normalizado in self._cache_vias:
+                resolvidos[nome_normalizado] = (self._cache_vias[nome_normalizado], 100, 'exato_cache')
+                origens[nome_normalizado] = 'cache'
+            elif not nome_normalizado:
+                resolvidos[nome_normalizado] = (None, 0, 'vazio')
+                origens[nome_normalizado] = 'vazio'
+            elif nome_normalizado in self._resolucoes:
+                self._resolucoes.move_to_end(nome_normalizado)
+                resolvidos[nome_normalizado] = self._resolucoes[nome_normalizado]
+                origens[nome_normalizado] = 'lru'
+            else:
+                pendentes.append(nome_normalizado)
+
+        # Resolucoes gravadas por este ou outros workers
+        if pendentes:
+            for resolucao in ResolucaoVia.objects.select_related('logradouro').filter(
+                nome_normalizado__in=pendentes,
+                versao_matcher=self.VERSAO_MATCHER,
+                versao_dados=self._versao_dados,
+            ):
+                resultado = (resolucao.logradouro, resolucao.score, resolucao.metodo)
+                resolvidos[resolucao.nome_normalizado] = resultado
+                origens[resolucao.nome_normalizado] = 'tabela'
+                self._lembrar(resolucao.nome_normalizado, resultado)
+            pendentes = [n for n in pendentes if n not in resolvidos]
+
+        # Match exato no banco: uma consulta para todos os nomes
+        novos = {}
+        if pendentes:
+            for via in Logradouro.objects.filter(
+                nome_busca__in=pendentes
+            ).order_by('-cod_trecho'):
+                # Ordem decrescente: fica o menor cod_trecho, como em _resolver
+                novos[via.nome_busca] = (via, 100, 'exato_banco')
+
+        # Fuzzy apenas no que sobrou (cada nome com a sua latencia)
+        duracoes = {}
+        for nome_normalizado in pendentes:
+            if nome_normalizado in novos:
+                origens[nome_normalizado] = 'banco'
+            else:
+                inicio_fuzzy = time.perf_counter()
+                novos[nome_normalizado] = self._resolver_fuzzy(nome_normalizado)
+                duracoes[nome_normalizado] = time.perf_counter() - inicio_fuzzy
+                origens[nome_normalizado] = 'calculado'
+            resolvidos[nome_normalizado] = novos[nome_normalizado]
+            self._lembrar(nome_normalizado, novos[nome_normalizado])
+
+        self._gravar_resolucoes(novos)
+
+        for nome_normalizado, nomes_waze in por_normalizado.items():
+            for nome in nomes_waze:
+                resultados[nome] = resolvidos[nome_normalizado]
+
+        # Metricas por nome distinto: o tempo das etapas em lote e rateado
+        demais = len(por_normalizado) - len(duracoes)
+        rateio = (time.perf_counter() - inicio - sum(duracoes.values())) / demais if demais else 0
+        for nome_normalizado, nomes_waze in por_normalizado.items():
+            self.metricas.registrar(
+                resolvidos[nome_normalizado][2],
+                origens[nome_normalizado],
+                duracoes.get(nome_normalizado, rateio),
+                self._preparar_nome(nomes_waze[0])[0],
+            )
+
+        return resultados
+
+    def buscar_vias_posicionadas(self, itens: list) -> list:
+        """
+        Busca vias de registros com posicao (ex: congestionamentos do feed)
 
+        Nomes resolvidos em lote por buscar_vias_multiplas; para cada
+        registro com coordenadas, o matching espacial tem prioridade. O
+        resultado espacial e reaproveitado para o mesmo nome na mesma
+        celula da grade, e os trechos vem de uma unica consulta.
+
+        Args:
+            itens: Lista de (nome_waze, latitude, longitude)
+
+        Returns:
+            list: (logradouro, score, metodo) na ordem de itens
+        """
+        from ..models import Logradouro
+
+        por_nome = self.buscar_vias_multiplas([nome for nome, _, _ in itens])
+        sem_match = (None, 0, 'vazio')
+
+        if not self._grade:
+            return [por_nome.get(nome, sem_match) for nome, _, _ in itens]
+
+        normalizados = {}
+        memo = {}
+        espaciais = []
+        for nome, latitude, longitude in itens:
+            if not nome or latitude is None or longitude is None:
+                espaciais.append(None)
+                continue
+            if nome not in normalizados:
+                normalizados[nome] = self._preparar_nome(nome)[1]
+            latitude, longitude = float(latitude), float(longitude)
+            chave = (normalizados[nome], self._celula(latitude, longitude))
+            if chave not in memo:
+                inicio = time.perf_counter()
+                memo[chave] = self._trecho_espacial(chave[0], latitude, longitude)
+                if memo[chave]:
+                    self.metricas.registrar('espacial', 'espacial', time.perf_counter() - inicio)
+            espaciais.append(memo[chave])
+
+        trechos = Logradouro.objects.in_bulk({e[0] for e in espaciais if e})
+
+        resultados = []
+        for (nome, _, _), espacial in zip(itens, espaciais):
+            if espacial and espacial[0] in trechos:
+                resultados.append((trechos[espacial[0]], espacial[1], 'espacial'))
+            else:
+                resultados.append(por_nome.get(nome, sem_match))
         return resultados
 
     def estatisticas_cache(self) -> dict:
         """Retorna estatisticas do cache"""
         return {
             'total_vias_cache': len(self._cache_vias),
-            'memoria_kb': len(str(self._cache_vias)) / 1024,
+            'total_trigramas': len(self._indice_trigramas),
+            'resolucoes_memoria': len(self._resolucoes),
+            'trechos_grade': self._trechos_grade,
+            'snapshot': self._snapshot.caminho if self._snapshot else None,
+            'metricas': resumir_metricas(self.metricas.como_dict()),
+            'memoria_kb': (
+                self._snapshot.tamanho_bytes / 1024 if self._snapshot
+                else len(str(self._cache_vias)) / 1024
+            ),
         }
 
 
@@ -319,11 +981,75 @@ def get_via_matcher() -> ViaMatcher:
     """
     Retorna instancia singleton do ViaMatcher
 
-    Usar esta funcao para evitar recarregar o cache multiplas vezes.
+    Usar esta funcao para evitar recarregar o cache multiplas vezes. O
+    estado vem do snapshot compartilhado (via_matcher_snapshot), montado
+    do banco apenas quando nao existe ou e de outra versao.
     """
+    from .via_matcher_snapshot import caminho_padrao
+
     global _matcher_instance
 
     if _matcher_instance is None:
-        _matcher_instance = ViaMatcher()
+        _matcher_instance = ViaMatcher(snapshot=caminho_padrao())
 
     return _matcher_instance
+
+
+def invalidar_resolucoes() -> int:
+    """
+    Descarta as resolucoes persistidas e o matcher deste processo
+
+    Chamada apos importar logradouros. Outros processos percebem a nova
+    versao dos dados em ate ViaMatcher.INTERVALO_VERSAO segundos.
+
+    Returns:
+        Quantidade de resolucoes removidas
+    """
+    from ..models import ResolucaoVia
+
+    global _matcher_instance
+
+    removidas, _ = ResolucaoVia.objects.all().delete()
+    _matcher_instance = None
+    return removidas
+
+
+def recriar_indice_texto_sqlite(schema_editor):
+    """
+    Triggers e conteudo do indice FTS5 de nome_busca (SQLite)
+
+    No SQLite, AddField/AlterField em logradouros recriam a tabela e
+    descartam os triggers da migration 0022: sem eles o indice fica
+    defasado. Migrations que alteram Logradouro chamam esta funcao depois
+    da alteracao.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [INDICE_TEXTO_SQLITE])
+        if not cursor.fetchone():
+            return
+
+    # Recriados sempre: o de atualizacao so reindexa quando o nome muda
+    # (o upsert da importacao regrava nome_busca em toda linha alterada)
+    for sufixo in ('ai', 'ad', 'au'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {INDICE_TEXTO_SQLITE}_{sufixo}")
+
+    schema_editor.execute(
+        f"CREATE TRIGGER {INDICE_TEXTO_SQLITE}_ai AFTER INSERT ON logradouros BEGIN "
+        f"INSERT INTO {INDICE_TEXTO_SQLITE}(rowid, nome_busca) VALUES (new.cod_trecho, new.nome_busca); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {INDICE_TEXTO_SQLITE}_ad AFTER DELETE ON logradouros BEGIN "
+        f"INSERT INTO {INDICE_TEXTO_SQLITE}({INDICE_TEXTO_SQLITE}, rowid, nome_busca) "
+        f"VALUES ('delete', old.cod_trecho, old.nome_busca); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {INDICE_TEXTO_SQLITE}_au AFTER UPDATE OF nome_busca ON logradouros "
+        f"WHEN old.nome_busca IS NOT new.nome_busca BEGIN "
+        f"INSERT INTO {INDICE_TEXTO_SQLITE}({INDICE_TEXTO_SQLITE}, rowid, nome_busca) "
+        f"VALUES ('delete', old.cod_trecho, old.nome_busca); "
+        f"INSERT INTO {INDICE_TEXTO_SQLITE}(rowid, nome_busca) VALUES (new.cod_trecho, new.nome_busca); END"
+    )
+    schema_editor.execute(f"INSERT INTO {INDICE_TEXTO_SQLITE}({INDICE_TEXTO_SQLITE}) VALUES ('rebuild')")
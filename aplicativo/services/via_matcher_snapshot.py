@@ -0,0 +1,460 @@
+"""
+Snapshot do ViaMatcher em Arquivo Mapeado
+=========================================
+
+Grava o estado do ViaMatcher (chaves normalizadas, atributos mínimos das
+vias do cache, índice de trigramas e grade espacial) em um arquivo
+binário compacto, aberto com mmap somente leitura por todos os workers:
+as páginas ficam no page cache do sistema e são compartilhadas entre os
+processos, e abrir o arquivo não monta nenhum objeto do ORM.
+
+O snapshot vale para uma versão do matcher e dos logradouros
+(ViaMatcher.VERSAO_MATCHER / calcular_versao_dados); get_via_matcher()
+descarta arquivos de outra versão e grava um novo.
+
+Formato (ordem de bytes nativa, seções alinhadas em 8 bytes):
+    MAGICO | tamanho do cabeçalho (uint32) | cabeçalho JSON | seções
+
+Exemplo:
+    gravar_snapshot(matcher, caminho, versao_dados)
+    snapshot = abrir_snapshot(caminho)
+    matcher._usar_snapshot(snapshot)
+"""
+
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MAGICO = b'VIAMATCH'
+VERSAO_FORMATO = 1
+
+# Campos das vias do cache (mesmos do .only() de ViaMatcher._carregar_cache)
+CAMPOS_VIA = [
+    'cod_trecho', 'nome_completo', 'nome_parcial', 'tipo_extenso',
+    'bairro', 'hierarquia', 'velocidade_regulamentada',
+]
+
+SEPARADOR = '\x1f'
+
+
+def caminho_padrao() -> str:
+    """Arquivo do snapshot (settings.VIA_MATCHER_SNAPSHOT)"""
+    from django.conf import settings
+
+    return str(getattr(
+        settings,
+        'VIA_MATCHER_SNAPSHOT',
+        os.path.join(settings.BASE_DIR, 'data', 'via_matcher.snap'),
+    ))
+
+
+# =============================================================================
+# GRAVAÇÃO
+# =============================================================================
+
+def _texto(valor) -> str:
+    return '' if valor is None else str(valor)
+
+
+def _tabela_textos(textos):
+    """(offsets uint32, blob utf-8) de uma lista de textos"""
+    offsets = array('I', [0])
+    partes = []
+    total = 0
+    for texto in textos:
+        dados = texto.encode('utf-8')
+        partes.append(dados)
+        total += len(dados)
+        offsets.append(total)
+    return offsets, b''.join(partes)
+
+
+def gravar_snapshot(matcher, caminho: str, versao_dados: str) -> int:
+    """
+    Grava o estado carregado do matcher
+
+    O arquivo é escrito ao lado do destino e renomeado (os.replace): os
+    workers nunca veem um snapshot pela metade.
+
+    Returns:
+        Tamanho do arquivo em bytes
+    """
+    chaves = list(matcher._chaves_cache)
+    vias = matcher._cache_vias
+
+    # Registros: chave + campos da via, separados por SEPARADOR
+    registros_offsets, registros = _tabela_textos(
+        SEPARADOR.join([chave] + [_texto(getattr(vias[chave], campo)) for campo in CAMPOS_VIA])
+        for chave in chaves
+    )
+    ordem_chaves = array('I', sorted(range(len(chaves)), key=lambda i: chaves[i].encode('utf-8')))
+    total_trigramas = array('H', (min(total, 65535) for total in matcher._total_trigramas))
+
+    # Índice de trigramas (chaves ASCII: trigramas de 3 bytes)
+    trigramas = sorted(
+        t for t in matcher._indice_trigramas if len(t.encode('utf-8')) == 3
+    )
+    postings_offsets = array('I', [0])
+    postings = array('I')
+    for trigrama in trigramas:
+        postings.extend(matcher._indice_trigramas[trigrama])
+        postings_offsets.append(len(postings))
+
+    # Grade espacial: células ordenadas, trechos em colunas paralelas
+    celulas = array('i')
+    grade_offsets = array('I', [0])
+    grade_lat = array('d')
+    grade_lon = array('d')
+    grade_trechos = array('i')
+    grade_nomes = array('I')
+    nomes_grade = {}
+    for celula in sorted(matcher._grade):
+        celulas.extend(celula)
+        for lat, lon, cod_trecho, chave in matcher._grade[celula]:
+            grade_lat.append(lat)
+            grade_lon.append(lon)
+            grade_trechos.append(cod_trecho)
+            grade_nomes.append(nomes_grade.setdefault(chave, len(nomes_grade)))
+        grade_offsets.append(len(grade_trechos))
+    nomes_offsets, nomes = _tabela_textos(nomes_grade)
+
+    secoes = [
+        ('registros_offsets', registros_offsets.tobytes()),
+        ('registros', registros),
+        ('ordem_chaves', ordem_chaves.tobytes()),
+        ('total_trigramas', total_trigramas.tobytes()),
+        ('trigramas', ''.join(trigramas).encode('ascii')),
+        ('postings_offsets', postings_offsets.tobytes()),
+        ('postings', postings.tobytes()),
+        ('grade_celulas', celulas.tobytes()),
+        ('grade_offsets', grade_offsets.tobytes()),
+        ('grade_lat', grade_lat.tobytes()),
+        ('grade_lon', grade_lon.tobytes()),
+        ('grade_trechos', grade_trechos.tobytes()),
+        ('grade_nomes', grade_nomes.tobytes()),
+        ('nomes_offsets', nomes_offsets.tobytes()),
+        ('nomes', nomes),
+    ]
+
+    cabecalho = {
+        'versao_formato': VERSAO_FORMATO,
+        'versao_matcher': matcher.VERSAO_MATCHER,
+        'versao_dados': versao_dados,
+        'total_vias': len(chaves),
+        'total_trechos_grade': len(grade_trechos),
+        'campos': CAMPOS_VIA,
+        'secoes': {},
+    }
+
+    # Offsets relativos ao início da área de seções
+    posicao = 0
+    for nome, dados in secoes:
+        cabecalho['secoes'][nome] = [posicao, len(dados)]
+        posicao += len(dados) + (-len(dados) % 8)
+
+    cabecalho_bytes = json.dumps(cabecalho).encode('utf-8')
+    inicio = len(MAGICO) + 4 + len(cabecalho_bytes)
+    preenchimento = -inicio % 8
+
+    diretorio = os.path.dirname(caminho) or '.'
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, prefix='.via_matcher.')
+    try:
+        with os.fdopen(descritor, 'wb') as f:
+            f.write(MAGICO)
+            f.write(struct.pack('<I', len(cabecalho_bytes)))
+            f.write(cabecalho_bytes)
+            f.write(b'\0' * preenchimento)
+            for _, dados in secoes:
+                f.write(dados)
+                f.write(b'\0' * (-len(dados) % 8))
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.unlink(temporario)
+        raise
+
+    return os.path.getsize(caminho)
+
+
+# =============================================================================
+# LEITURA
+# =============================================================================
+
+class _Fatias(Sequence):
+    """Sequência de entradas de largura fixa (bytes) de um buffer"""
+
+    def __init__(self, buffer, largura: int):
+        self._buffer = buffer
+        self._largura = largura
+
+    def __len__(self):
+        return len(self._buffer) // self._largura
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        inicio = i * self._largura
+        return bytes(self._buffer[inicio:inicio + self._largura])
+
+
+class _Textos(Sequence):
+    """Sequência de textos de uma tabela (offsets, blob)"""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode('utf-8')
+
+
+class _Chaves(Sequence):
+    """Chaves normalizadas das vias, na ordem do cache (_chaves_cache)"""
+
+    def __init__(self, registros: _Textos):
+        self._registros = registros
+
+    def __len__(self):
+        return len(self._registros)
+
+    def __getitem__(self, i):
+        return self._registros[i].split(SEPARADOR, 1)[0]
+
+
+class _ChavesOrdenadas(Sequence):
+    """Chaves em ordem binária (bytes), para busca binária"""
+
+    def __init__(self, chaves: _Chaves, ordem):
+        self._chaves = chaves
+        self._ordem = ordem
+
+    def __len__(self):
+        return len(self._ordem)
+
+    def __getitem__(self, i):
+        return self._chaves[self._ordem[i]].encode('utf-8')
+
+
+class _Vias(Mapping):
+    """chave normalizada -> Logradouro (campos de CAMPOS_VIA, demais adiados)"""
+
+    def __init__(self, registros: _Textos, chaves: _Chaves, ordem, campos):
+        self._registros = registros
+        self._chaves = chaves
+        self._ordenadas = _ChavesOrdenadas(chaves, ordem)
+        self._ordem = ordem
+        self._campos = campos
+        self._instancias = {}
+
+    def _posicao(self, chave) -> int:
+        if not isinstance(chave, str):
+            return -1
+        alvo = chave.encode('utf-8')
+        i = bisect.bisect_left(self._ordenadas, alvo)
+        if i < len(self._ordenadas) and self._ordenadas[i] == alvo:
+            return self._ordem[i]
+        return -1
+
+    def _instancia(self, posicao: int):
+        from ..models import Logradouro
+
+        via = self._instancias.get(posicao)
+        if via is None:
+            valores = dict(zip(self._campos, self._registros[posicao].split(SEPARADOR)[1:]))
+            valores['cod_trecho'] = int(valores['cod_trecho'])
+            velocidade = valores.get('velocidade_regulamentada')
+            valores['velocidade_regulamentada'] = int(velocidade) if velocidade else None
+            for campo in ('bairro', 'hierarquia'):
+                valores[campo] = valores.get(campo) or None
+
+            # Como um .only(): os demais campos são carregados sob demanda.
+            # from_db espera os valores na ordem dos campos do modelo
+            nomes = [f.attname for f in Logradouro._meta.concrete_fields if f.attname in valores]
+            via = Logradouro.from_db('default', nomes, [valores[nome] for nome in nomes])
+            self._instancias[posicao] = via
+        return via
+
+    def __contains__(self, chave):
+        return self._posicao(chave) >= 0
+
+    def __getitem__(self, chave):
+        posicao = self._posicao(chave)
+        if posicao < 0:
+            raise KeyError(chave)
+        return self._instancia(posicao)
+
+    def __iter__(self):
+        return iter(self._chaves)
+
+    def __len__(self):
+        return len(self._chaves)
+
+
+class _Trigramas(Mapping):
+    """trigrama -> posições das chaves (memoryview uint32)"""
+
+    def __init__(self, trigramas: _Fatias, offsets, postings):
+        self._trigramas = trigramas
+        self._offsets = offsets
+        self._postings = postings
+
+    def _posicao(self, trigrama) -> int:
+        try:
+            alvo = trigrama.encode('ascii')
+        except (AttributeError, UnicodeEncodeError):
+            return -1
+        i = bisect.bisect_left(self._trigramas, alvo)
+        if i < len(self._trigramas) and self._trigramas[i] == alvo:
+            return i
+        return -1
+
+    def __contains__(self, trigrama):
+        return self._posicao(trigrama) >= 0
+
+    def __getitem__(self, trigrama):
+        i = self._posicao(trigrama)
+        if i < 0:
+            raise KeyError(trigrama)
+        return self._postings[self._offsets[i]:self._offsets[i + 1]]
+
+    def __iter__(self):
+        for i in range(len(self._trigramas)):
+            yield self._trigramas[i].decode('ascii')
+
+    def __len__(self):
+        return len(self._trigramas)
+
+
+class _Grade(Mapping):
+    """(linha, coluna) -> [(lat, lon, cod_trecho, nome_busca)]"""
+
+    def __init__(self, celulas, offsets, lat, lon, trechos, nomes_idx, nomes: _Textos):
+        self._celulas = celulas
+        self._offsets = offsets
+        self._lat = lat
+        self._lon = lon
+        self._trechos = trechos
+        self._nomes_idx = nomes_idx
+        self._nomes = nomes
+        self._linhas = _Pares(celulas)
+
+    def _posicao(self, celula) -> int:
+        i = bisect.bisect_left(self._linhas, celula)
+        if i < len(self._linhas) and self._linhas[i] == celula:
+            return i
+        return -1
+
+    def __contains__(self, celula):
+        return self._posicao(tuple(celula)) >= 0
+
+    def __getitem__(self, celula):
+        i = self._posicao(tuple(celula))
+        if i < 0:
+            raise KeyError(celula)
+        return [
+            (self._lat[j], self._lon[j], self._trechos[j], self._nomes[self._nomes_idx[j]])
+            for j in range(self._offsets[i], self._offsets[i + 1])
+        ]
+
+    def __iter__(self):
+        return iter(self._linhas)
+
+    def __len__(self):
+        return len(self._linhas)
+
+
+class _Pares(Sequence):
+    """Células (linha, coluna) de um buffer int32 intercalado"""
+
+    def __init__(self, celulas):
+        self._celulas = celulas
+
+    def __len__(self):
+        return len(self._celulas) // 2
+
+    def __getitem__(self, i):
+        return self._celulas[2 * i], self._celulas[2 * i + 1]
+
+
+class SnapshotViaMatcher:
+    """
+    Snapshot aberto (mmap somente leitura)
+
+    Atributos com a mesma interface das estruturas do ViaMatcher:
+    vias (_cache_vias), chaves (_chaves_cache), indice_trigramas,
+    total_trigramas e grade.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        with open(caminho, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buffer = memoryview(self._mmap)
+        if bytes(buffer[:len(MAGICO)]) != MAGICO:
+            raise ValueError(f'{caminho} nao e um snapshot do ViaMatcher')
+
+        (tamanho,) = struct.unpack_from('<I', buffer, len(MAGICO))
+        inicio = len(MAGICO) + 4
+        cabecalho = json.loads(bytes(buffer[inicio:inicio + tamanho]).decode('utf-8'))
+        if cabecalho.get('versao_formato') != VERSAO_FORMATO:
+            raise ValueError(f'{caminho}: formato {cabecalho.get("versao_formato")} nao suportado')
+
+        base = inicio + tamanho
+        base += -base % 8
+
+        def secao(nome, formato=None):
+            posicao, comprimento = cabecalho['secoes'][nome]
+            dados = buffer[base + posicao:base + posicao + comprimento]
+            return dados.cast(formato) if formato else dados
+
+        self.versao_matcher = cabecalho['versao_matcher']
+        self.versao_dados = cabecalho['versao_dados']
+        self.total_trechos_grade = cabecalho['total_trechos_grade']
+
+        registros = _Textos(secao('registros_offsets', 'I'), secao('registros'))
+        self.chaves = _Chaves(registros)
+        self.vias = _Vias(registros, self.chaves, secao('ordem_chaves', 'I'), cabecalho['campos'])
+        self.total_trigramas = secao('total_trigramas', 'H')
+        self.indice_trigramas = _Trigramas(
+            _Fatias(secao('trigramas'), 3),
+            secao('postings_offsets', 'I'),
+            secao('postings', 'I'),
+        )
+        self.grade = _Grade(
+            secao('grade_celulas', 'i'),
+            secao('grade_offsets', 'I'),
+            secao('grade_lat', 'd'),
+            secao('grade_lon', 'd'),
+            secao('grade_trechos', 'i'),
+            secao('grade_nomes', 'I'),
+            _Textos(secao('nomes_offsets', 'I'), secao('nomes')),
+        )
+
+    @property
+    def tamanho_bytes(self) -> int:
+        return len(self._mmap)
+
+
+def abrir_snapshot(caminho: str) -> Optional[SnapshotViaMatcher]:
+    """Abre o snapshot; None se não existir ou estiver inválido"""
+    if not os.path.exists(caminho):
+        return None
+    try:
+        return SnapshotViaMatcher(caminho)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Snapshot do ViaMatcher invalido ({caminho}): {e}")
+        return None
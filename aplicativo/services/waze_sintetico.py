@@ -0,0 +1,301 @@
+"""
+Feed Waze Sintético
+===================
+
+Gera feeds TVT determinísticos (routes, irregularities com polylines,
+alerts) ao redor do centro do Rio e os serve por um servidor HTTP local,
+no lugar do endpoint real do Waze. Usado pelo comando benchmark_waze
+para medir o IntegradorWaze de ponta a ponta sem acessar a rede.
+
+Também gera polígonos de áreas de observação sobre a mesma região
+(gerar_areas), usados pelo comando benchmark_areas.
+
+Exemplo:
+    feed = gerar_feed(irregularidades=20000, alertas=5000, seed=42)
+    with ServidorFeedSintetico(feed) as servidor:
+        integrador = IntegradorWaze(cliente)
+        integrador.BASE_URL = servidor.base_url
+        integrador.coletar_dados()
+"""
+
+import json
+import math
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+TIPOS_IRREGULARIDADE = ['DYNAMIC', 'DYNAMIC', 'DYNAMIC', 'STATIC', 'ROAD_CLOSED', 'CONSTRUCTION']
+TIPOS_ALERTA = ['ACCIDENT', 'HAZARD', 'JAM', 'ROAD_CLOSED', 'POLICE']
+
+# Quantidade de nomes de via distintos no feed
+VIAS_DISTINTAS = 700
+
+# Vocabulário para nomes de via realistas (gerar_nomes_vias)
+_TIPOS_VIA = [
+    ('R', 'Rua'), ('R', 'Rua'), ('R', 'Rua'), ('Av', 'Avenida'), ('Av', 'Avenida'),
+    ('Etr', 'Estrada'), ('Trv', 'Travessa'), ('Pç', 'Praça'), ('Ld', 'Ladeira'), ('Al', 'Alameda'),
+]
+_TITULOS_VIA = [
+    '', '', '', 'Doutor', 'Professor', 'General', 'Almirante', 'Marechal',
+    'Visconde de', 'Barão de', 'Conde de', 'Padre', 'Santa', 'São', 'Presidente',
+]
+_NOMES_VIA = [
+    'João', 'José', 'Maria', 'Francisco', 'Antônio', 'Carlos', 'Paulo', 'Pedro',
+    'Luiz', 'Manuel', 'Joaquim', 'Ana', 'Rita', 'Teresa', 'Augusto', 'Henrique',
+    'Otávio', 'Benedito', 'Sebastião', 'Jerônimo', 'Leopoldo', 'Afonso', 'Rodrigo',
+    'Eduardo', 'Fernando', 'Gustavo', 'Raul', 'Olavo', 'Cândido', 'Tomás',
+]
+_SOBRENOMES_VIA = [
+    'Silva', 'Souza', 'Albuquerque', 'Mesquita', 'Pereira', 'Barbosa', 'Lima',
+    'Carvalho', 'Figueiredo', 'Magalhães', 'Rebouças', 'Bittencourt', 'Pinheiro',
+    'Vasconcelos', 'Guimarães', 'Cavalcanti', 'Moreira', 'Andrade', 'Teixeira',
+    'Nogueira', 'Queirós', 'Bastos', 'Frontin', 'Sampaio', 'Lacerda', 'Monteiro',
+    'Pestana', 'Rangel', 'Tavares', 'Vieira', 'Xavier', 'Brandão', 'Coutinho',
+]
+
+
+def _gerar_linha(rnd: random.Random, pontos: int) -> List[Dict]:
+    """Gera polyline aleatória ao redor do centro do Rio"""
+    x = -43.2 + rnd.uniform(-0.3, 0.3)
+    y = -22.9 + rnd.uniform(-0.15, 0.15)
+    linha = []
+    for _ in range(pontos):
+        x += rnd.uniform(-0.001, 0.001)
+        y += rnd.uniform(-0.001, 0.001)
+        linha.append({'x': x, 'y': y})
+    return linha
+
+
+def gerar_feed(rotas: int = 200, irregularidades: int = 20000, alertas: int = 5000, seed: int = 2024) -> Dict:
+    """
+    Gera um feed TVT sintético determinístico
+
+    Args:
+        rotas: Quantidade de routes
+        irregularidades: Quantidade de irregularities (com polylines)
+        alertas: Quantidade de alerts
+        seed: Semente do gerador (mesma semente = mesmo feed)
+
+    Returns:
+        Dict no formato do feed TVT do Waze
+    """
+    rnd = random.Random(seed)
+
+    feed_rotas = []
+    for i in range(rotas):
+        historic = rnd.randint(60, 900)
+        feed_rotas.append({
+            'id': 100000 + i,
+            'name': f'Rota {i}',
+            'fromName': f'Origem {i}',
+            'toName': f'Destino {i}',
+            'jamLevel': rnd.randint(0, 5),
+            'length': rnd.randint(500, 8000),
+            'time': int(historic * rnd.uniform(0.8, 3.0)),
+            'historicTime': historic,
+            'line': _gerar_linha(rnd, 10),
+        })
+
+    feed_irregularidades = []
+    for i in range(irregularidades):
+        historic = rnd.randint(30, 600)
+        feed_irregularidades.append({
+            'id': 200000 + i,
+            'type': rnd.choice(TIPOS_IRREGULARIDADE),
+            'name': f'Rua Sintetica {i % VIAS_DISTINTAS},Rio de Janeiro',
+            'toName': f'Cruzamento {i % 300}',
+            'jamLevel': rnd.randint(1, 5),
+            'length': rnd.randint(50, 5000),
+            'time': int(historic * rnd.uniform(0.9, 4.0)),
+            'historicTime': historic,
+            'line': _gerar_linha(rnd, rnd.randint(2, 12)),
+        })
+
+    feed_alertas = []
+    for i in range(alertas):
+        tipo = rnd.choice(TIPOS_ALERTA)
+        feed_alertas.append({
+            'uuid': f'alerta-{i}',
+            'type': tipo,
+            'subtype': f'{tipo}_MAJOR' if rnd.random() < 0.2 else f'{tipo}_MINOR',
+            'street': f'Rua Sintetica {i % VIAS_DISTINTAS}',
+            'city': 'Rio de Janeiro',
+            'reportRating': rnd.randint(0, 5),
+            'reliability': rnd.randint(0, 10),
+            'confidence': rnd.randint(0, 10),
+            'location': {
+                'x': -43.2 + rnd.uniform(-0.3, 0.3),
+                'y': -22.9 + rnd.uniform(-0.15, 0.15),
+            },
+        })
+
+    return {
+        'routes': feed_rotas,
+        'irregularities': feed_irregularidades,
+        'alerts': feed_alertas,
+        'lengthOfJams': [{'jamLevel': 1, 'jamLength': 0}],
+        'usersOnJams': [{'wazersCount': rnd.randint(0, 5000)}],
+    }
+
+
+def gerar_nomes_vias(quantidade: int, seed: int = 2024) -> List[Tuple[str, str, str]]:
+    """
+    Gera nomes de via distintos no estilo do Data.Rio
+
+    Returns:
+        Lista de (tipo_abreviado, tipo_extenso, nome_parcial)
+    """
+    rnd = random.Random(seed)
+    vistos = set()
+    nomes = []
+    while len(nomes) < quantidade:
+        abreviado, extenso = rnd.choice(_TIPOS_VIA)
+        partes = [rnd.choice(_TITULOS_VIA), rnd.choice(_NOMES_VIA)]
+        partes.extend(rnd.sample(_SOBRENOMES_VIA, rnd.randint(1, 2)))
+        parcial = ' '.join(p for p in partes if p)
+
+        if (extenso, parcial) in vistos:
+            # Espaço de combinações esgotado: diferenciar pelo número
+            parcial = f'{parcial} {len(nomes)}'
+        vistos.add((extenso, parcial))
+        nomes.append((abreviado, extenso, parcial))
+    return nomes
+
+
+def gerar_logradouros(quantidade: int = 500, cod_inicial: int = 900000000, nomes=None) -> List:
+    """
+    Gera logradouros (não gravados) com os nomes de via do feed sintético
+
+    Os primeiros `quantidade` nomes do feed ('Rua Sintetica N') passam a
+    existir como vias oficiais; os demais exercitam o fuzzy matching.
+    Todos entram no cache do ViaMatcher (arteriais/coletoras).
+
+    Args:
+        quantidade: Quantidade de logradouros
+        cod_inicial: Primeiro cod_trecho (fora da faixa do Data.Rio)
+        nomes: Lista de gerar_nomes_vias() no lugar de 'Rua Sintetica N'
+
+    Returns:
+        Lista de Logradouro para bulk_create
+    """
+    from ..models import Logradouro
+    from .via_matcher import normalizar_nome_via
+
+    if nomes is None:
+        nomes = [('R', 'Rua', f'Sintetica {i}') for i in range(quantidade)]
+
+    hierarquias = ['Arterial primária', 'Arterial secundária', 'Coletora']
+    return [
+        Logradouro(
+            cod_trecho=cod_inicial + i,
+            cod_logradouro=f'S{i}',
+            tipo_abreviado=abreviado,
+            tipo_extenso=extenso,
+            nome_parcial=parcial,
+            nome_completo=f'{extenso} {parcial}',
+            nome_mapa=f'{abreviado}. {parcial}',
+            nome_busca=normalizar_nome_via(f'{extenso} {parcial}'),
+            bairro='Centro',
+            hierarquia=hierarquias[i % len(hierarquias)],
+            velocidade_regulamentada=60,
+        )
+        for i, (abreviado, extenso, parcial) in enumerate(nomes[:quantidade])
+    ]
+
+
+def gerar_areas(quantidade: int = 100, vertices: int = 24, raio: float = 0.02, seed: int = 2024) -> List[Dict]:
+    """
+    Gera polígonos de áreas de observação (GeoJSON Feature) sobre o feed
+
+    Cada área é um polígono em estrela (não convexo) ao redor de um ponto
+    da mesma região das polylines de gerar_feed.
+
+    Args:
+        quantidade: Quantidade de áreas
+        vertices: Vértices do anel externo
+        raio: Raio máximo em graus (~2 km com 0.02)
+        seed: Semente do gerador
+
+    Returns:
+        Lista de GeoJSON Feature com geometria Polygon
+    """
+    rnd = random.Random(seed)
+    areas = []
+    for _ in range(quantidade):
+        cx = -43.2 + rnd.uniform(-0.3, 0.3)
+        cy = -22.9 + rnd.uniform(-0.15, 0.15)
+        angulos = sorted(rnd.uniform(0, 2 * math.pi) for _ in range(max(vertices, 3)))
+        anel = []
+        for angulo in angulos:
+            distancia = raio * rnd.uniform(0.4, 1.0)
+            anel.append([cx + distancia * math.cos(angulo), cy + distancia * math.sin(angulo)])
+        anel.append(anel[0])
+        areas.append({
+            'type': 'Feature',
+            'properties': {},
+            'geometry': {'type': 'Polygon', 'coordinates': [anel]},
+        })
+    return areas
+
+
+def total_itens(feed: Dict) -> int:
+    """Quantidade de itens (routes + irregularities + alerts) do feed"""
+    return sum(len(feed.get(chave) or []) for chave in ('routes', 'irregularities', 'alerts'))
+
+
+class ServidorFeedSintetico:
+    """
+    Servidor HTTP local que responde qualquer GET com o feed sintético
+
+    O feed é serializado uma única vez; a porta é escolhida pelo sistema.
+    Use como context manager e aponte IntegradorWaze.BASE_URL para
+    base_url.
+    """
+
+    def __init__(self, feed: Dict, host: str = '127.0.0.1', porta: int = 0):
+        self.conteudo = json.dumps(feed, separators=(',', ':')).encode('utf-8')
+        self.requisicoes = 0
+        self._trava = threading.Lock()
+
+        servidor = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with servidor._trava:
+                    servidor.requisicoes += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(servidor.conteudo)))
+                self.end_headers()
+                self.wfile.write(servidor.conteudo)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, porta), _Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, porta = self._httpd.server_address[:2]
+        return f'http://{host}:{porta}'
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+        return False
@@ -63,7 +63,9 @@ urlpatterns = [
     path('api/mob/waze-completo/', views_mobilidade.api_waze_completo, name='api_waze_completo'),
     # APIs de mobilidade - vias e alertas
     path('api/mob/vias-engarrafadas/', views_mobilidade.api_vias_engarrafadas, name='api_vias_engarrafadas'),
+    path('api/mob/vias-engarrafadas/ranking/', views_mobilidade.api_ranking_vias, name='api_ranking_vias'),
     path('api/mob/alertas-categorizados/', views_mobilidade.api_alertas_categorizados, name='api_alertas_categorizados'),
+    path('api/mob/via-matcher/metricas/', views_mobilidade.api_metricas_via_matcher, name='api_metricas_via_matcher'),
     path('mob/vias/', views_mobilidade.vias_engarrafadas_view, name='vias_engarrafadas'),
     path('mob/alertas/', views_mobilidade.alertas_categorizados_view, name='alertas_categorizados'),
     # Manter URL antiga para compatibilidade
@@ -35,6 +35,7 @@ from .models import (
     BensProtegidos,
     Calor
 )
+from .services.filtro_espacial import cache_de_tile, filtrar_pontos, limites_da_requisicao
 
 def teste_sem_login(request):
     """Teste sem login"""
@@ -55,6 +56,7 @@ def waze_dashboard_view(request):
 # APIs - SIRENES
 # ============================================
 
+@cache_de_tile()
 @never_cache
 def sirene_api(request):
     """
@@ -62,12 +64,25 @@ def sirene_api(request):
     Filtro:
     - Fonte COR: status == "ativa"
     - Fonte Defesa Civil: tipo != "Desligada"
+    - Opcional: ?bbox=oeste,sul,leste,norte ou ?tile=z/x/y
     """
+    try:
+        limites = limites_da_requisicao(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e), 'data': []}, status=400)
+
     try:
         lista_estacoes = []
         sirenes = Sirene.objects.all()
 
         for sirene in sirenes:
+            lat = float(sirene.lat) if sirene.lat else -22.9068
+            lng = float(sirene.lon) if sirene.lon else -43.1729
+
+            # Fora da área visível: nem consulta os dados da sirene
+            if limites and not limites.contem(lng, lat):
+                continue
+
             try:
                 # Pegar último dado da sirene
                 dados = DadosSirene.objects.filter(estacao_id=sirene.id).latest('id')
@@ -90,8 +105,8 @@ def sirene_api(request):
                 lista_estacoes.append({
                     "id": sirene.id,
                     "fonte": fonte,
-                    "lat": float(sirene.lat) if sirene.lat else -22.9068,
-                    "lng": float(sirene.lon) if sirene.lon else -43.1729,
+                    "lat": lat,
+                    "lng": lng,
                     "nome": sirene.nome,
                     "cidade": sirene.municipio if hasattr(sirene, 'municipio') else "Rio de Janeiro",
                     "status": status,
@@ -109,12 +124,15 @@ def sirene_api(request):
         ativas = len(lista_ordenada)
         logger.info(f"🚨 {ativas} sirenes ATIVAS no momento")
 
-        return JsonResponse({
+        resposta = {
             'success': True,
             'count': ativas,
             'ativas': ativas,
             'data': lista_ordenada
-        })
+        }
+        if limites:
+            resposta['bbox'] = limites.como_dict()
+        return JsonResponse(resposta)
 
     except Exception as e:
         logger.error(f"❌ Erro na API de sirenes: {str(e)}")
@@ -1210,6 +1228,12 @@ def api_cameras(request):
         search = request.GET.get('search', None)
         tipo = request.GET.get('tipo', None)  # 'fixa' ou 'movel'
 
+        # Recorte da área visível (?bbox= ou ?tile=z/x/y)
+        try:
+            limites = limites_da_requisicao(request)
+        except ValueError as e:
+            return Response({'success': False, 'error': str(e)}, status=400)
+
         # Buscar dados via TIXXI (fonte oficial)
         token = _get_tixxi_token()
         if not token:
@@ -1268,6 +1292,8 @@ def api_cameras(request):
                         continue
                     if tipo.lower() == 'movel' and fixa:
                         continue
+                if limites and not limites.contem(lng, lat):
+                    continue
 
                 # URL do stream
                 url_stream = cam.get('URL', '').replace('\\/', '/')
@@ -1302,7 +1328,8 @@ def api_cameras(request):
             'total_raw_moveis': total_raw_moveis,
             'bairros': sorted(list(bairros_set)),
             'zonas': sorted(list(zonas_set)),
-            'source': 'TIXXI'
+            'source': 'TIXXI',
+            **({'bbox': limites.como_dict()} if limites else {}),
         })
 
     except Exception as e:
@@ -1313,6 +1340,7 @@ def api_cameras(request):
         }, status=500)
 
 
+@cache_de_tile()
 @api_view(['GET'])
 def cameras_api_local(request):
     """Compatibilidade com /api/cameras/."""
@@ -3436,12 +3464,20 @@ def api_chuvas_defesa_civil(request):
         }, status=500)
 
 
+@cache_de_tile()
 @never_cache
 def api_sirenes_defesa_civil(request):
     """
     API de status das sirenes da Defesa Civil RJ
     Fonte: https://aplicativo.cocr.com.br/sirene_api
+
+    Opcional: ?bbox=oeste,sul,leste,norte ou ?tile=z/x/y
     """
+    try:
+        limites = limites_da_requisicao(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e), 'data': []}, status=400)
+
     try:
         response = requests.get(
             'https://aplicativo.cocr.com.br/sirene_api',
@@ -3483,6 +3519,9 @@ def api_sirenes_defesa_civil(request):
                     logger.warning(f"Erro ao parsear linha sirene: {linha[:50]}...")
                     continue
 
+        if limites:
+            sirenes = filtrar_pontos(sirenes, limites)
+
         # Estatísticas
         total = len(sirenes)
         online_count = len([s for s in sirenes if s['online']])
@@ -3505,12 +3544,20 @@ def api_sirenes_defesa_civil(request):
         }, status=500)
 
 
+@cache_de_tile()
 @never_cache
 def api_sirenes_chuvas_combinado(request):
     """
     API combinada: Sirenes + Chuvas em um único endpoint
     Combina dados de ambas as fontes por localização
+
+    Opcional: ?bbox=oeste,sul,leste,norte ou ?tile=z/x/y
     """
+    try:
+        limites = limites_da_requisicao(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e), 'data': []}, status=400)
+
     try:
         # Buscar dados de chuva
         chuvas_response = requests.get(
@@ -3588,6 +3635,9 @@ def api_sirenes_chuvas_combinado(request):
                     except (ValueError, IndexError):
                         continue
 
+        if limites:
+            dados_combinados = filtrar_pontos(dados_combinados, limites)
+
         # Estatísticas
         total = len(dados_combinados)
         sirenes_online = len([d for d in dados_combinados if d['sirene']['online']])
@@ -23,6 +23,7 @@ from django.utils import timezone
 from .models import (
     AreaObservacao, InventarioArea, AlertaArea, Cliente, AlertaUsuarioConfirmado
 )
+from .services.inventario_areas import inventariar_areas, obter_inventario
 
 
 def api_login_required(view_func):
@@ -94,16 +95,11 @@ def area_detalhe(request, area_id):
     if area.cliente != cliente:
         return JsonResponse({'error': 'Acesso negado'}, status=403)
 
-    # Inventariar
-    inventario = area.inventariar()
-    nivel = area.calcular_nivel_operacional()
-
-    # Salvar snapshot do inventário
-    InventarioArea.objects.create(
-        area=area,
-        dados=inventario,
-        nivel_operacional=nivel
-    )
+    # Último snapshot do inventário agendado (?forcar=1 recalcula)
+    forcar = request.GET.get('forcar') == '1'
+    snapshot, _ = obter_inventario(area, forcar=forcar)
+    inventario = snapshot.dados
+    nivel = snapshot.nivel_operacional
 
     # Buscar histórico (últimas 24h)
     limite = timezone.now() - timedelta(hours=24)
@@ -146,6 +142,7 @@ def area_detalhe(request, area_id):
         'grafico_data': json.dumps(grafico_data),
         'alertas': alertas,
         'agora': timezone.now(),
+        'inventario_em': snapshot.data_hora,
         'geojson': json.dumps(area.geojson),
     }
 
@@ -158,8 +155,11 @@ def area_detalhe(request, area_id):
 
 @login_required
 def api_listar_areas(request):
-    """API para listar todas as áreas"""
+    """API para listar todas as áreas (?zoom= simplifica os polígonos; ?bbox=/?tile= recorta no banco)"""
     from django.utils import timezone
+    from .services.filtro_espacial import limites_da_requisicao
+    from .services.geometria import banda_para_zoom, simplificar_geojson
+    from .services.inventario_areas import filtrar_por_retangulo
 
     cliente = Cliente.objects.filter(ativo=True).first()
 
@@ -168,6 +168,7 @@ def api_listar_areas(request):
 
     # Parâmetro para incluir todas as áreas (mesmo inativas)
     incluir_inativas = request.GET.get('incluir_inativas', 'false').lower() == 'true'
+    banda = banda_para_zoom(request.GET.get('zoom'))
 
     if incluir_inativas:
         areas = AreaObservacao.objects.filter(cliente=cliente).order_by('-criado_em')
@@ -177,6 +178,13 @@ def api_listar_areas(request):
             ativa=True
         ).order_by('-criado_em')
 
+    try:
+        limites = limites_da_requisicao(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    if limites:
+        areas = filtrar_por_retangulo(areas, limites)
+
     data = []
     agora = timezone.now()
 
@@ -199,7 +207,7 @@ def api_listar_areas(request):
             'descricao': area.descricao,
             'cor': area.cor,
             'tipo_desenho': area.tipo_desenho,
-            'geojson': area.geojson,
+            'geojson': simplificar_geojson(area.geojson, banda) if banda else area.geojson,
             'criado_em': area.criado_em.isoformat(),
             'ultimo_inventario': ultimo_inv.dados if ultimo_inv else {},
             'nivel_operacional': ultimo_inv.nivel_operacional if ultimo_inv else 1,
@@ -214,11 +222,14 @@ def api_listar_areas(request):
             'ativa': area.ativa,
         })
 
-    return JsonResponse({
+    resposta = {
         'success': True,
         'areas': data,
         'total': len(data)
-    })
+    }
+    if limites:
+        resposta['bbox'] = limites.como_dict()
+    return JsonResponse(resposta)
 
 
 @csrf_exempt
@@ -256,7 +267,7 @@ def api_criar_area(request):
 
         # Fazer inventário inicial
         inventario = area.inventariar()
-        nivel = area.calcular_nivel_operacional()
+        nivel = area.calcular_nivel_operacional(inventario)
 
         # Salvar snapshot
         InventarioArea.objects.create(
@@ -367,7 +378,13 @@ def api_deletar_area(request, area_id):
 
 @login_required
 def api_inventariar_area(request, area_id):
-    """API para inventariar área (atualização em tempo real)"""
+    """
+    API com o inventário da área
+
+    Serve o último snapshot do inventário agendado (comando
+    inventariar_areas); ?forcar=1 recalcula, verifica os alertas e grava
+    um novo snapshot.
+    """
 
     try:
         area = get_object_or_404(AreaObservacao, id=area_id)
@@ -377,19 +394,10 @@ def api_inventariar_area(request, area_id):
         if area.cliente != cliente:
             return JsonResponse({'error': 'Acesso negado'}, status=403)
 
-        # Inventariar
-        inventario = area.inventariar()
-        nivel = area.calcular_nivel_operacional()
-
-        # Salvar snapshot
-        InventarioArea.objects.create(
-            area=area,
-            dados=inventario,
-            nivel_operacional=nivel
-        )
-
-        # Verificar se precisa gerar alertas
-        verificar_e_gerar_alertas(area, inventario, nivel)
+        forcar = request.GET.get('forcar') == '1'
+        snapshot, recalculado = obter_inventario(area, forcar=forcar)
+        inventario = snapshot.dados
+        nivel = snapshot.nivel_operacional
 
         # Cores e nomes dos níveis
         niveis_info = {
@@ -406,7 +414,8 @@ def api_inventariar_area(request, area_id):
             'nivel': nivel,
             'nivel_nome': niveis_info[nivel]['nome'],
             'nivel_cor': niveis_info[nivel]['cor'],
-            'timestamp': timezone.now().isoformat(),
+            'timestamp': snapshot.data_hora.isoformat(),
+            'recalculado': recalculado,
         })
 
     except Exception as e:
@@ -479,9 +488,11 @@ def api_marcar_alerta_lido(request, alerta_id):
 
 @login_required
 def api_exportar_geojson(request, area_id):
-    """Exportar área em formato GeoJSON"""
+    """Exportar área em formato GeoJSON (?zoom= simplifica o polígono)"""
+    from .services.geometria import banda_para_zoom, simplificar_geometria
 
     area = get_object_or_404(AreaObservacao, id=area_id)
+    banda = banda_para_zoom(request.GET.get('zoom'))
 
     geojson = {
         "type": "Feature",
@@ -495,6 +506,9 @@ def api_exportar_geojson(request, area_id):
         "geometry": area.geojson.get('geometry', area.geojson)
     }
 
+    if banda:
+        geojson['geometry'] = simplificar_geometria(geojson['geometry'], banda)
+
     response = HttpResponse(
         json.dumps(geojson, indent=2, ensure_ascii=False),
         content_type='application/geo+json'
@@ -565,7 +579,7 @@ def api_exportar_relatorio_pdf(request, area_id):
 
     area = get_object_or_404(AreaObservacao, id=area_id)
     inventario = area.inventariar()
-    nivel = area.calcular_nivel_operacional()
+    nivel = area.calcular_nivel_operacional(inventario)
 
     niveis_info = {
         1: 'E1 - Normal',
@@ -785,6 +799,7 @@ def api_importar_kml(request):
             }, status=400)
 
         # Criar áreas para cada placemark
+        areas = []
         areas_criadas = []
         erros = []
 
@@ -819,26 +834,29 @@ def api_importar_kml(request):
                     evento_fim=evento_fim,
                 )
 
-                # Fazer inventário inicial
-                inventario = area.inventariar()
-                nivel = area.calcular_nivel_operacional()
-
-                InventarioArea.objects.create(
-                    area=area,
-                    dados=inventario,
-                    nivel_operacional=nivel
-                )
-
+                areas.append(area)
                 areas_criadas.append({
                     'id': str(area.id),
                     'nome': area.nome,
                     'tipo': tipo,
-                    'nivel': nivel,
+                    'nivel': 1,
                 })
 
             except Exception as e:
                 erros.append(f"Erro ao criar '{nome}': {str(e)}")
 
+        # Inventário inicial de todas as áreas importadas em uma passada
+        try:
+            inventarios = inventariar_areas(areas)
+            snapshots = []
+            for area, item in zip(areas, areas_criadas):
+                inventario = inventarios.get(area.id, {})
+                item['nivel'] = area.calcular_nivel_operacional(inventario)
+                snapshots.append(InventarioArea(area=area, dados=inventario, nivel_operacional=item['nivel']))
+            InventarioArea.objects.bulk_create(snapshots)
+        except Exception as e:
+            erros.append(f"Erro no inventário inicial: {str(e)}")
+
         return JsonResponse({
             'success': True,
             'areas_criadas': areas_criadas,
@@ -1673,82 +1691,3 @@ def api_atualizar_agendamento_grupo(request, grupo_id):
             'error': str(e)
         }, status=500)
 
-
-# ============================================
-# FUNÇÕES AUXILIARES
-# ============================================
-
-def verificar_e_gerar_alertas(area, inventario, nivel_atual):
-    """Verifica condições e gera alertas se necessário"""
-
-    if not area.alerta_habilitado:
-        return
-
-    # Buscar último inventário para comparar
-    ultimo_inv = area.inventarios.order_by('-data_hora').first()
-    nivel_anterior = ultimo_inv.nivel_operacional if ultimo_inv else 1
-
-    # Verificar mudança de nível
-    if nivel_atual > nivel_anterior:
-        AlertaArea.objects.create(
-            area=area,
-            tipo='nivel_mudou',
-            titulo=f'Nível subiu para E{nivel_atual}',
-            descricao=f'O nível operacional da área "{area.nome}" subiu de E{nivel_anterior} para E{nivel_atual}.',
-            gravidade='critico' if nivel_atual >= 4 else 'atencao'
-        )
-
-    # Verificar ocorrências graves
-    ocorrencias_graves = inventario.get('ocorrencias', {}).get('graves', 0)
-    if ocorrencias_graves >= 3:
-        # Verificar se já não tem alerta recente
-        alerta_recente = AlertaArea.objects.filter(
-            area=area,
-            tipo='ocorrencia_grave',
-            data_hora__gte=timezone.now() - timedelta(minutes=30)
-        ).exists()
-
-        if not alerta_recente:
-            AlertaArea.objects.create(
-                area=area,
-                tipo='ocorrencia_grave',
-                titulo=f'{ocorrencias_graves} ocorrências graves na área',
-                descricao=f'A área "{area.nome}" possui {ocorrencias_graves} ocorrências com prioridade alta/urgente/crítica.',
-                gravidade='critico'
-            )
-
-    # Verificar congestionamentos severos
-    jams_severos = inventario.get('waze', {}).get('jams_severos', 0)
-    if jams_severos >= 5:
-        alerta_recente = AlertaArea.objects.filter(
-            area=area,
-            tipo='jam_severo',
-            data_hora__gte=timezone.now() - timedelta(minutes=30)
-        ).exists()
-
-        if not alerta_recente:
-            AlertaArea.objects.create(
-                area=area,
-                tipo='jam_severo',
-                titulo=f'{jams_severos} congestionamentos severos',
-                descricao=f'A área "{area.nome}" possui {jams_severos} congestionamentos de nível 4-5.',
-                gravidade='atencao'
-            )
-
-    # Verificar sirenes acionadas
-    sirenes_acionadas = inventario.get('sirenes', {}).get('acionadas', 0)
-    if sirenes_acionadas >= 1:
-        alerta_recente = AlertaArea.objects.filter(
-            area=area,
-            tipo='sirene_acionada',
-            data_hora__gte=timezone.now() - timedelta(minutes=60)
-        ).exists()
-
-        if not alerta_recente:
-            AlertaArea.objects.create(
-                area=area,
-                tipo='sirene_acionada',
-                titulo=f'Sirene acionada na área!',
-                descricao=f'{sirenes_acionadas} sirene(s) acionada(s) na área "{area.nome}".',
-                gravidade='critico'
-            )
@@ -14,10 +14,13 @@ from django.db.models import Q
 from django.views.decorators.cache import never_cache
 
 from .models import Evento, DataEvento, SecLocaisEvento, Local
+from .services.geometria import banda_para_zoom, simplificar_geojson
+from .services.filtro_espacial import cache_de_tile, filtrar_geojson, limites_da_requisicao
 
 
 # ==================== API DE EVENTOS ====================
 
+@cache_de_tile()
 @never_cache
 def api_eventos_geojson(request):
     """
@@ -25,7 +28,15 @@ def api_eventos_geojson(request):
 
     GET /api/eventos/geojson/
     GET /api/eventos/geojson/?status=Planejado&criticidade=Alta&dias=30
+    GET /api/eventos/geojson/?zoom=12  (simplifica os polígonos)
+    GET /api/eventos/geojson/?bbox=-43.3,-23.0,-43.1,-22.8  (área visível)
+    GET /api/eventos/geojson/?tile=14/6225/9262
     """
+    try:
+        limites = limites_da_requisicao(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
     try:
         # Filtros
         status = request.GET.get('status')
@@ -182,6 +193,13 @@ def api_eventos_geojson(request):
             "features": features
         }
 
+        if limites:
+            geojson = filtrar_geojson(geojson, limites)
+
+        banda = banda_para_zoom(request.GET.get('zoom'))
+        if banda:
+            geojson = simplificar_geojson(geojson, banda)
+
         return JsonResponse(geojson)
 
     except Exception as e:
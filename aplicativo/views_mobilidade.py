@@ -9,11 +9,18 @@ Integrado ao Grupo 3 (Mobilidade) do Motor de Decisao.
 import json
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from datetime import timedelta
 from .models import Cliente, DadosMobilidade
+from .services.filtro_espacial import (
+    cache_de_tile,
+    filtrar_payload_waze,
+    filtrar_pontos,
+    limites_da_requisicao,
+)
 
 
 @login_required
@@ -301,15 +308,26 @@ def api_dados_mobilidade(request):
         }, status=500)
 
 
+@cache_de_tile()
 @login_required
 def api_jams_mapa(request):
     """
     API para obter congestionamentos para mapa
 
+    Parâmetros:
+        zoom: nível de zoom do mapa (simplifica as geometrias)
+        polyline: 1 para enviar 'polyline' codificada (precisão 5) no lugar de 'coordinates'
+        bbox / tile: recorte da área visível (oeste,sul,leste,norte ou z/x/y)
+
     Retorna:
         JSON com lista de jams com coordenadas
     """
 
+    try:
+        limites = limites_da_requisicao(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
     try:
         cliente = Cliente.objects.filter(ativo=True).first()
 
@@ -322,6 +340,14 @@ def api_jams_mapa(request):
         from .services.integrador_waze import IntegradorWaze
         integrador = IntegradorWaze(cliente)
         jams = integrador.obter_jams_para_mapa()
+        if limites:
+            jams = filtrar_payload_waze({'congestionamentos': jams}, limites)['congestionamentos']
+
+        from .services.geometria import banda_para_zoom, simplificar_jams
+        banda = banda_para_zoom(request.GET.get('zoom'))
+        codificar = request.GET.get('polyline') == '1'
+        if banda or codificar:
+            jams = simplificar_jams(jams, banda or 'alto', codificar=codificar)
 
         return JsonResponse({
             'success': True,
@@ -336,15 +362,24 @@ def api_jams_mapa(request):
         }, status=500)
 
 
+@cache_de_tile()
 @login_required
 def api_alerts_mapa(request):
     """
     API para obter alertas para mapa
 
+    Parâmetros:
+        bbox / tile: recorte da área visível (oeste,sul,leste,norte ou z/x/y)
+
     Retorna:
         JSON com lista de alerts com coordenadas
     """
 
+    try:
+        limites = limites_da_requisicao(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
     try:
         cliente = Cliente.objects.filter(ativo=True).first()
 
@@ -357,6 +392,8 @@ def api_alerts_mapa(request):
         from .services.integrador_waze import IntegradorWaze
         integrador = IntegradorWaze(cliente)
         alerts = integrador.obter_alerts_para_mapa()
+        if limites:
+            alerts = filtrar_pontos(alerts, limites, campo_lat='lat', campo_lon='lon')
 
         return JsonResponse({
             'success': True,
@@ -407,6 +444,34 @@ def api_resumo_mobilidade(request):
         }, status=500)
 
 
+def _resposta_payload_mapa(request, registro, limites=None):
+    """
+    Resposta HTTP para um PayloadMapaWaze pré-serializado
+
+    Responde 304 quando o If-None-Match confere com o hash do conteúdo e
+    envia os bytes gzip armazenados quando o cliente aceita gzip. Com
+    recorte (bbox/tile), o payload é filtrado e a ETag inclui o recorte.
+    """
+    etags = [etag.removeprefix('W/') for etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))]
+    etag = registro.etag if not limites else f'"{registro.hash_conteudo}-{limites.chave}"'
+
+    if etag in etags or '*' in etags:
+        resposta = HttpResponseNotModified()
+    elif limites:
+        resposta = JsonResponse(filtrar_payload_waze(registro.carregar(), limites))
+    elif 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        resposta = HttpResponse(bytes(registro.conteudo), content_type='application/json')
+        resposta['Content-Encoding'] = 'gzip'
+    else:
+        resposta = HttpResponse(registro.json_bytes(), content_type='application/json')
+
+    resposta['ETag'] = etag
+    resposta['Vary'] = 'Accept-Encoding'
+    resposta['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+
+@cache_de_tile()
 @login_required
 def api_waze_completo(request):
     """
@@ -420,6 +485,24 @@ def api_waze_completo(request):
             - rotas_transito: Rotas com transito alto
             - alertas: Acidentes, perigos, etc
             - estatisticas: Contagens por tipo
+
+    Por padrão consulta o feed partner do Waze em tempo real. Com
+    armazenado=1 (ou since), serve o payload pré-calculado na última
+    coleta (com ETag, 304 e gzip), a partir do feed TVT armazenado; sem
+    coleta recente, cai para o feed em tempo real.
+
+    Parâmetros:
+        armazenado: 1 para servir o payload pré-calculado na coleta.
+        since: id do snapshot já carregado. Retorna apenas os itens
+            adicionados/alterados desde ele, mais 'removidos'
+            ({categoria: [ids]}).
+        zoom: nível de zoom do mapa. Simplifica as geometrias
+            (Douglas-Peucker + quantização) para a faixa correspondente.
+        polyline: 1 para enviar 'polyline' codificada no lugar de
+            'coordinates'. Sempre com precisão 5, o padrão dos
+            decodificadores (polyline.js), em qualquer zoom.
+        bbox: oeste,sul,leste,norte - apenas os itens da área visível.
+        tile: z/x/y - recorte por tile do mapa (resposta cacheável).
     """
 
     def _mapear_feed_partner(raw):
@@ -498,7 +581,58 @@ def api_waze_completo(request):
             }, status=400)
 
         from .services.integrador_waze import IntegradorWaze
+        from .services.geometria import banda_para_zoom, simplificar_payload
         integrador = IntegradorWaze(cliente)
+
+        # Simplificação de geometrias por zoom / polyline codificada
+        banda = banda_para_zoom(request.GET.get('zoom'))
+        codificar = request.GET.get('polyline') == '1'
+
+        # Recorte da área visível
+        try:
+            limites = limites_da_requisicao(request)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+
+        def _resposta(dados):
+            if limites:
+                dados = filtrar_payload_waze(dados, limites)
+            if codificar:
+                dados = simplificar_payload(dados, banda or 'alto', codificar=True)
+            elif banda and dados.get('snapshot_id') is None:
+                # Dados de snapshot já vêm simplificados para a banda
+                dados = simplificar_payload(dados, banda)
+            return JsonResponse({
+                'success': True,
+                **dados
+            })
+
+        # Atualização incremental a partir dos snapshots armazenados
+        since = request.GET.get('since')
+        if since:
+            try:
+                since_id = int(since)
+            except ValueError:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Parametro since invalido'
+                }, status=400)
+
+            return _resposta(integrador.obter_mapa_incremental(since_id, banda))
+
+        # Payload pré-calculado na coleta (opcional)
+        if request.GET.get('armazenado') == '1':
+            registro = None if codificar else integrador.obter_payload_mapa(banda)
+            if registro:
+                return _resposta_payload_mapa(request, registro, limites)
+
+            dados = integrador.obter_mapa_incremental(None, banda)
+            if dados['snapshot_id'] is not None:
+                return _resposta(dados)
+
         dados = integrador.obter_dados_completos_mapa()
 
         # SEMPRE usar dados em tempo real do Waze para o mapa
@@ -520,10 +654,7 @@ def api_waze_completo(request):
             raw = response.json()
             dados = _mapear_feed_partner(raw)
 
-        return JsonResponse({
-            'success': True,
-            **dados
-        })
+        return _resposta(dados)
 
     except Exception as e:
         return JsonResponse({
@@ -573,6 +704,115 @@ def api_vias_engarrafadas(request):
         }, status=500)
 
 
+@login_required
+def api_ranking_vias(request):
+    """
+    API com o ranking histórico dos trechos mais congestionados
+
+    Lê o histórico por trecho e hora (CongestionamentoViaHora), sem varrer
+    os registros brutos de CongestionamentoVia.
+
+    Query params:
+        dias: Período em dias até agora (padrão: 7)
+        horas: Período em horas (substitui dias)
+        limite: Quantidade de trechos (padrão: 20, máximo 200)
+        ordenar: atraso, extensao, horas, registros ou criticidade (padrão: atraso)
+
+    Returns:
+        JSON com os trechos, pior primeiro
+    """
+    from .services.historico_congestionamentos import MAXIMO_RANKING, ORDENACOES, ranking_vias
+
+    try:
+        if request.GET.get('horas'):
+            periodo = timedelta(hours=int(request.GET['horas']))
+        else:
+            periodo = timedelta(days=int(request.GET.get('dias', 7)))
+        limite = min(int(request.GET.get('limite', 20)), MAXIMO_RANKING)
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': 'dias, horas e limite devem ser inteiros'
+        }, status=400)
+
+    ordenar = request.GET.get('ordenar', 'atraso')
+    if ordenar not in ORDENACOES or periodo <= timedelta(0) or limite < 1:
+        return JsonResponse({
+            'success': False,
+            'error': f"Parametros invalidos (ordenar: {', '.join(ORDENACOES)}; periodo e limite positivos)"
+        }, status=400)
+
+    try:
+        cliente = Cliente.objects.filter(ativo=True).first()
+
+        if not cliente:
+            return JsonResponse({
+                'success': False,
+                'error': 'Nenhum cliente configurado'
+            }, status=400)
+
+        fim = timezone.now()
+        inicio = fim - periodo
+        vias = ranking_vias(cliente, inicio, limite=limite, ordenar=ordenar)
+
+        return JsonResponse({
+            'success': True,
+            'inicio': inicio.isoformat(),
+            'fim': fim.isoformat(),
+            'ordenar': ordenar,
+            'total': len(vias),
+            'vias': vias,
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+@login_required
+def api_metricas_via_matcher(request):
+    """
+    API com as métricas do ViaMatcher (todos os workers)
+
+    Query params:
+        horas: Janela das métricas publicadas (padrão: 24)
+        top: Quantidade de nomes sem match (padrão: 20)
+
+    Returns:
+        JSON com latência e acertos por etapa, origens e nomes sem match
+    """
+    try:
+        horas = int(request.GET.get('horas', 24))
+        top = int(request.GET.get('top', 20))
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': 'horas e top devem ser inteiros'
+        }, status=400)
+
+    try:
+        from .services import via_matcher
+        from .services.metricas_via_matcher import agregar_metricas, resumir_metricas
+
+        # Métricas deste processo em memória (mais recentes que as publicadas)
+        locais = via_matcher._matcher_instance.metricas if via_matcher._matcher_instance else None
+        resumo = resumir_metricas(agregar_metricas(horas=horas, locais=locais), top=top)
+
+        return JsonResponse({
+            'success': True,
+            'horas': horas,
+            **resumo,
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
 @login_required
 def api_alertas_categorizados(request):
     """
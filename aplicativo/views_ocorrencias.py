@@ -11,6 +11,7 @@ from django.utils import timezone
 from django.core.paginator import Paginator
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth import get_user_model
+from django.db import transaction
 import requests
 import json
 
@@ -24,10 +25,33 @@ from .models import (
     AgenciaOcorrencia,
     AuditLog
 )
+from .services.filtro_espacial import cache_de_tile, filtrar_queryset, limites_da_requisicao
+from .services.snapping_vias import vincular_ocorrencias
 
 User = get_user_model()
 
 
+def _vincular_trecho(ocorrencia):
+    """
+    Trecho oficial mais próximo das coordenadas, depois do commit
+
+    O snapping pode montar o índice de trechos (processo recém-iniciado);
+    erros são registrados e não afetam a ocorrência já gravada.
+    """
+    if ocorrencia.latitude is None or ocorrencia.longitude is None:
+        return
+
+    def vincular():
+        try:
+            vincular_ocorrencias([ocorrencia])
+        except Exception as e:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.warning(f"Erro ao vincular trecho da ocorrência {ocorrencia.numero_protocolo}: {e}")
+
+    transaction.on_commit(vincular)
+
+
 @login_required
 def ocorrencias_dashboard(request):
     """Dashboard principal de ocorrências"""
@@ -274,6 +298,9 @@ def ocorrencia_criar(request):
                 {'protocolo': ocorrencia.numero_protocolo}
             )
 
+            # Trecho oficial mais próximo das coordenadas
+            _vincular_trecho(ocorrencia)
+
             # Recalcular estágio operacional da cidade
             try:
                 from .services.motor_decisao import MotorDecisao
@@ -462,6 +489,7 @@ def ocorrencia_editar(request, ocorrencia_id):
                 if ocorrencia.status == 'fechada':
                     ocorrencia.data_conclusao = timezone.now()
 
+            localizacao_alterada = ocorrencia.campos_areas_alterados(['latitude', 'longitude'])
             ocorrencia.save()
 
             # Atualizar agências
@@ -522,6 +550,10 @@ def ocorrencia_editar(request, ocorrencia_id):
                 {'alteracoes': alteracoes}
             )
 
+            # Coordenadas mudaram: refazer o trecho oficial
+            if localizacao_alterada:
+                _vincular_trecho(ocorrencia)
+
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
                     'success': True,
@@ -703,9 +735,20 @@ def buscar_cep(request):
         }, status=500)
 
 
+@cache_de_tile()
 @login_required
 def api_ocorrencias_mapa(request):
-    """API para retornar ocorrências para exibição no mapa"""
+    """
+    API para retornar ocorrências para exibição no mapa
+
+    Aceita ?bbox=oeste,sul,leste,norte ou ?tile=z/x/y para retornar
+    apenas a área visível.
+    """
+
+    try:
+        limites = limites_da_requisicao(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
     # Filtrar ocorrências com coordenadas
     ocorrencias = OcorrenciaGerenciada.objects.filter(
@@ -726,6 +769,8 @@ def api_ocorrencias_mapa(request):
         ocorrencias = ocorrencias.filter(prioridade=prioridade_filter)
     if categoria_filter:
         ocorrencias = ocorrencias.filter(categoria_id=categoria_filter)
+    if limites:
+        ocorrencias = filtrar_queryset(ocorrencias, limites)
 
     data = []
     for oc in ocorrencias:
@@ -747,7 +792,10 @@ def api_ocorrencias_mapa(request):
             'data_abertura': oc.data_abertura.strftime('%d/%m/%Y %H:%M'),
         })
 
-    return JsonResponse({'success': True, 'data': data, 'total': len(data)})
+    resposta = {'success': True, 'data': data, 'total': len(data)}
+    if limites:
+        resposta['bbox'] = limites.como_dict()
+    return JsonResponse(resposta)
 
 
 @login_required